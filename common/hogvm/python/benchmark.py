@@ -0,0 +1,117 @@
+"""
+Measures how fast the Python HogVM runs a typical per-event filter and a tight loop.
+
+    python -m common.hogvm.python.benchmark [--seconds 2]
+
+"execute_bytecode" validates and decodes the program on every call, like most callers do today. "HogVM.run" reuses
+one VM (and its decoded instructions) for every call, which is what hot paths evaluating the same program per event
+should do.
+"""
+
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from common.hogvm.python.execute import HogVM, execute_bytecode
+from common.hogvm.python.operation import HOGQL_BYTECODE_IDENTIFIER as _H, Operation as op
+
+# event = '$pageview' and properties.$current_url ilike '%posthog%' and properties.value > 10
+FILTER_BYTECODE: list[Any] = [
+    _H,
+    1,
+    op.STRING,
+    "$pageview",
+    op.STRING,
+    "event",
+    op.GET_GLOBAL,
+    1,
+    op.EQ,
+    op.STRING,
+    "%posthog%",
+    op.STRING,
+    "$current_url",
+    op.STRING,
+    "properties",
+    op.GET_GLOBAL,
+    2,
+    op.ILIKE,
+    op.INTEGER,
+    10,
+    op.STRING,
+    "value",
+    op.STRING,
+    "properties",
+    op.GET_GLOBAL,
+    2,
+    op.GT,
+    op.AND,
+    3,
+]
+
+FILTER_GLOBALS = {
+    "event": "$pageview",
+    "properties": {
+        "$current_url": "https://posthog.com/docs",
+        "value": 42,
+        "$browser": "Chrome",
+        "$os": "Mac OS X",
+    },
+}
+
+# let i := 0; while (i < 10000) { i := i + 1 }; return i
+LOOP_BYTECODE: list[Any] = [
+    _H,
+    1,
+    op.INTEGER,
+    0,
+    op.INTEGER,
+    10000,
+    op.GET_LOCAL,
+    0,
+    op.LT,
+    op.JUMP_IF_FALSE,
+    9,
+    op.INTEGER,
+    1,
+    op.GET_LOCAL,
+    0,
+    op.PLUS,
+    op.SET_LOCAL,
+    0,
+    op.JUMP,
+    -16,
+]
+
+
+def measure(fn: Callable[[], Any], seconds: float) -> float:
+    """Returns calls per second."""
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(100):
+            fn()
+        calls += 100
+    return calls / elapsed
+
+
+def main(seconds: float) -> None:
+    vm = HogVM(FILTER_BYTECODE)
+    assert vm.run(FILTER_GLOBALS).result is True
+    filter_ops = vm.ops
+    for name, fn in (
+        ("execute_bytecode", lambda: execute_bytecode(FILTER_BYTECODE, FILTER_GLOBALS)),
+        ("HogVM.run", lambda: vm.run(FILTER_GLOBALS)),
+    ):
+        runs = measure(fn, seconds)
+        print(f"filter  {name:<17} {runs:>12,.0f} runs/sec {runs * filter_ops:>14,.0f} ops/sec")  # noqa: T201
+
+    loop_vm = HogVM(LOOP_BYTECODE)
+    assert loop_vm.run().result == 10000
+    loop_ops = loop_vm.ops
+    runs = measure(loop_vm.run, seconds)
+    print(f"loop    {'HogVM.run':<17} {runs:>12,.1f} runs/sec {runs * loop_ops:>14,.0f} ops/sec")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[sys.argv.index("--seconds") + 1]) if "--seconds" in sys.argv else 2.0)
@@ -26,6 +26,7 @@ from common.hogvm.python.utils import (
     like,
     set_nested_value,
     calculate_cost,
+    COST_PER_UNIT,
     unify_comparison_types,
     HogVMRuntimeExceededException,
     HogVMMemoryExceededException,
@@ -46,91 +47,245 @@ class BytecodeResult:
     stdout: list[str]
 
 
+# An instruction is pre-decoded once per bytecode position: (handler, operands, width, checks_timeout).
+# The handler returns None to advance past the instruction, or _JUMPED / _HALT when it changed the frame itself.
+Instruction = tuple[Callable[["HogVM", tuple], Optional[int]], tuple, int, bool]
+
+_JUMPED = 1
+_HALT = 2
+
+
+class CompiledChunk:
+    """A chunk of bytecode along with its lazily decoded instructions, indexed by bytecode position."""
+
+    __slots__ = ("bytecode", "globals", "instructions", "last_op", "start_ip")
+
+    def __init__(self, bytecode: list[Any], globals: Optional[dict[str, Any]] = None):
+        self.bytecode = bytecode
+        self.globals = globals
+        self.last_op = len(bytecode) - 1
+        self.instructions: list[Optional[Instruction]] = [None] * len(bytecode)
+        # TODO: store chunk version
+        self.start_ip = 2 if bytecode and bytecode[0] == "_H" else 1 if bytecode and bytecode[0] == "_h" else 0
+
+    def decode(self, ip: int) -> Instruction:
+        bytecode = self.bytecode
+        symbol = bytecode[ip]
+        try:
+            handler = OPERATION_HANDLERS.get(symbol)
+        except TypeError:  # unhashable garbage in the bytecode
+            handler = None
+        if handler is None:
+            return (HogVM._op_unexpected, (symbol,), 1, False)
+
+        operand_count = OPERAND_COUNTS.get(symbol, 0)
+        if symbol == Operation.CLOSURE and ip < self.last_op:
+            operand_count = 1 + 2 * bytecode[ip + 1]
+        if ip + operand_count > self.last_op:
+            # Not cached, so that we keep raising if we ever land here again
+            raise HogVMException("Unexpected end of bytecode")
+
+        operands = tuple(bytecode[ip + 1 : ip + 1 + operand_count])
+        if symbol in CONSTANT_OPERATIONS:
+            operands = (operands[0], calculate_cost(operands[0]))
+        instruction = (handler, operands, operand_count + 1, symbol in TIMED_OPERATIONS)
+        self.instructions[ip] = instruction
+        return instruction
+
+
+_stl_chunks: dict[str, CompiledChunk] = {}
+
+
+def _get_stl_chunk(name: str) -> CompiledChunk:
+    chunk = _stl_chunks.get(name)
+    if chunk is None:
+        chunk = _stl_chunks[name] = CompiledChunk(BYTECODE_STL[name][1], {})
+    return chunk
+
+
+class CompiledProgram:
+    """
+    Bytecode that has been validated and is decoded into instructions as it runs. Hold on to an instance (or to a
+    `HogVM` built from it) to run the same program many times without decoding it again.
+    """
+
+    def __init__(self, input: list[Any] | dict):
+        self.bytecodes: dict = input if isinstance(input, dict) else {"root": {"bytecode": input}}
+        root_bytecode = self.bytecodes.get("root", {}).get("bytecode", []) or []
+        if not root_bytecode or (
+            root_bytecode[0] != HOGQL_BYTECODE_IDENTIFIER and root_bytecode[0] != HOGQL_BYTECODE_IDENTIFIER_V0
+        ):
+            raise HogVMException(f"Invalid bytecode. Must start with '{HOGQL_BYTECODE_IDENTIFIER}'")
+        self.version = (
+            root_bytecode[1] if len(root_bytecode) >= 2 and root_bytecode[0] == HOGQL_BYTECODE_IDENTIFIER else 0
+        )
+        self.root = CompiledChunk(root_bytecode)
+        self._chunks: dict[str, CompiledChunk] = {}
+
+    def get_chunk(self, name: str) -> CompiledChunk:
+        chunk = self._chunks.get(name)
+        if chunk is None:
+            chunk = self._chunks[name] = CompiledChunk(
+                self.bytecodes[name].get("bytecode", []), self.bytecodes[name].get("globals", {})
+            )
+        return chunk
+
+
+def compile_bytecode(input: list[Any] | dict | CompiledProgram) -> CompiledProgram:
+    return input if isinstance(input, CompiledProgram) else CompiledProgram(input)
+
+
 def execute_bytecode(
-    input: list[Any] | dict,
+    input: list[Any] | dict | CompiledProgram,
     globals: Optional[dict[str, Any]] = None,
     functions: Optional[dict[str, Callable[..., Any]]] = None,
     timeout=timedelta(seconds=5),
     team: Optional["Team"] = None,
     debug=False,
 ) -> BytecodeResult:
-    bytecodes = input if isinstance(input, dict) else {"root": {"bytecode": input}}
-    root_bytecode = bytecodes.get("root", {}).get("bytecode", []) or []
-
-    if (
-        not root_bytecode
-        or len(root_bytecode) == 0
-        or (root_bytecode[0] != HOGQL_BYTECODE_IDENTIFIER and root_bytecode[0] != HOGQL_BYTECODE_IDENTIFIER_V0)
+    return HogVM(input, functions=functions, timeout=timeout, team=team, debug=debug).run(globals)
+
+
+class HogVM:
+    """
+    Runs a compiled program. The VM can be reused to run the same program against many globals (e.g. one filter
+    against each incoming event), which skips validating and decoding the bytecode on every call.
+    Not thread safe: use one VM per thread.
+    """
+
+    def __init__(
+        self,
+        program: list[Any] | dict | CompiledProgram,
+        functions: Optional[dict[str, Callable[..., Any]]] = None,
+        timeout=timedelta(seconds=5),
+        team: Optional["Team"] = None,
+        debug=False,
     ):
-        raise HogVMException(f"Invalid bytecode. Must start with '{HOGQL_BYTECODE_IDENTIFIER}'")
-    version = root_bytecode[1] if len(root_bytecode) >= 2 and root_bytecode[0] == HOGQL_BYTECODE_IDENTIFIER else 0
-    start_time = time.time()
-    last_op = len(root_bytecode) - 1
-    stack: list = []
-    upvalues: list[dict] = []
-    upvalues_by_id: dict[int, dict] = {}
-    mem_stack: list = []
-    call_stack: list[CallFrame] = []
-    throw_stack: list[ThrowFrame] = []
-    declared_functions: dict[str, tuple[int, int]] = {}
-    mem_used = 0
-    max_mem_used = 0
-    ops = 0
-    stdout: list[str] = []
-    debug_bytecode = []
-    if isinstance(timeout, int):
-        timeout = timedelta(seconds=timeout)
-
-    if len(call_stack) == 0:
-        call_stack.append(
-            CallFrame(
-                ip=0,
-                chunk="root",
-                stack_start=0,
-                arg_len=0,
-                closure=new_hog_closure(
-                    new_hog_callable(
-                        type="local",
-                        arg_count=0,
-                        upvalue_count=0,
-                        ip=0,
-                        chunk="root",
-                        name="",
-                    )
-                ),
-            )
+        self.program = compile_bytecode(program)
+        self.functions = functions
+        self.timeout = timedelta(seconds=timeout) if isinstance(timeout, int) else timeout
+        self.timeout_seconds = self.timeout.total_seconds()
+        self.team = team
+        self.debug = debug
+
+    def run(self, globals: Optional[dict[str, Any]] = None) -> BytecodeResult:
+        self.globals = globals
+        self.stack: list = []
+        self.mem_stack: list = []
+        self.mem_used = 0
+        self.max_mem_used = 0
+        # Growth of containers mutated in place (SET_PROPERTY), which isn't reflected in the costs on mem_stack
+        self.heap_used = 0
+        # Costs of objects in the globals, which are never mutated during a run (we only ever push copies of them)
+        self.global_costs: dict[int, tuple[Any, int]] = {}
+        self.upvalues: list[dict] = []
+        self.upvalues_by_id: dict[int, dict] = {}
+        self.throw_stack: list[ThrowFrame] = []
+        self.declared_functions: dict[str, tuple[int, int]] = {}
+        self.stdout: list[str] = []
+        self.ops = 0
+        self.result: Any = None
+        self.debug_bytecode: list = []
+        self.start_time = time.time()
+        self.frame = CallFrame(
+            ip=0,
+            chunk="root",
+            stack_start=0,
+            arg_len=0,
+            closure=new_hog_closure(
+                new_hog_callable(type="local", arg_count=0, upvalue_count=0, ip=0, chunk="root", name="")
+            ),
         )
-    frame = call_stack[-1]
-    chunk_bytecode: list[Any] = root_bytecode
-    chunk_globals = globals
+        self.call_stack: list[CallFrame] = [self.frame]
+        self._set_chunk()
+
+        debug = self.debug
+        ops = 0
+        frame = self.frame
+        chunk = self.chunk
+        instructions = chunk.instructions
+        while True:
+            ip = frame.ip
+            # Return or jump back to the previous call frame if ran out of bytecode to execute in this one, and return null
+            if ip > chunk.last_op:
+                last_call_frame = self.call_stack.pop()
+                if len(self.call_stack) == 0:
+                    if len(self.stack) > 1:
+                        raise HogVMException("Invalid bytecode. More than one value left on stack")
+                    self.ops = ops
+                    return self._result(self._pop() if len(self.stack) > 0 else None)
+                self._stack_keep_first_elements(last_call_frame.stack_start)
+                self._push(None)
+                frame = self.frame = self.call_stack[-1]
+                self._set_chunk()
+                chunk = self.chunk
+                instructions = chunk.instructions
+                continue
+
+            ops += 1
+            instruction = instructions[ip] or chunk.decode(ip)
+            handler, operands, width, checks_timeout = instruction
+            if checks_timeout or (ops & 127) == 0:  # every 128th operation, and before every call
+                self.ops = ops
+                self._check_timeout()
+            if debug:
+                debugger(
+                    chunk.bytecode[ip],
+                    chunk.bytecode,
+                    self.debug_bytecode,
+                    ip,
+                    self.stack,
+                    self.call_stack,
+                    self.throw_stack,
+                )
+
+            outcome = handler(self, operands)
+            if outcome is None:
+                frame.ip += width
+            elif outcome == _JUMPED:
+                frame = self.frame
+                chunk = self.chunk
+                instructions = chunk.instructions
+            else:
+                self.ops = ops
+                return self._result(self.result)
 
-    def set_chunk_bytecode():
-        nonlocal chunk_bytecode, chunk_globals, last_op, debug_bytecode
+    def _result(self, result: Any) -> BytecodeResult:
+        return BytecodeResult(result=result, stdout=self.stdout, bytecodes=self.program.bytecodes)
+
+    def _set_chunk(self) -> None:
+        frame = self.frame
         if not frame.chunk or frame.chunk == "root":
-            chunk_bytecode = root_bytecode
-            chunk_globals = globals
+            self.chunk = self.program.root
+            self.chunk_globals = self.globals
         elif frame.chunk.startswith("stl/") and frame.chunk[4:] in BYTECODE_STL:
-            chunk_bytecode = BYTECODE_STL[frame.chunk[4:]][1]
-            chunk_globals = {}
-        elif bytecodes.get(frame.chunk):
-            chunk_bytecode = bytecodes[frame.chunk].get("bytecode", [])
-            chunk_globals = bytecodes[frame.chunk].get("globals", {})
+            self.chunk = _get_stl_chunk(frame.chunk[4:])
+            self.chunk_globals = self.chunk.globals
+        elif self.program.bytecodes.get(frame.chunk):
+            self.chunk = self.program.get_chunk(frame.chunk)
+            self.chunk_globals = self.chunk.globals
         else:
             raise HogVMException(f"Unknown chunk: {frame.chunk}")
-        last_op = len(chunk_bytecode) - 1
-        if debug:
-            debug_bytecode = color_bytecode(chunk_bytecode)
-        if frame.ip == 0 and (chunk_bytecode[0] == "_H" or chunk_bytecode[0] == "_h"):
-            # TODO: store chunk version
-            frame.ip += 2 if chunk_bytecode[0] == "_H" else 1
-
-    set_chunk_bytecode()
-
-    def stack_keep_first_elements(count: int) -> list[Any]:
-        nonlocal stack, mem_stack, mem_used
+        if self.debug:
+            self.debug_bytecode = color_bytecode(self.chunk.bytecode)
+        if frame.ip == 0:
+            frame.ip = self.chunk.start_ip
+
+    def _enter_frame(self, frame: CallFrame) -> int:
+        self.frame = frame
+        self._set_chunk()
+        self.call_stack.append(frame)
+        return _JUMPED
+
+    def _check_timeout(self) -> None:
+        if time.time() - self.start_time > self.timeout_seconds and not self.debug:
+            raise HogVMRuntimeExceededException(timeout_seconds=self.timeout_seconds, ops_performed=self.ops)
+
+    def _stack_keep_first_elements(self, count: int) -> list[Any]:
+        stack = self.stack
         if count < 0 or len(stack) < count:
             raise HogVMException("Stack underflow")
-        for upvalue in reversed(upvalues):
+        for upvalue in reversed(self.upvalues):
             if upvalue["location"] >= count:
                 if not upvalue["closed"]:
                     upvalue["closed"] = True
@@ -138,42 +293,58 @@ def execute_bytecode(
             else:
                 break
         removed = stack[count:]
-        stack = stack[0:count]
-        mem_used -= sum(mem_stack[count:])
-        mem_stack = mem_stack[0:count]
+        del stack[count:]
+        self.mem_used -= sum(self.mem_stack[count:])
+        del self.mem_stack[count:]
         return removed
 
-    def next_token():
-        nonlocal frame, chunk_bytecode
-        if frame.ip >= last_op:
-            raise HogVMException("Unexpected end of bytecode")
-        frame.ip += 1
-        return chunk_bytecode[frame.ip]
+    def _pop(self) -> Any:
+        if not self.stack:
+            raise HogVMException("Stack underflow")
+        self.mem_used -= self.mem_stack.pop()
+        return self.stack.pop()
 
-    def pop_stack():
-        if not stack:
+    def _pop_with_cost(self) -> tuple[Any, int]:
+        if not self.stack:
             raise HogVMException("Stack underflow")
-        nonlocal mem_used
-        mem_used -= mem_stack.pop()
-        return stack.pop()
-
-    def push_stack(value):
-        stack.append(value)
-        mem_stack.append(calculate_cost(value))
-        nonlocal mem_used
-        mem_used += mem_stack[-1]
-        nonlocal max_mem_used
-        max_mem_used = max(mem_used, max_mem_used)
-        if mem_used > MAX_MEMORY:
-            raise HogVMMemoryExceededException(memory_limit=MAX_MEMORY, attempted_memory=mem_used)
-
-    def check_timeout():
-        if time.time() - start_time > timeout.total_seconds() and not debug:
-            raise HogVMRuntimeExceededException(timeout_seconds=timeout.total_seconds(), ops_performed=ops)
-
-    def capture_upvalue(index) -> dict:
-        nonlocal upvalues
-        for upvalue in reversed(upvalues):
+        cost = self.mem_stack.pop()
+        self.mem_used -= cost
+        return self.stack.pop(), cost
+
+    def _push(self, value: Any, cost: Optional[int] = None) -> None:
+        """
+        Memory is charged where values are created: pass the `cost` when it's already known (constants, containers
+        built from values on the stack, copies of other stack slots), so that large values aren't walked on every push.
+        """
+        if cost is None:
+            cost = calculate_cost(value)
+        self.stack.append(value)
+        self.mem_stack.append(cost)
+        self.mem_used += cost
+        self._check_memory()
+
+    def _check_memory(self) -> None:
+        if self.mem_used > self.max_mem_used:
+            self.max_mem_used = self.mem_used
+            if self.mem_used > MAX_MEMORY:
+                raise HogVMMemoryExceededException(memory_limit=MAX_MEMORY, attempted_memory=self.mem_used)
+
+    def _charge_heap(self, delta: int) -> None:
+        heap_used = max(0, self.heap_used + delta)
+        self.mem_used += heap_used - self.heap_used
+        self.heap_used = heap_used
+        self._check_memory()
+
+    def _pop_elements(self, count: int) -> tuple[list[Any], int]:
+        elems = self.stack[-count:]
+        del self.stack[-count:]
+        cost = sum(self.mem_stack[-count:])
+        self.mem_used -= cost
+        del self.mem_stack[-count:]
+        return elems, cost
+
+    def _capture_upvalue(self, index: int) -> dict:
+        for upvalue in reversed(self.upvalues):
             if upvalue["location"] < index:
                 break
             if upvalue["location"] == index:
@@ -183,499 +354,567 @@ def execute_bytecode(
             "location": index,
             "closed": False,
             "value": None,
-            "id": len(upvalues) + 1,
+            "id": len(self.upvalues) + 1,
         }
-        upvalues.append(created_upvalue)
-        upvalues_by_id[created_upvalue["id"]] = created_upvalue
-        upvalues.sort(key=lambda x: x["location"])
+        self.upvalues.append(created_upvalue)
+        self.upvalues_by_id[created_upvalue["id"]] = created_upvalue
+        self.upvalues.sort(key=lambda x: x["location"])
         return created_upvalue
 
-    symbol: Any = None
-    while True:
-        # Return or jump back to the previous call frame if ran out of bytecode to execute in this one, and return null
-        if frame.ip > last_op:
-            last_call_frame = call_stack.pop()
-            if len(call_stack) == 0 or last_call_frame is None:
-                if len(stack) > 1:
-                    raise HogVMException("Invalid bytecode. More than one value left on stack")
-                return BytecodeResult(
-                    result=pop_stack() if len(stack) > 0 else None, stdout=stdout, bytecodes=bytecodes
-                )
-            stack_start = last_call_frame.stack_start
-            stack_keep_first_elements(stack_start)
-            push_stack(None)
-            frame = call_stack[-1]
-            set_chunk_bytecode()
-
-        ops += 1
-        symbol = chunk_bytecode[frame.ip]
-        if (ops & 127) == 0:  # every 128th operation
-            check_timeout()
-        elif debug:
-            debugger(symbol, chunk_bytecode, debug_bytecode, frame.ip, stack, call_stack, throw_stack)
-        match symbol:
-            case None:
-                break
-            case Operation.STRING:
-                push_stack(next_token())
-            case Operation.INTEGER:
-                push_stack(next_token())
-            case Operation.FLOAT:
-                push_stack(next_token())
-            case Operation.TRUE:
-                push_stack(True)
-            case Operation.FALSE:
-                push_stack(False)
-            case Operation.NULL:
-                push_stack(None)
-            case Operation.NOT:
-                push_stack(not pop_stack())
-            case Operation.AND:
-                push_stack(all([pop_stack() for _ in range(next_token())]))  # noqa: C419
-            case Operation.OR:
-                push_stack(any([pop_stack() for _ in range(next_token())]))  # noqa: C419
-            case Operation.PLUS:
-                push_stack(pop_stack() + pop_stack())
-            case Operation.MINUS:
-                push_stack(pop_stack() - pop_stack())
-            case Operation.DIVIDE:
-                push_stack(pop_stack() / pop_stack())
-            case Operation.MULTIPLY:
-                push_stack(pop_stack() * pop_stack())
-            case Operation.MOD:
-                push_stack(pop_stack() % pop_stack())
-            case Operation.EQ:
-                var1, var2 = unify_comparison_types(pop_stack(), pop_stack())
-                push_stack(var1 == var2)
-            case Operation.NOT_EQ:
-                var1, var2 = unify_comparison_types(pop_stack(), pop_stack())
-                push_stack(var1 != var2)
-            case Operation.GT:
-                var1, var2 = unify_comparison_types(pop_stack(), pop_stack())
-                push_stack(var1 > var2)
-            case Operation.GT_EQ:
-                var1, var2 = unify_comparison_types(pop_stack(), pop_stack())
-                push_stack(var1 >= var2)
-            case Operation.LT:
-                var1, var2 = unify_comparison_types(pop_stack(), pop_stack())
-                push_stack(var1 < var2)
-            case Operation.LT_EQ:
-                var1, var2 = unify_comparison_types(pop_stack(), pop_stack())
-                push_stack(var1 <= var2)
-            case Operation.LIKE:
-                push_stack(like(pop_stack(), pop_stack()))
-            case Operation.ILIKE:
-                push_stack(like(pop_stack(), pop_stack(), re.IGNORECASE))
-            case Operation.NOT_LIKE:
-                push_stack(not like(pop_stack(), pop_stack()))
-            case Operation.NOT_ILIKE:
-                push_stack(not like(pop_stack(), pop_stack(), re.IGNORECASE))
-            case Operation.IN:
-                push_stack(pop_stack() in pop_stack())
-            case Operation.NOT_IN:
-                push_stack(pop_stack() not in pop_stack())
-            case Operation.REGEX:
-                args = [pop_stack(), pop_stack()]
-                # TODO: swap this for re2, as used in HogQL/ClickHouse and in the NodeJS VM
-                push_stack(bool(re.search(re.compile(args[1]), args[0])) if args[0] and args[1] else False)
-            case Operation.NOT_REGEX:
-                args = [pop_stack(), pop_stack()]
-                # TODO: swap this for re2, as used in HogQL/ClickHouse and in the NodeJS VM
-                push_stack(not bool(re.search(re.compile(args[1]), args[0])) if args[0] and args[1] else False)
-            case Operation.IREGEX:
-                args = [pop_stack(), pop_stack()]
-                push_stack(
-                    bool(re.search(re.compile(args[1], re.RegexFlag.IGNORECASE), args[0]))
-                    if args[0] and args[1]
-                    else False
-                )
-            case Operation.NOT_IREGEX:
-                args = [pop_stack(), pop_stack()]
-                push_stack(
-                    not bool(re.search(re.compile(args[1], re.RegexFlag.IGNORECASE), args[0]))
-                    if args[0] and args[1]
-                    else False
+    def _get_upvalue(self, index: int) -> dict:
+        closure = self.frame.closure
+        if index >= len(closure["upvalues"]):
+            raise HogVMException(f"Invalid upvalue index: {index}")
+        upvalue = self.upvalues_by_id[closure["upvalues"][index]]
+        if not is_hog_upvalue(upvalue):
+            raise HogVMException(f"Invalid upvalue: {upvalue}")
+        return upvalue
+
+    def _call_args(self, arg_count: int) -> list[Any]:
+        if self.program.version == 0:
+            return [self._pop() for _ in range(arg_count)]
+        return self._stack_keep_first_elements(len(self.stack) - arg_count)
+
+    # Operation handlers, dispatched through OPERATION_HANDLERS
+
+    def _op_halt(self, operands: tuple) -> int:
+        self.result = self._pop() if len(self.stack) > 0 else None
+        return _HALT
+
+    def _op_unexpected(self, operands: tuple) -> None:
+        raise HogVMException(f'Unexpected node while running bytecode in chunk "{self.frame.chunk}": {operands[0]}')
+
+    def _op_constant(self, operands: tuple) -> None:
+        self._push(operands[0], operands[1])
+
+    def _op_true(self, operands: tuple) -> None:
+        self._push(True, COST_PER_UNIT)
+
+    def _op_false(self, operands: tuple) -> None:
+        self._push(False, COST_PER_UNIT)
+
+    def _op_null(self, operands: tuple) -> None:
+        self._push(None, COST_PER_UNIT)
+
+    def _op_not(self, operands: tuple) -> None:
+        self._push(not self._pop(), COST_PER_UNIT)
+
+    def _op_and(self, operands: tuple) -> None:
+        self._push(all([self._pop() for _ in range(operands[0])]), COST_PER_UNIT)  # noqa: C419
+
+    def _op_or(self, operands: tuple) -> None:
+        self._push(any([self._pop() for _ in range(operands[0])]), COST_PER_UNIT)  # noqa: C419
+
+    def _op_plus(self, operands: tuple) -> None:
+        self._push(self._pop() + self._pop())
+
+    def _op_minus(self, operands: tuple) -> None:
+        self._push(self._pop() - self._pop())
+
+    def _op_divide(self, operands: tuple) -> None:
+        self._push(self._pop() / self._pop())
+
+    def _op_multiply(self, operands: tuple) -> None:
+        self._push(self._pop() * self._pop())
+
+    def _op_mod(self, operands: tuple) -> None:
+        self._push(self._pop() % self._pop())
+
+    def _op_eq(self, operands: tuple) -> None:
+        var1, var2 = unify_comparison_types(self._pop(), self._pop())
+        self._push(var1 == var2, COST_PER_UNIT)
+
+    def _op_not_eq(self, operands: tuple) -> None:
+        var1, var2 = unify_comparison_types(self._pop(), self._pop())
+        self._push(var1 != var2, COST_PER_UNIT)
+
+    def _op_gt(self, operands: tuple) -> None:
+        var1, var2 = unify_comparison_types(self._pop(), self._pop())
+        self._push(var1 > var2, COST_PER_UNIT)
+
+    def _op_gt_eq(self, operands: tuple) -> None:
+        var1, var2 = unify_comparison_types(self._pop(), self._pop())
+        self._push(var1 >= var2, COST_PER_UNIT)
+
+    def _op_lt(self, operands: tuple) -> None:
+        var1, var2 = unify_comparison_types(self._pop(), self._pop())
+        self._push(var1 < var2, COST_PER_UNIT)
+
+    def _op_lt_eq(self, operands: tuple) -> None:
+        var1, var2 = unify_comparison_types(self._pop(), self._pop())
+        self._push(var1 <= var2, COST_PER_UNIT)
+
+    def _op_like(self, operands: tuple) -> None:
+        self._push(like(self._pop(), self._pop()), COST_PER_UNIT)
+
+    def _op_ilike(self, operands: tuple) -> None:
+        self._push(like(self._pop(), self._pop(), re.IGNORECASE), COST_PER_UNIT)
+
+    def _op_not_like(self, operands: tuple) -> None:
+        self._push(not like(self._pop(), self._pop()), COST_PER_UNIT)
+
+    def _op_not_ilike(self, operands: tuple) -> None:
+        self._push(not like(self._pop(), self._pop(), re.IGNORECASE), COST_PER_UNIT)
+
+    def _op_in(self, operands: tuple) -> None:
+        self._push(self._pop() in self._pop(), COST_PER_UNIT)
+
+    def _op_not_in(self, operands: tuple) -> None:
+        self._push(self._pop() not in self._pop(), COST_PER_UNIT)
+
+    def _op_regex(self, operands: tuple) -> None:
+        args = [self._pop(), self._pop()]
+        # TODO: swap this for re2, as used in HogQL/ClickHouse and in the NodeJS VM
+        self._push(bool(re.search(re.compile(args[1]), args[0])) if args[0] and args[1] else False, COST_PER_UNIT)
+
+    def _op_not_regex(self, operands: tuple) -> None:
+        args = [self._pop(), self._pop()]
+        # TODO: swap this for re2, as used in HogQL/ClickHouse and in the NodeJS VM
+        self._push(not bool(re.search(re.compile(args[1]), args[0])) if args[0] and args[1] else False, COST_PER_UNIT)
+
+    def _op_iregex(self, operands: tuple) -> None:
+        args = [self._pop(), self._pop()]
+        self._push(
+            bool(re.search(re.compile(args[1], re.RegexFlag.IGNORECASE), args[0])) if args[0] and args[1] else False,
+            COST_PER_UNIT,
+        )
+
+    def _op_not_iregex(self, operands: tuple) -> None:
+        args = [self._pop(), self._pop()]
+        self._push(
+            not bool(re.search(re.compile(args[1], re.RegexFlag.IGNORECASE), args[0]))
+            if args[0] and args[1]
+            else False,
+            COST_PER_UNIT,
+        )
+
+    def _op_get_global(self, operands: tuple) -> None:
+        chain = [self._pop() for _ in range(operands[0])]
+        chunk_globals = self.chunk_globals
+        if chunk_globals and chain[0] in chunk_globals:
+            value = get_nested_value(chunk_globals, chain, True)
+            # A deep copy costs the same as the original, whose cost we only need to calculate once per run
+            self._push(deepcopy(value), calculate_cost(value, cache=self.global_costs))
+        elif self.functions and chain[0] in self.functions:
+            self._push(
+                new_hog_closure(
+                    new_hog_callable(type="stl", name=chain[0], arg_count=0, upvalue_count=0, ip=-1, chunk="stl")
                 )
-            case Operation.GET_GLOBAL:
-                chain = [pop_stack() for _ in range(next_token())]
-                if chunk_globals and chain[0] in chunk_globals:
-                    push_stack(deepcopy(get_nested_value(chunk_globals, chain, True)))
-                elif functions and chain[0] in functions:
-                    push_stack(
-                        new_hog_closure(
-                            new_hog_callable(
-                                type="stl",
-                                name=chain[0],
-                                arg_count=0,
-                                upvalue_count=0,
-                                ip=-1,
-                                chunk="stl",
-                            )
-                        )
-                    )
-                elif chain[0] in STL and len(chain) == 1:
-                    push_stack(
-                        new_hog_closure(
-                            new_hog_callable(
-                                type="stl",
-                                name=chain[0],
-                                arg_count=STL[chain[0]].maxArgs or 0,
-                                upvalue_count=0,
-                                ip=-1,
-                                chunk="stl",
-                            )
-                        )
-                    )
-                elif chain[0] in BYTECODE_STL and len(chain) == 1:
-                    push_stack(
-                        new_hog_closure(
-                            new_hog_callable(
-                                type="stl",
-                                name=chain[0],
-                                arg_count=len(BYTECODE_STL[chain[0]][0]),
-                                upvalue_count=0,
-                                ip=0,
-                                chunk=f"stl/{chain[0]}",
-                            )
-                        )
-                    )
-                else:
-                    raise HogVMException(f"Global variable not found: {chain[0]}")
-            case Operation.POP:
-                pop_stack()
-            case Operation.CLOSE_UPVALUE:
-                stack_keep_first_elements(len(stack) - 1)
-            case Operation.RETURN:
-                response = pop_stack()
-                last_call_frame = call_stack.pop()
-                if len(call_stack) == 0 or last_call_frame is None:
-                    return BytecodeResult(result=response, stdout=stdout, bytecodes=bytecodes)
-                stack_start = last_call_frame.stack_start
-                stack_keep_first_elements(stack_start)
-                push_stack(response)
-                frame = call_stack[-1]
-                set_chunk_bytecode()
-                continue  # resume the loop without incrementing frame.ip
-
-            case Operation.GET_LOCAL:
-                stack_start = 0 if not call_stack else call_stack[-1].stack_start
-                push_stack(stack[next_token() + stack_start])
-            case Operation.SET_LOCAL:
-                stack_start = 0 if not call_stack else call_stack[-1].stack_start
-                value = pop_stack()
-                index = next_token() + stack_start
-                stack[index] = value
-                last_cost = mem_stack[index]
-                mem_stack[index] = calculate_cost(value)
-                mem_used += mem_stack[index] - last_cost
-                max_mem_used = max(mem_used, max_mem_used)
-            case Operation.GET_PROPERTY:
-                property = pop_stack()
-                push_stack(get_nested_value(pop_stack(), [property]))
-            case Operation.GET_PROPERTY_NULLISH:
-                property = pop_stack()
-                push_stack(get_nested_value(pop_stack(), [property], nullish=True))
-            case Operation.SET_PROPERTY:
-                value = pop_stack()
-                field = pop_stack()
-                set_nested_value(pop_stack(), [field], value)
-            case Operation.DICT:
-                count = next_token()
-                if count > 0:
-                    elems = stack[-(count * 2) :]
-                    stack = stack[: -(count * 2)]
-                    mem_used -= sum(mem_stack[-(count * 2) :])
-                    mem_stack = mem_stack[: -(count * 2)]
-                    push_stack({elems[i]: elems[i + 1] for i in range(0, len(elems), 2)})
-                else:
-                    push_stack({})
-            case Operation.ARRAY:
-                count = next_token()
-                if count > 0:
-                    elems = stack[-count:]
-                    stack = stack[:-count]
-                    mem_used -= sum(mem_stack[-count:])
-                    mem_stack = mem_stack[:-count]
-                    push_stack(elems)
-                else:
-                    push_stack([])
-            case Operation.TUPLE:
-                count = next_token()
-                if count > 0:
-                    elems = stack[-count:]
-                    stack = stack[:-count]
-                    mem_used -= sum(mem_stack[-count:])
-                    mem_stack = mem_stack[:-count]
-                    push_stack(tuple(elems))
-                else:
-                    push_stack(())
-            case Operation.JUMP:
-                count = next_token()
-                frame.ip += count
-            case Operation.JUMP_IF_FALSE:
-                count = next_token()
-                if not pop_stack():
-                    frame.ip += count
-            case Operation.JUMP_IF_STACK_NOT_NULL:
-                count = next_token()
-                if len(stack) > 0 and stack[-1] is not None:
-                    frame.ip += count
-            case Operation.DECLARE_FN:
-                # DEPRECATED
-                name = next_token()
-                arg_len = next_token()
-                body_len = next_token()
-                declared_functions[name] = (frame.ip + 1, arg_len)
-                frame.ip += body_len
-            case Operation.CALLABLE:
-                name = next_token()  # TODO: do we need it? it could change as the variable is reassigned
-                arg_count = next_token()
-                upvalue_count = next_token()
-                body_length = next_token()
-                push_stack(
+            )
+        elif chain[0] in STL and len(chain) == 1:
+            self._push(
+                new_hog_closure(
                     new_hog_callable(
-                        type="local",
-                        name=name,
-                        chunk=frame.chunk,
-                        arg_count=arg_count,
-                        upvalue_count=upvalue_count,
-                        ip=frame.ip + 1,
+                        type="stl",
+                        name=chain[0],
+                        arg_count=STL[chain[0]].maxArgs or 0,
+                        upvalue_count=0,
+                        ip=-1,
+                        chunk="stl",
                     )
                 )
-                frame.ip += body_length
-            case Operation.CLOSURE:
-                closure_callable = pop_stack()
-                closure = new_hog_closure(closure_callable)
-                stack_start = frame.stack_start
-                upvalue_count = next_token()
-                if upvalue_count != closure_callable["upvalueCount"]:
-                    raise HogVMException(
-                        f"Invalid upvalue count. Expected {closure_callable['upvalueCount']}, got {upvalue_count}"
-                    )
-                for _ in range(closure_callable["upvalueCount"]):
-                    is_local, index = next_token(), next_token()
-                    if is_local:
-                        closure["upvalues"].append(capture_upvalue(stack_start + index)["id"])
-                    else:
-                        closure["upvalues"].append(frame.closure["upvalues"][index])
-                push_stack(closure)
-            case Operation.GET_UPVALUE:
-                index = next_token()
-                closure = frame.closure
-                if index >= len(closure["upvalues"]):
-                    raise HogVMException(f"Invalid upvalue index: {index}")
-                upvalue = upvalues_by_id[closure["upvalues"][index]]
-                if not is_hog_upvalue(upvalue):
-                    raise HogVMException(f"Invalid upvalue: {upvalue}")
-                if upvalue["closed"]:
-                    push_stack(upvalue["value"])
-                else:
-                    push_stack(stack[upvalue["location"]])
-            case Operation.SET_UPVALUE:
-                index = next_token()
-                closure = frame.closure
-                if index >= len(closure["upvalues"]):
-                    raise HogVMException(f"Invalid upvalue index: {index}")
-                upvalue = upvalues_by_id[closure["upvalues"][index]]
-                if not is_hog_upvalue(upvalue):
-                    raise HogVMException(f"Invalid upvalue: {upvalue}")
-                if upvalue["closed"]:
-                    upvalue["value"] = pop_stack()
-                else:
-                    stack[upvalue["location"]] = pop_stack()
-            case Operation.CALL_GLOBAL:
-                check_timeout()
-                name = next_token()
-                arg_count = next_token()
-                # This is for backwards compatibility. We use a closure on the stack with local functions now.
-                if name in declared_functions:
-                    func_ip, arg_len = declared_functions[name]
-                    frame.ip += 1  # advance for when we return
-                    if arg_len > arg_count:
-                        for _ in range(arg_len - arg_count):
-                            push_stack(None)
-                    frame = CallFrame(
-                        ip=func_ip,
-                        chunk=frame.chunk,
-                        stack_start=len(stack) - arg_len,
-                        arg_len=arg_len,
-                        closure=new_hog_closure(
-                            new_hog_callable(
-                                type="local",
-                                name=name,
-                                arg_count=arg_len,
-                                upvalue_count=0,
-                                ip=func_ip,
-                                chunk=frame.chunk,
-                            )
-                        ),
+            )
+        elif chain[0] in BYTECODE_STL and len(chain) == 1:
+            self._push(
+                new_hog_closure(
+                    new_hog_callable(
+                        type="stl",
+                        name=chain[0],
+                        arg_count=len(BYTECODE_STL[chain[0]][0]),
+                        upvalue_count=0,
+                        ip=0,
+                        chunk=f"stl/{chain[0]}",
                     )
-                    set_chunk_bytecode()
-                    call_stack.append(frame)
-                    continue  # resume the loop without incrementing frame.ip
-                else:
-                    if name == "import":
-                        if arg_count != 1:
-                            raise HogVMException("Function import requires exactly 1 argument")
-                        module_name = pop_stack()
-                        frame.ip += 1  # advance for when we return
-                        frame = CallFrame(
-                            ip=0,
-                            chunk=module_name,
-                            stack_start=len(stack),
-                            arg_len=0,
-                            closure=new_hog_closure(
-                                new_hog_callable(
-                                    type="local",
-                                    name=module_name,
-                                    arg_count=0,
-                                    upvalue_count=0,
-                                    ip=0,
-                                    chunk=module_name,
-                                )
-                            ),
-                        )
-                        set_chunk_bytecode()
-                        call_stack.append(frame)
-                        continue
-                    elif functions is not None and name in functions:
-                        if version == 0:
-                            args = [pop_stack() for _ in range(arg_count)]
-                        else:
-                            args = stack_keep_first_elements(len(stack) - arg_count)
-                        push_stack(functions[name](*args))
-                    elif name in STL:
-                        if version == 0:
-                            args = [pop_stack() for _ in range(arg_count)]
-                        else:
-                            args = stack_keep_first_elements(len(stack) - arg_count)
-                        push_stack(STL[name].fn(args, team, stdout, timeout.total_seconds()))
-                    elif name in BYTECODE_STL:
-                        arg_names = BYTECODE_STL[name][0]
-                        if len(arg_names) != arg_count:
-                            raise HogVMException(f"Function {name} requires exactly {len(arg_names)} arguments")
-                        frame.ip += 1  # advance for when we return
-                        frame = CallFrame(
-                            ip=0,
-                            chunk=f"stl/{name}",
-                            stack_start=len(stack) - arg_count,
-                            arg_len=arg_count,
-                            closure=new_hog_closure(
-                                new_hog_callable(
-                                    type="stl",
-                                    name=name,
-                                    arg_count=arg_count,
-                                    upvalue_count=0,
-                                    ip=0,
-                                    chunk=f"stl/{name}",
-                                )
-                            ),
+                )
+            )
+        else:
+            raise HogVMException(f"Global variable not found: {chain[0]}")
+
+    def _op_pop(self, operands: tuple) -> None:
+        self._pop()
+
+    def _op_close_upvalue(self, operands: tuple) -> None:
+        self._stack_keep_first_elements(len(self.stack) - 1)
+
+    def _op_return(self, operands: tuple) -> int:
+        response = self._pop()
+        last_call_frame = self.call_stack.pop()
+        if len(self.call_stack) == 0:
+            self.result = response
+            return _HALT
+        self._stack_keep_first_elements(last_call_frame.stack_start)
+        self._push(response)
+        self.frame = self.call_stack[-1]
+        self._set_chunk()
+        return _JUMPED  # resume without incrementing frame.ip
+
+    def _op_get_local(self, operands: tuple) -> None:
+        stack_start = self.call_stack[-1].stack_start if self.call_stack else 0
+        index = operands[0] + stack_start
+        self._push(self.stack[index], self.mem_stack[index])
+
+    def _op_set_local(self, operands: tuple) -> None:
+        stack_start = self.call_stack[-1].stack_start if self.call_stack else 0
+        value, cost = self._pop_with_cost()
+        index = operands[0] + stack_start
+        self.stack[index] = value
+        self.mem_used += cost - self.mem_stack[index]
+        self.mem_stack[index] = cost
+        self._check_memory()
+
+    def _op_get_property(self, operands: tuple) -> None:
+        property = self._pop()
+        self._push(get_nested_value(self._pop(), [property]))
+
+    def _op_get_property_nullish(self, operands: tuple) -> None:
+        property = self._pop()
+        self._push(get_nested_value(self._pop(), [property], nullish=True))
+
+    def _op_set_property(self, operands: tuple) -> None:
+        value, value_cost = self._pop_with_cost()
+        field, field_cost = self._pop_with_cost()
+        obj = self._pop()
+        # Charge the container's growth, as its cost on the stack was calculated before the change
+        if isinstance(obj, dict):
+            growth = value_cost - calculate_cost(obj[field]) if field in obj else field_cost + value_cost
+        elif isinstance(obj, list) and isinstance(field, int) and 0 < field <= len(obj):
+            growth = value_cost - calculate_cost(obj[field - 1])
+        else:
+            growth = 0
+        set_nested_value(obj, [field], value)
+        self._charge_heap(growth)
+
+    def _op_dict(self, operands: tuple) -> None:
+        count = operands[0]
+        if count > 0:
+            elems, cost = self._pop_elements(count * 2)
+            self._push({elems[i]: elems[i + 1] for i in range(0, len(elems), 2)}, COST_PER_UNIT + cost)
+        else:
+            self._push({}, COST_PER_UNIT)
+
+    def _op_array(self, operands: tuple) -> None:
+        count = operands[0]
+        if count > 0:
+            elems, cost = self._pop_elements(count)
+            self._push(elems, COST_PER_UNIT + cost)
+        else:
+            self._push([], COST_PER_UNIT)
+
+    def _op_tuple(self, operands: tuple) -> None:
+        count = operands[0]
+        if count > 0:
+            elems, cost = self._pop_elements(count)
+            self._push(tuple(elems), COST_PER_UNIT + cost)
+        else:
+            self._push((), COST_PER_UNIT)
+
+    def _op_jump(self, operands: tuple) -> None:
+        self.frame.ip += operands[0]
+
+    def _op_jump_if_false(self, operands: tuple) -> None:
+        if not self._pop():
+            self.frame.ip += operands[0]
+
+    def _op_jump_if_stack_not_null(self, operands: tuple) -> None:
+        if len(self.stack) > 0 and self.stack[-1] is not None:
+            self.frame.ip += operands[0]
+
+    def _op_declare_fn(self, operands: tuple) -> None:
+        # DEPRECATED
+        name, arg_len, body_len = operands
+        self.declared_functions[name] = (self.frame.ip + 4, arg_len)
+        self.frame.ip += body_len
+
+    def _op_callable(self, operands: tuple) -> None:
+        # TODO: do we need the name? it could change as the variable is reassigned
+        name, arg_count, upvalue_count, body_length = operands
+        self._push(
+            new_hog_callable(
+                type="local",
+                name=name,
+                chunk=self.frame.chunk,
+                arg_count=arg_count,
+                upvalue_count=upvalue_count,
+                ip=self.frame.ip + 5,
+            )
+        )
+        self.frame.ip += body_length
+
+    def _op_closure(self, operands: tuple) -> None:
+        closure_callable = self._pop()
+        closure = new_hog_closure(closure_callable)
+        stack_start = self.frame.stack_start
+        upvalue_count = operands[0]
+        if upvalue_count != closure_callable["upvalueCount"]:
+            raise HogVMException(
+                f"Invalid upvalue count. Expected {closure_callable['upvalueCount']}, got {upvalue_count}"
+            )
+        for i in range(upvalue_count):
+            is_local, index = operands[1 + i * 2], operands[2 + i * 2]
+            if is_local:
+                closure["upvalues"].append(self._capture_upvalue(stack_start + index)["id"])
+            else:
+                closure["upvalues"].append(self.frame.closure["upvalues"][index])
+        self._push(closure)
+
+    def _op_get_upvalue(self, operands: tuple) -> None:
+        upvalue = self._get_upvalue(operands[0])
+        if upvalue["closed"]:
+            self._push(upvalue["value"])
+        else:
+            self._push(self.stack[upvalue["location"]], self.mem_stack[upvalue["location"]])
+
+    def _op_set_upvalue(self, operands: tuple) -> None:
+        upvalue = self._get_upvalue(operands[0])
+        if upvalue["closed"]:
+            upvalue["value"] = self._pop()
+        else:
+            value, cost = self._pop_with_cost()
+            self.stack[upvalue["location"]] = value
+            self.mem_used += cost - self.mem_stack[upvalue["location"]]
+            self.mem_stack[upvalue["location"]] = cost
+            self._check_memory()
+
+    def _op_call_global(self, operands: tuple) -> Optional[int]:
+        name, arg_count = operands
+        frame = self.frame
+        # This is for backwards compatibility. We use a closure on the stack with local functions now.
+        if name in self.declared_functions:
+            func_ip, arg_len = self.declared_functions[name]
+            frame.ip += 3  # advance for when we return
+            if arg_len > arg_count:
+                for _ in range(arg_len - arg_count):
+                    self._push(None, COST_PER_UNIT)
+            return self._enter_frame(
+                CallFrame(
+                    ip=func_ip,
+                    chunk=frame.chunk,
+                    stack_start=len(self.stack) - arg_len,
+                    arg_len=arg_len,
+                    closure=new_hog_closure(
+                        new_hog_callable(
+                            type="local", name=name, arg_count=arg_len, upvalue_count=0, ip=func_ip, chunk=frame.chunk
                         )
-                        set_chunk_bytecode()
-                        call_stack.append(frame)
-                        continue  # resume the loop without incrementing frame.ip
-                    else:
-                        raise HogVMException(f"Unsupported function call: {name}")
-            case Operation.CALL_LOCAL:
-                check_timeout()
-                closure = pop_stack()
-                if not isinstance(closure, dict) or closure.get("__hogClosure__") is None:
-                    raise HogVMException(f"Invalid closure: {closure}")
-                callable = closure.get("callable")
-                if not isinstance(callable, dict) or callable.get("__hogCallable__") is None:
-                    raise HogVMException(f"Invalid callable: {callable}")
-                args_length = next_token()
-                if args_length > MAX_FUNCTION_ARGS_LENGTH:
-                    raise HogVMException("Too many arguments")
-
-                if callable.get("__hogCallable__") == "local":
-                    if callable["argCount"] > args_length:
-                        # TODO: specify minimum required arguments somehow
-                        for _ in range(callable["argCount"] - args_length):
-                            push_stack(None)
-                    elif callable["argCount"] < args_length:
-                        raise HogVMException(
-                            f"Too many arguments. Passed {args_length}, expected {callable['argCount']}"
+                    ),
+                )
+            )
+        elif name == "import":
+            if arg_count != 1:
+                raise HogVMException("Function import requires exactly 1 argument")
+            module_name = self._pop()
+            frame.ip += 3  # advance for when we return
+            return self._enter_frame(
+                CallFrame(
+                    ip=0,
+                    chunk=module_name,
+                    stack_start=len(self.stack),
+                    arg_len=0,
+                    closure=new_hog_closure(
+                        new_hog_callable(
+                            type="local", name=module_name, arg_count=0, upvalue_count=0, ip=0, chunk=module_name
                         )
-                    frame.ip += 1  # advance for when we return
-                    frame = CallFrame(
-                        ip=callable["ip"],
-                        chunk=callable["chunk"],
-                        stack_start=len(stack) - callable["argCount"],
-                        arg_len=callable["argCount"],
-                        closure=closure,
-                    )
-                    set_chunk_bytecode()
-                    call_stack.append(frame)
-                    continue  # resume the loop without incrementing frame.ip
-
-                elif callable.get("__hogCallable__") == "stl":
-                    if callable["name"] not in STL:
-                        raise HogVMException(f"Unsupported function call: {callable['name']}")
-                    stl_fn = STL[callable["name"]]
-                    if stl_fn.minArgs is not None and args_length < stl_fn.minArgs:
-                        raise HogVMException(
-                            f"Function {callable['name']} requires at least {stl_fn.minArgs} arguments"
+                    ),
+                )
+            )
+        elif self.functions is not None and name in self.functions:
+            self._push(self.functions[name](*self._call_args(arg_count)))
+        elif name in STL:
+            self._push(STL[name].fn(self._call_args(arg_count), self.team, self.stdout, self.timeout_seconds))
+        elif name in BYTECODE_STL:
+            arg_names = BYTECODE_STL[name][0]
+            if len(arg_names) != arg_count:
+                raise HogVMException(f"Function {name} requires exactly {len(arg_names)} arguments")
+            frame.ip += 3  # advance for when we return
+            return self._enter_frame(
+                CallFrame(
+                    ip=0,
+                    chunk=f"stl/{name}",
+                    stack_start=len(self.stack) - arg_count,
+                    arg_len=arg_count,
+                    closure=new_hog_closure(
+                        new_hog_callable(
+                            type="stl", name=name, arg_count=arg_count, upvalue_count=0, ip=0, chunk=f"stl/{name}"
                         )
-                    if stl_fn.maxArgs is not None and args_length > stl_fn.maxArgs:
-                        raise HogVMException(f"Function {callable['name']} requires at most {stl_fn.maxArgs} arguments")
-                    if version == 0:
-                        args = [pop_stack() for _ in range(args_length)]
-                    else:
-                        args = list(reversed([pop_stack() for _ in range(args_length)]))
-                        if stl_fn.maxArgs is not None and len(args) < stl_fn.maxArgs:
-                            args = [*args, *([None] * (stl_fn.maxArgs - len(args)))]
-                    push_stack(stl_fn.fn(args, team, stdout, timeout.total_seconds()))
-
-                elif callable.get("__hogCallable__") == "async":
-                    raise HogVMException("Async functions are not supported")
-
-                else:
-                    raise HogVMException("Invalid callable")
-
-            case Operation.TRY:
-                throw_stack.append(
-                    ThrowFrame(
-                        call_stack_len=len(call_stack), stack_len=len(stack), catch_ip=frame.ip + 1 + next_token()
-                    )
+                    ),
                 )
-            case Operation.POP_TRY:
-                if throw_stack:
-                    throw_stack.pop()
-                else:
-                    raise HogVMException("Invalid operation POP_TRY: no try block to pop")
-            case Operation.THROW:
-                exception = pop_stack()
-                if not is_hog_error(exception):
-                    raise HogVMException("Can not throw: value is not of type Error")
-                if throw_stack:
-                    last_throw = throw_stack.pop()
-                    call_stack_len, stack_len, catch_ip = (
-                        last_throw.call_stack_len,
-                        last_throw.stack_len,
-                        last_throw.catch_ip,
-                    )
-                    stack_keep_first_elements(stack_len)
-                    call_stack = call_stack[0:call_stack_len]
-                    push_stack(exception)
-                    frame = call_stack[-1]
-                    set_chunk_bytecode()
-                    frame.ip = catch_ip
-                    continue
-                else:
-                    raise UncaughtHogVMException(
-                        type=exception.get("type"),
-                        message=exception.get("message"),
-                        payload=exception.get("payload"),
-                    )
-            case _:
-                raise HogVMException(
-                    f'Unexpected node while running bytecode in chunk "{frame.chunk}": {chunk_bytecode[frame.ip]}'
+            )
+        else:
+            raise HogVMException(f"Unsupported function call: {name}")
+        return None
+
+    def _op_call_local(self, operands: tuple) -> Optional[int]:
+        closure = self._pop()
+        if not isinstance(closure, dict) or closure.get("__hogClosure__") is None:
+            raise HogVMException(f"Invalid closure: {closure}")
+        callable = closure.get("callable")
+        if not isinstance(callable, dict) or callable.get("__hogCallable__") is None:
+            raise HogVMException(f"Invalid callable: {callable}")
+        args_length = operands[0]
+        if args_length > MAX_FUNCTION_ARGS_LENGTH:
+            raise HogVMException("Too many arguments")
+
+        if callable.get("__hogCallable__") == "local":
+            if callable["argCount"] > args_length:
+                # TODO: specify minimum required arguments somehow
+                for _ in range(callable["argCount"] - args_length):
+                    self._push(None, COST_PER_UNIT)
+            elif callable["argCount"] < args_length:
+                raise HogVMException(f"Too many arguments. Passed {args_length}, expected {callable['argCount']}")
+            self.frame.ip += 2  # advance for when we return
+            return self._enter_frame(
+                CallFrame(
+                    ip=callable["ip"],
+                    chunk=callable["chunk"],
+                    stack_start=len(self.stack) - callable["argCount"],
+                    arg_len=callable["argCount"],
+                    closure=closure,
                 )
+            )
 
-        frame.ip += 1
+        elif callable.get("__hogCallable__") == "stl":
+            if callable["name"] not in STL:
+                raise HogVMException(f"Unsupported function call: {callable['name']}")
+            stl_fn = STL[callable["name"]]
+            if stl_fn.minArgs is not None and args_length < stl_fn.minArgs:
+                raise HogVMException(f"Function {callable['name']} requires at least {stl_fn.minArgs} arguments")
+            if stl_fn.maxArgs is not None and args_length > stl_fn.maxArgs:
+                raise HogVMException(f"Function {callable['name']} requires at most {stl_fn.maxArgs} arguments")
+            if self.program.version == 0:
+                args = [self._pop() for _ in range(args_length)]
+            else:
+                args = list(reversed([self._pop() for _ in range(args_length)]))
+                if stl_fn.maxArgs is not None and len(args) < stl_fn.maxArgs:
+                    args = [*args, *([None] * (stl_fn.maxArgs - len(args)))]
+            self._push(stl_fn.fn(args, self.team, self.stdout, self.timeout_seconds))
+            return None
 
-    return BytecodeResult(result=pop_stack() if len(stack) > 0 else None, stdout=stdout, bytecodes=bytecodes)
+        elif callable.get("__hogCallable__") == "async":
+            raise HogVMException("Async functions are not supported")
+
+        else:
+            raise HogVMException("Invalid callable")
+
+    def _op_try(self, operands: tuple) -> None:
+        self.throw_stack.append(
+            ThrowFrame(
+                call_stack_len=len(self.call_stack),
+                stack_len=len(self.stack),
+                catch_ip=self.frame.ip + 1 + operands[0],
+            )
+        )
+
+    def _op_pop_try(self, operands: tuple) -> None:
+        if self.throw_stack:
+            self.throw_stack.pop()
+        else:
+            raise HogVMException("Invalid operation POP_TRY: no try block to pop")
+
+    def _op_throw(self, operands: tuple) -> int:
+        exception = self._pop()
+        if not is_hog_error(exception):
+            raise HogVMException("Can not throw: value is not of type Error")
+        if not self.throw_stack:
+            raise UncaughtHogVMException(
+                type=exception.get("type"),
+                message=exception.get("message"),
+                payload=exception.get("payload"),
+            )
+        last_throw = self.throw_stack.pop()
+        self._stack_keep_first_elements(last_throw.stack_len)
+        del self.call_stack[last_throw.call_stack_len :]
+        self._push(exception)
+        self.frame = self.call_stack[-1]
+        self._set_chunk()
+        self.frame.ip = last_throw.catch_ip
+        return _JUMPED
+
+
+OPERATION_HANDLERS: dict[Any, Callable[[HogVM, tuple], Optional[int]]] = {
+    None: HogVM._op_halt,
+    Operation.STRING: HogVM._op_constant,
+    Operation.INTEGER: HogVM._op_constant,
+    Operation.FLOAT: HogVM._op_constant,
+    Operation.TRUE: HogVM._op_true,
+    Operation.FALSE: HogVM._op_false,
+    Operation.NULL: HogVM._op_null,
+    Operation.NOT: HogVM._op_not,
+    Operation.AND: HogVM._op_and,
+    Operation.OR: HogVM._op_or,
+    Operation.PLUS: HogVM._op_plus,
+    Operation.MINUS: HogVM._op_minus,
+    Operation.DIVIDE: HogVM._op_divide,
+    Operation.MULTIPLY: HogVM._op_multiply,
+    Operation.MOD: HogVM._op_mod,
+    Operation.EQ: HogVM._op_eq,
+    Operation.NOT_EQ: HogVM._op_not_eq,
+    Operation.GT: HogVM._op_gt,
+    Operation.GT_EQ: HogVM._op_gt_eq,
+    Operation.LT: HogVM._op_lt,
+    Operation.LT_EQ: HogVM._op_lt_eq,
+    Operation.LIKE: HogVM._op_like,
+    Operation.ILIKE: HogVM._op_ilike,
+    Operation.NOT_LIKE: HogVM._op_not_like,
+    Operation.NOT_ILIKE: HogVM._op_not_ilike,
+    Operation.IN: HogVM._op_in,
+    Operation.NOT_IN: HogVM._op_not_in,
+    Operation.REGEX: HogVM._op_regex,
+    Operation.NOT_REGEX: HogVM._op_not_regex,
+    Operation.IREGEX: HogVM._op_iregex,
+    Operation.NOT_IREGEX: HogVM._op_not_iregex,
+    Operation.GET_GLOBAL: HogVM._op_get_global,
+    Operation.POP: HogVM._op_pop,
+    Operation.CLOSE_UPVALUE: HogVM._op_close_upvalue,
+    Operation.RETURN: HogVM._op_return,
+    Operation.GET_LOCAL: HogVM._op_get_local,
+    Operation.SET_LOCAL: HogVM._op_set_local,
+    Operation.GET_PROPERTY: HogVM._op_get_property,
+    Operation.GET_PROPERTY_NULLISH: HogVM._op_get_property_nullish,
+    Operation.SET_PROPERTY: HogVM._op_set_property,
+    Operation.DICT: HogVM._op_dict,
+    Operation.ARRAY: HogVM._op_array,
+    Operation.TUPLE: HogVM._op_tuple,
+    Operation.JUMP: HogVM._op_jump,
+    Operation.JUMP_IF_FALSE: HogVM._op_jump_if_false,
+    Operation.JUMP_IF_STACK_NOT_NULL: HogVM._op_jump_if_stack_not_null,
+    Operation.DECLARE_FN: HogVM._op_declare_fn,
+    Operation.CALLABLE: HogVM._op_callable,
+    Operation.CLOSURE: HogVM._op_closure,
+    Operation.GET_UPVALUE: HogVM._op_get_upvalue,
+    Operation.SET_UPVALUE: HogVM._op_set_upvalue,
+    Operation.CALL_GLOBAL: HogVM._op_call_global,
+    Operation.CALL_LOCAL: HogVM._op_call_local,
+    Operation.TRY: HogVM._op_try,
+    Operation.POP_TRY: HogVM._op_pop_try,
+    Operation.THROW: HogVM._op_throw,
+}
+
+# Number of inline operands following each operation in the bytecode. CLOSURE is variable: 1 + 2 * upvalue count.
+OPERAND_COUNTS: dict[Operation, int] = {
+    Operation.STRING: 1,
+    Operation.INTEGER: 1,
+    Operation.FLOAT: 1,
+    Operation.AND: 1,
+    Operation.OR: 1,
+    Operation.GET_GLOBAL: 1,
+    Operation.GET_LOCAL: 1,
+    Operation.SET_LOCAL: 1,
+    Operation.DICT: 1,
+    Operation.ARRAY: 1,
+    Operation.TUPLE: 1,
+    Operation.JUMP: 1,
+    Operation.JUMP_IF_FALSE: 1,
+    Operation.JUMP_IF_STACK_NOT_NULL: 1,
+    Operation.DECLARE_FN: 3,
+    Operation.CALLABLE: 4,
+    Operation.GET_UPVALUE: 1,
+    Operation.SET_UPVALUE: 1,
+    Operation.CALL_GLOBAL: 2,
+    Operation.CALL_LOCAL: 1,
+    Operation.TRY: 1,
+}
+
+CONSTANT_OPERATIONS = {Operation.STRING, Operation.INTEGER, Operation.FLOAT}
+TIMED_OPERATIONS = {Operation.CALL_GLOBAL, Operation.CALL_LOCAL}
 
 
 def validate_bytecode(bytecode: list[Any] | dict, inputs: Optional[dict] = None) -> tuple[bool, Optional[str]]:
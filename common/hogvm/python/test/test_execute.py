@@ -1,15 +1,17 @@
 import json
 from typing import Any, Optional
+from unittest.mock import patch
 from collections.abc import Callable
 
 
-from common.hogvm.python.execute import execute_bytecode, get_nested_value
+from common.hogvm.python.execute import HogVM, compile_bytecode, execute_bytecode, get_nested_value
 from common.hogvm.python.operation import (
     Operation as op,
     HOGQL_BYTECODE_IDENTIFIER as _H,
     HOGQL_BYTECODE_VERSION as VERSION,
 )
-from common.hogvm.python.utils import UncaughtHogVMException
+from common.hogvm.python import utils
+from common.hogvm.python.utils import HogVMMemoryExceededException, UncaughtHogVMException
 from posthog.hogql.compiler.bytecode import create_bytecode
 from posthog.hogql.parser import parse_expr, parse_program
 
@@ -268,10 +270,46 @@ class TestBytecodeExecute:
         try:
             execute_bytecode(bytecode, {})
         except Exception as e:
-            assert str(e) == "Memory limit of 67108864 bytes exceeded. Attempted to use 67155164 bytes"
+            assert str(e) == "Memory limit of 67108864 bytes exceeded. Attempted to use 67180199 bytes"
         else:
             raise AssertionError("Expected Exception not raised")
 
+    def test_memory_limits_set_property(self):
+        code = """
+            let string := 'banana'
+            for (let i := 0; i < 20; i := i + 1) {
+                string := string || string
+            }
+            let obj := {}
+            for (let i := 0; i < 100; i := i + 1) {
+                obj[i] := string
+            }
+        """
+        try:
+            self._run_program(code)
+        except HogVMMemoryExceededException as e:
+            assert e.memory_limit == 67108864
+        else:
+            raise AssertionError("Expected Exception not raised")
+
+    def test_large_globals_cost_is_calculated_once(self):
+        globals = {"properties": {f"key_{i}": f"value_{i}" for i in range(1000)}}
+        with patch("common.hogvm.python.utils.calculate_cost", wraps=utils.calculate_cost) as nested_calls:
+            result = self._run_program("return [properties, properties, properties, properties]", globals=globals)
+
+        assert result == [globals["properties"]] * 4
+        # A single walk over the dict visits each key and value once
+        assert nested_calls.call_count < 2 * 2000
+
+    def test_debugger_steps_through_every_operation(self):
+        bytecode = create_bytecode(parse_program("let a := 1; return concat(a, 'b')")).bytecode
+        vm = HogVM(bytecode, debug=True)
+        with patch("common.hogvm.python.execute.debugger") as debugger:
+            assert vm.run().result == "1b"
+
+        # Including the calls, which also check the timeout
+        assert debugger.call_count == vm.ops
+
     def test_functions(self):
         def stringify(*args):
             if args[0] == 1:
@@ -1033,3 +1071,27 @@ class TestBytecodeExecute:
             }
         )
         assert res.result == "tomato"
+
+    def test_vm_reuse(self):
+        bytecode = create_bytecode(parse_program("let a := properties.value; return a * 2")).bytecode
+        vm = HogVM(bytecode)
+        assert vm.run({"properties": {"value": 1}}).result == 2
+        assert vm.run({"properties": {"value": 21}}).result == 42
+        assert vm.run({"properties": {"value": 21}}).stdout == []
+
+    def test_compiled_program_reuse(self):
+        program = compile_bytecode(create_bytecode(parse_program("print(event); return event")).bytecode)
+        first = execute_bytecode(program, {"event": "a"})
+        second = execute_bytecode(program, {"event": "b"})
+        assert (first.result, first.stdout) == ("a", ["a"])
+        assert (second.result, second.stdout) == ("b", ["b"])
+
+    def test_vm_reuse_after_error(self):
+        vm = HogVM([_H, VERSION, op.STRING, "x", op.GET_GLOBAL, 1])
+        try:
+            vm.run({})
+        except Exception as e:
+            assert str(e) == "Global variable not found: x"
+        else:
+            raise AssertionError("Expected Exception not raised")
+        assert vm.run({"x": 1}).result == 1
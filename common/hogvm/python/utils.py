@@ -94,22 +94,36 @@ def set_nested_value(obj, chain, value) -> Any:
     return obj
 
 
-def calculate_cost(object, marked: set | None = None) -> int:
+def calculate_cost(object, marked: set | None = None, cache: dict[int, tuple[Any, int]] | None = None) -> int:
+    """
+    Estimated memory footprint of a value. Pass a `cache` to memoize the cost of containers by identity, for objects
+    that are known not to change while the cache is in use.
+    """
     if marked is None:
         marked = set()
     if isinstance(object, dict) or isinstance(object, list) or isinstance(object, tuple):
         if id(object) in marked:
             return COST_PER_UNIT
+        if cache is not None:
+            cached = cache.get(id(object))
+            if cached is not None and cached[0] is object:
+                return cached[1]
         marked.add(id(object))
         try:
             if isinstance(object, dict):
-                return COST_PER_UNIT + sum(
-                    [calculate_cost(key, marked) + calculate_cost(value, marked) for key, value in object.items()]
+                cost = COST_PER_UNIT + sum(
+                    [
+                        calculate_cost(key, marked, cache) + calculate_cost(value, marked, cache)
+                        for key, value in object.items()
+                    ]
                 )
-            elif isinstance(object, list) or isinstance(object, tuple):
-                return COST_PER_UNIT + sum([calculate_cost(val, marked) for val in object])
+            else:
+                cost = COST_PER_UNIT + sum([calculate_cost(val, marked, cache) for val in object])
         finally:
             marked.remove(id(object))
+        if cache is not None:
+            cache[id(object)] = (object, cost)
+        return cost
     elif isinstance(object, str):
         return COST_PER_UNIT + len(object)
     return COST_PER_UNIT
@@ -682,6 +682,8 @@ export interface EventsQueryResponse extends AnalyticsQueryResponseBase<any[][]>
     hasMore?: boolean
     limit?: integer
     offset?: integer
+    /** Cursor for the next page, returned when paginating with `cursor` */
+    nextCursor?: string
 }
 
 export type CachedEventsQueryResponse = CachedQueryResponse<EventsQueryResponse>
@@ -720,6 +722,10 @@ export interface EventsQuery extends DataNode<EventsQueryResponse> {
      * Number of rows to skip before returning rows
      */
     offset?: integer
+    /**
+     * Cursor to continue from, as returned in `nextCursor` of the previous page. Pass an empty string to paginate with cursors from the first page. Takes precedence over `offset`.
+     */
+    cursor?: string
     /**
      * Show events matching a given action
      */
@@ -1642,6 +1648,8 @@ export interface ActorsQueryResponse extends AnalyticsQueryResponseBase<any[][]>
     hasMore?: boolean
     limit: integer
     offset: integer
+    /** Cursor for the next page, returned when paginating with `cursor` */
+    nextCursor?: string
     missing_actors_count?: integer
 }
 
@@ -1659,6 +1667,8 @@ export interface ActorsQuery extends DataNode<ActorsQueryResponse> {
     orderBy?: string[]
     limit?: integer
     offset?: integer
+    /** Cursor to continue from, as returned in `nextCursor` of the previous page. Pass an empty string to paginate with cursors from the first page. Takes precedence over `offset`. */
+    cursor?: string
 }
 
 export type CachedGroupsQueryResponse = CachedQueryResponse<GroupsQueryResponse>
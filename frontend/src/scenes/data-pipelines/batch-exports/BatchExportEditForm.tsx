@@ -201,6 +201,8 @@ export function BatchExportsEditFields({
                                     const jsonLinesCompressionOptions = [
                                         { value: 'gzip', label: 'gzip' },
                                         { value: 'brotli', label: 'brotli' },
+                                        { value: 'zstd', label: 'zstd' },
+                                        { value: 'lz4', label: 'lz4' },
                                         { value: null, label: 'No compression' },
                                     ]
                                     const compressionOptions =
@@ -1,10 +1,15 @@
+import gzip
+import json
+import threading
 from concurrent.futures import ThreadPoolExecutor, Future
+from functools import partial
 
 import structlog
 from requests import Response, Session
 from requests.adapters import HTTPAdapter, Retry
 from datetime import datetime, UTC
 from prometheus_client import Counter
+from collections.abc import Callable
 from typing import Any, Optional
 
 from posthog.logging.timing import timed
@@ -12,6 +17,9 @@ from posthog.settings.ingestion import (
     CAPTURE_INTERNAL_URL,
     CAPTURE_REPLAY_INTERNAL_URL,
     CAPTURE_INTERNAL_MAX_WORKERS,
+    CAPTURE_INTERNAL_BATCH_MAX_BYTES,
+    CAPTURE_INTERNAL_BATCH_MAX_EVENTS,
+    BATCH_CAPTURE_ENDPOINT,
     NEW_ANALYTICS_CAPTURE_ENDPOINT,
     REPLAY_CAPTURE_ENDPOINT,
 )
@@ -30,6 +38,14 @@ CAPTURE_INTERNAL_EVENT_SUBMITTED_COUNTER = Counter(
     "Events received by capture_internal, tagged by source.",
     labelnames=["event_source"],  # which internal codepath submitted this event
 )
+CAPTURE_INTERNAL_BATCH_SUBMITTED_COUNTER = Counter(
+    "capture_internal_batch_submitted",
+    "Requests to the /batch/ endpoint sent by capture_batch_internal, tagged by source.",
+    labelnames=["event_source"],
+)
+
+# batches are much larger than single events, give capture more time to persist them
+CAPTURE_INTERNAL_BATCH_TIMEOUT_SECONDS = 10
 
 
 class CaptureInternalError(Exception):
@@ -112,12 +128,15 @@ def capture_batch_internal(
     event_source: str,
     token: str,
     process_person_profile: bool = False,
+    use_batch_endpoint: bool = False,
 ) -> list[Future]:
     """
     capture_batch_internal submits multiple capture request payloads to
-    PostHog (capture-rs backend) concurrently. capture_batch_internal does
-    not submit single requests to the capture /batch/ endpoint, so historical
-    event submission is not supported.
+    PostHog (capture-rs backend) concurrently. By default, each event is
+    submitted in its own request. With use_batch_endpoint, events are grouped
+    into gzipped requests to the capture /batch/ endpoint instead, which is
+    much cheaper for large numbers of events. Historical event submission is
+    not supported either way.
 
     Args:
         events: List of event payloads to capture. Each payload MUST include
@@ -126,9 +145,15 @@ def capture_batch_internal(
         token: API token to submit events in this batch on behalf of (required; overrides individual event tokens)
         process_person_profile: if TRUE, process the person profile for each event according to it's properties or team config
                                 if FALSE, disable person processing for all events in the batch (default: FALSE)
+        use_batch_endpoint: if TRUE, submit events in batches of at most CAPTURE_INTERNAL_BATCH_MAX_EVENTS events and
+                            CAPTURE_INTERNAL_BATCH_MAX_BYTES bytes to the /batch/ endpoint (default: FALSE)
 
     Returns:
-        List of Future objects that the caller can resolve to Response objects or thrown Exceptions
+        List of Future objects, one per event and in the same order, that the caller can resolve to Response
+        objects or thrown Exceptions. With use_batch_endpoint, per-event status isn't available: capture accepts or
+        rejects a batch as a whole, so each event's Response is that of the batch it was in. Events that couldn't be
+        serialized resolve to their own Exception, and session recording events, which are sent on their own, to
+        their own Response.
     """
     logger.debug(
         "capture_batch_internal",
@@ -136,8 +161,14 @@ def capture_batch_internal(
         event_source=event_source,
         token=token,
         process_person_profile=process_person_profile,
+        use_batch_endpoint=use_batch_endpoint,
     )
 
+    if use_batch_endpoint:
+        return _capture_batch_internal_batched(
+            events=events, event_source=event_source, token=token, process_person_profile=process_person_profile
+        )
+
     futures: list[Future] = []
 
     with ThreadPoolExecutor(max_workers=CAPTURE_INTERNAL_MAX_WORKERS) as executor:
@@ -167,6 +198,150 @@ def capture_batch_internal(
     return futures
 
 
+_batch_session: Optional[Session] = None
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_lock = threading.Lock()
+
+
+def _get_batch_session_and_executor() -> tuple[Session, ThreadPoolExecutor]:
+    """
+    Batches are sent from a long-lived pool of threads over a shared session, so that connections to capture are
+    kept alive and reused between batches and calls, instead of being set up for every request.
+    """
+    global _batch_session, _batch_executor
+
+    with _batch_lock:
+        if _batch_session is None or _batch_executor is None:
+            session = Session()
+            session.mount(
+                CAPTURE_INTERNAL_URL,
+                HTTPAdapter(
+                    pool_maxsize=CAPTURE_INTERNAL_MAX_WORKERS,
+                    # only retry batches that weren't sent, as capture may have ingested some of the events of a
+                    # batch it failed on, and sending them again would duplicate them
+                    max_retries=Retry(total=3, read=0, status=0, backoff_factor=0.1),
+                ),
+            )
+            _batch_session = session
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=CAPTURE_INTERNAL_MAX_WORKERS, thread_name_prefix="capture_batch_internal"
+            )
+        return _batch_session, _batch_executor
+
+
+def _capture_batch_internal_batched(
+    *,
+    events: list[dict[str, Any]],
+    event_source: str,
+    token: str,
+    process_person_profile: bool,
+) -> list[Future]:
+    session, executor = _get_batch_session_and_executor()
+    sent_at = datetime.now(UTC)
+    futures: list[Future] = [Future() for _ in events]
+    resolved_capture_url = f"{CAPTURE_INTERNAL_URL}{BATCH_CAPTURE_ENDPOINT}"
+    # the batch envelope, with the serialized events spliced in between the brackets
+    envelope_prefix = json.dumps({"api_key": token, "sent_at": sent_at.isoformat(), "batch": []})[:-2].encode("utf-8")
+    envelope_suffix = b"]}"
+
+    def send(batch_futures: list[Future], serialized_events: list[bytes]) -> None:
+        # events of cancelled futures are sent along with the rest of their batch, but aren't resolved
+        batch_futures = [future for future in batch_futures if future.set_running_or_notify_cancel()]
+        try:
+            body = envelope_prefix + b",".join(serialized_events) + envelope_suffix
+            CAPTURE_INTERNAL_BATCH_SUBMITTED_COUNTER.labels(event_source=event_source).inc()
+            CAPTURE_INTERNAL_EVENT_SUBMITTED_COUNTER.labels(event_source=event_source).inc(len(serialized_events))
+            response = session.post(
+                resolved_capture_url,
+                params={"compression": "gzip"},
+                data=gzip.compress(body),
+                headers={"Content-Type": "application/json"},
+                timeout=CAPTURE_INTERNAL_BATCH_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            for future in batch_futures:
+                future.set_exception(e)
+        else:
+            # capture responds once for the whole batch, there's no status per event
+            for future in batch_futures:
+                future.set_result(response)
+
+    batch_futures: list[Future] = []
+    serialized_events: list[bytes] = []
+    batch_bytes = 0
+
+    def flush() -> None:
+        nonlocal batch_futures, serialized_events, batch_bytes
+        if serialized_events:
+            executor.submit(send, batch_futures, serialized_events)
+        batch_futures, serialized_events, batch_bytes = [], [], 0
+
+    for event, future in zip(events, futures):
+        properties: dict[str, Any] = event.get("properties", {})
+        event_name: str = event.get("event", "")
+        timestamp: str = event.get("timestamp", properties.get("timestamp", ""))
+
+        if event_name in SESSION_RECORDING_EVENT_NAMES:
+            # recordings are captured by a separate endpoint, which has no /batch/ equivalent
+            executor.submit(
+                _resolve_future,
+                future,
+                partial(
+                    capture_internal,
+                    token=token,
+                    event_name=event_name,
+                    event_source=event_source,
+                    distinct_id=event.get("distinct_id", ""),
+                    timestamp=timestamp,
+                    properties=properties,
+                    sent_at=sent_at,
+                    process_person_profile=process_person_profile,
+                ),
+            )
+            continue
+
+        try:
+            payload = prepare_capture_internal_payload(
+                token,
+                event_name,
+                event_source,
+                event.get("distinct_id", ""),
+                timestamp,
+                properties,
+                sent_at,
+                process_person_profile,
+            )
+            # the batch carries these for all of its events
+            del payload["api_key"], payload["sent_at"]
+            # NaN and Infinity aren't valid JSON, and would make capture reject the whole batch rather than this event
+            serialized_event = json.dumps(payload, allow_nan=False).encode("utf-8")
+        except Exception as e:
+            future.set_running_or_notify_cancel()
+            future.set_exception(e)
+            continue
+
+        if serialized_events and (
+            len(serialized_events) >= CAPTURE_INTERNAL_BATCH_MAX_EVENTS
+            or batch_bytes + len(serialized_event) > CAPTURE_INTERNAL_BATCH_MAX_BYTES
+        ):
+            flush()
+        batch_futures.append(future)
+        serialized_events.append(serialized_event)
+        batch_bytes += len(serialized_event) + 1
+
+    flush()
+    return futures
+
+
+def _resolve_future(future: Future, fn: Callable[[], Response]) -> None:
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(fn())
+    except Exception as e:
+        future.set_exception(e)
+
+
 # prep payload for new capture_internal to POST to capture-rs
 def prepare_capture_internal_payload(
     token: str,
@@ -36,6 +36,7 @@ from posthog.models.user import User
 from posthog.user_permissions import UserPermissionsSerializerMixin
 from posthog.utils import filters_override_requested_by_client, variables_override_requested_by_client
 from posthog.clickhouse.client.async_task_chain import task_chain_context
+from posthog.hogql_queries.query_cache import prefetched_query_cache
 from contextlib import nullcontext
 import posthoganalytics
 
@@ -461,7 +462,10 @@ class DashboardSerializer(DashboardBasicSerializer):
             ),
         )
 
-        with task_chain_context() if chained_tile_refresh_enabled else nullcontext():
+        with (
+            task_chain_context() if chained_tile_refresh_enabled else nullcontext(),
+            prefetched_query_cache(self._tile_cache_keys(dashboard, sorted_tiles)),
+        ):
             for order, tile in enumerate(sorted_tiles):
                 self.context.update(
                     {
@@ -493,6 +497,53 @@ class DashboardSerializer(DashboardBasicSerializer):
 
         return serialized_tiles
 
+    def _tile_cache_keys(self, dashboard: Dashboard, tiles: list[DashboardTile]) -> list[str]:
+        """
+        Cache keys of all tiles, so their cached results can be fetched from Redis in one go. The keys are computed the
+        same way as when the tiles are calculated (see `process_query_model`), with the dashboard's filters and
+        variables, or their overrides.
+        """
+        from posthog.hogql.constants import LimitContext
+        from posthog.hogql_queries.query_runner import get_query_runner_or_none
+        from posthog.schema import DashboardFilter, HogQLVariable
+        from posthog.schema_migrations.upgrade_manager import upgrade_query
+
+        try:
+            filters = self.get_filters(dashboard)
+            variables = self.get_variables(dashboard)
+            dashboard_filters = DashboardFilter.model_validate(filters) if filters else None
+            variables_override = (
+                [HogQLVariable.model_validate(variable) for variable in variables.values()] if variables else None
+            )
+        except Exception:
+            # Invalid overrides are reported when the tiles themselves are serialized
+            return []
+
+        team = self.context["get_team"]()
+        cache_keys = []
+        for tile in tiles:
+            if not tile.insight or not tile.insight.query:
+                continue
+            try:
+                with upgrade_query(tile.insight):
+                    query = tile.insight.query
+                    query_runner = get_query_runner_or_none(query, team, limit_context=LimitContext.QUERY_ASYNC)
+                    # Nodes without a runner of their own are calculated with the runner of their source
+                    while query_runner is None and isinstance(query.get("source"), dict):
+                        query = query["source"]
+                        query_runner = get_query_runner_or_none(query, team, limit_context=LimitContext.QUERY_ASYNC)
+                    if query_runner is None:
+                        continue
+                    if dashboard_filters:
+                        query_runner.apply_dashboard_filters(dashboard_filters)
+                    if variables_override:
+                        query_runner.apply_variable_overrides(variables_override)
+                    cache_keys.append(query_runner.get_cache_key())
+            except Exception:
+                # Broken queries are handled (and reported) when the tile itself is serialized
+                continue
+        return cache_keys
+
     def get_filters(self, dashboard: Dashboard) -> dict:
         request = self.context.get("request")
         if request:
@@ -8,6 +8,7 @@ from datetime import datetime
 from django.db import transaction
 from django.db.models import QuerySet, Q, deletion, Prefetch
 from django.conf import settings
+from django.http import HttpResponse
 from drf_spectacular.utils import OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from rest_framework import (
@@ -19,6 +20,7 @@ from rest_framework import (
 )
 from posthog.api.utils import action
 from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 from rest_framework.response import Response
 from posthog.exceptions_capture import capture_exception
@@ -65,6 +67,12 @@ from posthog.models.feature_flag import (
 )
 from posthog.models.feature_flag.flag_analytics import increment_request_count
 from posthog.models.feature_flag.flag_matching import check_flag_evaluation_query_is_ok
+from posthog.models.feature_flag.local_evaluation import (
+    LocalEvaluationPayload,
+    get_local_evaluation_etag,
+    get_local_evaluation_payload,
+    set_local_evaluation_payload,
+)
 from posthog.models.surveys.survey import Survey
 from posthog.models.group_type_mapping import GroupTypeMapping
 from posthog.models.property import Property
@@ -90,6 +98,16 @@ BEHAVIOURAL_COHORT_FOUND_ERROR_CODE = "behavioral_cohort_found"
 MAX_PROPERTY_VALUES = 1000
 
 
+def _parse_if_none_match(header: Optional[str]) -> set[str]:
+    if not header:
+        return set()
+    return {etag.strip().removeprefix("W/").strip('"') for etag in header.split(",")}
+
+
+def _local_evaluation_response(payload: LocalEvaluationPayload) -> HttpResponse:
+    return HttpResponse(payload["content"], content_type="application/json", headers={"ETag": f'"{payload["etag"]}"'})
+
+
 class FeatureFlagThrottle(BurstRateThrottle):
     # Throttle class that's scoped just to the local evaluation endpoint.
     # This makes the rate limit independent of other endpoints.
@@ -1194,6 +1212,25 @@ class FeatureFlagViewSet(
                 },
             )
 
+            should_send_cohorts = "send_cohorts" in request.GET
+
+            # The payload only changes when flags, cohorts or group types do, so serve it from cache where possible
+            if_none_match = _parse_if_none_match(request.headers.get("If-None-Match"))
+            if if_none_match:
+                cached_etag = get_local_evaluation_etag(self.project_id, should_send_cohorts)
+                if cached_etag and cached_etag["etag"] in if_none_match:
+                    if cached_etag["billable"]:
+                        increment_request_count(self.team.pk, 1, FlagRequestType.LOCAL_EVALUATION)
+                    return HttpResponse(
+                        status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": f'"{cached_etag["etag"]}"'}
+                    )
+
+            cached_payload = get_local_evaluation_payload(self.project_id, should_send_cohorts)
+            if cached_payload:
+                if cached_payload["billable"]:
+                    increment_request_count(self.team.pk, 1, FlagRequestType.LOCAL_EVALUATION)
+                return _local_evaluation_response(cached_payload)
+
             try:
                 feature_flags = FeatureFlag.objects.db_manager(DATABASE_FOR_LOCAL_EVALUATION).filter(
                     ~Q(is_remote_configuration=True),
@@ -1213,7 +1250,6 @@ class FeatureFlagViewSet(
                     status=500,
                 )
 
-            should_send_cohorts = "send_cohorts" in request.GET
             cohorts = {}
             seen_cohorts_cache: dict[int, CohortOrEmpty] = {}
 
@@ -1310,9 +1346,10 @@ class FeatureFlagViewSet(
                     continue
 
             # Add request for analytics
-            if len(parsed_flags) > 0 and not all(
+            billable = len(parsed_flags) > 0 and not all(
                 flag.key.startswith(SURVEY_TARGETING_FLAG_PREFIX) for flag in parsed_flags
-            ):
+            )
+            if billable:
                 increment_request_count(self.team.pk, 1, FlagRequestType.LOCAL_EVALUATION)
 
             duration = time.time() - start_time
@@ -1335,7 +1372,13 @@ class FeatureFlagViewSet(
                     },
                     "cohorts": cohorts,
                 }
-                return Response(response_data)
+                payload = set_local_evaluation_payload(
+                    self.project_id,
+                    should_send_cohorts,
+                    JSONRenderer().render(response_data),
+                    billable=billable,
+                )
+                return _local_evaluation_response(payload)
 
             except Exception as e:
                 logger.error("Error serializing response", exc_info=True)
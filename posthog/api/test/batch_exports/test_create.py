@@ -490,7 +490,12 @@ def test_create_snowflake_batch_export_validates_credentials(
         (
             "JSONLines",
             "zstd",
-            "Compression zstd is not supported for file format JSONLines. Supported compressions are ['gzip', 'brotli']",
+            None,
+        ),
+        (
+            "JSONLines",
+            "snappy",
+            "Compression snappy is not supported for file format JSONLines. Supported compressions are ['gzip', 'brotli', 'zstd', 'lz4']",
         ),
         (
             "Parquet",
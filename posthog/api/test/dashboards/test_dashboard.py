@@ -14,6 +14,7 @@ from posthog.api.test.dashboards import DashboardAPI
 from posthog.constants import AvailableFeature
 from posthog.helpers.dashboard_templates import create_group_type_mapping_detail_dashboard
 from posthog.hogql_queries.legacy_compatibility.filter_to_query import filter_to_query
+from posthog.hogql_queries.query_cache import prefetched_query_cache
 from posthog.models import Dashboard, DashboardTile, Filter, Insight, Team, User
 from posthog.models.group_type_mapping import GroupTypeMapping
 from posthog.models.insight_variable import InsightVariable
@@ -1472,6 +1473,62 @@ class TestDashboard(APIBaseTest, QueryMatchingTest):
             assert value["variableId"] == str(variable.id)
             assert value["value"] == "some override value"
 
+    def test_dashboard_prefetches_the_cache_keys_tiles_are_calculated_with(self):
+        variable = InsightVariable.objects.create(
+            team=self.team, name="Test 1", code_name="test_1", default_value="some_default_value", type="String"
+        )
+        dashboard = Dashboard.objects.create(
+            team=self.team,
+            name="dashboard 1",
+            created_by=self.user,
+            filters={"date_from": "-14d"},
+            variables={
+                str(variable.id): {
+                    "code_name": variable.code_name,
+                    "variableId": str(variable.id),
+                    "value": "some override value",
+                }
+            },
+        )
+        hogql_insight = Insight.objects.create(
+            query={
+                "kind": "DataVisualizationNode",
+                "source": {
+                    "kind": "HogQLQuery",
+                    "query": "select {variables.test_1}",
+                    "variables": {str(variable.id): {"code_name": variable.code_name, "variableId": str(variable.id)}},
+                },
+            },
+            team=self.team,
+        )
+        trends_insight = Insight.objects.create(
+            query={
+                "kind": "InsightVizNode",
+                "source": {"kind": "TrendsQuery", "series": [{"kind": "EventsNode", "event": "$pageview"}]},
+            },
+            team=self.team,
+        )
+        DashboardTile.objects.create(dashboard=dashboard, insight=hogql_insight)
+        DashboardTile.objects.create(dashboard=dashboard, insight=trends_insight)
+
+        for query_params in [
+            {},
+            {
+                "filters_override": json.dumps({"date_from": "-7d"}),
+                "variables_override": json.dumps(
+                    {str(variable.id): {"code_name": variable.code_name, "variableId": str(variable.id), "value": "x"}}
+                ),
+            },
+        ]:
+            with patch(
+                "posthog.api.dashboards.dashboard.prefetched_query_cache", wraps=prefetched_query_cache
+            ) as prefetched:
+                response_data = self.dashboard_api.get_dashboard(dashboard.pk, query_params=query_params)
+
+            cache_keys = [tile["insight"]["filters_hash"] for tile in response_data["tiles"]]
+            assert len(set(cache_keys)) == 2
+            assert sorted(prefetched.call_args.args[0]) == sorted(cache_keys)
+
     def test_dashboard_variables_stale(self):
         # if a variable is deleted/updated, the dashboard should not show the stale variable
 
@@ -1,5 +1,8 @@
+import gzip
+import json
 import pathlib
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, cast
 from datetime import datetime, UTC
 from unittest.mock import patch, MagicMock
@@ -9,6 +12,7 @@ from prance import ResolvingParser
 from posthog.api.capture import capture_internal, capture_batch_internal, CaptureInternalError
 from posthog.test.base import BaseTest
 from posthog.settings.ingestion import (
+    BATCH_CAPTURE_ENDPOINT,
     CAPTURE_INTERNAL_URL,
     CAPTURE_REPLAY_INTERNAL_URL,
     NEW_ANALYTICS_CAPTURE_ENDPOINT,
@@ -549,3 +553,140 @@ class TestCaptureInternal(BaseTest):
         for future in resp_futures:
             resp = future.result()
             assert resp.status_code == 400
+
+    def _install_batch_spy(self, status_code=200, error=None) -> list[dict[str, Any]]:
+        spied_batches: list[dict[str, Any]] = []
+
+        def spy_post(url, **kwargs):
+            spied_batches.append(
+                {"url": url, "params": kwargs["params"], "payload": json.loads(gzip.decompress(kwargs["data"]))}
+            )
+            if error is not None:
+                raise error
+            mock_response = MagicMock()
+            mock_response.status_code = status_code
+            mock_response.batch_number = len(spied_batches)
+            return mock_response
+
+        mock_session = MagicMock()
+        mock_session.post.side_effect = spy_post
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        patcher = patch("posthog.api.capture._get_batch_session_and_executor", return_value=(mock_session, executor))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return spied_batches
+
+    def _batch_test_events(self, count: int) -> list[dict[str, Any]]:
+        return [
+            {
+                "event": f"test_event_{i}",
+                "distinct_id": f"distinct_id_{i}",
+                "timestamp": datetime.now(UTC).isoformat(),
+                "properties": {"$current_url": "https://example.com", "index": i},
+            }
+            for i in range(count)
+        ]
+
+    @patch("posthog.api.capture.CAPTURE_INTERNAL_BATCH_MAX_EVENTS", 4)
+    def test_capture_batch_internal_batch_endpoint(self):
+        spied_batches = self._install_batch_spy()
+        test_events = self._batch_test_events(10)
+
+        resp_futures = capture_batch_internal(
+            events=test_events,
+            event_source="test_capture_batch_internal_batch_endpoint",
+            token="abc123",
+            use_batch_endpoint=True,
+        )
+
+        assert len(resp_futures) == 10
+        assert [future.result().batch_number for future in resp_futures] == [1] * 4 + [2] * 4 + [3] * 2
+
+        assert len(spied_batches) == 3
+        sent_events = []
+        for spied_batch in spied_batches:
+            assert spied_batch["url"] == f"{CAPTURE_INTERNAL_URL}{BATCH_CAPTURE_ENDPOINT}"
+            assert spied_batch["params"] == {"compression": "gzip"}
+            assert spied_batch["payload"]["api_key"] == "abc123"
+            assert spied_batch["payload"]["sent_at"] is not None
+            sent_events.extend(spied_batch["payload"]["batch"])
+
+        for i, sent_event in enumerate(sent_events):
+            assert sent_event["event"] == f"test_event_{i}"
+            assert sent_event["distinct_id"] == f"distinct_id_{i}"
+            assert sent_event["timestamp"] == test_events[i]["timestamp"]
+            assert sent_event["properties"]["index"] == i
+            assert sent_event["properties"]["capture_internal"] is True
+            assert sent_event["properties"]["$process_person_profile"] is False
+
+    @patch("posthog.api.capture.CAPTURE_INTERNAL_BATCH_MAX_BYTES", 300)
+    def test_capture_batch_internal_batch_endpoint_limits_batch_size(self):
+        spied_batches = self._install_batch_spy()
+
+        resp_futures = capture_batch_internal(
+            events=self._batch_test_events(6),
+            event_source="test_capture_batch_internal_batch_endpoint_limits_batch_size",
+            token="abc123",
+            use_batch_endpoint=True,
+        )
+
+        for future in resp_futures:
+            future.result()
+        assert len(spied_batches) > 1
+        assert [event["event"] for batch in spied_batches for event in batch["payload"]["batch"]] == [
+            f"test_event_{i}" for i in range(6)
+        ]
+        for spied_batch in spied_batches:
+            assert sum(len(json.dumps(event)) + 1 for event in spied_batch["payload"]["batch"]) <= 300
+
+    def test_capture_batch_internal_batch_endpoint_reports_results_per_event(self):
+        spied_batches = self._install_batch_spy()
+        test_events = self._batch_test_events(3)
+        del test_events[1]["distinct_id"]
+
+        resp_futures = capture_batch_internal(
+            events=test_events,
+            event_source="test_capture_batch_internal_batch_endpoint_reports_results_per_event",
+            token="abc123",
+            use_batch_endpoint=True,
+        )
+
+        assert resp_futures[0].result().status_code == 200
+        with self.assertRaises(CaptureInternalError) as e:
+            resp_futures[1].result()
+        assert "distinct ID is required" in str(e.exception)
+        assert resp_futures[2].result().status_code == 200
+        assert [event["event"] for event in spied_batches[0]["payload"]["batch"]] == ["test_event_0", "test_event_2"]
+
+    def test_capture_batch_internal_batch_endpoint_rejects_nan(self):
+        spied_batches = self._install_batch_spy()
+        test_events = self._batch_test_events(3)
+        test_events[1]["properties"]["value"] = float("nan")
+
+        resp_futures = capture_batch_internal(
+            events=test_events,
+            event_source="test_capture_batch_internal_batch_endpoint_rejects_nan",
+            token="abc123",
+            use_batch_endpoint=True,
+        )
+
+        assert resp_futures[0].result().status_code == 200
+        with self.assertRaises(ValueError):
+            resp_futures[1].result()
+        assert resp_futures[2].result().status_code == 200
+        assert [event["event"] for event in spied_batches[0]["payload"]["batch"]] == ["test_event_0", "test_event_2"]
+
+    def test_capture_batch_internal_batch_endpoint_request_failure(self):
+        self._install_batch_spy(error=ConnectionError("capture is down"))
+
+        resp_futures = capture_batch_internal(
+            events=self._batch_test_events(3),
+            event_source="test_capture_batch_internal_batch_endpoint_request_failure",
+            token="abc123",
+            use_batch_endpoint=True,
+        )
+
+        for future in resp_futures:
+            with self.assertRaises(ConnectionError):
+                future.result()
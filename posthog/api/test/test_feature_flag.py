@@ -27,6 +27,7 @@ from posthog.models.feature_flag import (
     get_feature_flags_for_team_in_cache,
 )
 from posthog.models.feature_flag.feature_flag import FeatureFlagHashKeyOverride
+from posthog.models.feature_flag.local_evaluation import RECENTLY_CHANGED_TTL, cache as local_evaluation_cache
 from posthog.models.group.util import create_group
 from posthog.models.organization import Organization
 from posthog.models.person import Person
@@ -4050,6 +4051,59 @@ class TestFeatureFlag(APIBaseTest, ClickhouseTestMixin):
                 {b"165192618": b"6"},
             )
 
+    @patch("posthog.api.feature_flag.settings.DECIDE_FEATURE_FLAG_QUOTA_CHECK", False)
+    def test_local_evaluation_is_cached_until_flags_change(self):
+        FeatureFlag.objects.all().delete()
+        flag = FeatureFlag.objects.create(
+            name="Beta feature",
+            key="beta-feature",
+            team=self.team,
+            filters={"groups": [{"properties": [], "rollout_percentage": 50}]},
+            created_by=self.user,
+        )
+
+        personal_api_key = generate_random_token_personal()
+        PersonalAPIKey.objects.create(label="X", user=self.user, secure_value=hash_key_value(personal_api_key))
+        self.client.logout()
+
+        def local_evaluation(query: str = "", **headers):
+            return self.client.get(
+                f"/api/feature_flag/local_evaluation?token={self.team.api_token}{query}",
+                HTTP_AUTHORIZATION=f"Bearer {personal_api_key}",
+                **headers,
+            )
+
+        response = local_evaluation()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+        self.assertEqual([flag["key"] for flag in response.json()["flags"]], ["beta-feature"])
+
+        # Served from cache, without loading flags or cohorts
+        with patch("posthog.api.feature_flag.FeatureFlag.objects.db_manager") as db_manager_mock:
+            response = local_evaluation()
+            not_modified_response = local_evaluation(HTTP_IF_NONE_MATCH=etag)
+            db_manager_mock.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(not_modified_response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified_response.content, b"")
+
+        # The send_cohorts variant is cached separately
+        self.assertEqual(local_evaluation("&send_cohorts", HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        flag.filters = {"groups": [{"properties": [], "rollout_percentage": 100}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            flag.save()
+
+        # Read replicas may still be behind right after a change, so the new payload is only cached briefly
+        with patch.object(local_evaluation_cache, "set_many", wraps=local_evaluation_cache.set_many) as set_many_mock:
+            response = local_evaluation(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json()["flags"][0]["filters"]["groups"][0]["rollout_percentage"], 100)
+        self.assertEqual(set_many_mock.call_args.args[1], RECENTLY_CHANGED_TTL)
+
     @patch("posthog.models.feature_flag.flag_analytics.CACHE_BUCKET_SIZE", 10)
     def test_local_evaluation_billing_analytics_for_regular_feature_flag_list(self):
         FeatureFlag.objects.all().delete()
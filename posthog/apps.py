@@ -62,6 +62,9 @@ class PostHogConfig(AppConfig):
         if not posthoganalytics.disabled and posthoganalytics.feature_flag_definitions() is None:
             posthoganalytics.load_feature_flags()
 
+        # Registers the signal receivers invalidating cached HogQL databases
+        import posthog.hogql.database.cache  # noqa: F401
+
         from posthog.async_migrations.setup import setup_async_migrations
 
         if settings.SKIP_ASYNC_MIGRATIONS_SETUP:
@@ -4,6 +4,7 @@ from posthog import settings
 from posthog.api.services.query import logger
 from posthog.clickhouse.client import sync_execute
 from posthog.clickhouse.client.connection import default_client
+from posthog.clickhouse.client.single_flight import cancel_single_flight_waiters
 from posthog.settings import CLICKHOUSE_CLUSTER
 
 
@@ -11,6 +12,8 @@ def cancel_query_on_cluster(team_id: int, client_query_id: str) -> None:
     initiator_host = None
 
     statsd.incr("clickhouse.query.cancellation.requested", tags={"team_id": team_id})
+    # The query may be waiting on an identical query instead of running in ClickHouse
+    cancel_single_flight_waiters(team_id, client_query_id)
     try:
         result = sync_execute(
             """
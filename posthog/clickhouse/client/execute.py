@@ -20,6 +20,7 @@ from posthog.clickhouse.client.connection import (
     ClickHouseUser,
 )
 from posthog.clickhouse.client.escape import substitute_params
+from posthog.clickhouse.client.single_flight import cancellation_key, get_single_flight, single_flight_key
 from posthog.clickhouse.query_tagging import get_query_tag_value, get_query_tags, QueryTags, AccessMethod, Feature
 from posthog.cloud_utils import is_cloud
 from posthog.errors import wrap_query_error, ch_error_type
@@ -42,6 +43,12 @@ QUERY_FINISHED_COUNTER = Counter(
     labelnames=["team_id", "access_method", "chargeable"],
 )
 
+QUERY_COALESCED_COUNTER = Counter(
+    "posthog_clickhouse_query_coalesced",
+    "Number of queries that shared the execution of an identical query, rather than being sent to ClickHouse.",
+    labelnames=["team_id", "access_method", "query_type"],
+)
+
 QUERY_ERROR_COUNTER = Counter(
     "clickhouse_query_failure",
     "Query execution failure signal is dispatched when a query fails.",
@@ -185,68 +192,109 @@ def sync_execute(
     # update tags if inside temporal (should not)
     update_query_tags_with_temporal_info()
 
-    while True:
-        settings = {
-            **core_settings,
-            "log_comment": tags.to_json(),
-            "query_id": query_id,
-        }
-        if workload == Workload.OFFLINE:
-            # disabling hedged requests for offline queries reduces the likelihood of these queries bleeding over into the
-            # online resource pool when the offline resource pool is under heavy load. this comes at the cost of higher and
-            # more variable latency and a higher likelihood of query failures - but offline workloads should be tolerant to
-            # these disruptions
-            settings["use_hedged_requests"] = "0"
-        start_time = perf_counter()
-        try:
-            QUERY_STARTED_COUNTER.labels(
-                team_id=str(team_id or ""),
-                access_method=tags.access_method or "other",
-                chargeable=str(tags.chargeable or "0"),
-            ).inc()
-            with sync_client or get_client_from_pool(workload, team_id, readonly, ch_user) as client:
-                result = client.execute(
-                    prepared_sql,
-                    params=prepared_args,
-                    settings=settings,
-                    with_column_types=with_column_types,
-                    query_id=query_id,
-                )
-                if "INSERT INTO" in prepared_sql and client.last_query.progress.written_rows > 0:
-                    result = client.last_query.progress.written_rows
-        except Exception as e:
-            exception_type = ch_error_type(e)
-            QUERY_ERROR_COUNTER.labels(
-                exception_type=exception_type,
-                query_type=query_type,
-                workload=workload.value if workload else "None",
-                chargeable=str(tags.chargeable or "0"),
-            ).inc()
-            err = wrap_query_error(e)
-            if isinstance(err, ClickHouseAtCapacity) and is_personal_api_key and workload == Workload.OFFLINE:
-                workload = Workload.ONLINE
-                tags.clickhouse_exception_type = exception_type
-                tags.workload = str(workload)
-                continue
-            raise err from e
-        finally:
-            execution_time = perf_counter() - start_time
-
-            QUERY_FINISHED_COUNTER.labels(
-                team_id=str(team_id or ""),
-                access_method=tags.access_method or "other",
-                chargeable=str(tags.chargeable or "0"),
-            ).inc()
-
-            if query_counter := getattr(thread_local_storage, "query_counter", None):
-                query_counter.total_query_time += execution_time
-
-            if app_settings.SHELL_PLUS_PRINT_SQL:
-                print("Execution time: %.6fs" % (execution_time,))  # noqa T201
-
-        break
-
-    return result
+    def run_query():
+        nonlocal workload
+
+        while True:
+            settings = {
+                **core_settings,
+                "log_comment": tags.to_json(),
+                "query_id": query_id,
+            }
+            if workload == Workload.OFFLINE:
+                # disabling hedged requests for offline queries reduces the likelihood of these queries bleeding over into
+                # the online resource pool when the offline resource pool is under heavy load. this comes at the cost of
+                # higher and more variable latency and a higher likelihood of query failures - but offline workloads should
+                # be tolerant to these disruptions
+                settings["use_hedged_requests"] = "0"
+            start_time = perf_counter()
+            try:
+                QUERY_STARTED_COUNTER.labels(
+                    team_id=str(team_id or ""),
+                    access_method=tags.access_method or "other",
+                    chargeable=str(tags.chargeable or "0"),
+                ).inc()
+                with sync_client or get_client_from_pool(workload, team_id, readonly, ch_user) as client:
+                    result = client.execute(
+                        prepared_sql,
+                        params=prepared_args,
+                        settings=settings,
+                        with_column_types=with_column_types,
+                        query_id=query_id,
+                    )
+                    if "INSERT INTO" in prepared_sql and client.last_query.progress.written_rows > 0:
+                        result = client.last_query.progress.written_rows
+            except Exception as e:
+                exception_type = ch_error_type(e)
+                QUERY_ERROR_COUNTER.labels(
+                    exception_type=exception_type,
+                    query_type=query_type,
+                    workload=workload.value if workload else "None",
+                    chargeable=str(tags.chargeable or "0"),
+                ).inc()
+                err = wrap_query_error(e)
+                if isinstance(err, ClickHouseAtCapacity) and is_personal_api_key and workload == Workload.OFFLINE:
+                    workload = Workload.ONLINE
+                    tags.clickhouse_exception_type = exception_type
+                    tags.workload = str(workload)
+                    continue
+                raise err from e
+            finally:
+                execution_time = perf_counter() - start_time
+
+                QUERY_FINISHED_COUNTER.labels(
+                    team_id=str(team_id or ""),
+                    access_method=tags.access_method or "other",
+                    chargeable=str(tags.chargeable or "0"),
+                ).inc()
+
+                if query_counter := getattr(thread_local_storage, "query_counter", None):
+                    query_counter.total_query_time += execution_time
+
+                if app_settings.SHELL_PLUS_PRINT_SQL:
+                    print("Execution time: %.6fs" % (execution_time,))  # noqa T201
+
+            break
+
+        return result
+
+    # API usage is billed from the `log_comment` of the queries in query_log, so billed and API queries always run
+    flight_key = (
+        single_flight_key(
+            team_id,
+            prepared_sql,
+            prepared_args,
+            settings=core_settings,
+            with_column_types=with_column_types,
+            workload=workload,
+            readonly=readonly,
+            ch_user=ch_user,
+        )
+        if app_settings.CLICKHOUSE_SINGLE_FLIGHT_ENABLED
+        and sync_client is None
+        and not tags.chargeable
+        and not is_personal_api_key
+        else None
+    )
+    if flight_key is None:
+        return run_query()
+
+    def record_coalesced():
+        # The query isn't in query_log for this caller, so record who it was run for here
+        QUERY_COALESCED_COUNTER.labels(
+            team_id=str(team_id or ""),
+            access_method=tags.access_method or "other",
+            query_type=query_type,
+        ).inc()
+        logger.info("Query shared the execution of an identical query", extra={"log_comment": tags.to_json()})
+
+    client_query_id = get_query_tag_value("client_query_id")
+    return get_single_flight().run(
+        flight_key,
+        run_query,
+        cancellation_key=cancellation_key(team_id, client_query_id) if team_id and client_query_id else None,
+        on_coalesced=record_coalesced,
+    )
 
 
 def query_with_columns(
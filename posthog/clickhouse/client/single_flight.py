@@ -0,0 +1,310 @@
+import hashlib
+import json
+import pickle
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any, Optional
+
+import redis as redis_lib
+import structlog
+from clickhouse_driver.errors import ServerException
+from django.conf import settings
+from prometheus_client import Counter
+
+from posthog import redis
+from posthog.errors import wrap_query_error
+
+logger = structlog.get_logger(__name__)
+
+SINGLE_FLIGHT_COUNTER = Counter(
+    "posthog_clickhouse_single_flight_total",
+    "ClickHouse queries eligible for single-flight, by whether they ran or shared the execution of an identical query.",
+    labelnames=["result"],
+)
+
+# QUERY_WAS_CANCELLED and QUERY_WAS_CANCELLED_BY_CLIENT
+CANCELLED_ERROR_CODES = (394, 735)
+# How long a result handed off through Redis is kept for the processes waiting on it
+RESULT_TTL_SECONDS = 30
+
+# The comment `_annotate_tagged_query` prefixes queries with, which differs between users running the same query
+_ANNOTATION_REGEX = re.compile(r"^/\*.*?\*/ ", re.DOTALL)
+_READ_QUERY_REGEX = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+# Deletes the lock only if it's still held by the caller
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Extends the lock only if it's still held by the caller
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def single_flight_key(team_id: Optional[int], sql: str, args: Any, **options: Any) -> Optional[str]:
+    """
+    Returns the key that identical executions of `sql` share, or None if the query can't be shared: queries that
+    aren't reads, or that aren't run for a team. `options` are the query settings and whatever else changes the result.
+    """
+    if team_id is None or args is not None:
+        return None
+    normalized_sql = _ANNOTATION_REGEX.sub("", sql, count=1)
+    if not _READ_QUERY_REGEX.match(normalized_sql):
+        return None
+    options_hash = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()
+    sql_hash = hashlib.sha256(normalized_sql.encode()).hexdigest()
+    return f"{team_id}:{sql_hash}:{options_hash}"
+
+
+def cancellation_key(team_id: int, client_query_id: str) -> str:
+    # The prefix of the query ids ClickHouse queries of `client_query_id` run with, see `validated_client_query_id`
+    return f"clickhouse_single_flight:cancelled:{team_id}_{client_query_id}"
+
+
+def cancel_single_flight_waiters(team_id: int, client_query_id: str) -> None:
+    """Makes callers waiting on an identical query for `client_query_id` stop waiting, in any process"""
+    if not settings.CLICKHOUSE_SINGLE_FLIGHT_ENABLED:
+        return
+    try:
+        redis.get_client().set(
+            cancellation_key(team_id, client_query_id), 1, ex=settings.CLICKHOUSE_SINGLE_FLIGHT_MAX_WAIT_SECONDS
+        )
+    except redis_lib.RedisError:
+        logger.exception("clickhouse_single_flight.cancel_failed", team_id=team_id, client_query_id=client_query_id)
+
+
+def is_cancellation(error: BaseException) -> bool:
+    return isinstance(error, ServerException) and error.code in CANCELLED_ERROR_CODES
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Shares one execution of a query between the callers running it at the same time.
+
+    The first caller for a key runs the query, and callers arriving while it runs wait for it and get a copy of its
+    result, or its error. With `across_processes`, callers in other processes wait too: the caller running the query
+    holds a lock in Redis, which it refreshes while the query runs, so that callers stop waiting on a process that died
+    soon after the lock expires. Waiting callers register under the lock's token, and only if any did is the result
+    handed off through Redis under that token, so that only callers that saw the query running get its result, and
+    nothing is served once it's finished.
+
+    Only the caller running the query has a query running in ClickHouse under its query id. Cancelling that query
+    cancels it for that caller only, and the callers waiting on it run the query again. Waiting callers are cancelled
+    through `cancel_single_flight_waiters`.
+    """
+
+    def __init__(
+        self,
+        *,
+        across_processes: bool = False,
+        lock_ttl: float = 10,
+        max_wait: float = 600,
+        max_result_bytes: int = 10 * 1024 * 1024,
+        poll_interval: float = 0.1,
+    ):
+        self.across_processes = across_processes
+        self.lock_ttl = lock_ttl
+        self.max_wait = max_wait
+        self.max_result_bytes = max_result_bytes
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+
+    def run(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        *,
+        cancellation_key: Optional[str] = None,
+        on_coalesced: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """Runs `fn`, or waits on the caller running it under `key`, calling `on_coalesced` if it didn't run `fn`"""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if is_leader:
+            return self._lead(key, call, fn, cancellation_key, on_coalesced)
+
+        while not call.done.wait(self.poll_interval):
+            self._raise_if_cancelled(cancellation_key)
+        if call.error is not None:
+            if is_cancellation(call.error):
+                # Cancelled for the caller running it, but not for this one
+                SINGLE_FLIGHT_COUNTER.labels(result="retried").inc()
+                return self.run(key, fn, cancellation_key=cancellation_key, on_coalesced=on_coalesced)
+            raise call.error
+        SINGLE_FLIGHT_COUNTER.labels(result="coalesced").inc()
+        assert call.result is not None
+        result = pickle.loads(call.result)
+        if on_coalesced is not None:
+            on_coalesced()
+        return result
+
+    def _lead(
+        self,
+        key: str,
+        call: _Call,
+        fn: Callable[[], Any],
+        cancellation_key: Optional[str],
+        on_coalesced: Optional[Callable[[], None]],
+    ) -> Any:
+        try:
+            result, data = self._run_once(key, fn, cancellation_key, on_coalesced)
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            call.error = e
+            call.done.set()
+            raise
+
+        with self._lock:
+            del self._calls[key]
+            waiters = call.waiters
+        if waiters:
+            # Each waiter gets its own copy, so that callers can modify their results
+            call.result = data if data is not None else pickle.dumps(result)
+        call.done.set()
+        return result
+
+    def _run_once(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        cancellation_key: Optional[str],
+        on_coalesced: Optional[Callable[[], None]],
+    ) -> tuple[Any, Optional[bytes]]:
+        """Runs `fn` unless another process is running it, returning its result, and the result pickled if it was"""
+        if not self.across_processes:
+            SINGLE_FLIGHT_COUNTER.labels(result="executed").inc()
+            return fn(), None
+
+        lock_key = f"clickhouse_single_flight:lock:{key}"
+        token = uuid.uuid4().hex
+        running_token: Optional[bytes] = None
+        registered_token: Optional[bytes] = None
+        deadline = time.monotonic() + self.max_wait
+        locked = False
+        try:
+            client = redis.get_client()
+            while True:
+                # The result is handed off before the lock is released, so look for it before taking the lock
+                if registered_token is not None:
+                    data = client.get(f"clickhouse_single_flight:result:{key}:{registered_token.decode()}")
+                    if data is not None:
+                        SINGLE_FLIGHT_COUNTER.labels(result="coalesced_across_processes").inc()
+                        result = pickle.loads(data)
+                        if on_coalesced is not None:
+                            on_coalesced()
+                        return result, data
+                if locked := bool(client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))):
+                    break
+                running_token = client.get(lock_key) or running_token
+                if running_token is not None and running_token != registered_token:
+                    # Let the process running the query know that its result is waited on
+                    waiters_key = f"clickhouse_single_flight:waiters:{key}:{running_token.decode()}"
+                    client.pipeline().incr(waiters_key).expire(waiters_key, int(self.max_wait)).execute()
+                    registered_token = running_token
+                if time.monotonic() > deadline:
+                    # Run the query rather than wait on it any longer
+                    break
+                time.sleep(self.poll_interval)
+                self._raise_if_cancelled(cancellation_key)
+        except redis_lib.RedisError:
+            logger.exception("clickhouse_single_flight.lock_failed")
+
+        SINGLE_FLIGHT_COUNTER.labels(result="executed").inc()
+        if not locked:
+            return fn(), None
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(client, lock_key, token, stop_heartbeat),
+            name="clickhouse_single_flight_heartbeat",
+            daemon=True,
+        )
+        heartbeat.start()
+        try:
+            result = fn()
+            data = None
+            try:
+                if client.exists(f"clickhouse_single_flight:waiters:{key}:{token}"):
+                    data = pickle.dumps(result)
+                    if len(data) <= self.max_result_bytes:
+                        client.set(f"clickhouse_single_flight:result:{key}:{token}", data, ex=RESULT_TTL_SECONDS)
+            except redis_lib.RedisError:
+                logger.exception("clickhouse_single_flight.hand_off_failed")
+            return result, data
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            try:
+                client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except redis_lib.RedisError:
+                logger.exception("clickhouse_single_flight.unlock_failed")
+
+    def _heartbeat(self, client: redis_lib.Redis, lock_key: str, token: str, stop: threading.Event) -> None:
+        """Keeps the lock from expiring until `stop` is set"""
+        while not stop.wait(self.lock_ttl / 3):
+            try:
+                if not client.eval(_REFRESH_SCRIPT, 1, lock_key, token, int(self.lock_ttl * 1000)):
+                    # The lock expired anyway, and may be held by another process by now
+                    return
+            except redis_lib.RedisError:
+                logger.exception("clickhouse_single_flight.refresh_failed")
+
+    def _raise_if_cancelled(self, cancellation_key: Optional[str]) -> None:
+        if cancellation_key is None:
+            return
+        try:
+            cancelled = redis.get_client().exists(cancellation_key)
+        except redis_lib.RedisError:
+            return
+        if cancelled:
+            SINGLE_FLIGHT_COUNTER.labels(result="cancelled").inc()
+            raise wrap_query_error(
+                ServerException(
+                    "Query was cancelled while waiting on an identical query", code=CANCELLED_ERROR_CODES[0]
+                )
+            )
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(
+                    across_processes=settings.CLICKHOUSE_SINGLE_FLIGHT_ACROSS_PROCESSES,
+                    lock_ttl=settings.CLICKHOUSE_SINGLE_FLIGHT_LOCK_TTL_SECONDS,
+                    max_wait=settings.CLICKHOUSE_SINGLE_FLIGHT_MAX_WAIT_SECONDS,
+                    max_result_bytes=settings.CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES,
+                )
+    return _single_flight
@@ -0,0 +1,218 @@
+import pickle
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from clickhouse_driver.errors import ServerException
+from django.test import override_settings
+
+from posthog import redis
+from posthog.clickhouse.client.execute import sync_execute
+from posthog.clickhouse.client.single_flight import (
+    SingleFlight,
+    cancel_single_flight_waiters,
+    cancellation_key,
+    single_flight_key,
+)
+from posthog.clickhouse.query_tagging import AccessMethod, tags_context
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        redis.get_client().flushdb()
+
+    def _run_concurrently(self, single_flight: SingleFlight, fn, callers: int, **kwargs) -> list:
+        """Runs `fn` through `single_flight` from `callers` threads, returning the result or error of each"""
+        outcomes: list = [None] * callers
+
+        def run(index: int):
+            try:
+                outcomes[index] = single_flight.run("key", fn, **kwargs)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def _blocking(self, single_flight: SingleFlight, waiters: int, results: list):
+        """Returns a function returning `results` in turn, which first blocks until `waiters` callers wait on it"""
+        calls = 0
+
+        def fn():
+            nonlocal calls
+            calls += 1
+            deadline = time.monotonic() + 5
+            while calls == 1 and time.monotonic() < deadline:
+                call = single_flight._calls.get("key")
+                if call is None or call.waiters >= waiters:
+                    break
+                time.sleep(0.005)
+            result = results[calls - 1]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return fn
+
+    def test_concurrent_callers_share_one_execution(self):
+        single_flight = SingleFlight(poll_interval=0.01)
+        fn = self._blocking(single_flight, waiters=3, results=[[(1, "a")], [(2, "b")]])
+
+        outcomes = self._run_concurrently(single_flight, fn, callers=4)
+
+        assert outcomes == [[(1, "a")]] * 4
+        # Each caller gets its own copy of the result
+        assert len({id(outcome) for outcome in outcomes}) == 4
+        assert single_flight._calls == {}
+
+        assert single_flight.run("key", lambda: "ran again") == "ran again"
+
+    def test_calls_on_coalesced_for_callers_that_share_an_execution(self):
+        single_flight = SingleFlight(poll_interval=0.01)
+        fn = self._blocking(single_flight, waiters=2, results=[[(1, "a")]])
+        coalesced: list[str] = []
+
+        self._run_concurrently(single_flight, fn, callers=3, on_coalesced=lambda: coalesced.append("key"))
+
+        assert coalesced == ["key", "key"]
+
+    def test_concurrent_callers_share_errors(self):
+        single_flight = SingleFlight(poll_interval=0.01)
+        fn = self._blocking(single_flight, waiters=2, results=[ValueError("Query failed")])
+
+        outcomes = self._run_concurrently(single_flight, fn, callers=3)
+
+        assert [str(outcome) for outcome in outcomes] == ["Query failed"] * 3
+
+    def test_waiters_run_the_query_again_when_it_is_cancelled(self):
+        single_flight = SingleFlight(poll_interval=0.01)
+        fn = self._blocking(
+            single_flight,
+            waiters=2,
+            results=[ServerException("Query was cancelled", code=394), "result", "result"],
+        )
+
+        outcomes = self._run_concurrently(single_flight, fn, callers=3)
+
+        assert sum(isinstance(outcome, ServerException) for outcome in outcomes) == 1
+        assert sorted(outcome for outcome in outcomes if not isinstance(outcome, ServerException)) == ["result"] * 2
+
+    @override_settings(CLICKHOUSE_SINGLE_FLIGHT_ENABLED=True)
+    def test_waiters_can_be_cancelled(self):
+        single_flight = SingleFlight(poll_interval=0.01)
+        started = threading.Event()
+        release = threading.Event()
+
+        def fn():
+            started.set()
+            release.wait(5)
+            return "result"
+
+        leader = threading.Thread(target=single_flight.run, args=("key", fn))
+        leader.start()
+        started.wait(5)
+
+        cancel_single_flight_waiters(1, "client-query-id")
+        with self.assertRaises(ServerException) as context:
+            single_flight.run("key", fn, cancellation_key=cancellation_key(1, "client-query-id"))
+        assert context.exception.code == 394
+
+        release.set()
+        leader.join(5)
+
+    def test_hands_results_off_across_processes(self):
+        single_flight = SingleFlight(across_processes=True, poll_interval=0.01)
+        client = redis.get_client()
+        # Another process is running the query
+        client.set("clickhouse_single_flight:lock:key", "other")
+
+        def finish_other_process():
+            deadline = time.monotonic() + 5
+            while not client.exists("clickhouse_single_flight:waiters:key:other") and time.monotonic() < deadline:
+                time.sleep(0.01)
+            client.set("clickhouse_single_flight:result:key:other", pickle.dumps([(1, "a")]))
+            client.delete("clickhouse_single_flight:lock:key")
+
+        coalesced: list[str] = []
+        threading.Thread(target=finish_other_process).start()
+        assert single_flight.run("key", lambda: [(2, "b")], on_coalesced=lambda: coalesced.append("key")) == [(1, "a")]
+        assert coalesced == ["key"]
+
+        # Finished queries aren't served to new callers
+        assert single_flight.run("key", lambda: [(2, "b")], on_coalesced=lambda: coalesced.append("key")) == [(2, "b")]
+        assert coalesced == ["key"]
+        assert client.get("clickhouse_single_flight:lock:key") is None
+
+    def test_hands_results_off_only_when_waited_on(self):
+        single_flight = SingleFlight(across_processes=True, poll_interval=0.01)
+        client = redis.get_client()
+
+        assert single_flight.run("key", lambda: [(1, "a")]) == [(1, "a")]
+        assert client.keys("clickhouse_single_flight:result:*") == []
+
+        def fn():
+            # Another process waits on the query
+            token = client.get("clickhouse_single_flight:lock:key").decode()
+            client.incr(f"clickhouse_single_flight:waiters:key:{token}")
+            return [(2, "b")]
+
+        assert single_flight.run("key", fn) == [(2, "b")]
+        (result_key,) = client.keys("clickhouse_single_flight:result:*")
+        assert pickle.loads(client.get(result_key)) == [(2, "b")]
+
+    def test_runs_the_query_when_another_process_fails_to(self):
+        single_flight = SingleFlight(across_processes=True, poll_interval=0.01)
+        client = redis.get_client()
+        client.set("clickhouse_single_flight:lock:key", "other")
+
+        def fail_other_process():
+            time.sleep(0.05)
+            client.delete("clickhouse_single_flight:lock:key")
+
+        threading.Thread(target=fail_other_process).start()
+        assert single_flight.run("key", lambda: [(2, "b")]) == [(2, "b")]
+
+    def test_refreshes_the_lock_while_the_query_runs(self):
+        single_flight = SingleFlight(across_processes=True, lock_ttl=0.3, poll_interval=0.01)
+        client = redis.get_client()
+
+        def fn():
+            time.sleep(0.6)
+            return client.get("clickhouse_single_flight:lock:key")
+
+        assert single_flight.run("key", fn) is not None
+        assert client.get("clickhouse_single_flight:lock:key") is None
+
+    def test_single_flight_key(self):
+        key = single_flight_key(1, "/* user_id:1 request:api_query */ SELECT 1", None, settings={"a": 1})
+        assert key is not None
+        assert key == single_flight_key(1, "/* user_id:2 request:api_insight */ SELECT 1", None, settings={"a": 1})
+        assert key != single_flight_key(2, "/* user_id:1 request:api_query */ SELECT 1", None, settings={"a": 1})
+        assert key != single_flight_key(1, "/* user_id:1 request:api_query */ SELECT 2", None, settings={"a": 1})
+        assert key != single_flight_key(1, "/* user_id:1 request:api_query */ SELECT 1", None, settings={"a": 2})
+
+        assert single_flight_key(None, "SELECT 1", None) is None
+        assert single_flight_key(1, "INSERT INTO events VALUES", [(1,)]) is None
+        assert single_flight_key(1, "/* user_id:1 celery:task */ ALTER TABLE events DELETE WHERE 1", None) is None
+
+    @override_settings(CLICKHOUSE_SINGLE_FLIGHT_ENABLED=True)
+    @patch("posthog.clickhouse.client.execute.get_single_flight")
+    @patch("posthog.clickhouse.client.execute.get_client_from_pool")
+    def test_billed_and_api_queries_always_run(self, mock_get_client_from_pool, mock_get_single_flight):
+        client = mock_get_client_from_pool.return_value.__enter__.return_value
+        client.execute.return_value = [(1,)]
+
+        with tags_context(chargeable=1):
+            assert sync_execute("SELECT 1", flush=False, team_id=1) == [(1,)]
+        with tags_context(access_method=AccessMethod.PERSONAL_API_KEY):
+            assert sync_execute("SELECT 1", flush=False, team_id=1) == [(1,)]
+        mock_get_single_flight.assert_not_called()
+        assert client.execute.call_count == 2
+
+        sync_execute("SELECT 1", flush=False, team_id=1)
+        mock_get_single_flight.return_value.run.assert_called_once()
@@ -0,0 +1,172 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from prometheus_client import Counter
+
+from posthog.hogql.database.database import Database, DatabaseView
+from posthog.models.group_type_mapping import GroupTypeMapping
+from posthog.models.signals import mutable_receiver
+from posthog.models.team.team import Team
+from posthog.models.team.team_revenue_analytics_config import TeamRevenueAnalyticsConfig
+from posthog.warehouse.models import (
+    DataWarehouseCredential,
+    DataWarehouseJoin,
+    DataWarehouseSavedQuery,
+    DataWarehouseTable,
+    ExternalDataSchema,
+    ExternalDataSource,
+)
+
+logger = structlog.get_logger(__name__)
+
+HOGQL_DATABASE_VERSION_TTL = 60 * 60 * 24
+
+HOGQL_DATABASE_CACHE_COUNTER = Counter(
+    "posthog_hogql_database_cache_total",
+    "Lookups against the in-process cache of HogQL database schemas.",
+    labelnames=["result"],
+)
+
+DatabaseCacheKey = tuple[int, str]
+
+
+class HogQLDatabaseCache:
+    """
+    Per-process LRU of built HogQL databases.
+    '(team_id, modifiers and team settings)' -> (version, inserted at, database)
+
+    Entries are tied to the team's schema version, which is kept in Redis and replaced whenever anything the database
+    is built from changes (warehouse tables, saved queries, joins, sources, group types, team settings), so every
+    process notices the change on its next lookup. The TTL bounds how stale an entry can get when a change bypasses
+    model signals (e.g. `QuerySet.update`).
+
+    `Database` tables are mutable and get modified in place by callers, so callers get a `DatabaseView` of the cached
+    database, which copies each table the first time the caller accesses it.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[DatabaseCacheKey, tuple[str, float, Database]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: DatabaseCacheKey, version: str) -> Optional[Database]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                HOGQL_DATABASE_CACHE_COUNTER.labels(result="miss").inc()
+                return None
+            if entry[0] != version or time.monotonic() - entry[1] > self.ttl_seconds:
+                HOGQL_DATABASE_CACHE_COUNTER.labels(result="stale").inc()
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        HOGQL_DATABASE_CACHE_COUNTER.labels(result="hit").inc()
+        return DatabaseView.of(entry[2])
+
+    def set(self, key: DatabaseCacheKey, version: str, database: Database) -> Database:
+        """Caches `database`, which mustn't be modified afterwards, returning a view of it for the caller to use"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (version, time.monotonic(), database)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return DatabaseView.of(database)
+
+    def invalidate_team(self, team_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == team_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_hogql_database_cache: Optional[HogQLDatabaseCache] = None
+_hogql_database_cache_lock = threading.Lock()
+
+
+def get_hogql_database_cache() -> Optional[HogQLDatabaseCache]:
+    """Returns this process's database cache, or None if it's disabled."""
+    global _hogql_database_cache
+
+    if settings.HOGQL_DATABASE_CACHE_MAX_ENTRIES <= 0:
+        return None
+    if _hogql_database_cache is None:
+        with _hogql_database_cache_lock:
+            if _hogql_database_cache is None:
+                _hogql_database_cache = HogQLDatabaseCache(
+                    max_entries=settings.HOGQL_DATABASE_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.HOGQL_DATABASE_CACHE_TTL_SECONDS,
+                )
+    return _hogql_database_cache
+
+
+def _version_cache_key(team_id: int) -> str:
+    return f"hogql_database_version:{team_id}"
+
+
+def get_hogql_database_version(team_id: int) -> Optional[str]:
+    """
+    Returns the current schema version of the team, or None if it can't be determined, in which case the database
+    shouldn't be cached.
+    """
+    key = _version_cache_key(team_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            # A fresh version can't match any cached entry, so losing the key only costs a rebuild
+            cache.add(key, uuid.uuid4().hex, HOGQL_DATABASE_VERSION_TTL)
+            version = cache.get(key)
+        return version
+    except Exception:
+        logger.exception("Redis is unavailable")
+        return None
+
+
+def invalidate_hogql_database(team_ids: list[int]) -> None:
+    if _hogql_database_cache is not None:
+        for team_id in team_ids:
+            _hogql_database_cache.invalidate_team(team_id)
+    try:
+        cache.delete_many([_version_cache_key(team_id) for team_id in team_ids])
+    except Exception:
+        logger.exception("Redis is unavailable")
+
+
+def _invalidate_hogql_database_for_change(team_ids: list[int]) -> None:
+    invalidate_hogql_database(team_ids)
+    # Invalidate again once the change is visible to other connections, so a database built concurrently from the
+    # old state can't be cached under the new version
+    transaction.on_commit(lambda: invalidate_hogql_database(team_ids))
+
+
+@mutable_receiver([post_save, post_delete], sender=DataWarehouseTable)
+@mutable_receiver([post_save, post_delete], sender=DataWarehouseSavedQuery)
+@mutable_receiver([post_save, post_delete], sender=DataWarehouseJoin)
+@mutable_receiver([post_save, post_delete], sender=DataWarehouseCredential)
+@mutable_receiver([post_save, post_delete], sender=ExternalDataSource)
+@mutable_receiver([post_save, post_delete], sender=ExternalDataSchema)
+@mutable_receiver([post_save, post_delete], sender=TeamRevenueAnalyticsConfig)
+def invalidate_hogql_database_on_team_model_change(sender, instance, **kwargs):
+    _invalidate_hogql_database_for_change([instance.team_id])
+
+
+@mutable_receiver([post_save, post_delete], sender=Team)
+def invalidate_hogql_database_on_team_change(sender, instance: Team, **kwargs):
+    _invalidate_hogql_database_for_change([instance.pk])
+
+
+@mutable_receiver([post_save, post_delete], sender=GroupTypeMapping)
+def invalidate_hogql_database_on_group_type_change(sender, instance: GroupTypeMapping, **kwargs):
+    team_ids = list(Team.objects.filter(project_id=instance.project_id).values_list("id", flat=True))
+    _invalidate_hogql_database_for_change(team_ids)
@@ -1,3 +1,4 @@
+import copy
 import dataclasses
 from collections.abc import Callable
 from typing import (
@@ -327,6 +328,49 @@ class Database(BaseModel):
             self._view_table_names.append(f_name)
 
 
+class DatabaseView(Database):
+    """
+    A database sharing the tables of another one, which copies each table the first time it's accessed, so that
+    changes to it don't leak into the other database. Queries only touch a few of a team's tables, so most are never
+    copied.
+    """
+
+    @classmethod
+    def of(cls, database: Database) -> "DatabaseView":
+        view = cls.__new__(cls)
+        private = {
+            name: list(value) if isinstance(value, list) else value
+            for name, value in (database.__pydantic_private__ or {}).items()
+        }
+        # Tables are left out of the view's fields, so that `__getattr__` copies them on first access
+        private["_shared_tables"] = {
+            **private.get("_shared_tables", {}),
+            **database.__dict__,
+            **(database.__pydantic_extra__ or {}),
+        }
+        object.__setattr__(view, "__dict__", {})
+        object.__setattr__(view, "__pydantic_extra__", {})
+        object.__setattr__(view, "__pydantic_fields_set__", set(database.__pydantic_fields_set__))
+        object.__setattr__(view, "__pydantic_private__", private)
+        return view
+
+    def __getattr__(self, name: str) -> Any:
+        shared_tables = self._get_shared_tables()
+        if name in shared_tables:
+            table = copy.deepcopy(shared_tables.pop(name))
+            super().__setattr__(name, table)
+            return table
+        return super().__getattr__(name)  # type: ignore[misc]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self._get_shared_tables().pop(name, None)
+        super().__setattr__(name, value)
+
+    def _get_shared_tables(self) -> dict[str, Any]:
+        # Read directly, as private attributes are looked up through `__getattr__`
+        return cast(dict[str, Any], self.__pydantic_private__)["_shared_tables"]
+
+
 def _use_person_properties_from_events(database: Database) -> None:
     database.events.fields["person"] = FieldTraverser(chain=["poe"])
 
@@ -414,13 +458,9 @@ def create_hogql_database(
     modifiers: Optional[HogQLQueryModifiers] = None,
     timings: Optional[HogQLTimings] = None,
 ) -> Database:
-    from posthog.hogql.database.s3_table import S3Table
+    from posthog.hogql.database.cache import get_hogql_database_cache, get_hogql_database_version
     from posthog.hogql.query import create_default_modifiers_for_team
     from posthog.models import Team
-    from posthog.warehouse.models import DataWarehouseJoin, DataWarehouseSavedQuery
-    from products.revenue_analytics.backend.views.revenue_analytics_base_view import (
-        RevenueAnalyticsBaseView,
-    )
 
     if timings is None:
         timings = HogQLTimings()
@@ -440,6 +480,39 @@ def create_hogql_database(
 
     with timings.measure("modifiers"):
         modifiers = create_default_modifiers_for_team(team, modifiers)
+
+    database_cache = get_hogql_database_cache()
+    database_cache_key: Optional[tuple[int, str]] = None
+    database_version: Optional[str] = None
+    if database_cache is not None:
+        with timings.measure("database_cache"):
+            database_cache_key = (
+                team.pk,
+                f"{team.timezone}:{team.week_start_day}:{modifiers.model_dump_json(exclude_none=True)}",
+            )
+            database_version = get_hogql_database_version(team.pk)
+            if database_version is not None:
+                cached_database = database_cache.get(database_cache_key, database_version)
+                if cached_database is not None:
+                    return cached_database
+
+    database = _create_hogql_database(team, modifiers, timings)
+
+    if database_cache is not None and database_cache_key is not None and database_version is not None:
+        with timings.measure("database_cache_set"):
+            database = database_cache.set(database_cache_key, database_version, database)
+
+    return database
+
+
+def _create_hogql_database(team: "Team", modifiers: HogQLQueryModifiers, timings: HogQLTimings) -> Database:
+    from posthog.hogql.database.s3_table import S3Table
+    from posthog.warehouse.models import DataWarehouseJoin, DataWarehouseSavedQuery
+    from products.revenue_analytics.backend.views.revenue_analytics_base_view import (
+        RevenueAnalyticsBaseView,
+    )
+
+    with timings.measure("modifiers"):
         database = Database(timezone=team.timezone, week_start_day=team.week_start_day)
         poe = cast(VirtualTable, database.events.fields["poe"])
 
@@ -780,13 +853,13 @@ def create_hogql_database(
                         for chain in person_field.chain:
                             if isinstance(table_or_field, ast.LazyJoin):
                                 table_or_field = table_or_field.resolve_table(
-                                    HogQLContext(team_id=team_id, database=database)
+                                    HogQLContext(team_id=team.pk, database=database)
                                 )
                                 if table_or_field.has_field(chain):
                                     table_or_field = table_or_field.get_field(chain)
                                     if isinstance(table_or_field, ast.LazyJoin):
                                         table_or_field = table_or_field.resolve_table(
-                                            HogQLContext(team_id=team_id, database=database)
+                                            HogQLContext(team_id=team.pk, database=database)
                                         )
                             elif isinstance(table_or_field, ast.Table):
                                 table_or_field = table_or_field.get_field(chain)
@@ -7,7 +7,8 @@ from django.test import override_settings
 from parameterized import parameterized
 
 from posthog.hogql.constants import MAX_SELECT_RETURNED_ROWS
-from posthog.hogql.database.database import create_hogql_database, serialize_database
+from posthog.hogql.database.cache import get_hogql_database_cache
+from posthog.hogql.database.database import DatabaseView, create_hogql_database, serialize_database
 from posthog.hogql.database.models import (
     FieldTraverser,
     LazyJoin,
@@ -1018,3 +1019,92 @@ class TestDatabase(BaseTest, QueryMatchingTest):
         )
 
         print_ast(parse_select("SELECT events.distinct_id FROM subscriptions"), context, dialect="clickhouse")
+
+    @override_settings(HOGQL_DATABASE_CACHE_MAX_ENTRIES=10)
+    def test_create_hogql_database_is_cached_per_team_and_modifiers(self):
+        get_hogql_database_cache().clear()  # type: ignore
+
+        database = create_hogql_database(team=self.team)
+        with self.assertNumQueries(0):
+            cached_database = create_hogql_database(team=self.team)
+
+        assert cached_database is not database
+        assert cached_database.get_all_tables() == database.get_all_tables()
+
+        # Callers get their own copy, so changes to it don't leak into the cache
+        cached_database.events.fields["leaked"] = StringDatabaseField(name="leaked")
+        database.persons.fields["leaked"] = StringDatabaseField(name="leaked")
+        cached_database.add_views(leaked_view=cached_database.get_table("events"))
+        uncached_database = create_hogql_database(team=self.team)
+        assert "leaked" not in uncached_database.events.fields
+        assert "leaked" not in uncached_database.persons.fields
+        assert "leaked_view" not in uncached_database.get_all_tables()
+        assert not uncached_database.has_table("leaked_view")
+        assert "leaked" in cached_database.get_table("events").fields
+
+        poe_database = create_hogql_database(
+            team=self.team,
+            modifiers=HogQLQueryModifiers(
+                personsOnEventsMode=PersonsOnEventsMode.PERSON_ID_NO_OVERRIDE_PROPERTIES_ON_EVENTS
+            ),
+        )
+        assert isinstance(poe_database.events.fields["person_id"], StringDatabaseField)
+        assert not isinstance(create_hogql_database(team=self.team).events.fields["person_id"], StringDatabaseField)
+
+    def test_database_view_copies_tables_it_accesses(self):
+        database = create_hogql_database(team=self.team)
+        view = DatabaseView.of(database)
+        nested_view = DatabaseView.of(view)
+
+        view.events.fields["changed"] = StringDatabaseField(name="changed")
+        nested_view.persons.fields["changed"] = StringDatabaseField(name="changed")
+
+        assert view.events is not database.events
+        assert "changed" in view.events.fields
+        assert "changed" not in database.events.fields
+        assert "changed" not in nested_view.events.fields
+        assert "changed" not in view.persons.fields
+        assert "changed" not in database.persons.fields
+        assert nested_view.get_all_tables() == database.get_all_tables()
+
+    @override_settings(HOGQL_DATABASE_CACHE_MAX_ENTRIES=10)
+    def test_create_hogql_database_cache_is_invalidated_by_warehouse_changes(self):
+        get_hogql_database_cache().clear()  # type: ignore
+
+        assert "table_1" not in create_hogql_database(team=self.team).get_all_tables()
+
+        credential = DataWarehouseCredential.objects.create(access_key="key", access_secret="secret", team=self.team)
+        table = DataWarehouseTable.objects.create(
+            name="table_1",
+            format="Parquet",
+            team=self.team,
+            credential=credential,
+            url_pattern="https://bucket.s3/data/*",
+            columns={"id": {"hogql": "StringDatabaseField", "clickhouse": "Nullable(String)", "schema_valid": True}},
+        )
+        assert "table_1" in create_hogql_database(team=self.team).get_all_tables()
+
+        DataWarehouseSavedQuery.objects.create(
+            team=self.team,
+            name="saved_query",
+            query={"query": "SELECT 1 AS id", "kind": "HogQLQuery"},
+            columns={"id": "Int64"},
+        )
+        assert "saved_query" in create_hogql_database(team=self.team).get_all_tables()
+
+        DataWarehouseJoin.objects.create(
+            team=self.team,
+            source_table_name="events",
+            source_table_key="distinct_id",
+            joining_table_name="table_1",
+            joining_table_key="id",
+            field_name="table_1",
+        )
+        assert "table_1" in create_hogql_database(team=self.team).events.fields
+
+        table.soft_delete()
+        assert "table_1" not in create_hogql_database(team=self.team).get_all_tables()
+
+        self.team.timezone = "Europe/Berlin"
+        self.team.save()
+        assert create_hogql_database(team=self.team).get_timezone() == "Europe/Berlin"
@@ -1,9 +1,11 @@
-from typing import Literal, Optional, cast
+import threading
+from collections import OrderedDict
+from typing import Any, Literal, Optional, cast
 from collections.abc import Callable
 
 from antlr4 import CommonTokenStream, InputStream, ParseTreeVisitor, ParserRuleContext
 from antlr4.error.ErrorListener import ErrorListener
-from prometheus_client import Histogram
+from prometheus_client import Counter, Histogram
 
 from posthog.hogql import ast
 from posthog.hogql.ast import SelectSetNode
@@ -15,6 +17,7 @@ from posthog.hogql.grammar.HogQLParser import HogQLParser
 from posthog.hogql.parse_string import parse_string_literal_text, parse_string_literal_ctx, parse_string_text_ctx
 from posthog.hogql.placeholders import replace_placeholders
 from posthog.hogql.timings import HogQLTimings
+from posthog.hogql.visitor import clone_expr
 from hogql_parser import (
     parse_expr as _parse_expr_cpp,
     parse_order_expr as _parse_order_expr_cpp,
@@ -68,6 +71,80 @@ RULE_TO_HISTOGRAM: dict[Literal["expr", "order_expr", "select", "full_template_s
     for rule in ("expr", "order_expr", "select", "full_template_string")
 }
 
+RULE_TO_CACHE_COUNTER: dict[Literal["expr", "order_expr", "select", "full_template_string"], Counter] = {
+    cast(Literal["expr", "order_expr", "select", "full_template_string"], rule): Counter(
+        f"parse_{rule}_cache_total",
+        f"Lookups of {rule} expressions in the parse cache",
+        labelnames=["backend", "result"],
+    )
+    for rule in ("expr", "order_expr", "select", "full_template_string")
+}
+
+# Query runners parse the same templates over and over, so we keep their ASTs around. Longer strings are most likely
+# one-off user queries, which aren't worth keeping.
+PARSE_CACHE_MAX_ENTRIES = 2048
+PARSE_CACHE_MAX_SOURCE_LENGTH = 10_000
+
+
+class ParseCache:
+    """
+    LRU of parsed ASTs.
+    '(rule, backend, source, *args)' -> AST
+
+    Cached ASTs must never be handed out as they are, as callers mutate the nodes they get back.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            node = self._entries.get(key)
+            if node is not None:
+                self._entries.move_to_end(key)
+            return node
+
+    def set(self, key: tuple, node: Any) -> None:
+        with self._lock:
+            self._entries[key] = node
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+parse_cache = ParseCache(max_entries=PARSE_CACHE_MAX_ENTRIES)
+
+
+def _parse_cached(
+    rule: Literal["expr", "order_expr", "select", "full_template_string"],
+    backend: Literal["python", "cpp"],
+    string: str,
+    *args: Any,
+    clone: bool = True,
+) -> Any:
+    """
+    Parse `string` with the given rule, reusing the AST of a previous parse of the same string.
+
+    Set `clone` to False only if the caller copies the returned AST itself before it's mutated, e.g. by replacing
+    placeholders in it.
+    """
+    if len(string) > PARSE_CACHE_MAX_SOURCE_LENGTH:
+        return RULE_TO_PARSE_FUNCTION[backend][rule](string, *args)
+
+    key = (rule, backend, string, *args)
+    node = parse_cache.get(key)
+    RULE_TO_CACHE_COUNTER[rule].labels(backend=backend, result="miss" if node is None else "hit").inc()
+    if node is None:
+        node = RULE_TO_PARSE_FUNCTION[backend][rule](string, *args)
+        parse_cache.set(key, node)
+    return clone_expr(node) if clone else node
+
 
 def parse_string_template(
     string: str,
@@ -81,7 +158,7 @@ def parse_string_template(
         timings = HogQLTimings()
     with timings.measure(f"parse_full_template_string_{backend}"):
         with RULE_TO_HISTOGRAM["full_template_string"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["full_template_string"]("F'" + string)
+            node = _parse_cached("full_template_string", backend, "F'" + string, clone=not placeholders)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 node = replace_placeholders(node, placeholders)
@@ -102,7 +179,7 @@ def parse_expr(
         timings = HogQLTimings()
     with timings.measure(f"parse_expr_{backend}"):
         with RULE_TO_HISTOGRAM["expr"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["expr"](expr, start)
+            node = _parse_cached("expr", backend, expr, start, clone=not placeholders)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 node = replace_placeholders(node, placeholders)
@@ -120,7 +197,7 @@ def parse_order_expr(
         timings = HogQLTimings()
     with timings.measure(f"parse_order_expr_{backend}"):
         with RULE_TO_HISTOGRAM["order_expr"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["order_expr"](order_expr)
+            node = _parse_cached("order_expr", backend, order_expr, clone=not placeholders)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 node = replace_placeholders(node, placeholders)
@@ -138,7 +215,7 @@ def parse_select(
         timings = HogQLTimings()
     with timings.measure(f"parse_select_{backend}"):
         with RULE_TO_HISTOGRAM["select"].labels(backend=backend).time():
-            node = RULE_TO_PARSE_FUNCTION[backend]["select"](statement)
+            node = _parse_cached("select", backend, statement, clone=not placeholders)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 node = replace_placeholders(node, placeholders)
@@ -28,7 +28,7 @@ from posthog.hogql.ast import (
 from posthog.hogql.parser import parse_program
 from posthog.hogql import ast
 from posthog.hogql.errors import ExposedHogQLError, SyntaxError
-from posthog.hogql.parser import parse_expr, parse_order_expr, parse_select, parse_string_template
+from posthog.hogql.parser import parse_cache, parse_expr, parse_order_expr, parse_select, parse_string_template
 from posthog.hogql.visitor import clear_locations
 from posthog.test.base import BaseTest, MemoryLeakTestMixin
 
@@ -2914,4 +2914,73 @@ def parser_test_factory(backend: Literal["python", "cpp"]):
             )
             self.assertEqual(program, expected)
 
+        def test_parse_cache_returns_copies(self):
+            parse_cache.clear()
+            query = "SELECT event, count() FROM events WHERE timestamp > now() GROUP BY event"
+
+            first = parse_select(query, backend=backend)
+            second = parse_select(query, backend=backend)
+            self.assertEqual(first, second)
+            self.assertIsNot(first, second)
+
+            # Mutating a parsed query must not affect later parses of the same query
+            assert isinstance(first, ast.SelectQuery)
+            first.select.append(ast.Field(chain=["properties"]))
+            first.where = None
+            self.assertEqual(parse_select(query, backend=backend), second)
+
+        def test_parse_cache_with_placeholders(self):
+            parse_cache.clear()
+            template = "event = {event} and {condition}"
+
+            first = self._expr(template, {"event": ast.Constant(value="$pageview"), "condition": ast.Constant(value=1)})
+            second = self._expr(
+                template, {"event": ast.Constant(value="$pageleave"), "condition": ast.Constant(value=2)}
+            )
+            self.assertEqual(
+                first,
+                ast.And(
+                    exprs=[
+                        ast.CompareOperation(
+                            op=ast.CompareOperationOp.Eq,
+                            left=ast.Field(chain=["event"]),
+                            right=ast.Constant(value="$pageview"),
+                        ),
+                        ast.Constant(value=1),
+                    ]
+                ),
+            )
+            self.assertEqual(
+                second,
+                ast.And(
+                    exprs=[
+                        ast.CompareOperation(
+                            op=ast.CompareOperationOp.Eq,
+                            left=ast.Field(chain=["event"]),
+                            right=ast.Constant(value="$pageleave"),
+                        ),
+                        ast.Constant(value=2),
+                    ]
+                ),
+            )
+            self.assertEqual(
+                self._expr(template),
+                ast.And(
+                    exprs=[
+                        ast.CompareOperation(
+                            op=ast.CompareOperationOp.Eq,
+                            left=ast.Field(chain=["event"]),
+                            right=ast.Placeholder(expr=ast.Field(chain=["event"])),
+                        ),
+                        ast.Placeholder(expr=ast.Field(chain=["condition"])),
+                    ]
+                ),
+            )
+
+        def test_parse_cache_keeps_errors_uncached(self):
+            parse_cache.clear()
+            for _ in range(2):
+                with self.assertRaises(SyntaxError):
+                    parse_select("SELECT FROM WHERE", backend=backend)
+
     return TestParser
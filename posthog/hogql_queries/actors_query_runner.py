@@ -13,7 +13,7 @@ from posthog.hogql.resolver_utils import extract_select_queries
 from posthog.hogql_queries.actor_strategies import ActorStrategy, PersonStrategy, GroupStrategy
 from posthog.hogql_queries.insights.funnels.funnels_query_runner import FunnelsQueryRunner
 from posthog.hogql_queries.insights.insight_actors_query_runner import InsightActorsQueryRunner
-from posthog.hogql_queries.insights.paginators import HogQLHasMorePaginator
+from posthog.hogql_queries.insights.paginators import HogQLCursorPaginator
 from posthog.hogql_queries.query_runner import QueryRunner, get_query_runner
 from posthog.schema import (
     ActorsQuery,
@@ -33,15 +33,20 @@ class ActorsQueryRunner(QueryRunner):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.paginator = HogQLHasMorePaginator.from_limit_context(
-            limit_context=self.limit_context, limit=self.query.limit, offset=self.query.offset
-        )
         self.source_query_runner: Optional[QueryRunner] = None
 
         if self.query.source:
             self.source_query_runner = get_query_runner(self.query.source, self.team, self.timings, self.limit_context)
             self.modifiers = self.source_query_runner.modifiers
 
+        self.paginator = HogQLCursorPaginator.from_limit_context(
+            limit_context=self.limit_context,
+            limit=self.query.limit,
+            offset=self.query.offset,
+            cursor=self.query.cursor,
+            sortable_fields=("created_at",),
+            unique_field=GroupStrategy.origin_id if self.group_type_index is not None else PersonStrategy.origin_id,
+        )
         self.strategy = self.determine_strategy()
         self.calculating = False
 
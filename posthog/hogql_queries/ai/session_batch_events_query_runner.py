@@ -1,7 +1,7 @@
 from typing import Any
 
-from posthog.hogql_queries.events_query_runner import EventsQueryRunner
-from posthog.hogql_queries.insights.paginators import HogQLHasMorePaginator
+from posthog.hogql_queries.events_query_runner import EVENTS_SORTABLE_FIELDS, EventsQueryRunner
+from posthog.hogql_queries.insights.paginators import HogQLCursorPaginator
 from posthog.hogql_queries.query_runner import QueryRunner
 from posthog.schema import (
     CachedSessionBatchEventsQueryResponse,
@@ -32,9 +32,14 @@ class SessionBatchEventsQueryRunner(QueryRunner):
         super().__init__(*args, **kwargs)
         # Create an EventsQueryRunner for delegation
         self._events_runner = self._create_events_runner()
-        # Override the paginator to use our query's limit and offset
-        self.paginator = HogQLHasMorePaginator.from_limit_context(
-            limit_context=self.limit_context, limit=self.query.limit, offset=self.query.offset
+        # Override the paginator to use our query's limit, offset and cursor
+        self.paginator = HogQLCursorPaginator.from_limit_context(
+            limit_context=self.limit_context,
+            limit=self.query.limit,
+            offset=self.query.offset,
+            cursor=self.query.cursor,
+            sortable_fields=EVENTS_SORTABLE_FIELDS,
+            unique_field="uuid",
         )
 
     def _create_events_runner(self) -> EventsQueryRunner:
@@ -53,6 +58,7 @@ class SessionBatchEventsQueryRunner(QueryRunner):
             orderBy=self.query.orderBy,
             limit=self.query.limit,
             offset=self.query.offset,
+            cursor=self.query.cursor,
             after=self.query.after,
             before=self.query.before,
             event=self.query.event,
@@ -1,6 +1,7 @@
 from datetime import timedelta
 from functools import cached_property
-from typing import Optional, cast
+from collections.abc import Callable
+from typing import Any, Optional, cast
 import re
 
 from django.db.models import Prefetch
@@ -14,7 +15,7 @@ from posthog.hogql.ast import Alias
 from posthog.hogql.parser import parse_expr, parse_order_expr, parse_select
 from posthog.hogql.property import action_to_expr, has_aggregation, property_to_expr, map_virtual_properties
 from posthog.hogql_queries.insights.insight_actors_query_runner import InsightActorsQueryRunner
-from posthog.hogql_queries.insights.paginators import HogQLHasMorePaginator
+from posthog.hogql_queries.insights.paginators import HogQLCursorPaginator
 from posthog.hogql_queries.query_runner import QueryRunner, get_query_runner
 from posthog.models import Action, Person
 from posthog.models.element import chain_to_elements
@@ -36,6 +37,9 @@ SELECT_STAR_FROM_EVENTS_FIELDS = [
     "created_at",
 ]
 
+# Event fields that are never null, so that pages of events ordered by them can be seeked with a cursor
+EVENTS_SORTABLE_FIELDS = ("timestamp", "event", "distinct_id", "created_at")
+
 
 class EventsQueryRunner(QueryRunner):
     query: EventsQuery
@@ -44,8 +48,13 @@ class EventsQueryRunner(QueryRunner):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.paginator = HogQLHasMorePaginator.from_limit_context(
-            limit_context=self.limit_context, limit=self.query.limit, offset=self.query.offset
+        self.paginator = HogQLCursorPaginator.from_limit_context(
+            limit_context=self.limit_context,
+            limit=self.query.limit,
+            offset=self.query.offset,
+            cursor=self.query.cursor,
+            sortable_fields=EVENTS_SORTABLE_FIELDS,
+            unique_field="uuid",
         )
 
     @cached_property
@@ -286,71 +295,7 @@ class EventsQueryRunner(QueryRunner):
             limit_context=self.limit_context,
         )
 
-        # Convert star field from tuple to dict in each result
-        if "*" in self.select_input_raw():
-            with self.timings.measure("expand_asterisk"):
-                star_idx = self.select_input_raw().index("*")
-                for index, result in enumerate(self.paginator.results):
-                    self.paginator.results[index] = list(result)
-                    select = result[star_idx]
-                    new_result = dict(zip(SELECT_STAR_FROM_EVENTS_FIELDS, select))
-                    new_result["properties"] = orjson.loads(new_result["properties"])
-                    if new_result["elements_chain"]:
-                        new_result["elements"] = ElementSerializer(
-                            chain_to_elements(new_result["elements_chain"]), many=True
-                        ).data
-                    self.paginator.results[index][star_idx] = new_result
-
-        person_indices: list[int] = []
-        for column_index, col in enumerate(self.select_input_raw()):
-            if col.split("--")[0].strip() == "person":
-                person_indices.append(column_index)
-            # convert tuple that gets returned into a dict
-            if col.split("--")[0].strip() == "person_display_name":
-                for index, result in enumerate(self.paginator.results):
-                    row = list(self.paginator.results[index])
-                    row[column_index] = {
-                        "display_name": result[column_index][0],
-                        "id": str(result[column_index][1]),
-                    }
-                    self.paginator.results[index] = row
-
-        # TODO: get rid of this logic once we don't use `person` columns anywhere
-        if len(person_indices) > 0 and len(self.paginator.results) > 0:
-            with self.timings.measure("person_column_extra_query"):
-                # Make a query into postgres to fetch person
-                person_idx = person_indices[0]
-                distinct_ids = list({event[person_idx] for event in self.paginator.results})
-
-                distinct_to_person: dict[str, Person] = {}
-                # Process distinct_ids in batches to avoid overwhelming PostgreSQL
-                batch_size = 1000
-                for i in range(0, len(distinct_ids), batch_size):
-                    batch_distinct_ids = distinct_ids[i : i + batch_size]
-                    persons = get_persons_by_distinct_ids(self.team.pk, batch_distinct_ids)
-                    persons = persons.prefetch_related(Prefetch("persondistinctid_set", to_attr="distinct_ids_cache"))
-                    for person in persons.iterator(chunk_size=1000):
-                        if person:
-                            for person_distinct_id in person.distinct_ids:
-                                distinct_to_person[person_distinct_id] = person
-
-                # Loop over all columns in case there is more than one "person" column
-                for column_index in person_indices:
-                    for index, result in enumerate(self.paginator.results):
-                        distinct_id: str = result[column_index]
-                        self.paginator.results[index] = list(result)
-                        if distinct_to_person.get(distinct_id):
-                            person = distinct_to_person[distinct_id]
-                            self.paginator.results[index][column_index] = {
-                                "uuid": person.uuid,
-                                "created_at": person.created_at,
-                                "properties": person.properties or {},
-                                "distinct_id": distinct_id,
-                            }
-                        else:
-                            self.paginator.results[index][column_index] = {
-                                "distinct_id": distinct_id,
-                            }
+        self.paginator.results = self._post_process(self.paginator.results)
 
         return EventsQueryResponse(
             results=self.paginator.results,
@@ -362,6 +307,86 @@ class EventsQueryRunner(QueryRunner):
             **self.paginator.response_params(),
         )
 
+    def _post_process(self, results: list) -> list:
+        """
+        Expands the asterisk, person and person display name columns of `results`, one column at a time, and builds
+        each row once at the end.
+        """
+        select_input = self.select_input_raw()
+        transforms: list[tuple[int, Callable[[Any], Any]]] = []
+        if "*" in select_input:
+            transforms.append((select_input.index("*"), self._expand_asterisk()))
+        person_indices: list[int] = []
+        for column_index, col in enumerate(select_input):
+            if col.split("--")[0].strip() == "person":
+                person_indices.append(column_index)
+            elif col.split("--")[0].strip() == "person_display_name":
+                transforms.append((column_index, _expand_person_display_name))
+
+        if len(results) == 0:
+            return results
+
+        # TODO: get rid of this logic once we don't use `person` columns anywhere
+        if len(person_indices) > 0:
+            with self.timings.measure("person_column_extra_query"):
+                expand_person = self._expand_person({row[person_indices[0]] for row in results})
+            transforms.extend((column_index, expand_person) for column_index in person_indices)
+
+        if len(transforms) == 0:
+            return results
+
+        columns = list(zip(*results))
+        for column_index, transform in transforms:
+            columns[column_index] = tuple(map(transform, columns[column_index]))
+        return [list(row) for row in zip(*columns)]
+
+    @staticmethod
+    def _expand_asterisk() -> Callable[[tuple], dict[str, Any]]:
+        # Many events share an elements chain, e.g. clicks on the same button, so each is parsed once per page
+        elements_by_chain: dict[str, Any] = {}
+
+        def expand_asterisk(fields: tuple) -> dict[str, Any]:
+            event = dict(zip(SELECT_STAR_FROM_EVENTS_FIELDS, fields))
+            event["properties"] = orjson.loads(event["properties"])
+            if chain := event["elements_chain"]:
+                elements = elements_by_chain.get(chain)
+                if elements is None:
+                    elements = elements_by_chain[chain] = ElementSerializer(chain_to_elements(chain), many=True).data
+                event["elements"] = elements
+            return event
+
+        return expand_asterisk
+
+    def _expand_person(self, distinct_ids: set[str]) -> Callable[[str], dict[str, Any]]:
+        # Make a query into postgres to fetch person
+        distinct_id_list = list(distinct_ids)
+        distinct_to_person: dict[str, Person] = {}
+        # Process distinct_ids in batches to avoid overwhelming PostgreSQL
+        batch_size = 1000
+        for i in range(0, len(distinct_id_list), batch_size):
+            batch_distinct_ids = distinct_id_list[i : i + batch_size]
+            persons = get_persons_by_distinct_ids(self.team.pk, batch_distinct_ids)
+            persons = persons.prefetch_related(Prefetch("persondistinctid_set", to_attr="distinct_ids_cache"))
+            for person in persons.iterator(chunk_size=1000):
+                if person:
+                    for person_distinct_id in person.distinct_ids:
+                        distinct_to_person[person_distinct_id] = person
+
+        def expand_person(distinct_id: str) -> dict[str, Any]:
+            person = distinct_to_person.get(distinct_id)
+            if person:
+                return {
+                    "uuid": person.uuid,
+                    "created_at": person.created_at,
+                    "properties": person.properties or {},
+                    "distinct_id": distinct_id,
+                }
+            return {
+                "distinct_id": distinct_id,
+            }
+
+        return expand_person
+
     def apply_dashboard_filters(self, dashboard_filter: DashboardFilter):
         if dashboard_filter.date_to or dashboard_filter.date_from:
             self.query.before = dashboard_filter.date_to
@@ -380,3 +405,11 @@ class EventsQueryRunner(QueryRunner):
 
     def select_input_raw(self) -> list[str]:
         return ["*"] if len(self.query.select) == 0 else self.query.select
+
+
+def _expand_person_display_name(value: tuple) -> dict[str, Any]:
+    # Selected as a tuple of the display name and the person's id
+    return {
+        "display_name": value[0],
+        "id": str(value[1]),
+    }
@@ -1,4 +1,10 @@
-from typing import Any, Optional, Union, cast
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+from typing import Any, Optional, Self, Union, cast
+from uuid import UUID
 
 from posthog.hogql import ast
 from posthog.hogql.constants import (
@@ -7,7 +13,9 @@ from posthog.hogql.constants import (
     LimitContext,
     DEFAULT_RETURNED_ROWS,
 )
+from posthog.hogql.errors import QueryError
 from posthog.hogql.query import execute_hogql_query
+from posthog.hogql.visitor import clone_expr
 from posthog.schema import HogQLQueryResponse
 
 
@@ -28,12 +36,12 @@ class HogQLHasMorePaginator:
 
     @classmethod
     def from_limit_context(
-        cls, *, limit_context: LimitContext, limit: Optional[int] = None, offset: Optional[int] = None
-    ) -> "HogQLHasMorePaginator":
+        cls, *, limit_context: LimitContext, limit: Optional[int] = None, offset: Optional[int] = None, **kwargs
+    ) -> Self:
         max_rows = get_max_limit_for_context(limit_context)
         default_rows = get_default_limit_for_context(limit_context)
         limit = min(max_rows, default_rows if (limit is None or limit <= 0) else limit)
-        return cls(limit=limit, offset=offset, limit_context=limit_context)
+        return cls(limit=limit, offset=offset, limit_context=limit_context, **kwargs)
 
     def paginate(self, query: Union[ast.SelectQuery, ast.SelectSetQuery]) -> Union[ast.SelectQuery, ast.SelectSetQuery]:
         if isinstance(query, ast.SelectQuery):
@@ -89,3 +97,211 @@ class HogQLHasMorePaginator:
             "limit": self.limit,
             "offset": self.offset,
         }
+
+
+class HogQLCursorPaginator(HogQLHasMorePaginator):
+    """
+    Paginator that continues from an opaque cursor returned with the previous page, as `nextCursor`.
+
+    Queries ordered only by `sortable_fields` seek past the last row of the previous page: its sort key is encoded in
+    the cursor and turned into a WHERE condition, so that every page costs the same instead of ClickHouse reading and
+    discarding all earlier rows. `unique_field` is added to the ORDER BY as a tiebreaker, so that rows with the same
+    sort key are neither skipped nor repeated between pages. Queries with other orderings or a GROUP BY fall back to
+    LIMIT/OFFSET, with the offset kept in the cursor.
+
+    Paginating with cursors is opt-in, with `cursor=""` for the first page, as it changes the ORDER BY of the query.
+    """
+
+    def __init__(
+        self,
+        *,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        limit_context: Optional[LimitContext] = None,
+        cursor: Optional[str] = None,
+        sortable_fields: Sequence[str] = (),
+        unique_field: Optional[str] = None,
+    ):
+        super().__init__(limit=limit, offset=offset, limit_context=limit_context)
+        self.cursor = cursor
+        self.sortable_fields = sortable_fields
+        self.unique_field = unique_field
+        # The sort key of the previous page's last row, and the ORDER BY it was returned for
+        self.seek_after: Optional[tuple[str, list[Any]]] = None
+        # The ORDER BY seeked on and the sort key of this page's last row, selected as extra columns of each row
+        self.order_by: Optional[str] = None
+        self.last_sort_key: Optional[list[Any]] = None
+
+        if cursor:
+            payload = decode_cursor(cursor)
+            self.offset = payload["offset"]
+            if "sort_key" in payload:
+                self.seek_after = (payload["order_by"], [_decode_value(value) for value in payload["sort_key"]])
+
+    def sort_key(self, query: ast.SelectQuery) -> Optional[list[ast.OrderExpr]]:
+        """Returns the ORDER BY to seek on, including the tiebreaker, or None if the query can't be seeked"""
+        if self.cursor is None or self.unique_field is None or query.group_by or not query.order_by:
+            return None
+        # A field may have been redefined by an alias, in which case we know nothing about it
+        aliases = {column.alias for column in query.select if isinstance(column, ast.Alias)}
+        for order_expr in query.order_by:
+            expr = order_expr.expr
+            if (
+                not isinstance(expr, ast.Field)
+                or len(expr.chain) != 1
+                or expr.chain[0] not in (*self.sortable_fields, self.unique_field)
+                or expr.chain[0] in aliases
+            ):
+                return None
+
+        if any(cast(ast.Field, order_expr.expr).chain == [self.unique_field] for order_expr in query.order_by):
+            return list(query.order_by)
+        return [
+            *query.order_by,
+            ast.OrderExpr(expr=ast.Field(chain=[self.unique_field]), order=query.order_by[-1].order),
+        ]
+
+    def paginate(self, query: Union[ast.SelectQuery, ast.SelectSetQuery]) -> Union[ast.SelectQuery, ast.SelectSetQuery]:
+        if not isinstance(query, ast.SelectQuery) or (sort_key := self.sort_key(query)) is None:
+            if self.seek_after is not None:
+                raise QueryError("This cursor can't be used with the order of this query")
+            return super().paginate(query)
+
+        query.order_by = sort_key
+        query.limit = ast.Constant(value=self.limit + 1)
+        if self.seek_after is None:
+            query.offset = ast.Constant(value=self.offset)
+            return query
+
+        order_by, values = self.seek_after
+        if order_by != _describe_order(sort_key) or len(values) != len(sort_key):
+            raise QueryError("This cursor can't be used with the order of this query")
+        seek = _seek_condition(sort_key, values)
+        query.where = seek if query.where is None else ast.And(exprs=[query.where, seek])
+        query.offset = ast.Constant(value=0)
+        return query
+
+    def execute_hogql_query(
+        self,
+        query: Union[ast.SelectQuery, ast.SelectSetQuery],
+        *,
+        query_type: str,
+        **kwargs,
+    ) -> HogQLQueryResponse:
+        sort_key = self.sort_key(query) if isinstance(query, ast.SelectQuery) else None
+        if sort_key is None:
+            return super().execute_hogql_query(query, query_type=query_type, **kwargs)
+
+        assert isinstance(query, ast.SelectQuery)
+        self.order_by = _describe_order(sort_key)
+        query.select = [
+            *query.select,
+            *(
+                ast.Alias(alias=f"_cursor_sort_key_{index}", expr=clone_expr(order_expr.expr))
+                for index, order_expr in enumerate(sort_key)
+            ),
+        ]
+        response = super().execute_hogql_query(query, query_type=query_type, **kwargs)
+
+        # Take the sort key columns back out of the response
+        width = len(sort_key)
+        if response.results:
+            if self.has_more():
+                self.last_sort_key = list(response.results[self.limit - 1][-width:])
+            response.results = [row[:-width] for row in response.results]
+        if response.columns:
+            response.columns = response.columns[:-width]
+        if response.types:
+            response.types = response.types[:-width]
+        self.results = self.trim_results()
+        return response
+
+    def next_cursor(self) -> Optional[str]:
+        if self.cursor is None or not self.has_more():
+            return None
+
+        payload: dict[str, Any] = {"offset": self.offset + self.limit}
+        if self.order_by is not None and self.last_sort_key is not None:
+            sort_key = [_encode_value(value) for value in self.last_sort_key]
+            # Without a value to compare to, the next page starts at its offset instead
+            if all(value is not None for value in sort_key):
+                payload["order_by"] = self.order_by
+                payload["sort_key"] = sort_key
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+    def response_params(self):
+        params = super().response_params()
+        if self.cursor is not None:
+            params["nextCursor"] = self.next_cursor()
+        return params
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise QueryError("Invalid cursor")
+    if (
+        not isinstance(payload, dict)
+        or not isinstance(payload.get("offset"), int)
+        or payload["offset"] < 0
+        or ("sort_key" in payload and not isinstance(payload["sort_key"], list))
+        or ("sort_key" in payload and not isinstance(payload.get("order_by"), str))
+    ):
+        raise QueryError("Invalid cursor")
+    return payload
+
+
+def _describe_order(sort_key: list[ast.OrderExpr]) -> str:
+    return ", ".join(f"{cast(ast.Field, order_expr.expr).chain[0]} {order_expr.order}" for order_expr in sort_key)
+
+
+def _seek_condition(sort_key: list[ast.OrderExpr], values: list[Any]) -> ast.Expr:
+    """Matches rows after `values` in the order of `sort_key`, i.e. (a, b) > (1, 2) becomes a > 1 OR (a = 1 AND b > 2)"""
+    conditions: list[ast.Expr] = []
+    for index, order_expr in enumerate(sort_key):
+        exprs: list[ast.Expr] = [
+            ast.CompareOperation(
+                op=ast.CompareOperationOp.Eq,
+                left=clone_expr(previous.expr),
+                right=ast.Constant(value=value),
+            )
+            for previous, value in zip(sort_key[:index], values)
+        ]
+        exprs.append(
+            ast.CompareOperation(
+                op=ast.CompareOperationOp.Lt if order_expr.order == "DESC" else ast.CompareOperationOp.Gt,
+                left=clone_expr(order_expr.expr),
+                right=ast.Constant(value=values[index]),
+            )
+        )
+        conditions.append(exprs[0] if len(exprs) == 1 else ast.And(exprs=exprs))
+    return conditions[0] if len(conditions) == 1 else ast.Or(exprs=conditions)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"date": value.isoformat()}
+    if isinstance(value, UUID):
+        return {"uuid": str(value)}
+    if isinstance(value, str | int | float):
+        return value
+    return None
+
+
+def _decode_value(value: Any) -> Any:
+    try:
+        if isinstance(value, dict) and len(value) == 1:
+            if "datetime" in value:
+                return datetime.fromisoformat(value["datetime"])
+            if "date" in value:
+                return date.fromisoformat(value["date"])
+            if "uuid" in value:
+                return UUID(value["uuid"])
+    except (TypeError, ValueError):
+        raise QueryError("Invalid cursor")
+    if isinstance(value, str | int | float):
+        return value
+    raise QueryError("Invalid cursor")
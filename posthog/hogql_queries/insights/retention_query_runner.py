@@ -8,6 +8,8 @@ from posthog.hogql.constants import HogQLGlobalSettings, MAX_BYTES_BEFORE_EXTERN
 from math import ceil
 from typing import Any, cast, Optional
 
+import numpy as np
+
 from posthog.caching.insights_api import BASE_MINIMUM_INSIGHT_REFRESH_INTERVAL, REDUCED_MINIMUM_INSIGHT_REFRESH_INTERVAL
 from posthog.constants import (
     TREND_FILTER_TYPE_EVENTS,
@@ -24,7 +26,6 @@ from posthog.hogql_queries.query_runner import QueryRunner
 from posthog.hogql_queries.utils.query_date_range import QueryDateRangeWithIntervals
 from posthog.models import Team
 from posthog.models.filters.mixins.utils import cached_property
-from posthog.queries.util import correct_result_for_sampling
 from posthog.schema import (
     CachedRetentionQueryResponse,
     HogQLQueryModifiers,
@@ -552,100 +553,106 @@ class RetentionQueryRunner(QueryRunner):
             settings=HogQLGlobalSettings(max_bytes_before_external_group_by=MAX_BYTES_BEFORE_EXTERNAL_GROUP_BY),
         )
 
+        results = self._format_results(response.results or [])
+
+        return RetentionQueryResponse(results=results, timings=response.timings, hogql=hogql, modifiers=self.modifiers)
+
+    def _aggregate_results(self, rows: list[Any]) -> tuple[list[Any], np.ndarray]:
+        """
+        Sums the counts of `rows` into an array of breakdowns × start intervals × return intervals, corrected for
+        sampling, and returns it along with the breakdown values of its first axis, ranked by cohort size. Breakdowns
+        beyond the limit are folded into 'Other'. Without breakdowns, the first axis has a single `None` breakdown.
+        """
+        intervals_between = self.query_date_range.intervals_between
+        lookahead = self.query_date_range.lookahead
+
         if self.breakdowns_in_query:
-            # Step 1: Calculate total cohort size for each breakdown value (size at intervals_from_base = 0)
-            breakdown_totals: dict[str, int] = {}
-            original_results = response.results or []
-            for row in original_results:
-                start_interval, intervals_from_base, breakdown_value, count = row
-                if intervals_from_base == 0:
-                    breakdown_totals[breakdown_value] = breakdown_totals.get(breakdown_value, 0) + count
-
-            # Step 2: Rank breakdowns and determine top N and 'Other'
+            start_intervals, intervals_from_base, breakdown_values, counts = zip(*rows) if rows else ((), (), (), ())
+        else:
+            start_intervals, intervals_from_base, counts = zip(*rows) if rows else ((), (), ())
+        starts = np.array(start_intervals, dtype=np.int64)
+        from_base = np.array(intervals_from_base, dtype=np.int64)
+        row_counts = np.array(counts, dtype=np.float64)
+
+        if self.breakdowns_in_query:
+            codes_by_value: dict[Any, int] = {}
+            codes = np.fromiter(
+                (codes_by_value.setdefault(value, len(codes_by_value)) for value in breakdown_values),
+                dtype=np.int64,
+                count=len(rows),
+            )
+            values = list(codes_by_value)
+
+            # Rank breakdowns by cohort size (the count at intervals_from_base = 0), breakdowns without any cohort
+            # are left out
+            is_cohort = from_base == 0
+            totals = np.zeros(len(values), dtype=np.int64)
+            np.add.at(totals, codes[is_cohort], np.array(counts, dtype=np.int64)[is_cohort])
+            has_cohort = np.bincount(codes[is_cohort], minlength=len(values)) > 0
+            totals_list = totals.tolist()
+            # Sort by count descending, then by breakdown value ascending for stability
+            ranked = sorted(np.flatnonzero(has_cohort).tolist(), key=lambda code: (-totals_list[code], values[code]))
+
             breakdown_limit = (
                 self.query.breakdownFilter.breakdown_limit
                 if self.query.breakdownFilter and self.query.breakdownFilter.breakdown_limit is not None
                 else get_breakdown_limit_for_context(self.limit_context)
             )
-            # Sort by count descending, then by breakdown value ascending for stability
-            sorted_breakdowns = sorted(breakdown_totals.items(), key=lambda item: (-item[1], item[0]), reverse=False)
-            other_values = {item[0] for item in sorted_breakdowns[breakdown_limit:]}
-
-            # Step 3: Aggregate results, grouping less frequent breakdowns into 'Other'
-            aggregated_data: dict[str, dict[int, dict[int, float]]] = {}
-            for row in original_results:
-                start_interval, intervals_from_base, breakdown_value, count = row
-
-                target_breakdown = breakdown_value
-                if breakdown_value in other_values:
-                    target_breakdown = BREAKDOWN_OTHER_STRING_LABEL
-
-                # Apply sampling correction when aggregating into the final structure
-                corrected_count = correct_result_for_sampling(count, self.query.samplingFactor)
-                aggregated_data[target_breakdown] = aggregated_data.get(target_breakdown, {})
-                breakdown_data = aggregated_data[target_breakdown]
-
-                breakdown_data[start_interval] = breakdown_data.get(start_interval, {})
-                interval_data = breakdown_data[start_interval]
-                interval_data[intervals_from_base] = interval_data.get(intervals_from_base, 0.0) + corrected_count
-
-            # Step 4: Format final output
-            final_results: list[dict[str, Any]] = []
-            # Keep track of the order based on the ranking
-            ordered_breakdown_keys = [item[0] for item in sorted_breakdowns[:breakdown_limit]]
-            if other_values:
-                ordered_breakdown_keys.append(BREAKDOWN_OTHER_STRING_LABEL)
-
-            for breakdown_value in ordered_breakdown_keys:
-                intervals_data: dict[int, dict[int, float]] = aggregated_data.get(breakdown_value, {})
-
-                breakdown_results = []
-                for start_interval in range(self.query_date_range.intervals_between):
-                    result_dict: dict[int, float] = intervals_data.get(start_interval, {})
-                    values = [
-                        {
-                            "count": result_dict.get(return_interval, 0.0),
-                            "label": f"{self.query_date_range.interval_name.title()} {return_interval}",
-                        }
-                        for return_interval in range(self.query_date_range.lookahead)
-                    ]
-
-                    breakdown_results.append(
-                        {
-                            "values": values,
-                            "label": f"{self.query_date_range.interval_name.title()} {start_interval}",
-                            "date": self.get_date(start_interval),
-                            "breakdown_value": breakdown_value,
-                        }
-                    )
-
-                final_results.extend(breakdown_results)
-
-            results = final_results
+            ordered_values = [values[code] for code in ranked[:breakdown_limit]]
+            positions = np.full(len(values), -1, dtype=np.int64)
+            positions[ranked[:breakdown_limit]] = np.arange(len(ordered_values))
+            if len(ranked) > len(ordered_values):
+                positions[ranked[breakdown_limit:]] = len(ordered_values)
+                ordered_values.append(BREAKDOWN_OTHER_STRING_LABEL)
+            row_positions = positions[codes]
         else:
-            # Rename this variable to avoid conflict with the one in the if block
-            results_by_interval_pair: dict[tuple[int, int], dict[str, float]] = {
-                (start_event_matching_interval, intervals_from_base): {
-                    "count": correct_result_for_sampling(count, self.query.samplingFactor)
-                }
-                for (start_event_matching_interval, intervals_from_base, count) in response.results
-            }
-            results = [
-                {
+            ordered_values = [None]
+            row_positions = np.zeros(len(rows), dtype=np.int64)
+
+        if self.query.samplingFactor:
+            # Corrected per row, like `correct_result_for_sampling`
+            row_counts = np.round(row_counts * (1 / self.query.samplingFactor))
+
+        in_range = (
+            (row_positions >= 0)
+            & (starts >= 0)
+            & (starts < intervals_between)
+            & (from_base >= 0)
+            & (from_base < lookahead)
+        )
+        cells = (row_positions * intervals_between + starts) * lookahead + from_base
+        aggregated = np.bincount(
+            cells[in_range],
+            weights=row_counts[in_range],
+            minlength=len(ordered_values) * intervals_between * lookahead,
+        ).reshape(len(ordered_values), intervals_between, lookahead)
+        return ordered_values, aggregated
+
+    def _format_results(self, rows: list[Any]) -> list[dict[str, Any]]:
+        ordered_values, aggregated = self._aggregate_results(rows)
+
+        interval_name = self.query_date_range.interval_name.title()
+        labels = [
+            f"{interval_name} {interval}"
+            for interval in range(max(self.query_date_range.intervals_between, self.query_date_range.lookahead))
+        ]
+        return_labels = labels[: self.query_date_range.lookahead]
+        dates = [self.get_date(start_interval) for start_interval in range(self.query_date_range.intervals_between)]
+
+        results: list[dict[str, Any]] = []
+        for breakdown_value, breakdown_counts in zip(ordered_values, aggregated.astype(np.int64).tolist()):
+            for start_interval, interval_counts in enumerate(breakdown_counts):
+                result = {
                     "values": [
-                        {
-                            **results_by_interval_pair.get((start_interval, return_interval), {"count": 0.0}),
-                            "label": f"{self.query_date_range.interval_name.title()} {return_interval}",
-                        }
-                        for return_interval in range(self.query_date_range.lookahead)
+                        {"count": count, "label": label} for count, label in zip(interval_counts, return_labels)
                     ],
-                    "label": f"{self.query_date_range.interval_name.title()} {start_interval}",
-                    "date": self.get_date(start_interval),
+                    "label": labels[start_interval],
+                    "date": dates[start_interval],
                 }
-                for start_interval in range(self.query_date_range.intervals_between)
-            ]
-
-        return RetentionQueryResponse(results=results, timings=response.timings, hogql=hogql, modifiers=self.modifiers)
+                if self.breakdowns_in_query:
+                    result["breakdown_value"] = breakdown_value
+                results.append(result)
+        return results
 
     def to_actors_query(
         self, interval: Optional[int] = None, breakdown_values: str | list[str] | int | None = None
@@ -1,5 +1,8 @@
+from datetime import UTC, datetime
 from typing import cast
+from unittest import TestCase
 from unittest.mock import MagicMock, patch
+from uuid import UUID
 
 from posthog.hogql.ast import SelectQuery
 from posthog.hogql.constants import (
@@ -8,12 +11,14 @@ from posthog.hogql.constants import (
     get_max_limit_for_context,
     MAX_SELECT_RETURNED_ROWS,
 )
+from posthog.hogql.errors import QueryError
 from posthog.hogql.parser import parse_select
-from posthog.hogql_queries.insights.paginators import HogQLHasMorePaginator
+from posthog.hogql_queries.insights.paginators import HogQLCursorPaginator, HogQLHasMorePaginator
 from posthog.hogql_queries.actors_query_runner import ActorsQueryRunner
 from posthog.models.utils import UUIDT
 from posthog.schema import (
     ActorsQuery,
+    HogQLQueryResponse,
     PersonPropertyFilter,
     PropertyOperator,
 )
@@ -80,6 +85,39 @@ class TestHogQLHasMorePaginator(ClickhouseTestMixin, APIBaseTest):
         self.assertEqual(response.results, [[f"jacob7@{self.random_uuid}.posthog.com"]])
         self.assertEqual(response.hasMore, True)
 
+    def test_persons_query_cursor(self):
+        emails: list[str] = []
+        cursor: str | None = ""
+        while cursor is not None:
+            runner = self._create_runner(
+                ActorsQuery(
+                    select=["properties.email", "created_at"], orderBy=["created_at DESC"], limit=3, cursor=cursor
+                )
+            )
+            response = runner.calculate()
+            emails.extend(row[0] for row in response.results)
+            self.assertEqual(response.hasMore, response.nextCursor is not None)
+            if cursor:
+                # Later pages seek past the previous one instead of skipping rows
+                self.assertIn("less(created_at, ", response.hogql)
+                self.assertIn("LIMIT 4 OFFSET 0", response.hogql)
+            cursor = response.nextCursor
+
+        self.assertEqual(sorted(emails), sorted(f"jacob{index}@{self.random_uuid}.posthog.com" for index in range(10)))
+
+    def test_persons_query_cursor_falls_back_to_offset(self):
+        emails: list[str] = []
+        cursor: str | None = ""
+        while cursor is not None:
+            runner = self._create_runner(
+                ActorsQuery(select=["properties.email"], orderBy=["properties.email DESC"], limit=3, cursor=cursor)
+            )
+            response = runner.calculate()
+            emails.extend(row[0] for row in response.results)
+            cursor = response.nextCursor
+
+        self.assertEqual(emails, [f"jacob{index}@{self.random_uuid}.posthog.com" for index in reversed(range(10))])
+
     def test_zero_limit(self):
         """Test behavior with limit set to zero."""
         runner = self._create_runner(ActorsQuery(select=["properties.email"], limit=0))
@@ -221,3 +259,120 @@ class TestHogQLHasMorePaginator(ClickhouseTestMixin, APIBaseTest):
         )
         mock_execute_hogql_query.assert_called_once()
         self.assertEqual(mock_execute_hogql_query.call_args.kwargs["limit_context"], limit_context)
+
+
+class TestHogQLCursorPaginator(TestCase):
+    def _paginate(self, paginator: HogQLCursorPaginator, query: str) -> str:
+        return cast(SelectQuery, paginator.paginate(parse_select(query))).to_hogql()
+
+    def _paginator(self, cursor: str | None = "", **kwargs) -> HogQLCursorPaginator:
+        return HogQLCursorPaginator(
+            limit=2, cursor=cursor, sortable_fields=("timestamp", "event"), unique_field="uuid", **kwargs
+        )
+
+    @patch("posthog.hogql_queries.insights.paginators.execute_hogql_query")
+    def _next_cursor(
+        self,
+        rows: list[tuple],
+        mock_execute_hogql_query: MagicMock,
+        query: str = "SELECT event FROM events ORDER BY timestamp DESC",
+    ) -> str | None:
+        mock_execute_hogql_query.return_value = HogQLQueryResponse(results=rows)
+        paginator = self._paginator()
+        paginator.execute_hogql_query(cast(SelectQuery, parse_select(query)), query_type="test")
+        return paginator.response_params()["nextCursor"]
+
+    def test_first_page_orders_by_the_unique_field(self):
+        self.assertEqual(
+            self._paginate(self._paginator(), "SELECT event FROM events ORDER BY timestamp DESC"),
+            "SELECT event FROM events ORDER BY timestamp DESC, uuid DESC LIMIT 3 OFFSET 0",
+        )
+        # Without a cursor, nothing changes
+        self.assertEqual(
+            self._paginate(self._paginator(cursor=None), "SELECT event FROM events ORDER BY timestamp DESC"),
+            "SELECT event FROM events ORDER BY timestamp DESC LIMIT 3 OFFSET 0",
+        )
+
+    @patch("posthog.hogql_queries.insights.paginators.execute_hogql_query")
+    def test_strips_the_sort_key_from_results(self, mock_execute_hogql_query: MagicMock):
+        timestamp = datetime(2024, 1, 1, 12, tzinfo=UTC)
+        mock_execute_hogql_query.return_value = HogQLQueryResponse(
+            results=[
+                ("$pageview", timestamp, UUID(int=3)),
+                ("$pageleave", timestamp, UUID(int=2)),
+                ("$pageview", timestamp, UUID(int=1)),
+            ],
+            columns=["event", "_cursor_sort_key_0", "_cursor_sort_key_1"],
+            types=[("event", "String"), ("_cursor_sort_key_0", "DateTime64"), ("_cursor_sort_key_1", "UUID")],
+        )
+        paginator = self._paginator()
+        response = paginator.execute_hogql_query(
+            cast(SelectQuery, parse_select("SELECT event FROM events ORDER BY timestamp DESC")), query_type="test"
+        )
+
+        executed_query = mock_execute_hogql_query.call_args.kwargs["query"]
+        self.assertEqual(
+            executed_query.to_hogql(),
+            "SELECT event, timestamp AS _cursor_sort_key_0, uuid AS _cursor_sort_key_1 FROM events "
+            "ORDER BY timestamp DESC, uuid DESC LIMIT 3 OFFSET 0",
+        )
+        self.assertEqual(paginator.results, [("$pageview",), ("$pageleave",)])
+        self.assertEqual(response.columns, ["event"])
+        self.assertEqual(response.types, [("event", "String")])
+        self.assertEqual(paginator.last_sort_key, [timestamp, UUID(int=2)])
+
+    def test_seeks_past_the_previous_page(self):
+        timestamp = datetime(2024, 1, 1, 12, tzinfo=UTC)
+        cursor = self._next_cursor(
+            [("$pageview", timestamp, UUID(int=3)), ("$pageleave", timestamp, UUID(int=2)), ("$pageview", None, None)]
+        )
+        assert cursor is not None
+
+        paginator = self._paginator(cursor=cursor)
+        self.assertEqual(paginator.offset, 2)
+        self.assertEqual(
+            self._paginate(paginator, "SELECT event FROM events WHERE event != 'x' ORDER BY timestamp DESC"),
+            "SELECT event FROM events WHERE and(notEquals(event, 'x'), or(less(timestamp, toDateTime('2024-01-01 "
+            "12:00:00.000000')), and(equals(timestamp, toDateTime('2024-01-01 12:00:00.000000')), less(uuid, "
+            "toUUID('00000000-0000-0000-0000-000000000002'))))) ORDER BY timestamp DESC, uuid DESC LIMIT 3 OFFSET 0",
+        )
+        self.assertEqual(paginator.response_params()["offset"], 2)
+
+    def test_falls_back_to_offset(self):
+        # Not ordered by sortable fields
+        query = "SELECT event FROM events ORDER BY properties.$browser DESC"
+        cursor = self._next_cursor([("a",), ("b",), ("c",)], query=query)
+        assert cursor is not None
+        self.assertEqual(
+            self._paginate(self._paginator(cursor=cursor), query),
+            "SELECT event FROM events ORDER BY properties.$browser DESC LIMIT 3 OFFSET 2",
+        )
+
+        # Aggregated
+        query = "SELECT event, count() FROM events GROUP BY event ORDER BY event"
+        cursor = self._next_cursor([("a", 1), ("b", 2), ("c", 3)], query=query)
+        assert cursor is not None
+        self.assertEqual(
+            self._paginate(self._paginator(cursor=cursor), query),
+            "SELECT event, count() FROM events GROUP BY event ORDER BY event ASC LIMIT 3 OFFSET 2",
+        )
+
+        # Rows without a sort key
+        cursor = self._next_cursor([("a", None, 1), ("b", None, 2), ("c", None, 3)])
+        assert cursor is not None
+        self.assertEqual(self._paginator(cursor=cursor).seek_after, None)
+
+    def test_no_cursor_on_the_last_page(self):
+        self.assertIsNone(self._next_cursor([("a", 1, 1), ("b", 2, 2)]))
+
+    def test_rejects_invalid_cursors(self):
+        for invalid_cursor in ["not a cursor", "e30=", "eyJvZmZzZXQiOi0xfQ=="]:
+            with self.subTest(cursor=invalid_cursor), self.assertRaises(QueryError):
+                self._paginator(cursor=invalid_cursor)
+
+        # Returned for a different order
+        timestamp = datetime(2024, 1, 1, 12, tzinfo=UTC)
+        cursor = self._next_cursor([("a", timestamp, UUID(int=3)), ("b", timestamp, UUID(int=2)), ("c", None, None)])
+        assert cursor is not None
+        with self.assertRaises(QueryError):
+            self._paginate(self._paginator(cursor=cursor), "SELECT event FROM events ORDER BY timestamp ASC")
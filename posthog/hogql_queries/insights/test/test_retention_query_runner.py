@@ -3478,6 +3478,46 @@ class TestRetention(ClickhouseTestMixin, APIBaseTest):
                 f"Missing expected {expected_type} at {expected_time} for person2 on day 1",
             )
 
+    @freeze_time("2020-01-04T12:00:00Z")
+    @patch("posthog.hogql_queries.insights.retention_query_runner.execute_hogql_query")
+    def test_breakdown_aggregation_folds_other_and_corrects_for_sampling(self, execute_hogql_query_mock):
+        execute_hogql_query_mock.return_value = MagicMock(
+            timings=[],
+            results=[
+                # start interval, intervals from base, breakdown value, count
+                (0, 0, "Chrome", 10),
+                (0, 1, "Chrome", 5),
+                (1, 0, "Firefox", 4),
+                (1, 1, "Firefox", 3),
+                (0, 0, "Safari", 4),
+                (0, 1, "Safari", 1),
+                # Without a cohort, so left out
+                (1, 1, "Edge", 7),
+                # Outside of the date range
+                (0, 3, "Chrome", 9),
+            ],
+        )
+
+        result = self.run_query(
+            query={
+                "dateRange": {"date_from": "-2d"},
+                "retentionFilter": {"period": "Day", "totalIntervals": 3},
+                "breakdownFilter": {
+                    "breakdowns": [{"property": "$browser", "type": "event"}],
+                    "breakdown_limit": 1,
+                },
+                "samplingFactor": 0.5,
+            }
+        )
+
+        self.assertEqual(pluck(result, "breakdown_value"), ["Chrome"] * 3 + [BREAKDOWN_OTHER_STRING_LABEL] * 3)
+        self.assertEqual(pluck(result, "label"), ["Day 0", "Day 1", "Day 2"] * 2)
+        self.assertEqual(
+            pluck(result, "values", "count"),
+            [[20, 10, 0], [0, 0, 0], [0, 0, 0], [8, 2, 0], [8, 6, 0], [0, 0, 0]],
+        )
+        self.assertEqual(pluck(result[0]["values"], "label"), ["Day 0", "Day 1", "Day 2"])
+
 
 class TestClickhouseRetentionGroupAggregation(ClickhouseTestMixin, APIBaseTest):
     def run_query(self, query, *, limit_context: Optional[LimitContext] = None):
@@ -1118,6 +1118,45 @@ class TestTrendsQueryRunner(ClickhouseTestMixin, APIBaseTest):
         # action needs to be unset to display custom label
         assert response.results[0]["action"] is None
 
+    def test_apply_formula_aligns_breakdown_values_across_series(self):
+        runner = self._create_query_runner(
+            "2020-01-09",
+            "2020-01-11",
+            IntervalType.DAY,
+            [EventsNode(event="$pageview"), EventsNode(event="$pageleave")],
+            TrendsFilter(formulaNodes=[TrendsFormulaNode(formula="A+B")]),
+            BreakdownFilter(breakdown="$browser"),
+        )
+
+        def result(breakdown_value, data):
+            return {
+                "label": f"series {breakdown_value}",
+                "data": data,
+                "count": sum(data),
+                "action": {"order": 0},
+                "breakdown_value": breakdown_value,
+                "days": ["2020-01-09", "2020-01-10", "2020-01-11"],
+                "labels": ["9-Jan-2020", "10-Jan-2020", "11-Jan-2020"],
+            }
+
+        series_a = [result("Chrome", [1, 2, 3]), result("Safari", [1, 1, 1]), result("item 10", [0, 0, 1])]
+        series_b = [result("Firefox", [2, 2, 2]), result("Chrome", [1, 0, 0]), result("item 9", [0, 0, 1])]
+
+        formula_results = runner.apply_formula(TrendsFormulaNode(formula="A+B"), [series_a, series_b])
+
+        assert [(r["breakdown_value"], r["data"], r["count"]) for r in formula_results] == [
+            ("Chrome", [2, 2, 3], 7.0),
+            ("Safari", [1, 1, 1], 3.0),
+            ("item 10", [0, 0, 1], 1.0),
+            # Based on a filler result from series A, so sorted by an aggregated value of 0
+            ("Firefox", [2, 2, 2], 6.0),
+            ("item 9", [0, 0, 1], 1.0),
+        ]
+        assert all(r["label"] == "Formula (A+B)" and r["action"] is None for r in formula_results)
+        # Series results are left untouched, e.g. for other formulas
+        assert series_a[0] == result("Chrome", [1, 2, 3])
+        assert series_b[1] == result("Chrome", [1, 0, 0])
+
     def test_formula_with_multi_cohort_all_breakdown_with_compare(self):
         self._create_test_events()
         cohort1 = Cohort.objects.create(
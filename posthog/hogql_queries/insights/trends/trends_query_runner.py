@@ -1,6 +1,6 @@
-import threading
 from copy import deepcopy
 from datetime import timedelta, datetime
+from functools import partial
 from math import ceil
 from operator import itemgetter
 from typing import Any, Optional, Union
@@ -19,6 +19,8 @@ from posthog.clickhouse import query_tagging
 from posthog.clickhouse.query_tagging import QueryTags
 from posthog.hogql import ast
 from posthog.hogql.constants import MAX_SELECT_RETURNED_ROWS, LimitContext
+from posthog.hogql.context import HogQLContext
+from posthog.hogql.database.database import Database, DatabaseView, create_hogql_database
 from posthog.hogql.printer import to_printed_hogql
 from posthog.hogql.query import execute_hogql_query
 from posthog.hogql.timings import HogQLTimings
@@ -34,12 +36,13 @@ from posthog.hogql_queries.insights.trends.series_with_extras import SeriesWithE
 from posthog.hogql_queries.insights.trends.trends_actors_query_builder import TrendsActorsQueryBuilder
 from posthog.hogql_queries.insights.trends.trends_query_builder import TrendsQueryBuilder
 from posthog.hogql_queries.query_runner import QueryRunner
-from posthog.hogql_queries.utils.formula_ast import FormulaAST
+from posthog.hogql_queries.utils.formula_ast import compile_formula
 from posthog.hogql_queries.utils.query_compare_to_date_range import QueryCompareToDateRange
 from posthog.hogql_queries.utils.query_date_range import QueryDateRange
 from posthog.hogql_queries.utils.query_previous_period_date_range import (
     QueryPreviousPeriodDateRange,
 )
+from posthog.hogql_queries.utils.subquery_executor import get_subquery_executor
 from posthog.hogql_queries.utils.timestamp_utils import get_earliest_timestamp_from_series, format_label_date
 from posthog.models import Team
 from posthog.models.action.action import Action
@@ -362,11 +365,12 @@ class TrendsQueryRunner(QueryRunner):
             index: int,
             query: ast.SelectQuery | ast.SelectSetQuery,
             timings: HogQLTimings,
-            is_parallel: bool,
+            database: Optional[Database] = None,
             query_tags: Optional[QueryTags] = None,
         ):
             try:
                 if query_tags:
+                    query_tagging.reset_query_tags()
                     query_tagging.update_tags(query_tags)
 
                 series_with_extra = self.series[index]
@@ -378,6 +382,10 @@ class TrendsQueryRunner(QueryRunner):
                     timings=timings,
                     modifiers=self.modifiers,
                     limit_context=self.limit_context,
+                    # Resolving a query can modify its database, so each series gets its own view of it
+                    context=HogQLContext(
+                        team_id=self.team.pk, database=DatabaseView.of(database) if database else None
+                    ),
                 )
 
                 timings_matrix[index + 1] = response.timings
@@ -386,12 +394,6 @@ class TrendsQueryRunner(QueryRunner):
                     debug_errors.append(response.error)
             except Exception as e:
                 errors.append(e)
-            finally:
-                if is_parallel:
-                    from django.db import connection
-
-                    # This will only close the DB connection for the newly spawned thread and not the whole app
-                    connection.close()
 
         with self.timings.measure("execute_queries"):
             timings_matrix[0] = self.timings.to_list(back_out_stack=False)
@@ -401,23 +403,24 @@ class TrendsQueryRunner(QueryRunner):
             # this right now due to the lack of multithreaded support of Django
             if len(queries) == 1 or settings.IN_UNIT_TESTING:
                 for index, query in enumerate(queries):
-                    run(index, query, self.timings.clone_for_subquery(index), False)
+                    run(index, query, self.timings.clone_for_subquery(index))
             else:
-                jobs = [
-                    threading.Thread(
-                        target=run,
-                        args=(
-                            index,
-                            query,
-                            self.timings.clone_for_subquery(index),
-                            True,
-                            query_tagging.get_query_tags().model_copy(deep=True),
-                        ),
+                # Build the database once rather than once per series
+                with self.timings.measure("create_hogql_database"):
+                    database = create_hogql_database(team=self.team, modifiers=self.modifiers)
+
+                tasks = [
+                    partial(
+                        run,
+                        index,
+                        query,
+                        self.timings.clone_for_subquery(index),
+                        database,
+                        query_tagging.get_query_tags().model_copy(deep=True),
                     )
                     for index, query in enumerate(queries)
                 ]
-                [j.start() for j in jobs]  # type:ignore
-                [j.join() for j in jobs]  # type:ignore
+                get_subquery_executor().run_all(self.team.pk, tasks, max_parallelism=self._max_subquery_parallelism())
 
         # Raise any errors raised in a seperate thread
         if len(errors) > 0:
@@ -816,6 +819,12 @@ class TrendsQueryRunner(QueryRunner):
 
         return series_with_extras
 
+    def _max_subquery_parallelism(self) -> Optional[int]:
+        # API queries of teams with a concurrency limit don't run more queries at once than the limit allows
+        if not self.is_query_service:
+            return None
+        return self.get_api_queries_concurrency_limit()
+
     def apply_formula(
         self, formula_node: TrendsFormulaNode, results: list[list[dict[str, Any]]], in_breakdown_clause=False
     ) -> list[dict[str, Any]]:
@@ -859,12 +868,17 @@ class TrendsQueryRunner(QueryRunner):
         if has_compare or has_breakdown:
             keys = ["breakdown_value"] if has_breakdown else ["compare_label"]
 
-            all_breakdown_values = set()
+            # Index each series' results by breakdown value once, keeping the first result for each value
+            results_by_breakdown_value: list[dict[Any, dict[str, Any]]] = []
+            all_breakdown_values: dict[Any, None] = {}
             for result in results:
+                result_by_breakdown_value: dict[Any, dict[str, Any]] = {}
                 if isinstance(result, list):
                     for item in result:
                         data = itemgetter(*keys)(item)
-                        all_breakdown_values.add(tuple(data) if isinstance(data, list) else data)
+                        result_by_breakdown_value.setdefault(tuple(data) if isinstance(data, list) else data, item)
+                results_by_breakdown_value.append(result_by_breakdown_value)
+                all_breakdown_values.update(dict.fromkeys(result_by_breakdown_value))
 
             # sort the results so that the breakdown values are in the correct order
             sorted_breakdown_values = natsorted(list(all_breakdown_values), alg=ns.IGNORECASE)
@@ -877,20 +891,18 @@ class TrendsQueryRunner(QueryRunner):
                     else single_or_multiple_breakdown_value
                 )
 
-                any_result: Optional[dict[str, Any]] = None
-                for result in results:
-                    matching_result = [item for item in result if itemgetter(*keys)(item) == breakdown_value]
-                    if matching_result:
-                        any_result = matching_result[0]
-                        break
+                matching_results = [
+                    result_by_breakdown_value.get(single_or_multiple_breakdown_value)
+                    for result_by_breakdown_value in results_by_breakdown_value
+                ]
+                any_result = next((result for result in matching_results if result is not None), None)
                 if not any_result:
                     continue
                 row_results = []
-                for result in results:
-                    matching_result = [item for item in result if itemgetter(*keys)(item) == breakdown_value]
-                    if matching_result:
-                        # Create a deep copy of the matching result to avoid modifying shared data
-                        row_results.append(deepcopy(matching_result[0]))
+                for matching_result in matching_results:
+                    if matching_result is not None:
+                        # Formulas only replace top level keys, so a shallow copy avoids modifying shared data
+                        row_results.append(dict(matching_result))
                     else:
                         row_results.append(
                             {
@@ -931,11 +943,9 @@ class TrendsQueryRunner(QueryRunner):
                 reverse=True,
             )
         else:
-            # Create a deep copy of the results to avoid modifying shared data
-            copied_results = [[deepcopy(r[0]) for r in results]]
-            return [
-                self.apply_formula_to_results_group(copied_results[0], formula_node, aggregate_values=is_total_value)
-            ]
+            # Formulas only replace top level keys, so a shallow copy avoids modifying shared data
+            copied_results = [dict(r[0]) for r in results]
+            return [self.apply_formula_to_results_group(copied_results, formula_node, aggregate_values=is_total_value)]
 
     @staticmethod
     def apply_formula_to_results_group(
@@ -949,19 +959,20 @@ class TrendsQueryRunner(QueryRunner):
         Applies the formula to a list of results, resulting in a single, computed result.
         """
         formula = formula_node.formula
+        compiled_formula = compile_formula(formula)
         base_result = results_group[0]
         base_result["label"] = formula_node.custom_name or f"Formula ({formula})"
         base_result["action"] = None
 
         if aggregate_values:
             series_data = [[s["aggregated_value"]] for s in results_group]
-            new_series_data = FormulaAST(series_data).call(formula)
+            new_series_data = compiled_formula.evaluate(series_data)
             base_result["aggregated_value"] = float(sum(new_series_data))
             base_result["data"] = None
             base_result["count"] = 0
         else:
             series_data = [s["data"] for s in results_group]
-            new_series_data = FormulaAST(series_data).call(formula)
+            new_series_data = compiled_formula.evaluate(series_data)
             base_result["data"] = new_series_data
             base_result["count"] = float(sum(new_series_data))
 
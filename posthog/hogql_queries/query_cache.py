@@ -1,13 +1,231 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 from datetime import datetime, UTC
-from typing import Optional
+from typing import Any, Optional
 
+import orjson
+import structlog
 from django.conf import settings
 from django.core.cache import cache
+from prometheus_client import Counter
 
 from posthog import redis
 from posthog.cache_utils import OrjsonJsonSerializer
 from posthog.utils import get_safe_cache
 
+logger = structlog.get_logger(__name__)
+
+QUERY_CACHE_INVALIDATION_CHANNEL = "query_cache_invalidation"
+
+LOCAL_QUERY_CACHE_COUNTER = Counter(
+    "posthog_query_cache_local_total",
+    "Lookups against the in-process query results cache tier.",
+    labelnames=["result"],
+)
+
+
+class LocalQueryCache:
+    """
+    Per-process LRU of query results, sitting in front of Redis.
+    '{cache_key}' -> (last_refresh, inserted at, serialized response)
+
+    Responses are kept serialized and decoded on every `get`, so that callers can modify what they get without
+    affecting the cached result or other callers. Bounded by the summed size of the serialized responses.
+
+    Entries are tied to the `last_refresh` of the result they hold: when any process writes a fresh result for a cache
+    key it publishes the new `last_refresh`, and every process drops its entry for that key unless it already holds that
+    exact result. The newest announced `last_refresh` of each key is remembered, so that a result read from Redis
+    before the announcement isn't cached after it.
+    """
+
+    # How many cache keys to remember the newest announced `last_refresh` of
+    MAX_ANNOUNCED_KEYS = 10_000
+
+    def __init__(self, *, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self._entries: OrderedDict[str, tuple[Optional[str], float, bytes]] = OrderedDict()
+        self._announced: OrderedDict[str, datetime] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl_seconds:
+                self._remove(cache_key)
+                return None
+            self._entries.move_to_end(cache_key)
+        return OrjsonJsonSerializer({}).loads(entry[2])
+
+    def set(self, cache_key: str, serialized: bytes, *, last_refresh: Optional[str]) -> None:
+        if len(serialized) > self.max_bytes:
+            return
+        with self._lock:
+            announced = self._announced.get(cache_key)
+            if announced is not None:
+                refreshed_at = _parse_last_refresh(last_refresh)
+                if refreshed_at is None or refreshed_at < announced:
+                    # A newer result has been written since this one was read
+                    return
+                del self._announced[cache_key]
+            self._remove(cache_key)
+            self._entries[cache_key] = (last_refresh, time.monotonic(), serialized)
+            self.current_bytes += len(serialized)
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, cache_key: str, *, unless_last_refresh: Optional[str] = None) -> None:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and (unless_last_refresh is None or entry[0] != unless_last_refresh):
+                self._remove(cache_key)
+            refreshed_at = _parse_last_refresh(unless_last_refresh)
+            announced = self._announced.get(cache_key)
+            if refreshed_at is not None and (announced is None or refreshed_at > announced):
+                self._announced[cache_key] = refreshed_at
+                self._announced.move_to_end(cache_key)
+                if len(self._announced) > self.MAX_ANNOUNCED_KEYS:
+                    self._announced.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, cache_key: str) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.current_bytes -= len(entry[2])
+
+
+def _parse_last_refresh(last_refresh: Any) -> Optional[datetime]:
+    if not isinstance(last_refresh, str):
+        return None
+    try:
+        refreshed_at = datetime.fromisoformat(last_refresh)
+    except ValueError:
+        return None
+    return refreshed_at if refreshed_at.tzinfo is not None else refreshed_at.replace(tzinfo=UTC)
+
+
+_local_query_cache: Optional[LocalQueryCache] = None
+_local_query_cache_pid: Optional[int] = None
+_local_query_cache_lock = threading.Lock()
+
+
+def _handle_invalidation_message(message: dict) -> None:
+    local_cache = _local_query_cache
+    if local_cache is None:
+        return
+    try:
+        payload = orjson.loads(message["data"])
+        local_cache.invalidate(payload["cache_key"], unless_last_refresh=payload.get("last_refresh"))
+    except Exception as e:
+        # We can't tell which entry is affected, so drop them all rather than serve something stale
+        logger.warning("query_cache_invalidation_message_invalid", error=str(e))
+        local_cache.clear()
+
+
+def get_local_query_cache() -> Optional[LocalQueryCache]:
+    """
+    Returns this process's local query cache tier, or None if it's disabled.
+
+    The cache (and its Redis pub-sub listener) is created lazily and per PID, so that forked gunicorn workers each get
+    their own listener thread instead of inheriting a dead one from the master.
+    """
+    global _local_query_cache, _local_query_cache_pid
+
+    if settings.QUERY_CACHE_LOCAL_MAX_BYTES <= 0:
+        return None
+    if _local_query_cache is not None and _local_query_cache_pid == os.getpid():
+        return _local_query_cache
+
+    with _local_query_cache_lock:
+        if _local_query_cache is None or _local_query_cache_pid != os.getpid():
+            local_cache = LocalQueryCache(
+                max_bytes=settings.QUERY_CACHE_LOCAL_MAX_BYTES, ttl_seconds=settings.QUERY_CACHE_LOCAL_TTL_SECONDS
+            )
+            if not settings.TEST:
+                pubsub = redis.get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{QUERY_CACHE_INVALIDATION_CHANNEL: _handle_invalidation_message})
+                pubsub.run_in_thread(sleep_time=1, daemon=True)
+            _local_query_cache = local_cache
+            _local_query_cache_pid = os.getpid()
+    return _local_query_cache
+
+
+# Results fetched up front for a batch of queries (e.g. all tiles of a dashboard), see `prefetched_query_cache`
+_thread_locals = threading.local()
+
+
+def _get_prefetched_results() -> Optional[dict[str, Optional[dict]]]:
+    return getattr(_thread_locals, "prefetched_results", None)
+
+
+def _get_pending_target_ages() -> Optional[dict[int, dict[str | bytes, float]]]:
+    return getattr(_thread_locals, "pending_target_ages", None)
+
+
+@contextmanager
+def prefetched_query_cache(cache_keys: Iterable[str]) -> Iterator[None]:
+    """
+    Resolves all given cache keys with a single MGET, so that `QueryCacheManager.get_cache_data` calls within the
+    context are served from memory instead of going to Redis one by one. Keys not passed in here fall back to the
+    usual lookup.
+
+    Target ages set within the context are buffered and written with a single pipelined ZADD batch on exit.
+    """
+    if _get_prefetched_results() is not None:
+        # Already prefetching further up the stack, keep using that batch
+        yield
+        return
+
+    prefetched_results: dict[str, Optional[dict]] = {}
+    keys_to_fetch = []
+    local_cache = get_local_query_cache()
+    for cache_key in dict.fromkeys(cache_keys):
+        local_response = local_cache.get(cache_key) if local_cache is not None else None
+        if local_response is not None:
+            prefetched_results[cache_key] = local_response
+        else:
+            keys_to_fetch.append(cache_key)
+
+    if keys_to_fetch:
+        try:
+            cached_responses_bytes: dict[str, bytes] = cache.get_many(keys_to_fetch)
+        except Exception as e:
+            # Leave the keys out of the batch, each query then falls back to its own lookup
+            logger.warning("query_cache_prefetch_failed", error=str(e))
+        else:
+            for cache_key in keys_to_fetch:
+                cached_response_bytes = cached_responses_bytes.get(cache_key)
+                prefetched_results[cache_key] = (
+                    QueryCacheManager.decode_cache_data(cache_key, cached_response_bytes)
+                    if cached_response_bytes
+                    else None
+                )
+
+    _thread_locals.prefetched_results = prefetched_results
+    _thread_locals.pending_target_ages = {}
+    try:
+        yield
+    finally:
+        pending_target_ages = _get_pending_target_ages() or {}
+        _thread_locals.prefetched_results = None
+        _thread_locals.pending_target_ages = None
+        if pending_target_ages:
+            pipeline = redis.get_client().pipeline(transaction=False)
+            for team_id, target_ages in pending_target_ages.items():
+                pipeline.zadd(f"cache_timestamps:{team_id}", target_ages)
+            pipeline.execute()
+
 
 class QueryCacheManager:
     """
@@ -81,6 +299,11 @@ class QueryCacheManager:
         if not self.insight_id:
             return
 
+        pending_target_ages = _get_pending_target_ages()
+        if pending_target_ages is not None:
+            pending_target_ages.setdefault(self.team_id, {})[self.identifier] = target_age.timestamp()
+            return
+
         self.redis_client.zadd(
             f"cache_timestamps:{self.team_id}",
             {self.identifier: target_age.timestamp()},
@@ -90,11 +313,20 @@ class QueryCacheManager:
         if not self.insight_id:
             return
 
+        pending_target_ages = _get_pending_target_ages()
+        if pending_target_ages is not None:
+            pending_target_ages.get(self.team_id, {}).pop(self.identifier, None)
+
         self.redis_client.zrem(f"cache_timestamps:{self.team_id}", self.identifier)
 
     def set_cache_data(self, *, response: dict, target_age: Optional[datetime]) -> None:
         fresh_response_serialized = OrjsonJsonSerializer({}).dumps(response)
         cache.set(self.cache_key, fresh_response_serialized, settings.CACHED_RESULTS_TTL)
+        self._invalidate_local_caches(response)
+
+        prefetched_results = _get_prefetched_results()
+        if prefetched_results is not None:
+            prefetched_results.pop(self.cache_key, None)
 
         if target_age:
             self.update_target_age(target_age)
@@ -102,8 +334,47 @@ class QueryCacheManager:
             self.remove_last_refresh()
 
     def get_cache_data(self) -> Optional[dict]:
+        prefetched_results = _get_prefetched_results()
+        if prefetched_results is not None and self.cache_key in prefetched_results:
+            prefetched_response = prefetched_results[self.cache_key]
+            return dict(prefetched_response) if prefetched_response is not None else None
+
+        local_cache = get_local_query_cache()
+        if local_cache is not None:
+            local_response = local_cache.get(self.cache_key)
+            LOCAL_QUERY_CACHE_COUNTER.labels(result="hit" if local_response is not None else "miss").inc()
+            if local_response is not None:
+                return local_response
+
         cached_response_bytes: Optional[bytes] = get_safe_cache(self.cache_key)
         if not cached_response_bytes:
             return None
 
-        return OrjsonJsonSerializer({}).loads(cached_response_bytes)
+        cached_response = self.decode_cache_data(self.cache_key, cached_response_bytes)
+        return dict(cached_response) if isinstance(cached_response, dict) else cached_response
+
+    @staticmethod
+    def decode_cache_data(cache_key: str, cached_response_bytes: bytes) -> Any:
+        cached_response = OrjsonJsonSerializer({}).loads(cached_response_bytes)
+        local_cache = get_local_query_cache()
+        if local_cache is not None and isinstance(cached_response, dict):
+            local_cache.set(cache_key, cached_response_bytes, last_refresh=cached_response.get("last_refresh"))
+        return cached_response
+
+    def _invalidate_local_caches(self, response: dict[str, Any]) -> None:
+        local_cache = get_local_query_cache()
+        if local_cache is None:
+            return
+
+        # Serialize `last_refresh` the same way it's stored in Redis, so that it compares equal to decoded entries
+        last_refresh = orjson.loads(OrjsonJsonSerializer({}).dumps(response.get("last_refresh")))
+        local_cache.invalidate(self.cache_key, unless_last_refresh=last_refresh)
+        if settings.TEST:
+            return
+        try:
+            self.redis_client.publish(
+                QUERY_CACHE_INVALIDATION_CHANNEL,
+                orjson.dumps({"cache_key": self.cache_key, "last_refresh": last_refresh}),
+            )
+        except Exception as e:
+            logger.warning("query_cache_invalidation_publish_failed", error=str(e))
@@ -445,6 +445,48 @@ class TestEventsQueryRunner(ClickhouseTestMixin, APIBaseTest):
         self.assertEqual(len(response.results), 1)
         self.assertEqual(response.results[0][0]["properties"]["attr"], "no div")
 
+    def test_expands_asterisk_and_person_columns(self):
+        _create_person(team_id=self.team.pk, distinct_ids=["with_person"], properties={"email": "tim@posthog.com"})
+        elements = [
+            Element(tag_name="button", attr_class=["btn"], text="Submit", nth_child=0, nth_of_type=0),
+            Element(tag_name="div", nth_child=1, nth_of_type=0),
+        ]
+        for distinct_id, timestamp in [
+            ("with_person", "2020-01-11T12:00:01Z"),
+            ("with_person", "2020-01-11T12:00:02Z"),
+            ("without_person", "2020-01-11T12:00:03Z"),
+        ]:
+            _create_event(
+                event="$autocapture",
+                team=self.team,
+                distinct_id=distinct_id,
+                timestamp=timestamp,
+                properties={"attr": distinct_id},
+                elements=elements,
+            )
+        flush_persons_and_events()
+
+        query = EventsQuery(
+            after="all",
+            kind="EventsQuery",
+            select=["*", "event", "person"],
+            orderBy=["timestamp ASC"],
+        )
+        response = EventsQueryRunner(query=query, team=self.team).calculate()
+
+        assert [row[0]["properties"]["attr"] for row in response.results] == [
+            "with_person",
+            "with_person",
+            "without_person",
+        ]
+        assert [row[1] for row in response.results] == ["$autocapture"] * 3
+        # Events with the same elements chain get the same elements
+        assert [element["tag_name"] for element in response.results[0][0]["elements"]] == ["button", "div"]
+        assert response.results[2][0]["elements"] == response.results[0][0]["elements"]
+        assert response.results[0][2]["properties"] == {"email": "tim@posthog.com"}
+        assert response.results[1][2]["distinct_id"] == "with_person"
+        assert response.results[2][2] == {"distinct_id": "without_person"}
+
     @snapshot_clickhouse_queries
     @freeze_time("2021-01-21")
     def test_presorted_events_table(self):
@@ -505,6 +547,44 @@ class TestEventsQueryRunner(ClickhouseTestMixin, APIBaseTest):
 
         assert response_regular.results == response_presorted.results
 
+    @freeze_time("2021-01-21")
+    def test_cursor_pagination(self):
+        self._create_events(
+            data=[
+                ("p1", "2020-01-20T12:00:04Z", {"index": 0}),
+                ("p1", "2020-01-20T12:00:04Z", {"index": 1}),
+                ("p2", "2020-01-20T12:00:04Z", {"index": 2}),
+                ("p2", "2020-01-20T12:00:14Z", {"index": 3}),
+                ("p3", "2020-01-20T12:00:24Z", {"index": 4}),
+            ]
+        )
+        flush_persons_and_events()
+
+        for modifiers in (HogQLQueryModifiers(), HogQLQueryModifiers(usePresortedEventsTable=True)):
+            with self.subTest(modifiers=modifiers):
+                pages: list[list] = []
+                cursor: str | None = ""
+                while cursor is not None:
+                    query = EventsQuery(
+                        after="-7d",
+                        kind="EventsQuery",
+                        select=["uuid", "properties.index", "timestamp"],
+                        limit=2,
+                        cursor=cursor,
+                    )
+                    response = EventsQueryRunner(query=query, team=self.team, modifiers=modifiers).calculate()
+                    if cursor:
+                        self.assertIn("less(timestamp, ", response.hogql)
+                    pages.append(response.results)
+                    cursor = response.nextCursor
+
+                self.assertEqual([len(page) for page in pages], [2, 2, 1])
+                rows = [row for page in pages for row in page]
+                self.assertEqual([row[1] for row in rows[:2]], [4, 3])
+                # Events with the same timestamp are neither repeated nor skipped between pages
+                self.assertEqual(len({row[0] for row in rows}), 5)
+                self.assertEqual({row[1] for row in rows[2:]}, {0, 1, 2})
+
     def test_select_person_column(self):
         self._create_events(
             [
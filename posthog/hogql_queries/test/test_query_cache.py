@@ -0,0 +1,173 @@
+from datetime import datetime, UTC
+from unittest.mock import patch
+
+import orjson
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posthog.hogql_queries import query_cache
+from posthog import redis
+from posthog.hogql_queries.query_cache import LocalQueryCache, QueryCacheManager, prefetched_query_cache
+
+
+def _serialized(results: str, size: int) -> bytes:
+    """A serialized response of exactly `size` bytes"""
+    serialized = orjson.dumps({"results": results.ljust(size - 14)})
+    assert len(serialized) == size
+    return serialized
+
+
+class TestLocalQueryCache(TestCase):
+    def test_get_returns_a_copy(self):
+        local_cache = LocalQueryCache(max_bytes=1000, ttl_seconds=60)
+        local_cache.set("key", orjson.dumps({"results": [[1, {"a": 1}]]}), last_refresh=None)
+
+        first = local_cache.get("key")
+        assert first is not None
+        first["is_cached"] = True
+        first["results"][0][1]["a"] = 2
+
+        self.assertEqual(local_cache.get("key"), {"results": [[1, {"a": 1}]]})
+
+    def test_evicts_least_recently_used_when_over_byte_budget(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=60)
+        local_cache.set("a", _serialized("a", 40), last_refresh=None)
+        local_cache.set("b", _serialized("b", 40), last_refresh=None)
+        local_cache.get("a")
+        local_cache.set("c", _serialized("c", 40), last_refresh=None)
+
+        self.assertIsNotNone(local_cache.get("a"))
+        self.assertIsNone(local_cache.get("b"))
+        self.assertIsNotNone(local_cache.get("c"))
+        self.assertEqual(local_cache.current_bytes, 80)
+
+    def test_skips_entries_larger_than_budget(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=60)
+        local_cache.set("a", _serialized("a", 101), last_refresh=None)
+
+        self.assertIsNone(local_cache.get("a"))
+        self.assertEqual(local_cache.current_bytes, 0)
+
+    def test_expires_entries_after_ttl(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=60)
+        with patch("posthog.hogql_queries.query_cache.time.monotonic", return_value=1000):
+            local_cache.set("a", _serialized("a", 40), last_refresh=None)
+        with patch("posthog.hogql_queries.query_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(local_cache.get("a"))
+
+    def test_invalidate_keeps_entry_with_matching_last_refresh(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=60)
+        local_cache.set("a", _serialized("a", 40), last_refresh="2024-01-01T00:00:00Z")
+
+        local_cache.invalidate("a", unless_last_refresh="2024-01-01T00:00:00Z")
+        self.assertIsNotNone(local_cache.get("a"))
+
+        local_cache.invalidate("a", unless_last_refresh="2024-01-02T00:00:00Z")
+        self.assertIsNone(local_cache.get("a"))
+
+    def test_does_not_cache_results_older_than_an_announced_one(self):
+        local_cache = LocalQueryCache(max_bytes=100, ttl_seconds=60)
+        local_cache.invalidate("a", unless_last_refresh="2024-01-02T00:00:00Z")
+
+        # Read from Redis before the newer result was written
+        local_cache.set("a", _serialized("a", 40), last_refresh="2024-01-01T00:00:00Z")
+        self.assertIsNone(local_cache.get("a"))
+        local_cache.set("a", _serialized("a", 40), last_refresh=None)
+        self.assertIsNone(local_cache.get("a"))
+
+        local_cache.set("a", _serialized("a", 40), last_refresh="2024-01-02T00:00:00Z")
+        self.assertIsNotNone(local_cache.get("a"))
+
+        # An older announcement doesn't replace a newer one
+        local_cache.invalidate("b", unless_last_refresh="2024-01-02T00:00:00Z")
+        local_cache.invalidate("b", unless_last_refresh="2024-01-01T00:00:00Z")
+        local_cache.set("b", _serialized("b", 40), last_refresh="2024-01-01T12:00:00Z")
+        self.assertIsNone(local_cache.get("b"))
+
+
+@override_settings(QUERY_CACHE_LOCAL_MAX_BYTES=10_000)
+class TestQueryCacheManagerLocalTier(TestCase):
+    def setUp(self):
+        super().setUp()
+        query_cache._local_query_cache = None
+        cache.clear()
+
+    def tearDown(self):
+        query_cache._local_query_cache = None
+        super().tearDown()
+
+    def test_second_read_is_served_from_local_tier(self):
+        manager = QueryCacheManager(team_id=1, cache_key="cache_key_1")
+        manager.set_cache_data(response={"results": [1, 2], "last_refresh": datetime.now(UTC)}, target_age=None)
+
+        with patch("posthog.hogql_queries.query_cache.get_safe_cache", wraps=query_cache.get_safe_cache) as spy:
+            first = manager.get_cache_data()
+            second = manager.get_cache_data()
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second["results"], [1, 2])  # type: ignore
+
+    def test_set_cache_data_invalidates_local_tier(self):
+        manager = QueryCacheManager(team_id=1, cache_key="cache_key_1")
+        manager.set_cache_data(response={"results": [1], "last_refresh": datetime.now(UTC)}, target_age=None)
+        manager.get_cache_data()
+
+        manager.set_cache_data(response={"results": [2], "last_refresh": datetime.now(UTC)}, target_age=None)
+
+        self.assertEqual(manager.get_cache_data()["results"], [2])  # type: ignore
+
+    @override_settings(QUERY_CACHE_LOCAL_MAX_BYTES=0)
+    def test_local_tier_disabled_by_default(self):
+        self.assertIsNone(query_cache.get_local_query_cache())
+
+
+class TestPrefetchedQueryCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        redis.get_client().delete("cache_timestamps:1")
+
+    def test_prefetch_serves_reads_from_a_single_fetch(self):
+        for i in range(3):
+            QueryCacheManager(team_id=1, cache_key=f"key_{i}").set_cache_data(
+                response={"results": [i]}, target_age=None
+            )
+
+        with patch("posthog.hogql_queries.query_cache.cache.get_many", wraps=cache.get_many) as get_many_spy:
+            with prefetched_query_cache(["key_0", "key_1", "key_2", "missing_key"]):
+                with patch("posthog.hogql_queries.query_cache.get_safe_cache") as get_safe_cache_mock:
+                    results = [QueryCacheManager(team_id=1, cache_key=f"key_{i}").get_cache_data() for i in range(3)]
+                    missing = QueryCacheManager(team_id=1, cache_key="missing_key").get_cache_data()
+
+        self.assertEqual(get_many_spy.call_count, 1)
+        get_safe_cache_mock.assert_not_called()
+        self.assertEqual([result["results"] for result in results], [[0], [1], [2]])  # type: ignore
+        self.assertIsNone(missing)
+
+    def test_keys_outside_the_prefetch_fall_back_to_regular_lookup(self):
+        QueryCacheManager(team_id=1, cache_key="other_key").set_cache_data(response={"results": [1]}, target_age=None)
+
+        with prefetched_query_cache([]):
+            self.assertEqual(QueryCacheManager(team_id=1, cache_key="other_key").get_cache_data(), {"results": [1]})
+
+    def test_set_cache_data_replaces_prefetched_result(self):
+        manager = QueryCacheManager(team_id=1, cache_key="key_0")
+        manager.set_cache_data(response={"results": [0]}, target_age=None)
+
+        with prefetched_query_cache(["key_0"]):
+            manager.set_cache_data(response={"results": [1]}, target_age=None)
+            self.assertEqual(manager.get_cache_data(), {"results": [1]})
+
+    def test_target_ages_are_written_in_one_batch_on_exit(self):
+        target_age = datetime(2024, 1, 1, tzinfo=UTC)
+
+        with prefetched_query_cache([]):
+            QueryCacheManager(team_id=1, cache_key="key_0", insight_id=1).update_target_age(target_age)
+            QueryCacheManager(team_id=1, cache_key="key_1", insight_id=2, dashboard_id=3).update_target_age(target_age)
+            self.assertEqual(redis.get_client().zcard("cache_timestamps:1"), 0)
+
+        self.assertEqual(
+            redis.get_client().zrange("cache_timestamps:1", 0, -1, withscores=True),
+            [(b"1:", target_age.timestamp()), (b"2:3", target_age.timestamp())],
+        )
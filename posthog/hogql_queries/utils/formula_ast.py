@@ -1,9 +1,31 @@
 import ast
+import math
 import operator
+from functools import lru_cache
 from typing import Any
 
+import numpy as np
+
+# Integers (and float64 values holding integers) are exact up to here. Beyond it Python's arbitrary precision integers
+# and float64 would disagree, so we let Python do the math.
+MAX_EXACT_INTEGER = 2**53
+
+
+class _NotVectorizable(Exception):
+    """Raised when evaluating a formula column-wise could give different results than evaluating it row by row."""
+
+
+class CompiledFormula:
+    """
+    A formula parsed once, evaluated over whole series at a time.
+
+    Series are evaluated column-wise with NumPy. Each intermediate value is a float64 array together with a mask of
+    which elements Python would hold as an `int`, so that results are the same numbers, of the same types, as
+    evaluating the formula row by row in Python: Division or modulo by zero results in an integer 0, operations on
+    integers give integers unless they're divisions, and NaN propagates. Whenever that can't be guaranteed (e.g.
+    values beyond float64's exact integer range or non-numeric values), we evaluate the formula row by row instead.
+    """
 
-class FormulaAST:
     op_map = {
         ast.Add: operator.add,
         ast.Sub: operator.sub,
@@ -12,28 +34,43 @@ class FormulaAST:
         ast.Mod: operator.mod,
         ast.Pow: operator.pow,
     }
-    zipped_data: list[tuple[float]]
 
-    def __init__(self, data: list[list[float]]):
-        self.zipped_data = list(zip(*data))
+    def __init__(self, formula: str):
+        self.formula = formula.lower()
+        self._tree: ast.Module | None = None
 
-    def call(self, node: str):
+    @property
+    def tree(self) -> ast.Module:
+        # Parse lazily, so that invalid formulas only raise when there's data to apply them to
+        if self._tree is None:
+            self._tree = ast.parse(self.formula)
+        return self._tree
+
+    def evaluate(self, data: list[list[float]]) -> list:
+        """Apply the formula to each row across `data`, where each series is named by a letter, starting with `a`."""
+        length = min((len(series) for series in data), default=0)
+        if length == 0:
+            return []
+
+        try:
+            columns = {_name(index): _to_column(series[:length]) for index, series in enumerate(data)}
+            with np.errstate(all="ignore"):
+                values, is_int = self._evaluate_vectorized(self.tree, columns, length)
+            return _to_list(values, is_int)
+        except _NotVectorizable:
+            return self._evaluate_rows(data)
+
+    def _evaluate_rows(self, data: list[list[float]]) -> list:
         res = []
-        for consts in self.zipped_data:
-            map = {}
-            for index, value in enumerate(consts):
-                map[chr(ord("`") + index + 1)] = value
-            result = self._evaluate(node.lower(), map)
-            res.append(result)
+        for consts in zip(*data):
+            const_map = {_name(index): value for index, value in enumerate(consts)}
+            res.append(self._evaluate(self.tree, const_map))
         return res
 
     def _evaluate(self, node, const_map: dict[str, Any]):
         if isinstance(node, list | tuple):
             return [self._evaluate(sub_node, const_map) for sub_node in node]
 
-        elif isinstance(node, str):
-            return self._evaluate(ast.parse(node), const_map)
-
         elif isinstance(node, ast.Module):
             values = []
             for body in node.body:
@@ -65,8 +102,8 @@ class FormulaAST:
                 return operand
             raise ValueError(f"Operator {unary_op.__class__.__name__} not supported")
 
-        elif isinstance(node, ast.Num):
-            return node.n
+        elif isinstance(node, ast.Constant) and isinstance(node.value, int | float | complex):
+            return node.value
 
         elif isinstance(node, ast.Name):
             try:
@@ -75,3 +112,153 @@ class FormulaAST:
                 raise ValueError(f"Constant {node.id} not supported")
 
         raise TypeError(f"Unsupported operation: {node.__class__.__name__}")
+
+    def _evaluate_vectorized(
+        self, node, columns: dict[str, tuple[np.ndarray, np.ndarray]], length: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if isinstance(node, ast.Module):
+            if len(node.body) != 1:
+                # Rows evaluate to lists of values
+                raise _NotVectorizable()
+            return self._evaluate_vectorized(node.body[0], columns, length)
+
+        elif isinstance(node, ast.Expr):
+            return self._evaluate_vectorized(node.value, columns, length)
+
+        elif isinstance(node, ast.BinOp):
+            left = self._evaluate_vectorized(node.left, columns, length)
+            right = self._evaluate_vectorized(node.right, columns, length)
+            op = node.op
+            if type(op) not in self.op_map:
+                raise ValueError(f"Operator {op.__class__.__name__} not supported")
+            return _normalize_ints(_BINARY_OPERATIONS[type(op)](left, right))
+
+        elif isinstance(node, ast.UnaryOp):
+            values, is_int = self._evaluate_vectorized(node.operand, columns, length)
+            unary_op = node.op
+            if isinstance(unary_op, ast.USub):
+                return _normalize_ints((-values, is_int))
+            elif isinstance(unary_op, ast.UAdd):
+                return values, is_int
+            raise ValueError(f"Operator {unary_op.__class__.__name__} not supported")
+
+        elif isinstance(node, ast.Constant) and isinstance(node.value, int | float | complex):
+            value = node.value
+            if isinstance(value, complex) or (isinstance(value, int) and abs(value) >= MAX_EXACT_INTEGER):
+                raise _NotVectorizable()
+            return np.full(length, value, dtype=np.float64), np.full(length, isinstance(value, int))
+
+        elif isinstance(node, ast.Name):
+            try:
+                return columns[node.id]
+            except KeyError:
+                raise ValueError(f"Constant {node.id} not supported")
+
+        raise TypeError(f"Unsupported operation: {node.__class__.__name__}")
+
+
+def _name(index: int) -> str:
+    return chr(ord("`") + index + 1)
+
+
+def _to_column(series: list) -> tuple[np.ndarray, np.ndarray]:
+    types = set(map(type, series))
+    if not types <= {int, float}:
+        raise _NotVectorizable()
+
+    try:
+        values = np.array(series, dtype=np.float64)
+    except OverflowError:
+        raise _NotVectorizable()
+    if types == {float}:
+        is_int = np.zeros(len(series), dtype=bool)
+    elif types == {int}:
+        is_int = np.ones(len(series), dtype=bool)
+    else:
+        is_int = np.fromiter((type(value) is int for value in series), dtype=bool, count=len(series))
+
+    return _normalize_ints((values, is_int))
+
+
+def _normalize_ints(value: tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    values, is_int = value
+    if not is_int.any():
+        return value
+    if np.abs(values[is_int]).max() >= MAX_EXACT_INTEGER:
+        raise _NotVectorizable()
+    # Python integers have no negative zero, adding a positive zero drops it
+    return np.where(is_int, values + 0.0, values), is_int
+
+
+def _to_list(values: np.ndarray, is_int: np.ndarray) -> list:
+    if not is_int.any():
+        return values.tolist()
+    if is_int.all():
+        return values.astype(np.int64).tolist()
+    return [int(value) if value_is_int else value for value, value_is_int in zip(values.tolist(), is_int.tolist())]
+
+
+def _add(left, right):
+    return left[0] + right[0], left[1] & right[1]
+
+
+def _subtract(left, right):
+    return left[0] - right[0], left[1] & right[1]
+
+
+def _multiply(left, right):
+    return left[0] * right[0], left[1] & right[1]
+
+
+def _divide(left, right):
+    # Python raises ZeroDivisionError, which formulas turn into an integer 0
+    by_zero = right[0] == 0
+    return np.where(by_zero, 0.0, left[0] / np.where(by_zero, 1.0, right[0])), by_zero
+
+
+def _modulo(left, right):
+    by_zero = right[0] == 0
+    if not (np.isfinite(left[0]) & np.isfinite(right[0]))[~by_zero].all():
+        # NumPy and Python disagree on some modulos of infinities
+        raise _NotVectorizable()
+    values = np.where(by_zero, 0.0, np.mod(left[0], np.where(by_zero, 1.0, right[0])))
+    return values, (left[1] & right[1]) | by_zero
+
+
+def _power(left, right):
+    base, exponent = left[0], right[0]
+    if ((base < 0) & (exponent != np.floor(exponent)) & np.isfinite(exponent)).any():
+        # Python returns complex numbers
+        raise _NotVectorizable()
+
+    by_zero = (base == 0) & (exponent < 0)
+    exponent = np.where(by_zero, 1.0, exponent)
+    try:
+        # Python computes powers with the C library's `pow`, which rounds differently than NumPy's
+        values = np.array([math.pow(b, e) for b, e in zip(base.tolist(), exponent.tolist())], dtype=np.float64)
+    except (OverflowError, ValueError):
+        raise _NotVectorizable()
+    return np.where(by_zero, 0.0, values), (left[1] & right[1] & (exponent >= 0) & ~by_zero) | by_zero
+
+
+_BINARY_OPERATIONS = {
+    ast.Add: _add,
+    ast.Sub: _subtract,
+    ast.Mult: _multiply,
+    ast.Div: _divide,
+    ast.Mod: _modulo,
+    ast.Pow: _power,
+}
+
+
+@lru_cache(maxsize=1024)
+def compile_formula(formula: str) -> CompiledFormula:
+    return CompiledFormula(formula)
+
+
+class FormulaAST:
+    def __init__(self, data: list[list[float]]):
+        self.data = data
+
+    def call(self, node: str):
+        return compile_formula(node).evaluate(self.data)
@@ -0,0 +1,223 @@
+import contextvars
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Optional, TypeVar
+
+from django.conf import settings
+from django.db import connections
+from prometheus_client import Counter, Gauge
+
+T = TypeVar("T")
+
+SUBQUERY_EXECUTOR_TASKS_COUNTER = Counter(
+    "posthog_insight_subquery_executor_tasks_total",
+    "Insight subqueries run, by whether they ran on the calling thread or in the shared pool.",
+    labelnames=["result"],
+)
+SUBQUERY_EXECUTOR_QUEUED_GAUGE = Gauge(
+    "posthog_insight_subquery_executor_queued",
+    "Insight subqueries waiting for a worker of the shared pool.",
+)
+
+_worker = threading.local()
+
+
+class _WorkItem:
+    def __init__(self, fn: Callable[[], Any]):
+        self.future: Future = Future()
+        self.fn = fn
+        # Run the subquery with the submitter's context variables, e.g. its query tags
+        self.context = contextvars.copy_context()
+
+    def run(self) -> None:
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.context.run(self.fn)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+
+class SubqueryExecutor:
+    """
+    Process-wide pool of threads for running the subqueries of insights, e.g. one query per trends series.
+
+    Work is queued per team, and workers take turns between teams with queued work, so that a team running many large
+    insights can't starve others. No team has more than `max_workers_per_team` subqueries running in the pool at once.
+
+    Workers are long-lived and keep their Postgres connections between subqueries, instead of opening and closing one
+    per subquery. A worker exits, closing its connections, once it has been idle for `idle_timeout` seconds.
+    """
+
+    def __init__(
+        self, *, max_workers: int, max_workers_per_team: int, idle_timeout: float = 60, thread_name_prefix: str = ""
+    ):
+        self.max_workers = max_workers
+        self.max_workers_per_team = max_workers_per_team
+        self.idle_timeout = idle_timeout
+        self.thread_name_prefix = thread_name_prefix or "subquery_executor"
+        self._condition = threading.Condition()
+        self._queues: dict[int, deque[_WorkItem]] = {}
+        # Teams with queued work that can run more subqueries, in turn order
+        self._ready: deque[int] = deque()
+        self._running: dict[int, int] = {}
+        self._queued = 0
+        self._workers = 0
+        self._idle_workers = 0
+        self._worker_counter = 0
+
+    def submit(self, team_id: int, fn: Callable[[], T]) -> "Future[T]":
+        item = _WorkItem(fn)
+        with self._condition:
+            self._queues.setdefault(team_id, deque()).append(item)
+            self._make_ready(team_id)
+            self._queued += 1
+            SUBQUERY_EXECUTOR_QUEUED_GAUGE.inc()
+            if self._runnable() > self._idle_workers and self._workers < self.max_workers:
+                self._start_worker()
+            self._condition.notify()
+        return item.future
+
+    def run_all(self, team_id: int, tasks: list[Callable[[], T]], *, max_parallelism: Optional[int] = None) -> list[T]:
+        """
+        Runs `tasks` concurrently, returning their results in order, or raising the first error.
+
+        Like in the pool, each task runs in a copy of the caller's context. The calling thread runs tasks too instead of
+        only waiting on the pool, so a busy pool slows insights down but never stalls them. At most `max_parallelism`
+        tasks run at once, including the one on the calling thread.
+
+        Called from within a subquery, e.g. by a runner running another runner, tasks run one after another on the
+        calling thread, so that subqueries never wait on the pool they're occupying.
+        """
+        parallelism = len(tasks) if max_parallelism is None else min(max(max_parallelism, 1), len(tasks))
+        if parallelism <= 1 or getattr(_worker, "executor", None) is self:
+            SUBQUERY_EXECUTOR_TASKS_COUNTER.labels(result="caller").inc(len(tasks))
+            return [contextvars.copy_context().run(task) for task in tasks]
+
+        results: list[Any] = [None] * len(tasks)
+        pending = deque(range(len(tasks)))
+        in_flight: dict[Future, int] = {}
+
+        def collect(futures) -> None:
+            for future in futures:
+                results[in_flight.pop(future)] = future.result()
+
+        def submit_pending() -> None:
+            # One slot of the parallelism is the calling thread's
+            while len(pending) > 1 and len(in_flight) < parallelism - 1:
+                index = pending.popleft()
+                in_flight[self.submit(team_id, tasks[index])] = index
+
+        try:
+            submit_pending()
+            while pending:
+                index = pending.popleft()
+                SUBQUERY_EXECUTOR_TASKS_COUNTER.labels(result="caller").inc()
+                results[index] = contextvars.copy_context().run(tasks[index])
+                collect([future for future in in_flight if future.done()])
+                submit_pending()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+                submit_pending()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        return results
+
+    def _make_ready(self, team_id: int) -> None:
+        if (
+            self._queues.get(team_id)
+            and self._running.get(team_id, 0) < self.max_workers_per_team
+            and team_id not in self._ready
+        ):
+            self._ready.append(team_id)
+
+    def _runnable(self) -> int:
+        """How many queued subqueries can start now, leaving out those held back by the per-team limit"""
+        return sum(
+            min(len(self._queues[team_id]), self.max_workers_per_team - self._running.get(team_id, 0))
+            for team_id in self._ready
+        )
+
+    def _start_worker(self) -> None:
+        self._workers += 1
+        self._worker_counter += 1
+        thread = threading.Thread(
+            target=self._work, name=f"{self.thread_name_prefix}_{self._worker_counter}", daemon=True
+        )
+        thread.start()
+
+    def _next_item(self) -> Optional[tuple[int, _WorkItem]]:
+        with self._condition:
+            while not self._ready:
+                self._idle_workers += 1
+                notified = self._condition.wait(timeout=self.idle_timeout)
+                self._idle_workers -= 1
+                if not notified and not self._ready:
+                    self._workers -= 1
+                    return None
+
+            team_id = self._ready.popleft()
+            queue = self._queues[team_id]
+            item = queue.popleft()
+            if not queue:
+                del self._queues[team_id]
+            self._running[team_id] = self._running.get(team_id, 0) + 1
+            self._make_ready(team_id)
+            self._queued -= 1
+            SUBQUERY_EXECUTOR_QUEUED_GAUGE.dec()
+            return team_id, item
+
+    def _finish_item(self, team_id: int) -> None:
+        with self._condition:
+            self._running[team_id] -= 1
+            if self._running[team_id] == 0:
+                del self._running[team_id]
+            # The team may have been waiting on its limit, this worker picks its work up next if it's its turn
+            self._make_ready(team_id)
+
+    def _work(self) -> None:
+        _worker.executor = self
+        try:
+            while (next_item := self._next_item()) is not None:
+                team_id, item = next_item
+                try:
+                    _close_unusable_connections()
+                    SUBQUERY_EXECUTOR_TASKS_COUNTER.labels(result="pool").inc()
+                    item.run()
+                finally:
+                    self._finish_item(team_id)
+        finally:
+            # This only closes the connections of this thread
+            connections.close_all()
+
+
+def _close_unusable_connections() -> None:
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None and connection.errors_occurred and not connection.is_usable():
+            connection.close()
+
+
+_subquery_executor: Optional[SubqueryExecutor] = None
+_subquery_executor_lock = threading.Lock()
+
+
+def get_subquery_executor() -> SubqueryExecutor:
+    global _subquery_executor
+
+    if _subquery_executor is None:
+        with _subquery_executor_lock:
+            if _subquery_executor is None:
+                _subquery_executor = SubqueryExecutor(
+                    max_workers=settings.INSIGHT_SUBQUERY_MAX_WORKERS,
+                    max_workers_per_team=settings.INSIGHT_SUBQUERY_MAX_WORKERS_PER_TEAM,
+                    idle_timeout=settings.INSIGHT_SUBQUERY_WORKER_IDLE_TIMEOUT_SECONDS,
+                    thread_name_prefix="insight_subquery",
+                )
+    return _subquery_executor
@@ -1,3 +1,5 @@
+import math
+
 from posthog.hogql_queries.utils.formula_ast import FormulaAST
 from posthog.test.base import APIBaseTest
 
@@ -66,3 +68,52 @@ class TestFormulaAST(APIBaseTest):
         formula = self._get_formula_ast()
         response = formula.call("+A")
         self.assertListEqual([1, 2, 3, 4], response)
+
+    def test_division_zero_keeps_other_values(self):
+        formula = FormulaAST(data=[[1, 2, 3, 4], [0, 2, 0, 0.5]])
+        response = formula.call("A/B")
+        self.assertListEqual([0, 1.0, 0, 8.0], response)
+        self.assertListEqual([int, float, int, float], [type(value) for value in response])
+
+    def test_modulo_zero(self):
+        formula = FormulaAST(data=[[5, 7, 9], [0, 3, 0.0]])
+        response = formula.call("A%B")
+        self.assertListEqual([0, 1, 0], response)
+        self.assertListEqual([int, int, int], [type(value) for value in response])
+
+    def test_keeps_integers_and_floats_apart(self):
+        formula = FormulaAST(data=[[1, 2.5, 3], [2, 2, 2.0]])
+        response = formula.call("A*B-1")
+        self.assertListEqual([1, 4.0, 5.0], response)
+        self.assertListEqual([int, float, float], [type(value) for value in response])
+
+    def test_nan_propagates(self):
+        formula = FormulaAST(data=[[1.0, float("nan")], [2, 2]])
+        response = formula.call("A+B")
+        self.assertEqual(3.0, response[0])
+        self.assertTrue(math.isnan(response[1]))
+
+    def test_negative_power(self):
+        formula = FormulaAST(data=[[0, 2, 4]])
+        response = formula.call("A**-1")
+        self.assertListEqual([0, 0.5, 0.25], response)
+
+    def test_large_integers(self):
+        formula = FormulaAST(data=[[2**60, 2**62], [3, 5]])
+        response = formula.call("A*B+1")
+        self.assertListEqual([3 * 2**60 + 1, 5 * 2**62 + 1], response)
+
+    def test_series_of_different_lengths(self):
+        formula = FormulaAST(data=[[1, 2, 3], [1, 2]])
+        response = formula.call("A+B")
+        self.assertListEqual([2, 4], response)
+
+    def test_empty_series(self):
+        formula = FormulaAST(data=[[], []])
+        response = formula.call("A+")
+        self.assertListEqual([], response)
+
+    def test_unsupported_constant(self):
+        formula = self._get_formula_ast()
+        with self.assertRaises(ValueError):
+            formula.call("A+Z")
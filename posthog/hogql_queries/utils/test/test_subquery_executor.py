@@ -0,0 +1,136 @@
+import contextvars
+import threading
+import time
+from unittest import TestCase
+
+from posthog.hogql_queries.utils.subquery_executor import SubqueryExecutor
+
+test_var: contextvars.ContextVar[str] = contextvars.ContextVar("test_var", default="unset")
+
+
+class TestSubqueryExecutor(TestCase):
+    def test_run_all_returns_results_in_order(self):
+        executor = SubqueryExecutor(max_workers=4, max_workers_per_team=4)
+
+        def task(index: int):
+            def run():
+                time.sleep(0.01 * (5 - index))
+                return index
+
+            return run
+
+        assert executor.run_all(1, [task(index) for index in range(5)]) == [0, 1, 2, 3, 4]
+        assert executor.run_all(1, [task(index) for index in range(5)], max_parallelism=2) == [0, 1, 2, 3, 4]
+        assert executor.run_all(1, []) == []
+
+    def test_run_all_raises_errors(self):
+        executor = SubqueryExecutor(max_workers=4, max_workers_per_team=4)
+
+        def fail():
+            raise ValueError("Subquery failed")
+
+        with self.assertRaisesRegex(ValueError, "Subquery failed"):
+            executor.run_all(1, [lambda: 1, fail, lambda: 3])
+
+    def test_limits_parallelism_per_team_and_call(self):
+        executor = SubqueryExecutor(max_workers=8, max_workers_per_team=2)
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def task():
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+        executor.run_all(1, [task] * 8)
+        # Two in the pool, and one on the calling thread
+        assert max_running == 3
+
+        max_running = 0
+        executor.run_all(1, [task] * 8, max_parallelism=2)
+        assert max_running == 2
+
+    def test_takes_turns_between_teams(self):
+        executor = SubqueryExecutor(max_workers=1, max_workers_per_team=1)
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def task(name: str, block: bool = False):
+            def run():
+                order.append(name)
+                if block:
+                    started.set()
+                    release.wait(5)
+
+            return run
+
+        futures = [executor.submit(1, task("team 1, task 1", block=True))]
+        started.wait(5)
+        futures.append(executor.submit(1, task("team 1, task 2")))
+        futures.append(executor.submit(1, task("team 1, task 3")))
+        futures.append(executor.submit(2, task("team 2, task 1")))
+        release.set()
+        for future in futures:
+            future.result(5)
+
+        # Team 1 is at its limit while its first task runs, so team 2 goes next
+        assert order == ["team 1, task 1", "team 2, task 1", "team 1, task 2", "team 1, task 3"]
+
+    def test_does_not_start_workers_for_subqueries_held_back_by_the_team_limit(self):
+        executor = SubqueryExecutor(max_workers=4, max_workers_per_team=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        futures = [executor.submit(1, block)]
+        started.wait(5)
+        futures += [executor.submit(1, lambda: None) for _ in range(3)]
+
+        assert executor._workers == 1
+        release.set()
+        for future in futures:
+            future.result(5)
+
+    def test_runs_tasks_with_the_callers_context(self):
+        executor = SubqueryExecutor(max_workers=2, max_workers_per_team=2)
+
+        def task():
+            value = test_var.get()
+            test_var.set("changed by task")
+            return value
+
+        test_var.set("caller")
+        assert executor.run_all(1, [task] * 3) == ["caller"] * 3
+        assert test_var.get() == "caller"
+
+    def test_nested_run_all_runs_on_the_calling_thread(self):
+        executor = SubqueryExecutor(max_workers=1, max_workers_per_team=1)
+
+        def nested():
+            return threading.current_thread(), executor.run_all(1, [threading.current_thread] * 2)
+
+        results = executor.run_all(1, [nested, nested])
+        # One task ran in the pool, and its own tasks ran on the pool's thread
+        pool_results = [result for result in results if result[0] is not threading.current_thread()]
+        assert len(pool_results) == 1
+        pool_thread, nested_threads = pool_results[0]
+        assert nested_threads == [pool_thread, pool_thread]
+
+    def test_idle_workers_exit(self):
+        executor = SubqueryExecutor(max_workers=2, max_workers_per_team=2, idle_timeout=0.05)
+
+        executor.run_all(1, [lambda: time.sleep(0.01)] * 3)
+        assert executor._workers == 2
+
+        time.sleep(0.2)
+        assert executor._workers == 0
+        assert executor.run_all(1, [lambda: 1] * 3) == [1, 1, 1]
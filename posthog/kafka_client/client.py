@@ -1,17 +1,28 @@
+import atexit
+import functools
 import json
+import math
+import weakref
+import threading
+import time
+from collections import Counter as CollectionsCounter, deque
 from enum import StrEnum
-from typing import Any, Optional
+from typing import Any, NamedTuple, Optional
 from collections.abc import Callable
 
+import orjson
 from django.conf import settings
 from kafka import KafkaConsumer as KC
 from kafka import KafkaProducer as KP
+from kafka.errors import KafkaTimeoutError
+from kafka.future import Future
 from kafka.producer.future import (
     FutureProduceResult,
     FutureRecordMetadata,
     RecordMetadata,
 )
 from kafka.structs import TopicPartition
+from prometheus_client import Counter, Gauge
 from statshog.defaults.django import statsd
 from structlog import get_logger
 
@@ -23,6 +34,16 @@ KAFKA_PRODUCER_RETRIES = 5
 
 logger = get_logger(__name__)
 
+KAFKA_PRODUCER_MESSAGES_COUNTER = Counter(
+    "posthog_kafka_producer_messages_total",
+    "Messages produced to Kafka, by whether they were buffered, delivered, or failed to be delivered.",
+    labelnames=["topic", "result"],
+)
+KAFKA_PRODUCER_BUFFERED_GAUGE = Gauge(
+    "posthog_kafka_producer_buffered_messages",
+    "Messages waiting in the produce buffers to be handed to Kafka.",
+)
+
 
 class KafkaProducerForTests:
     def __init__(self):
@@ -83,6 +104,236 @@ class KafkaConsumerForTests:
         return
 
 
+class BufferedRecordFuture(Future):
+    """
+    The future of a message in the produce buffer, resolved with the record metadata once Kafka acknowledges it.
+    Like `FutureRecordMetadata`, it can be waited on with `get`.
+
+    It's resolved from the Kafka client's thread while callers may still be adding callbacks, so its state is guarded
+    by the lock of its buffer, and callbacks are called outside of it.
+    """
+
+    is_done: bool
+    value: Any
+    exception: Optional[BaseException]
+    _callbacks: list[Callable[[Any], Any]]
+    _errbacks: list[Callable[[Any], Any]]
+
+    def __init__(self, lock: threading.Lock):
+        super().__init__()
+        self._lock = lock
+        # Only created for futures that are waited on
+        self._waiter: Optional[threading.Event] = None
+
+    def success(self, value):
+        with self._lock:
+            assert not self.is_done, "Future is already complete"
+            self.value = value
+            self.is_done = True
+            callbacks, self._callbacks, self._errbacks = self._callbacks, [], []
+            waiter = self._waiter
+        if waiter is not None:
+            waiter.set()
+        self._call_backs("callback", callbacks, value)
+        return self
+
+    def failure(self, e):
+        with self._lock:
+            assert not self.is_done, "Future is already complete"
+            self.exception = e if type(e) is not type else e()
+            self.is_done = True
+            errbacks, self._callbacks, self._errbacks = self._errbacks, [], []
+            waiter = self._waiter
+        if waiter is not None:
+            waiter.set()
+        self._call_backs("errback", errbacks, self.exception)
+        return self
+
+    def add_callback(self, f, *args, **kwargs):
+        if args or kwargs:
+            f = functools.partial(f, *args, **kwargs)
+        with self._lock:
+            if not self.is_done:
+                self._callbacks.append(f)
+                return self
+        if not self.exception:
+            self._call_backs("callback", [f], self.value)
+        return self
+
+    def add_errback(self, f, *args, **kwargs):
+        if args or kwargs:
+            f = functools.partial(f, *args, **kwargs)
+        with self._lock:
+            if not self.is_done:
+                self._errbacks.append(f)
+                return self
+        if self.exception:
+            self._call_backs("errback", [f], self.exception)
+        return self
+
+    def get(self, timeout=None):
+        with self._lock:
+            if not self.is_done and self._waiter is None:
+                self._waiter = threading.Event()
+            waiter = self._waiter
+        if not self.is_done and waiter is not None and not waiter.wait(timeout):
+            raise KafkaTimeoutError(f"Timeout after waiting for {timeout} secs.")
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+class _BufferedMessage(NamedTuple):
+    topic: str
+    value: bytes
+    key: Optional[bytes]
+    headers: Optional[list[tuple[str, bytes]]]
+    future: BufferedRecordFuture
+
+
+class _ProduceBuffer:
+    """
+    Hands messages to the Kafka client from a background thread, in batches of whatever accumulated while the
+    previous batch was handed over, or within `linger_seconds` of the first message.
+
+    `send` only blocks when `max_messages` messages are already buffered, so that a stalled Kafka client applies
+    backpressure instead of buffering without bound. `flush` waits for buffered messages to be handed to the client,
+    and `close` also stops the background thread.
+
+    Deliveries and failures are tallied in memory and reported to statsd and Prometheus once per batch (and at least
+    every `REPORT_INTERVAL_SECONDS`), rather than per message: reporting each of them is a syscall that hands the GIL
+    back and forth between this thread and the ones producing, which would make buffering slower than not buffering.
+    """
+
+    REPORT_INTERVAL_SECONDS = 1.0
+
+    def __init__(self, producer, *, max_messages: int, linger_seconds: float):
+        self.producer = producer
+        self.max_messages = max(max_messages, 1)
+        self.linger_seconds = linger_seconds
+        self._messages: deque[_BufferedMessage] = deque()
+        self._handing_over = 0
+        self._flushing = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._futures_lock = threading.Lock()
+        self._accounting_lock = threading.Lock()
+        self._delivered: CollectionsCounter[str] = CollectionsCounter()
+        self._failed: CollectionsCounter[tuple[str, str]] = CollectionsCounter()
+        # Flushed on exit by `_flush_produce_buffers`, without keeping the buffer alive
+        _produce_buffers.add(self)
+        self._thread = threading.Thread(target=self._run, name="kafka_produce_buffer", daemon=True)
+        self._thread.start()
+
+    def send(
+        self, topic: str, value: bytes, key: Optional[bytes], headers: Optional[list[tuple[str, bytes]]]
+    ) -> BufferedRecordFuture:
+        # Metrics are updated from the background thread, to keep this as cheap as possible for the caller
+        future = BufferedRecordFuture(self._futures_lock)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Can't send messages to a closed produce buffer")
+            while len(self._messages) >= self.max_messages:
+                self._condition.wait()
+            self._messages.append(_BufferedMessage(topic, value, key, headers, future))
+            if len(self._messages) == 1:
+                self._condition.notify_all()
+        return future
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Returns whether all buffered messages were handed to the Kafka client within `timeout` seconds"""
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(lambda: not self._messages and not self._handing_over, timeout)
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Hands buffered messages over and stops the background thread, after which messages can't be sent"""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        _produce_buffers.discard(self)
+
+    def report_deliveries(self) -> None:
+        # Held while reporting, so that deliveries are reported once this returns, even if the runner was reporting them
+        with self._accounting_lock:
+            delivered, self._delivered = self._delivered, CollectionsCounter()
+            failed, self._failed = self._failed, CollectionsCounter()
+            for topic, count in delivered.items():
+                statsd.incr("posthog_cloud_kafka_send_success", count, tags={"topic": topic})
+                KAFKA_PRODUCER_MESSAGES_COUNTER.labels(topic=topic, result="delivered").inc(count)
+            for (topic, exception), count in failed.items():
+                statsd.incr("posthog_cloud_kafka_send_failure", count, tags={"topic": topic, "exception": exception})
+                KAFKA_PRODUCER_MESSAGES_COUNTER.labels(topic=topic, result="failed").inc(count)
+
+    def _on_delivered(self, topic: str, record_metadata: RecordMetadata) -> None:
+        with self._accounting_lock:
+            self._delivered[topic] += 1
+
+    def _on_failed(self, topic: str, exc: Exception) -> None:
+        with self._accounting_lock:
+            self._failed[(topic, exc.__class__.__name__)] += 1
+
+    def _next_batch(self) -> list[_BufferedMessage]:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._messages or self._closed, self.REPORT_INTERVAL_SECONDS):
+                return []
+            if not self._messages:
+                return []
+            deadline = time.monotonic() + self.linger_seconds
+            while (
+                not self._flushing
+                and len(self._messages) < self.max_messages
+                and (remaining := deadline - time.monotonic()) > 0
+            ):
+                self._condition.wait(remaining)
+            batch = list(self._messages)
+            self._messages.clear()
+            self._handing_over = len(batch)
+            # Wake up senders waiting for room in the buffer
+            self._condition.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        while not self._closed or self._messages:
+            batch = self._next_batch()
+            for topic, count in CollectionsCounter(message.topic for message in batch).items():
+                KAFKA_PRODUCER_MESSAGES_COUNTER.labels(topic=topic, result="buffered").inc(count)
+            for message in batch:
+                try:
+                    self.producer.send(
+                        message.topic, value=message.value, key=message.key, headers=message.headers
+                    ).add_callback(self._on_delivered, message.topic).add_errback(self._on_failed, message.topic).chain(
+                        message.future
+                    )
+                except Exception as e:
+                    self._on_failed(message.topic, e)
+                    message.future.failure(e)
+            with self._condition:
+                self._handing_over = 0
+                self._condition.notify_all()
+            self.report_deliveries()
+
+
+_produce_buffers: "weakref.WeakSet[_ProduceBuffer]" = weakref.WeakSet()
+KAFKA_PRODUCER_BUFFERED_GAUGE.set_function(lambda: sum(len(buffer) for buffer in list(_produce_buffers)))
+
+
+@atexit.register
+def _flush_produce_buffers() -> None:
+    # Hand buffered messages over before the Kafka clients flush their own buffers on exit
+    for buffer in list(_produce_buffers):
+        buffer.flush()
+
+
 class _KafkaSecurityProtocol(StrEnum):
     PLAINTEXT = "PLAINTEXT"
     SSL = "SSL"
@@ -103,6 +354,16 @@ def _sasl_params():
     return {}
 
 
+def _has_non_finite_float(value: Any) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(item) for item in value.values())
+    if isinstance(value, list | tuple):
+        return any(_has_non_finite_float(item) for item in value)
+    return False
+
+
 class _KafkaProducer:
     def __init__(
         self,
@@ -114,6 +375,8 @@ class _KafkaProducer:
         kafka_security_protocol=None,
         max_request_size=None,
         compression_type=None,
+        buffered=None,
+        json_default: Optional[Callable[[Any], Any]] = None,
     ):
         if settings.TEST:
             test = True  # Set at runtime so that overriden settings.TEST is supported
@@ -123,6 +386,9 @@ class _KafkaProducer:
             kafka_hosts = settings.KAFKA_HOSTS
         if kafka_base64_keys is None:
             kafka_base64_keys = settings.KAFKA_BASE64_KEYS
+        if buffered is None:
+            buffered = settings.KAFKA_PRODUCER_BUFFERED
+        self.json_default = json_default
 
         if test:
             self.producer = KafkaProducerForTests()
@@ -142,15 +408,38 @@ class _KafkaProducer:
                 **_sasl_params(),
             )
 
+        self.buffer = (
+            _ProduceBuffer(
+                self.producer,
+                max_messages=settings.KAFKA_PRODUCER_BUFFER_MAX_MESSAGES,
+                linger_seconds=settings.KAFKA_PRODUCER_BUFFER_LINGER_MS / 1000,
+            )
+            if buffered
+            else None
+        )
+
     @staticmethod
-    def json_serializer(d):
-        b = json.dumps(d).encode("utf-8")
-        return b
+    def json_serializer(d, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        """
+        Serializes with orjson, which is several times faster than json. orjson also serializes datetimes, UUIDs and
+        dataclasses, and `default` is called for any other type it can't serialize. Values orjson rejects but json
+        accepts (e.g. integers beyond 64 bits) are serialized with json, so no message that used to be produced fails.
+        Messages with NaN or Infinity are serialized with json too, as orjson writes them as null where json keeps them.
+        """
+        try:
+            serialized = orjson.dumps(d, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return json.dumps(d, default=default).encode("utf-8")
+        if b"null" in serialized and _has_non_finite_float(d):
+            return json.dumps(d, default=default).encode("utf-8")
+        return serialized
 
     def on_send_success(self, record_metadata: RecordMetadata):
         statsd.incr("posthog_cloud_kafka_send_success", tags={"topic": record_metadata.topic})
+        KAFKA_PRODUCER_MESSAGES_COUNTER.labels(topic=record_metadata.topic, result="delivered").inc()
 
     def on_send_failure(self, topic: str, exc: Exception):
+        KAFKA_PRODUCER_MESSAGES_COUNTER.labels(topic=topic, result="failed").inc()
         statsd.incr(
             "posthog_cloud_kafka_send_failure",
             tags={"topic": topic, "exception": exc.__class__.__name__},
@@ -164,24 +453,33 @@ class _KafkaProducer:
         value_serializer: Optional[Callable[[Any], Any]] = None,
         headers: Optional[list[tuple[str, str]]] = None,
     ):
-        if not value_serializer:
-            value_serializer = self.json_serializer
-        b = value_serializer(data)
+        # Serialized here rather than in the buffer, as callers may go on to modify `data`
+        b = value_serializer(data) if value_serializer else self.json_serializer(data, default=self.json_default)
         if key is not None:
             key = key.encode("utf-8")
         encoded_headers = (
             [(header[0], header[1].encode("utf-8")) for header in headers] if headers is not None else None
         )
+        if self.buffer is not None:
+            # The buffer records if the send request was successful or not
+            return self.buffer.send(topic, value=b, key=key, headers=encoded_headers)
+
         future = self.producer.send(topic, value=b, key=key, headers=encoded_headers)
         # Record if the send request was successful or not
         future.add_callback(self.on_send_success).add_errback(lambda exc: self.on_send_failure(topic=topic, exc=exc))
         return future
 
     def flush(self, timeout=None):
+        if self.buffer is not None:
+            self.buffer.flush(timeout)
         self.producer.flush(timeout)
+        if self.buffer is not None:
+            self.buffer.report_deliveries()
 
     def close(self):
-        self.producer.flush()
+        self.flush()
+        if self.buffer is not None:
+            self.buffer.close()
 
 
 def can_connect():
@@ -197,7 +495,8 @@ def can_connect():
     every 10 seconds.
     """
     try:
-        _KafkaProducer(test=settings.TEST)
+        # Not buffered, as that would start a background thread for each check
+        _KafkaProducer(test=settings.TEST, buffered=False)
     except Exception:
         logger.debug("kafka_connection_failure", exc_info=True)
         return False
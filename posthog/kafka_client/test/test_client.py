@@ -1,9 +1,20 @@
-from unittest.mock import patch
+import json
+import threading
+import uuid
+from datetime import datetime, UTC
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
 
 import kafka
 from django.test import TestCase, override_settings
 
-from posthog.kafka_client.client import _KafkaProducer, build_kafka_consumer
+from posthog.kafka_client.client import (
+    KAFKA_PRODUCER_MESSAGES_COUNTER,
+    KafkaProducerForTests,
+    _KafkaProducer,
+    build_kafka_consumer,
+    can_connect,
+)
 
 
 @override_settings(TEST=False)
@@ -75,3 +86,135 @@ class KafkaClientTestCase(TestCase):
             producer = _KafkaProducer(test=False)
         for key, value in expected_sasl_config.items():
             self.assertEqual(value, producer.producer.config[key])  # type: ignore
+
+
+class KafkaProducerSerializationTestCase(TestCase):
+    def test_json_serializer_matches_json(self):
+        payload = {"foo": "bar", "nested": {"list": [1, 2.5, None, True]}, "unicode": "héllo ✓", 1: "int key"}
+
+        assert json.loads(_KafkaProducer.json_serializer(payload)) == json.loads(json.dumps(payload))
+
+    def test_json_serializer_serializes_non_standard_types(self):
+        event_uuid = uuid.uuid4()
+
+        serialized = _KafkaProducer.json_serializer(
+            {"uuid": event_uuid, "timestamp": datetime(2024, 1, 1, tzinfo=UTC), "amount": Decimal("1.5")},
+            default=str,
+        )
+
+        assert json.loads(serialized) == {
+            "uuid": str(event_uuid),
+            "timestamp": "2024-01-01T00:00:00+00:00",
+            "amount": "1.5",
+        }
+        with self.assertRaises(TypeError):
+            _KafkaProducer.json_serializer({"amount": Decimal("1.5")})
+
+    def test_json_serializer_falls_back_to_json(self):
+        assert json.loads(_KafkaProducer.json_serializer({"big": 2**70})) == {"big": 2**70}
+
+    def test_json_serializer_keeps_nan_and_infinity_like_json(self):
+        payload = {"nan": float("nan"), "nested": [float("inf"), -float("inf"), None], "finite": 1.5}
+
+        assert _KafkaProducer.json_serializer(payload) == json.dumps(payload).encode("utf-8")
+        assert (
+            _KafkaProducer.json_serializer(payload)
+            == b'{"nan": NaN, "nested": [Infinity, -Infinity, null], "finite": 1.5}'
+        )
+
+    def test_produce_uses_json_default(self):
+        producer = _KafkaProducer(test=True, json_default=str)
+        with patch.object(producer.producer, "send", wraps=producer.producer.send) as send:
+            producer.produce(topic="test_topic", data={"amount": Decimal("1.5")})
+
+        assert json.loads(send.call_args.kwargs["value"]) == {"amount": "1.5"}
+
+
+class KafkaProducerBufferTestCase(TestCase):
+    def test_buffered_produce_delivers_messages(self):
+        producer = _KafkaProducer(test=True, buffered=True)
+        assert producer.buffer is not None
+
+        with patch.object(producer.producer, "send", wraps=producer.producer.send) as send:
+            futures = [producer.produce(topic="test_topic", data={"index": index}) for index in range(100)]
+            producer.flush()
+
+        assert [json.loads(call.kwargs["value"])["index"] for call in send.call_args_list] == list(range(100))
+        for future in futures:
+            future.get(timeout=1)
+
+    def test_buffered_produce_accounts_for_deliveries(self):
+        def count(result: str) -> float:
+            return KAFKA_PRODUCER_MESSAGES_COUNTER.labels(topic="accounting_topic", result=result)._value.get()
+
+        buffered_before, delivered_before = count("buffered"), count("delivered")
+        producer = _KafkaProducer(test=True, buffered=True)
+
+        for index in range(3):
+            producer.produce(topic="accounting_topic", data={"index": index})
+        producer.flush()
+
+        assert count("buffered") - buffered_before == 3
+        assert count("delivered") - delivered_before == 3
+
+    def test_buffered_produce_reports_failures(self):
+        producer = _KafkaProducer(test=True, buffered=True)
+        on_failure = MagicMock()
+
+        with patch.object(producer.producer, "send", side_effect=kafka.errors.KafkaTimeoutError("no metadata")):
+            future = producer.produce(topic="test_topic", data={"foo": "bar"})
+            future.add_errback(on_failure)
+            producer.flush()
+
+        with self.assertRaises(kafka.errors.KafkaTimeoutError):
+            future.get(timeout=1)
+        on_failure.assert_called_once()
+
+    @override_settings(KAFKA_PRODUCER_BUFFER_MAX_MESSAGES=2)
+    def test_buffered_produce_blocks_when_buffer_is_full(self):
+        started = threading.Event()
+        release = threading.Event()
+        test_producer = KafkaProducerForTests()
+
+        def blocking_send(topic, value, **kwargs):
+            started.set()
+            release.wait(5)
+            return KafkaProducerForTests.send(test_producer, topic, value)
+
+        producer = _KafkaProducer(test=True, buffered=True)
+        patcher = patch.object(producer.producer, "send", side_effect=blocking_send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        assert producer.buffer is not None
+
+        # The first message is being handed over, two more fill the buffer
+        producer.produce(topic="test_topic", data={"index": 0})
+        assert started.wait(5)
+        for index in range(1, 3):
+            producer.produce(topic="test_topic", data={"index": index})
+        blocked = threading.Thread(target=producer.produce, kwargs={"topic": "test_topic", "data": {"index": 3}})
+        blocked.start()
+        blocked.join(0.1)
+        assert blocked.is_alive()
+
+        release.set()
+        blocked.join(5)
+        assert not blocked.is_alive()
+        assert producer.buffer.flush(timeout=5)
+
+    def test_close_stops_the_buffer_thread(self):
+        producer = _KafkaProducer(test=True, buffered=True)
+        assert producer.buffer is not None
+        future = producer.produce(topic="test_topic", data={"foo": "bar"})
+
+        producer.close()
+
+        future.get(timeout=1)
+        assert not producer.buffer._thread.is_alive()
+        with self.assertRaises(RuntimeError):
+            producer.produce(topic="test_topic", data={"foo": "bar"})
+
+    def test_can_connect_does_not_buffer(self):
+        with patch("posthog.kafka_client.client._ProduceBuffer") as produce_buffer:
+            assert can_connect()
+        produce_buffer.assert_not_called()
@@ -0,0 +1,98 @@
+import random
+import time
+import uuid
+
+import orjson
+from django.core.management.base import BaseCommand
+
+from products.batch_exports.backend.temporal.compression import (
+    BrotliStreamCompressor,
+    GzipStreamCompressor,
+    LZ4StreamCompressor,
+    StreamCompressor,
+    ZstdStreamCompressor,
+)
+
+# Roughly the size of a record batch dumped to JSONL by the batch export writers.
+WRITE_SIZE = 256 * 1024
+
+COMPRESSORS: list[tuple[str, type[StreamCompressor], dict]] = [
+    ("gzip", GzipStreamCompressor, {}),
+    ("brotli q5", BrotliStreamCompressor, {"level": 5}),
+    ("brotli q11", BrotliStreamCompressor, {}),
+    ("zstd 1", ZstdStreamCompressor, {"level": 1, "threads": 0}),
+    ("zstd 3", ZstdStreamCompressor, {"level": 3, "threads": 0}),
+    ("zstd 3 mt", ZstdStreamCompressor, {"level": 3, "threads": -1}),
+    ("lz4", LZ4StreamCompressor, {}),
+]
+
+
+def generate_jsonl(size: int) -> list[bytes]:
+    """Generate writes of JSONL events adding up to roughly `size` bytes."""
+    rand = random.Random(0)
+    writes = []
+    current: list[bytes] = []
+    current_size = 0
+    total = 0
+    while total < size:
+        line = (
+            orjson.dumps(
+                {
+                    "uuid": str(uuid.UUID(int=rand.getrandbits(128))),
+                    "event": rand.choice(["$pageview", "$autocapture", "$identify", "signed_up"]),
+                    "distinct_id": f"user-{rand.randint(0, 10_000)}",
+                    "timestamp": f"2024-01-01T{rand.randint(0, 23):02}:{rand.randint(0, 59):02}:00Z",
+                    "properties": {
+                        "$current_url": f"https://example.com/{rand.choice(['docs', 'pricing', 'blog'])}/{rand.randint(0, 500)}",
+                        "$browser": rand.choice(["Chrome", "Firefox", "Safari"]),
+                        "$os": rand.choice(["Mac OS X", "Windows", "Linux", "iOS"]),
+                        "$screen_width": rand.choice([1280, 1440, 1920]),
+                        "value": rand.random(),
+                    },
+                }
+            )
+            + b"\n"
+        )
+        current.append(line)
+        current_size += len(line)
+        total += len(line)
+        if current_size >= WRITE_SIZE:
+            writes.append(b"".join(current))
+            current = []
+            current_size = 0
+    if current:
+        writes.append(b"".join(current))
+    return writes
+
+
+class Command(BaseCommand):
+    help = "Compare throughput per core and compression ratio of batch export stream compressors on JSONL events"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--megabytes",
+            type=int,
+            default=64,
+            help="Megabytes of JSONL to compress with each compressor (default: 64)",
+        )
+
+    def handle(self, *args, **options):
+        writes = generate_jsonl(options["megabytes"] * 1024 * 1024)
+        input_megabytes = sum(len(write) for write in writes) / 1024 / 1024
+
+        for name, compressor_class, kwargs in COMPRESSORS:
+            compressor = compressor_class(**kwargs)
+
+            # CPU time adds up the time of all threads, which gives us throughput per core
+            # even for multithreaded compressors.
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            output_size = sum(len(compressor.compress(write)) for write in writes) + len(compressor.finish())
+            cpu_elapsed = time.process_time() - cpu_start
+            wall_elapsed = time.perf_counter() - wall_start
+
+            self.stdout.write(
+                f"{name:<11} {input_megabytes / cpu_elapsed:>9.1f} MB/s per core"
+                f" {input_megabytes / wall_elapsed:>9.1f} MB/s wall"
+                f" ratio {input_megabytes * 1024 * 1024 / output_size:>6.2f}"
+            )
@@ -0,0 +1,119 @@
+import json
+import random
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from kafka.future import Future
+from kafka.producer.future import RecordMetadata
+from kafka.structs import TopicPartition
+
+from posthog.kafka_client.client import _KafkaProducer
+
+TOPIC = "benchmark_kafka_producer"
+
+
+class NullKafkaClient:
+    """Acknowledges every message immediately, so that only the cost of the wrapper is measured."""
+
+    def send(self, topic, value, key=None, headers=None):
+        return Future().success(RecordMetadata(topic, 0, TopicPartition(topic, 0), 0, 0, 0, None, 0, len(value), 0))
+
+    def flush(self, timeout=None):
+        pass
+
+
+def generate_messages(count: int) -> list[dict]:
+    """Generate messages shaped like the app metrics, log entries and person updates produced from request threads."""
+    rand = random.Random(0)
+    return [
+        {
+            "team_id": rand.randint(1, 10_000),
+            "id": str(uuid.UUID(int=rand.getrandbits(128))),
+            "timestamp": f"2024-01-01 {rand.randint(0, 23):02}:{rand.randint(0, 59):02}:00.000000",
+            "properties": json.dumps(
+                {
+                    "email": f"user-{rand.randint(0, 100_000)}@example.com",
+                    "$browser": rand.choice(["Chrome", "Firefox", "Safari"]),
+                    "$initial_referrer": f"https://example.com/{rand.randint(0, 500)}",
+                }
+            ),
+            "is_identified": rand.choice([0, 1]),
+            "is_deleted": 0,
+            "version": rand.randint(0, 100),
+            "metrics": {"successes": rand.randint(0, 1000), "failures": rand.randint(0, 10)},
+        }
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Measure messages per second serialized and produced by the Kafka producer wrapper, on the calling thread"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=100_000,
+            help="Number of messages to serialize and produce in each mode (default: 100000)",
+        )
+        parser.add_argument(
+            "--burst",
+            type=int,
+            default=10,
+            help="Messages produced between simulated request I/O in the burst scenario (default: 10)",
+        )
+        parser.add_argument(
+            "--kafka",
+            action="store_true",
+            help="Produce to the configured Kafka cluster instead of a client that acknowledges messages immediately",
+        )
+
+    def handle(self, *args, **options):
+        messages = generate_messages(options["messages"])
+
+        serializers: list[tuple[str, Callable[[Any], bytes]]] = [
+            ("json", lambda message: json.dumps(message).encode("utf-8")),
+            ("orjson", _KafkaProducer.json_serializer),
+        ]
+        for name, serializer in serializers:
+            start = time.perf_counter()
+            for message in messages:
+                serializer(message)
+            self._report(f"serialize {name}", len(messages), time.perf_counter() - start)
+
+        for buffered in (False, True):
+            producer = _KafkaProducer(test=not options["kafka"], buffered=buffered)
+            if not options["kafka"]:
+                producer.producer = NullKafkaClient()  # type: ignore[assignment]
+                if producer.buffer is not None:
+                    producer.buffer.producer = producer.producer
+            mode = "buffered" if buffered else "direct"
+
+            # Producing as fast as possible, where all work competes for the same core
+            start = time.perf_counter()
+            for message in messages:
+                producer.produce(topic=TOPIC, data=message)
+            calling_thread_elapsed = time.perf_counter() - start
+            producer.flush()
+            self._report(f"loop {mode}", len(messages), calling_thread_elapsed, time.perf_counter() - start)
+
+            # Producing a few messages at a time in between I/O, like request threads do
+            calling_thread_elapsed = 0.0
+            start = time.perf_counter()
+            for offset in range(0, len(messages), options["burst"]):
+                burst_start = time.perf_counter()
+                for message in messages[offset : offset + options["burst"]]:
+                    producer.produce(topic=TOPIC, data=message)
+                calling_thread_elapsed += time.perf_counter() - burst_start
+                time.sleep(0.0001)
+            producer.close()
+            self._report(f"bursts {mode}", len(messages), calling_thread_elapsed, time.perf_counter() - start)
+
+    def _report(self, name: str, count: int, elapsed: float, total_elapsed: float | None = None):
+        line = f"{name:<18} {count / elapsed:>12,.0f} messages/s"
+        if total_elapsed is not None:
+            line += f" of calling thread time, {count / total_elapsed:>12,.0f} messages/s overall"
+        self.stdout.write(line)
@@ -0,0 +1,137 @@
+import random
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from posthog.hogql_queries.insights.retention_query_runner import RetentionQueryRunner
+from posthog.hogql_queries.insights.trends.breakdown import BREAKDOWN_OTHER_STRING_LABEL
+from posthog.hogql.constants import get_breakdown_limit_for_context
+from posthog.models import Team
+from posthog.queries.util import correct_result_for_sampling
+from posthog.schema import RetentionQueryResponse
+
+
+def generate_rows(intervals: int, breakdowns: int, density: float, seed: int = 0) -> list[tuple]:
+    """Rows shaped like the results of a breakdown retention query: start interval, intervals from base, breakdown, count"""
+    rand = random.Random(seed)
+    rows = []
+    for breakdown in range(breakdowns):
+        for start_interval in range(intervals):
+            cohort_size = rand.randint(1, 10_000)
+            rows.append((start_interval, 0, f"breakdown-{breakdown}", cohort_size))
+            for intervals_from_base in range(1, intervals - start_interval):
+                if rand.random() < density:
+                    rows.append(
+                        (start_interval, intervals_from_base, f"breakdown-{breakdown}", rand.randint(0, cohort_size))
+                    )
+    return rows
+
+
+def format_results_with_dicts(runner: RetentionQueryRunner, rows: list[tuple]) -> list[dict[str, Any]]:
+    """The previous implementation, aggregating into dicts of dicts, kept here as the baseline"""
+    breakdown_totals: dict[str, int] = {}
+    for row in rows:
+        start_interval, intervals_from_base, breakdown_value, count = row
+        if intervals_from_base == 0:
+            breakdown_totals[breakdown_value] = breakdown_totals.get(breakdown_value, 0) + count
+
+    breakdown_limit = (
+        runner.query.breakdownFilter.breakdown_limit
+        if runner.query.breakdownFilter and runner.query.breakdownFilter.breakdown_limit is not None
+        else get_breakdown_limit_for_context(runner.limit_context)
+    )
+    sorted_breakdowns = sorted(breakdown_totals.items(), key=lambda item: (-item[1], item[0]), reverse=False)
+    other_values = {item[0] for item in sorted_breakdowns[breakdown_limit:]}
+
+    aggregated_data: dict[str, dict[int, dict[int, float]]] = {}
+    for row in rows:
+        start_interval, intervals_from_base, breakdown_value, count = row
+        target_breakdown = breakdown_value
+        if breakdown_value in other_values:
+            target_breakdown = BREAKDOWN_OTHER_STRING_LABEL
+        corrected_count = correct_result_for_sampling(count, runner.query.samplingFactor)
+        aggregated_data[target_breakdown] = aggregated_data.get(target_breakdown, {})
+        breakdown_data = aggregated_data[target_breakdown]
+        breakdown_data[start_interval] = breakdown_data.get(start_interval, {})
+        interval_data = breakdown_data[start_interval]
+        interval_data[intervals_from_base] = interval_data.get(intervals_from_base, 0.0) + corrected_count
+
+    final_results: list[dict[str, Any]] = []
+    ordered_breakdown_keys = [item[0] for item in sorted_breakdowns[:breakdown_limit]]
+    if other_values:
+        ordered_breakdown_keys.append(BREAKDOWN_OTHER_STRING_LABEL)
+
+    for breakdown_value in ordered_breakdown_keys:
+        intervals_data: dict[int, dict[int, float]] = aggregated_data.get(breakdown_value, {})
+        for start_interval in range(runner.query_date_range.intervals_between):
+            result_dict: dict[int, float] = intervals_data.get(start_interval, {})
+            values = [
+                {
+                    "count": result_dict.get(return_interval, 0.0),
+                    "label": f"{runner.query_date_range.interval_name.title()} {return_interval}",
+                }
+                for return_interval in range(runner.query_date_range.lookahead)
+            ]
+            final_results.append(
+                {
+                    "values": values,
+                    "label": f"{runner.query_date_range.interval_name.title()} {start_interval}",
+                    "date": runner.get_date(start_interval),
+                    "breakdown_value": breakdown_value,
+                }
+            )
+    return final_results
+
+
+class Command(BaseCommand):
+    help = "Measure the time and memory spent in Python on the results of a breakdown retention query"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervals", type=int, default=365, help="Cohorts and lookahead (default: 365)")
+        parser.add_argument("--breakdowns", type=int, default=50, help="Distinct breakdown values (default: 50)")
+        parser.add_argument("--limit", type=int, default=25, help="Breakdown limit, the rest is 'Other' (default: 25)")
+        parser.add_argument(
+            "--density", type=float, default=0.5, help="Fraction of retention cells with a row (default: 0.5)"
+        )
+        parser.add_argument("--sampling-factor", type=float, default=None, help="Sampling factor of the query")
+
+    def handle(self, *args, **options):
+        runner = RetentionQueryRunner(
+            team=Team(pk=1, timezone="UTC"),
+            query={
+                "kind": "RetentionQuery",
+                "dateRange": {"date_from": f"-{options['intervals']}d"},
+                "retentionFilter": {"period": "Day", "totalIntervals": options["intervals"]},
+                "breakdownFilter": {
+                    "breakdowns": [{"property": "$browser", "type": "event"}],
+                    "breakdown_limit": options["limit"],
+                },
+                "samplingFactor": options["sampling_factor"],
+            },
+        )
+        rows = generate_rows(options["intervals"], options["breakdowns"], options["density"])
+        self.stdout.write(f"{len(rows):,} rows")
+
+        implementations: list[tuple[str, Callable[[list[tuple]], list[dict[str, Any]]]]] = [
+            ("dicts", lambda rows: format_results_with_dicts(runner, rows)),
+            ("numpy", runner._format_results),
+        ]
+        responses = []
+        for name, format_results in implementations:
+            tracemalloc.start()
+            start = time.perf_counter()
+            results = format_results(rows)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"{name:<6} {elapsed * 1000:>10,.0f} ms {peak / 1024 / 1024:>10,.0f} MB peak")
+
+            start = time.perf_counter()
+            responses.append(RetentionQueryResponse(results=results))
+            self.stdout.write(f"{name:<6} {(time.perf_counter() - start) * 1000:>10,.0f} ms to validate the response")
+
+        if responses[0] != responses[1]:
+            raise AssertionError("Implementations returned different results")
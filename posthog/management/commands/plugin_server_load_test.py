@@ -60,6 +60,11 @@ class Command(BaseCommand):
             default="1",
             help="The team to which the events should be associated.",
         )
+        parser.add_argument(
+            "--use-batch-endpoint",
+            action="store_true",
+            help="Submit events in batches to the capture /batch/ endpoint instead of one request per event.",
+        )
 
     def handle(self, *args, **options):
         seed = options.get("seed") or secrets.token_hex(16)
@@ -118,6 +123,7 @@ class Command(BaseCommand):
             event_source="plugin_server_load_test",
             token=token,
             process_person_profile=True,  # allow person profile processing to occur as cfg for this token (team/project)
+            use_batch_endpoint=options["use_batch_endpoint"],
         )
         for future in results:
             try:
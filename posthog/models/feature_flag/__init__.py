@@ -4,6 +4,13 @@ from .feature_flag import (
     set_feature_flags_for_team_in_cache,
     FeatureFlagDashboards,
 )
-from .flag_matching import FeatureFlagMatcher, get_all_feature_flags, get_all_feature_flags_with_details
+from .local_evaluation import clear_local_evaluation_cache
+from .flag_matching import (
+    BulkFeatureFlagMatcher,
+    FeatureFlagMatcher,
+    get_all_feature_flags,
+    get_all_feature_flags_with_details,
+    get_feature_flag_matches_for_distinct_ids,
+)
 from .permissions import can_user_edit_feature_flag
 from .user_blast_radius import get_user_blast_radius
@@ -47,6 +47,9 @@ logger = structlog.get_logger(__name__)
 __LONG_SCALE__ = float(0xFFFFFFFFFFFFFFF)
 
 FLAG_MATCHING_QUERY_TIMEOUT_MS = 500  # 500 ms. Any longer and we'll just error out.
+# Bulk matching runs in background jobs rather than in decide, so it can afford to wait longer for bigger queries
+BULK_FLAG_MATCHING_QUERY_TIMEOUT_MS = 10_000
+BULK_FLAG_MATCHING_BATCH_SIZE = 1000
 
 FLAG_EVALUATION_ERROR_COUNTER = Counter(
     "flag_evaluation_error_total",
@@ -172,6 +175,7 @@ class FeatureFlagMatcher:
         group_property_value_overrides: Optional[dict[str, dict[str, Union[str, int]]]] = None,
         skip_database_flags: bool = False,
         cohorts_cache: Optional[dict[int, CohortOrEmpty]] = None,
+        precomputed_query_conditions: Optional[dict[str, bool]] = None,
     ):
         if group_property_value_overrides is None:
             group_property_value_overrides = {}
@@ -191,6 +195,8 @@ class FeatureFlagMatcher:
         self.property_value_overrides = property_value_overrides
         self.group_property_value_overrides = group_property_value_overrides
         self.skip_database_flags = skip_database_flags
+        # Set when conditions were already fetched for many distinct_ids at once, see `BulkFeatureFlagMatcher`
+        self.precomputed_query_conditions = precomputed_query_conditions
 
         if cohorts_cache is None:
             self.cohorts_cache = {}
@@ -485,16 +491,22 @@ class FeatureFlagMatcher:
         if self.skip_database_flags:
             raise DatabaseError("Database healthcheck failed, not fetching flag conditions.")
 
+        query_conditions = (
+            self.precomputed_query_conditions
+            if self.precomputed_query_conditions is not None
+            else self.query_conditions
+        )
+
         # :TRICKY: Currently this option is only set with the is_not_set operator, but we can shortcircuit the condition check
         # if the person doesn't exist. This is important as it allows resolving flags correctly for non-ingested persons.
         if match_if_entity_doesnt_exist:
             existence_key = f"{ENTITY_EXISTS_PREFIX}{group_type_index if group_type_index is not None else PERSON_KEY}"
-            entity_doesnt_exist = self.query_conditions.get(existence_key) is False
+            entity_doesnt_exist = query_conditions.get(existence_key) is False
             # :TRICKY: We only return if entity doesn't exist, because if it does, we still need to check the condition properly.
             if entity_doesnt_exist:
                 return True
 
-        return self.query_conditions.get(key, False)
+        return query_conditions.get(key, False)
 
     # Define contiguous sub-domains within [0, 1].
     # By looking up a random hash value, you can find the associated variant key.
@@ -514,164 +526,14 @@ class FeatureFlagMatcher:
         try:
             # Some extra wiggle room here for timeouts because this depends on the number of flags as well,
             # and not just the database query.
-            all_conditions: dict = {}
             person_query: QuerySet = Person.objects.db_manager(DATABASE_FOR_PERSONS).filter(
                 team_id=self.team_id,
                 persondistinctid__distinct_id=self.distinct_id,
                 persondistinctid__team_id=self.team_id,
             )
-            basic_group_query: QuerySet = Group.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(
-                team_id=self.team_id
+            all_conditions, person_query, person_fields, group_query_per_group_type_mapping = (
+                self.build_condition_queries(person_query)
             )
-            group_query_per_group_type_mapping: dict[GroupTypeIndex, tuple[QuerySet, list[str]]] = {}
-            # :TRICKY: Create a queryset for each group type that uniquely identifies a group, based on the groups passed in.
-            # If no groups for a group type are passed in, we can skip querying for that group type,
-            # since the result will always be `false`.
-            for group_type, group_key in self.groups.items():
-                group_type_index = self.cache.group_types_to_indexes.get(group_type)
-                if group_type_index is not None:
-                    # a tuple of querySet and field names
-                    group_query_per_group_type_mapping[group_type_index] = (
-                        basic_group_query.filter(group_type_index=group_type_index, group_key=group_key),
-                        [],
-                    )
-
-            person_fields: list[str] = []
-
-            for existence_condition_key in self.has_pure_is_not_conditions:
-                if existence_condition_key == PERSON_KEY:
-                    person_exists = person_query.exists()
-                    all_conditions[f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = person_exists
-                else:
-                    if existence_condition_key not in group_query_per_group_type_mapping:
-                        continue
-
-                    group_query, _ = group_query_per_group_type_mapping[cast(GroupTypeIndex, existence_condition_key)]
-                    group_exists = group_query.exists()
-                    all_conditions[f"{ENTITY_EXISTS_PREFIX}{existence_condition_key}"] = group_exists
-
-            def condition_eval(key, condition):
-                expr = None
-                annotate_query = True
-                nonlocal person_query
-
-                property_list = Filter(data=condition).property_groups.flat
-                properties_with_math_operators = get_all_properties_with_math_operators(
-                    property_list, self.cohorts_cache, self.project_id
-                )
-
-                properties = condition.get("properties")
-                if properties and len(properties) > 0:
-                    # Feature Flags don't support OR filtering yet
-                    target_properties = self.property_value_overrides
-                    if feature_flag.aggregation_group_type_index is not None:
-                        if feature_flag.aggregation_group_type_index not in self.cache.group_type_index_to_name:
-                            target_properties = {}
-                        else:
-                            target_properties = self.group_property_value_overrides.get(
-                                self.cache.group_type_index_to_name[feature_flag.aggregation_group_type_index],
-                                {},
-                            )
-
-                    expr = properties_to_Q(
-                        self.project_id,
-                        property_list,
-                        override_property_values=target_properties,
-                        cohorts_cache=self.cohorts_cache,
-                        using_database=DATABASE_FOR_FLAG_MATCHING,
-                    )
-
-                    # TRICKY: Due to property overrides for cohorts, we sometimes shortcircuit the condition check.
-                    # In that case, the expression is either an explicit True or explicit False, or multiple conditions.
-                    # We can skip going to the database in explicit True|False conditions. This is important
-                    # as it allows resolving flags correctly for non-ingested persons.
-                    # However, this doesn't work for the multiple condition case (when expr has multiple Q objects),
-                    # but it's better than nothing.
-                    # TODO: A proper fix would be to handle cohorts with property overrides before we get to this point.
-                    # Unskip test test_complex_cohort_filter_with_override_properties when we fix this.
-                    if expr == Q(pk__isnull=False):
-                        all_conditions[key] = True
-                        annotate_query = False
-                    elif expr == Q(pk__isnull=True):
-                        all_conditions[key] = False
-                        annotate_query = False
-
-                if annotate_query:
-                    if feature_flag.aggregation_group_type_index is None:
-                        # :TRICKY: Flag matching depends on type of property when doing >, <, >=, <= comparisons.
-                        # This requires a generated field to query in Q objects, which sadly don't allow inlining fields,
-                        # hence we need to annotate the query here, even though these annotations are used much deeper,
-                        # in properties_to_q, in empty_or_null_with_value_q
-                        # These need to come in before the expr so they're available to use inside the expr.
-                        # Same holds for the group queries below.
-                        type_property_annotations = _get_property_type_annotations(properties_with_math_operators)
-                        person_query = person_query.annotate(
-                            **type_property_annotations,
-                            **{
-                                key: ExpressionWrapper(
-                                    cast(Expression, expr if expr else RawSQL("true", [])),
-                                    output_field=BooleanField(),
-                                ),
-                            },
-                        )
-                        person_fields.append(key)
-                    else:
-                        if feature_flag.aggregation_group_type_index not in group_query_per_group_type_mapping:
-                            # ignore flags that didn't have the right groups passed in
-                            return
-                        (
-                            group_query,
-                            group_fields,
-                        ) = group_query_per_group_type_mapping[feature_flag.aggregation_group_type_index]
-                        type_property_annotations = _get_property_type_annotations(properties_with_math_operators)
-                        group_query = group_query.annotate(
-                            **type_property_annotations,
-                            **{
-                                key: ExpressionWrapper(
-                                    cast(Expression, expr if expr else RawSQL("true", [])),
-                                    output_field=BooleanField(),
-                                ),
-                            },
-                        )
-                        group_fields.append(key)
-                        group_query_per_group_type_mapping[feature_flag.aggregation_group_type_index] = (
-                            group_query,
-                            group_fields,
-                        )
-
-            # only fetch all cohorts if not passed in any cached cohorts
-            if not self.cohorts_cache and any(feature_flag.uses_cohorts for feature_flag in self.feature_flags):
-                all_cohorts = {
-                    cohort.pk: cohort
-                    for cohort in Cohort.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(
-                        team__project_id=self.project_id, deleted=False
-                    )
-                }
-                self.cohorts_cache.update(all_cohorts)
-            # release conditions
-            for feature_flag in self.feature_flags:
-                # super release conditions
-                if feature_flag.super_conditions and len(feature_flag.super_conditions) > 0:
-                    condition = feature_flag.super_conditions[0]
-                    prop_key = (condition.get("properties") or [{}])[0].get("key")
-                    if prop_key:
-                        key = f"flag_{feature_flag.pk}_super_condition"
-                        condition_eval(key, condition)
-
-                        is_set_key = f"flag_{feature_flag.pk}_super_condition_is_set"
-                        is_set_condition = {
-                            "properties": [
-                                {
-                                    "key": prop_key,
-                                    "operator": "is_set",
-                                }
-                            ]
-                        }
-                        condition_eval(is_set_key, is_set_condition)
-
-                for index, condition in enumerate(feature_flag.conditions):
-                    key = f"flag_{feature_flag.pk}_condition_{index}"
-                    condition_eval(key, condition)
 
             if len(person_fields) > 0:
                 with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS * 2, DATABASE_FOR_PERSONS):
@@ -679,19 +541,7 @@ class FeatureFlagMatcher:
                     if len(person_query) > 0:
                         all_conditions = {**all_conditions, **person_query[0]}
 
-            if len(group_query_per_group_type_mapping) > 0:
-                with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS * 2, DATABASE_FOR_FLAG_MATCHING):
-                    for (
-                        group_query,
-                        group_fields,
-                    ) in group_query_per_group_type_mapping.values():
-                        # Only query the group if there's a field to query
-                        if len(group_fields) > 0:
-                            group_query = group_query.values(*group_fields)
-                            if len(group_query) > 0:
-                                assert len(group_query) == 1, f"Expected 1 group query result, got {len(group_query)}"
-                                all_conditions = {**all_conditions, **group_query[0]}
-            return all_conditions
+            return {**all_conditions, **self.fetch_group_conditions(group_query_per_group_type_mapping)}
         except DatabaseError as e:
             logger.exception("query_conditions database error", error=str(e), exc_info=True)
             self.failed_to_fetch_conditions = True
@@ -702,6 +552,189 @@ class FeatureFlagMatcher:
             # Covers all cases like invalid JSON, invalid operator, invalid property name, invalid group input format, etc.
             raise
 
+    def build_condition_queries(
+        self, person_query: QuerySet, check_person_exists: bool = True
+    ) -> tuple[dict[str, bool], QuerySet, list[str], dict[GroupTypeIndex, tuple[QuerySet, list[str]]]]:
+        """
+        Annotates `person_query` and one query per passed in group with a boolean field for every flag condition.
+
+        Returns the conditions that could be resolved without querying, the annotated person query and its condition
+        fields, and the annotated group queries with their condition fields.
+        """
+        all_conditions: dict = {}
+        basic_group_query: QuerySet = Group.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(team_id=self.team_id)
+        group_query_per_group_type_mapping: dict[GroupTypeIndex, tuple[QuerySet, list[str]]] = {}
+        # :TRICKY: Create a queryset for each group type that uniquely identifies a group, based on the groups passed in.
+        # If no groups for a group type are passed in, we can skip querying for that group type,
+        # since the result will always be `false`.
+        for group_type, group_key in self.groups.items():
+            group_type_index = self.cache.group_types_to_indexes.get(group_type)
+            if group_type_index is not None:
+                # a tuple of querySet and field names
+                group_query_per_group_type_mapping[group_type_index] = (
+                    basic_group_query.filter(group_type_index=group_type_index, group_key=group_key),
+                    [],
+                )
+
+        person_fields: list[str] = []
+
+        for existence_condition_key in self.has_pure_is_not_conditions:
+            if existence_condition_key == PERSON_KEY:
+                if not check_person_exists:
+                    continue
+                person_exists = person_query.exists()
+                all_conditions[f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = person_exists
+            else:
+                if existence_condition_key not in group_query_per_group_type_mapping:
+                    continue
+
+                group_query, _ = group_query_per_group_type_mapping[cast(GroupTypeIndex, existence_condition_key)]
+                group_exists = group_query.exists()
+                all_conditions[f"{ENTITY_EXISTS_PREFIX}{existence_condition_key}"] = group_exists
+
+        def condition_eval(key, condition):
+            expr = None
+            annotate_query = True
+            nonlocal person_query
+
+            property_list = Filter(data=condition).property_groups.flat
+            properties_with_math_operators = get_all_properties_with_math_operators(
+                property_list, self.cohorts_cache, self.project_id
+            )
+
+            properties = condition.get("properties")
+            if properties and len(properties) > 0:
+                # Feature Flags don't support OR filtering yet
+                target_properties = self.property_value_overrides
+                if feature_flag.aggregation_group_type_index is not None:
+                    if feature_flag.aggregation_group_type_index not in self.cache.group_type_index_to_name:
+                        target_properties = {}
+                    else:
+                        target_properties = self.group_property_value_overrides.get(
+                            self.cache.group_type_index_to_name[feature_flag.aggregation_group_type_index],
+                            {},
+                        )
+
+                expr = properties_to_Q(
+                    self.project_id,
+                    property_list,
+                    override_property_values=target_properties,
+                    cohorts_cache=self.cohorts_cache,
+                    using_database=DATABASE_FOR_FLAG_MATCHING,
+                )
+
+                # TRICKY: Due to property overrides for cohorts, we sometimes shortcircuit the condition check.
+                # In that case, the expression is either an explicit True or explicit False, or multiple conditions.
+                # We can skip going to the database in explicit True|False conditions. This is important
+                # as it allows resolving flags correctly for non-ingested persons.
+                # However, this doesn't work for the multiple condition case (when expr has multiple Q objects),
+                # but it's better than nothing.
+                # TODO: A proper fix would be to handle cohorts with property overrides before we get to this point.
+                # Unskip test test_complex_cohort_filter_with_override_properties when we fix this.
+                if expr == Q(pk__isnull=False):
+                    all_conditions[key] = True
+                    annotate_query = False
+                elif expr == Q(pk__isnull=True):
+                    all_conditions[key] = False
+                    annotate_query = False
+
+            if annotate_query:
+                if feature_flag.aggregation_group_type_index is None:
+                    # :TRICKY: Flag matching depends on type of property when doing >, <, >=, <= comparisons.
+                    # This requires a generated field to query in Q objects, which sadly don't allow inlining fields,
+                    # hence we need to annotate the query here, even though these annotations are used much deeper,
+                    # in properties_to_q, in empty_or_null_with_value_q
+                    # These need to come in before the expr so they're available to use inside the expr.
+                    # Same holds for the group queries below.
+                    type_property_annotations = _get_property_type_annotations(properties_with_math_operators)
+                    person_query = person_query.annotate(
+                        **type_property_annotations,
+                        **{
+                            key: ExpressionWrapper(
+                                cast(Expression, expr if expr else RawSQL("true", [])),
+                                output_field=BooleanField(),
+                            ),
+                        },
+                    )
+                    person_fields.append(key)
+                else:
+                    if feature_flag.aggregation_group_type_index not in group_query_per_group_type_mapping:
+                        # ignore flags that didn't have the right groups passed in
+                        return
+                    (
+                        group_query,
+                        group_fields,
+                    ) = group_query_per_group_type_mapping[feature_flag.aggregation_group_type_index]
+                    type_property_annotations = _get_property_type_annotations(properties_with_math_operators)
+                    group_query = group_query.annotate(
+                        **type_property_annotations,
+                        **{
+                            key: ExpressionWrapper(
+                                cast(Expression, expr if expr else RawSQL("true", [])),
+                                output_field=BooleanField(),
+                            ),
+                        },
+                    )
+                    group_fields.append(key)
+                    group_query_per_group_type_mapping[feature_flag.aggregation_group_type_index] = (
+                        group_query,
+                        group_fields,
+                    )
+
+        # only fetch all cohorts if not passed in any cached cohorts
+        if not self.cohorts_cache and any(feature_flag.uses_cohorts for feature_flag in self.feature_flags):
+            all_cohorts = {
+                cohort.pk: cohort
+                for cohort in Cohort.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(
+                    team__project_id=self.project_id, deleted=False
+                )
+            }
+            self.cohorts_cache.update(all_cohorts)
+        # release conditions
+        for feature_flag in self.feature_flags:
+            # super release conditions
+            if feature_flag.super_conditions and len(feature_flag.super_conditions) > 0:
+                condition = feature_flag.super_conditions[0]
+                prop_key = (condition.get("properties") or [{}])[0].get("key")
+                if prop_key:
+                    key = f"flag_{feature_flag.pk}_super_condition"
+                    condition_eval(key, condition)
+
+                    is_set_key = f"flag_{feature_flag.pk}_super_condition_is_set"
+                    is_set_condition = {
+                        "properties": [
+                            {
+                                "key": prop_key,
+                                "operator": "is_set",
+                            }
+                        ]
+                    }
+                    condition_eval(is_set_key, is_set_condition)
+
+            for index, condition in enumerate(feature_flag.conditions):
+                key = f"flag_{feature_flag.pk}_condition_{index}"
+                condition_eval(key, condition)
+
+        return all_conditions, person_query, person_fields, group_query_per_group_type_mapping
+
+    def fetch_group_conditions(
+        self, group_query_per_group_type_mapping: dict[GroupTypeIndex, tuple[QuerySet, list[str]]]
+    ) -> dict[str, bool]:
+        group_conditions: dict[str, bool] = {}
+        if len(group_query_per_group_type_mapping) > 0:
+            with execute_with_timeout(FLAG_MATCHING_QUERY_TIMEOUT_MS * 2, DATABASE_FOR_FLAG_MATCHING):
+                for (
+                    group_query,
+                    group_fields,
+                ) in group_query_per_group_type_mapping.values():
+                    # Only query the group if there's a field to query
+                    if len(group_fields) > 0:
+                        group_query = group_query.values(*group_fields)
+                        if len(group_query) > 0:
+                            assert len(group_query) == 1, f"Expected 1 group query result, got {len(group_query)}"
+                            group_conditions = {**group_conditions, **group_query[0]}
+        return group_conditions
+
     def hashed_identifier(self, feature_flag: FeatureFlag) -> Optional[str]:
         """
         If aggregating by people, returns distinct_id.
@@ -795,6 +828,192 @@ class FeatureFlagMatcher:
         return entity_to_condition_check
 
 
+class BulkFeatureFlagMatcher:
+    """
+    Evaluates flags for many distinct_ids at once, with the same semantics as a `FeatureFlagMatcher` per distinct_id.
+
+    Instead of one annotated person query per distinct_id, person conditions are fetched with a single set-based query
+    per batch of distinct_ids, and group conditions (groups are shared by all distinct_ids) are fetched once.
+
+    :TRICKY: Flags that filter on the `distinct_id` property resolve it from a per-distinct_id override inside their
+    condition queries, so those can't be shared between distinct_ids and are still evaluated one query per distinct_id.
+    """
+
+    def __init__(
+        self,
+        team_id: int,
+        project_id: int,
+        feature_flags: list[FeatureFlag],
+        distinct_ids: list[str],
+        groups: Optional[dict[GroupTypeName, str]] = None,
+        cache: Optional[FlagsMatcherCache] = None,
+        hash_key_overrides: Optional[dict[str, dict[str, str]]] = None,
+        cohorts_cache: Optional[dict[int, CohortOrEmpty]] = None,
+        batch_size: int = BULK_FLAG_MATCHING_BATCH_SIZE,
+    ):
+        self.team_id = team_id
+        self.project_id = project_id
+        self.feature_flags = feature_flags
+        self.distinct_ids = list(dict.fromkeys(distinct_ids))
+        self.groups = groups or {}
+        self.cache = cache or FlagsMatcherCache(project_id)
+        # distinct_id -> flag key -> hash key, see `get_feature_flag_hash_key_overrides_for_distinct_ids`
+        self.hash_key_overrides = hash_key_overrides or {}
+        self.cohorts_cache = cohorts_cache if cohorts_cache is not None else {}
+        self.batch_size = batch_size
+        # Set when a flag failed to evaluate for any distinct_id, like `errorsWhileComputingFlags` in decide
+        self.errors_while_computing_flags = False
+
+        _, self.group_property_value_overrides = add_local_person_and_group_properties(None, self.groups, {}, {})
+
+    def get_matches(self) -> dict[str, dict[str, FeatureFlagMatch]]:
+        """Returns distinct_id -> flag key -> match. Flags that failed to evaluate are left out, as in decide."""
+        if not self.cohorts_cache and any(feature_flag.uses_cohorts for feature_flag in self.feature_flags):
+            self.cohorts_cache.update(
+                {
+                    cohort.pk: cohort
+                    for cohort in Cohort.objects.db_manager(DATABASE_FOR_FLAG_MATCHING).filter(
+                        team__project_id=self.project_id, deleted=False
+                    )
+                }
+            )
+
+        bulk_flags: list[FeatureFlag] = []
+        per_distinct_id_flags: list[FeatureFlag] = []
+        for feature_flag in self.feature_flags:
+            if self._filters_on_distinct_id(feature_flag):
+                per_distinct_id_flags.append(feature_flag)
+            else:
+                bulk_flags.append(feature_flag)
+
+        query_conditions: dict[str, dict[str, bool]] = {}
+        failed_to_fetch_conditions = False
+        if bulk_flags:
+            try:
+                query_conditions = self._bulk_query_conditions(bulk_flags)
+            except DatabaseError as err:
+                # As with `FeatureFlagMatcher.query_conditions`, flags that need the conditions fail to evaluate,
+                # and the rest are still matched
+                handle_feature_flag_exception(
+                    err, "[Feature Flags] Error fetching flag conditions in bulk", set_healthcheck=False
+                )
+                failed_to_fetch_conditions = True
+
+        matches: dict[str, dict[str, FeatureFlagMatch]] = {}
+        for distinct_id in self.distinct_ids:
+            bulk_matcher = self._matcher(bulk_flags, distinct_id, query_conditions.get(distinct_id, {}))
+            bulk_matcher.failed_to_fetch_conditions = failed_to_fetch_conditions
+            matchers = [
+                (bulk_flags, bulk_matcher),
+                (per_distinct_id_flags, self._matcher(per_distinct_id_flags, distinct_id, None)),
+            ]
+
+            distinct_id_matches: dict[str, FeatureFlagMatch] = {}
+            for flags, matcher in matchers:
+                for feature_flag in flags:
+                    try:
+                        distinct_id_matches[feature_flag.key] = matcher.get_match(feature_flag)
+                    except Exception as err:
+                        self.errors_while_computing_flags = True
+                        handle_feature_flag_exception(
+                            err, "[Feature Flags] Error computing flags in bulk", set_healthcheck=False
+                        )
+            matches[distinct_id] = distinct_id_matches
+
+        return matches
+
+    def _matcher(
+        self,
+        feature_flags: list[FeatureFlag],
+        distinct_id: str,
+        precomputed_query_conditions: Optional[dict[str, bool]],
+    ) -> FeatureFlagMatcher:
+        return FeatureFlagMatcher(
+            self.team_id,
+            self.project_id,
+            feature_flags,
+            distinct_id,
+            groups=self.groups,
+            cache=self.cache,
+            hash_key_overrides=self.hash_key_overrides.get(distinct_id, {}),
+            property_value_overrides={"distinct_id": distinct_id},
+            group_property_value_overrides=self.group_property_value_overrides,
+            cohorts_cache=self.cohorts_cache,
+            precomputed_query_conditions=precomputed_query_conditions,
+        )
+
+    def _bulk_query_conditions(self, feature_flags: list[FeatureFlag]) -> dict[str, dict[str, bool]]:
+        # Only used to build the condition queries, the per distinct_id evaluation happens in `get_matches`
+        template_matcher = FeatureFlagMatcher(
+            self.team_id,
+            self.project_id,
+            feature_flags,
+            "",
+            groups=self.groups,
+            cache=self.cache,
+            group_property_value_overrides=self.group_property_value_overrides,
+            cohorts_cache=self.cohorts_cache,
+        )
+        shared_conditions, person_query, person_fields, group_query_per_group_type_mapping = (
+            template_matcher.build_condition_queries(
+                Person.objects.db_manager(DATABASE_FOR_PERSONS).filter(team_id=self.team_id),
+                check_person_exists=False,
+            )
+        )
+        shared_conditions = {
+            **shared_conditions,
+            **template_matcher.fetch_group_conditions(group_query_per_group_type_mapping),
+        }
+        check_person_exists = PERSON_KEY in template_matcher.has_pure_is_not_conditions
+
+        query_conditions: dict[str, dict[str, bool]] = {
+            distinct_id: {**shared_conditions} for distinct_id in self.distinct_ids
+        }
+        if check_person_exists:
+            for conditions in query_conditions.values():
+                conditions[f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = False
+
+        if not person_fields and not check_person_exists:
+            return query_conditions
+
+        for start in range(0, len(self.distinct_ids), self.batch_size):
+            batch = self.distinct_ids[start : start + self.batch_size]
+            # :TRICKY: The distinct_id filter must be a single `filter()` call, so `values()` below reuses its join
+            # and we get exactly one row per matching distinct_id.
+            batch_query = person_query.filter(
+                persondistinctid__distinct_id__in=batch, persondistinctid__team_id=self.team_id
+            ).values("persondistinctid__distinct_id", *person_fields)
+            with execute_with_timeout(BULK_FLAG_MATCHING_QUERY_TIMEOUT_MS, DATABASE_FOR_PERSONS):
+                rows = list(batch_query)
+            for row in rows:
+                conditions = query_conditions[row.pop("persondistinctid__distinct_id")]
+                conditions.update(row)
+                if check_person_exists:
+                    conditions[f"{ENTITY_EXISTS_PREFIX}{PERSON_KEY}"] = True
+
+        return query_conditions
+
+    def _filters_on_distinct_id(self, feature_flag: FeatureFlag) -> bool:
+        def properties_filter_on_distinct_id(properties: list[Property], seen_cohort_ids: set[int]) -> bool:
+            for property in properties:
+                if property.type == "person" and property.key == "distinct_id":
+                    return True
+                if property.type == "cohort":
+                    cohort_id = int(property.value)
+                    cohort = self.cohorts_cache.get(cohort_id)
+                    if cohort and cohort_id not in seen_cohort_ids:
+                        seen_cohort_ids.add(cohort_id)
+                        if properties_filter_on_distinct_id(cohort.properties.flat, seen_cohort_ids):
+                            return True
+            return False
+
+        conditions = [*feature_flag.conditions, *(feature_flag.super_conditions or [])]
+        return any(
+            properties_filter_on_distinct_id(Filter(data=condition).property_groups.flat, set())
+            for condition in conditions
+        )
+
+
 def get_feature_flag_hash_key_overrides(
     team_id: int,
     distinct_ids: list[str],
@@ -829,6 +1048,33 @@ def get_feature_flag_hash_key_overrides(
     return feature_flag_to_key_overrides
 
 
+def get_feature_flag_hash_key_overrides_for_distinct_ids(
+    team_id: int, distinct_ids: list[str], using_database: str = "default"
+) -> dict[str, dict[str, str]]:
+    """
+    Bulk version of `get_feature_flag_hash_key_overrides`, returning the overrides of each distinct_id's person.
+    """
+    distinct_id_to_person_id = dict(
+        PersonDistinctId.objects.db_manager(using_database)
+        .filter(distinct_id__in=distinct_ids, team_id=team_id)
+        .values_list("distinct_id", "person_id")
+    )
+
+    person_id_to_overrides: dict[int, dict[str, str]] = {}
+    for feature_flag_key, hash_key, person_id in (
+        FeatureFlagHashKeyOverride.objects.db_manager(using_database)
+        .filter(person_id__in=set(distinct_id_to_person_id.values()), team_id=team_id)
+        .values_list("feature_flag_key", "hash_key", "person_id")
+    ):
+        person_id_to_overrides.setdefault(person_id, {})[feature_flag_key] = hash_key
+
+    return {
+        distinct_id: person_id_to_overrides[person_id]
+        for distinct_id, person_id in distinct_id_to_person_id.items()
+        if person_id in person_id_to_overrides
+    }
+
+
 # Return a Dict with all flags and their values
 def _get_all_feature_flags(
     feature_flags: list[FeatureFlag],
@@ -1065,6 +1311,40 @@ def get_all_feature_flags_with_details(
     )
 
 
+def get_feature_flag_matches_for_distinct_ids(
+    team: Team,
+    distinct_ids: list[str],
+    groups: Optional[dict[GroupTypeName, str]] = None,
+    flag_keys: Optional[list[str]] = None,
+) -> dict[str, dict[str, FeatureFlagMatch]]:
+    """
+    Evaluates all (or the given) flags of the team for many distinct_ids with a small, fixed number of queries
+    per batch of distinct_ids. Meant for background jobs, not for decide.
+    """
+    feature_flags = get_feature_flags_for_team_in_cache(team.project_id)
+    if feature_flags is None:
+        feature_flags = set_feature_flags_for_team_in_cache(team.project_id)
+    if flag_keys is not None:
+        flag_keys_set = set(flag_keys)
+        feature_flags = [feature_flag for feature_flag in feature_flags if feature_flag.key in flag_keys_set]
+
+    hash_key_overrides: dict[str, dict[str, str]] = {}
+    if any(feature_flag.ensure_experience_continuity for feature_flag in feature_flags):
+        with execute_with_timeout(BULK_FLAG_MATCHING_QUERY_TIMEOUT_MS, DATABASE_FOR_FLAG_MATCHING):
+            hash_key_overrides = get_feature_flag_hash_key_overrides_for_distinct_ids(
+                team.id, distinct_ids, DATABASE_FOR_FLAG_MATCHING
+            )
+
+    return BulkFeatureFlagMatcher(
+        team.id,
+        team.project_id,
+        feature_flags,
+        distinct_ids,
+        groups=groups,
+        hash_key_overrides=hash_key_overrides,
+    ).get_matches()
+
+
 def set_feature_flag_hash_key_overrides(team: Team, distinct_ids: list[str], hash_key_override: str) -> bool:
     # As a product decision, the first override wins, i.e consistency matters for the first walkthrough.
     # Thus, we don't need to do upserts here.
@@ -0,0 +1,122 @@
+import hashlib
+from typing import Optional, TypedDict
+
+import structlog
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from posthog.models.cohort import Cohort
+from posthog.models.feature_flag.feature_flag import FIVE_DAYS, FeatureFlag
+from posthog.models.group_type_mapping import GroupTypeMapping
+from posthog.models.signals import mutable_receiver
+
+logger = structlog.get_logger(__name__)
+
+# Local evaluation reads from a read replica, which can lag behind the primary. For this long after a change, payloads
+# may have been built from the state before it, so they're only cached for `RECENTLY_CHANGED_TTL`.
+REPLICA_LAG_WINDOW_SECONDS = 60
+RECENTLY_CHANGED_TTL = 5
+
+
+class LocalEvaluationETag(TypedDict):
+    etag: str
+    # Whether serving this payload counts as a billable local evaluation request
+    billable: bool
+
+
+class LocalEvaluationPayload(LocalEvaluationETag):
+    content: bytes
+
+
+def _cache_key(prefix: str, project_id: int, send_cohorts: bool) -> str:
+    return f"{prefix}:{project_id}:{'cohorts' if send_cohorts else 'flags'}"
+
+
+def get_local_evaluation_etag(project_id: int, send_cohorts: bool) -> Optional[LocalEvaluationETag]:
+    """
+    Only the small ETag entry, so that SDKs polling with an up-to-date If-None-Match can be answered without
+    transferring the whole payload out of Redis.
+    """
+    try:
+        return cache.get(_cache_key("local_evaluation_etag", project_id, send_cohorts))
+    except Exception:
+        logger.exception("Redis is unavailable")
+        return None
+
+
+def get_local_evaluation_payload(project_id: int, send_cohorts: bool) -> Optional[LocalEvaluationPayload]:
+    try:
+        return cache.get(_cache_key("local_evaluation_payload", project_id, send_cohorts))
+    except Exception:
+        logger.exception("Redis is unavailable")
+        return None
+
+
+def set_local_evaluation_payload(
+    project_id: int, send_cohorts: bool, content: bytes, *, billable: bool
+) -> LocalEvaluationPayload:
+    etag = hashlib.sha256(content).hexdigest()[:32]
+    payload = LocalEvaluationPayload(etag=etag, billable=billable, content=content)
+    try:
+        recently_changed = cache.get(_changed_key(project_id)) is not None
+        cache.set_many(
+            {
+                _cache_key("local_evaluation_etag", project_id, send_cohorts): LocalEvaluationETag(
+                    etag=etag, billable=billable
+                ),
+                _cache_key("local_evaluation_payload", project_id, send_cohorts): payload,
+            },
+            RECENTLY_CHANGED_TTL if recently_changed else FIVE_DAYS,
+        )
+    except Exception:
+        logger.exception("Redis is unavailable")
+    return payload
+
+
+def clear_local_evaluation_cache(project_id: int) -> None:
+    try:
+        cache.delete_many(
+            [
+                _cache_key(prefix, project_id, send_cohorts)
+                for prefix in ("local_evaluation_etag", "local_evaluation_payload")
+                for send_cohorts in (True, False)
+            ]
+        )
+    except Exception:
+        logger.exception("Redis is unavailable")
+
+
+def _changed_key(project_id: int) -> str:
+    return f"local_evaluation_changed:{project_id}"
+
+
+def _mark_changed(project_id: int) -> None:
+    try:
+        cache.set(_changed_key(project_id), True, REPLICA_LAG_WINDOW_SECONDS)
+    except Exception:
+        logger.exception("Redis is unavailable")
+    clear_local_evaluation_cache(project_id)
+
+
+def _clear_local_evaluation_cache_for_change(project_id: int) -> None:
+    clear_local_evaluation_cache(project_id)
+    # Clear again once the change is committed, so a poll racing with this transaction can't leave a payload built
+    # from the old state in the cache. Read replicas may still be behind then, so payloads built in the next
+    # `REPLICA_LAG_WINDOW_SECONDS` are only cached briefly
+    transaction.on_commit(lambda: _mark_changed(project_id))
+
+
+@mutable_receiver([post_save, post_delete], sender=FeatureFlag)
+def clear_local_evaluation_cache_on_flag_change(sender, instance: FeatureFlag, **kwargs):
+    _clear_local_evaluation_cache_for_change(instance.team.project_id)
+
+
+@mutable_receiver([post_save, post_delete], sender=Cohort)
+def clear_local_evaluation_cache_on_cohort_change(sender, instance: Cohort, **kwargs):
+    _clear_local_evaluation_cache_for_change(instance.team.project_id)
+
+
+@mutable_receiver([post_save, post_delete], sender=GroupTypeMapping)
+def clear_local_evaluation_cache_on_group_type_change(sender, instance: GroupTypeMapping, **kwargs):
+    _clear_local_evaluation_cache_for_change(instance.project_id)
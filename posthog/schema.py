@@ -4410,6 +4410,9 @@ class SessionBatchEventsQueryResponse(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -5028,6 +5031,9 @@ class ActorsQueryResponse(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: int
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -5627,6 +5633,9 @@ class CachedActorsQueryResponse(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     next_allowed_client_refresh: datetime
     offset: int
     query_status: Optional[QueryStatus] = Field(
@@ -5732,6 +5741,9 @@ class CachedEventsQueryResponse(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     next_allowed_client_refresh: datetime
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
@@ -6348,6 +6360,9 @@ class CachedSessionBatchEventsQueryResponse(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     next_allowed_client_refresh: datetime
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
@@ -7148,6 +7163,9 @@ class Response(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -7178,6 +7196,9 @@ class Response1(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: int
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -7969,6 +7990,9 @@ class EventsQueryResponse(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -8751,6 +8775,9 @@ class QueryResponseAlternative1(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -8781,6 +8808,9 @@ class QueryResponseAlternative2(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: int
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -9236,6 +9266,9 @@ class QueryResponseAlternative31(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: Optional[int] = None
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -9266,6 +9299,9 @@ class QueryResponseAlternative32(BaseModel):
     modifiers: Optional[HogQLQueryModifiers] = Field(
         default=None, description="Modifiers used when performing the query"
     )
+    nextCursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page, returned when paginating with `cursor`"
+    )
     offset: int
     query_status: Optional[QueryStatus] = Field(
         default=None, description="Query status indicates whether next to the provided data, a query is still running."
@@ -13048,6 +13084,13 @@ class SessionBatchEventsQuery(BaseModel):
     actionId: Optional[int] = Field(default=None, description="Show events matching a given action")
     after: Optional[str] = Field(default=None, description="Only fetch events that happened after this timestamp")
     before: Optional[str] = Field(default=None, description="Only fetch events that happened before this timestamp")
+    cursor: Optional[str] = Field(
+        default=None,
+        description=(
+            "Cursor to continue from, as returned in `nextCursor` of the previous page. Pass an empty string to"
+            " paginate with cursors from the first page. Takes precedence over `offset`."
+        ),
+    )
     event: Optional[str] = Field(default=None, description="Limit to events matching this string")
     filterTestAccounts: Optional[bool] = Field(default=None, description="Filter test accounts")
     fixedProperties: Optional[
@@ -13131,6 +13174,13 @@ class ActorsQuery(BaseModel):
     model_config = ConfigDict(
         extra="forbid",
     )
+    cursor: Optional[str] = Field(
+        default=None,
+        description=(
+            "Cursor to continue from, as returned in `nextCursor` of the previous page. Pass an empty string to"
+            " paginate with cursors from the first page. Takes precedence over `offset`."
+        ),
+    )
     fixedProperties: Optional[
         list[Union[PersonPropertyFilter, CohortPropertyFilter, HogQLPropertyFilter, EmptyPropertyFilter]]
     ] = Field(
@@ -13176,6 +13226,13 @@ class EventsQuery(BaseModel):
     actionId: Optional[int] = Field(default=None, description="Show events matching a given action")
     after: Optional[str] = Field(default=None, description="Only fetch events that happened after this timestamp")
     before: Optional[str] = Field(default=None, description="Only fetch events that happened before this timestamp")
+    cursor: Optional[str] = Field(
+        default=None,
+        description=(
+            "Cursor to continue from, as returned in `nextCursor` of the previous page. Pass an empty string to"
+            " paginate with cursors from the first page. Takes precedence over `offset`."
+        ),
+    )
     event: Optional[str] = Field(default=None, description="Limit to events matching this string")
     filterTestAccounts: Optional[bool] = Field(default=None, description="Filter test accounts")
     fixedProperties: Optional[
@@ -1,4 +1,5 @@
 import asyncio
+import itertools
 import json
 import os
 import re
@@ -17,6 +18,7 @@ from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from drf_spectacular.utils import extend_schema
 from openai.types.chat import (
     ChatCompletionAssistantMessageParam,
@@ -70,6 +72,11 @@ from posthog.session_recordings.realtime_snapshots import (
 )
 from tenacity import retry, wait_random_exponential, retry_if_exception_type, stop_after_attempt
 from posthog.session_recordings.session_recording_v2_service import list_blocks
+from posthog.session_recordings.snapshot_stream import (
+    SNAPPY_BLOCKS_ENCODING,
+    encode_snapshot_stream,
+    negotiate_snapshot_encoding,
+)
 from posthog.session_recordings.utils import clean_prompt_whitespace
 from posthog.settings.session_replay import SESSION_REPLAY_AI_REGEX_MODEL
 from posthog.storage import object_storage, session_recording_v2_object_storage
@@ -977,7 +984,7 @@ class SessionRecordingViewSet(TeamAndOrgViewSetMixin, viewsets.GenericViewSet, U
             )
 
         try:
-            response: Response | HttpResponse
+            response: Response | HttpResponse | StreamingHttpResponse
             if not source:
                 response = self._gather_session_recording_sources(recording, timer, is_v2_enabled, is_v2_lts_enabled)
             elif source == "realtime":
@@ -989,7 +996,15 @@ class SessionRecordingViewSet(TeamAndOrgViewSetMixin, viewsets.GenericViewSet, U
                         recording, validated_data.get("blob_key", ""), validated_data.get("if_none_match")
                     )
             elif source == "blob_v2":
-                if "min_blob_key" in validated_data:
+                if "min_blob_key" in validated_data and settings.SESSION_RECORDING_V2_STREAM_SNAPSHOTS:
+                    response = self._stream_blob_v2_blocks_to_client(
+                        recording,
+                        timer,
+                        min_blob_key=validated_data["min_blob_key"],
+                        max_blob_key=validated_data["max_blob_key"],
+                        accept_encoding=request.headers.get("Accept-Encoding"),
+                    )
+                elif "min_blob_key" in validated_data:
                     response = self._stream_blob_v2_to_client(
                         recording,
                         timer,
@@ -1302,38 +1317,31 @@ class SessionRecordingViewSet(TeamAndOrgViewSetMixin, viewsets.GenericViewSet, U
             if max_blob_key >= len(blocks):
                 raise exceptions.NotFound("Block index out of range")
 
-            async def fetch_single_block_async(block_index: int) -> tuple[int, str | None]:
-                try:
-                    block = blocks[block_index]
-                    content = await asyncio.to_thread(
-                        session_recording_v2_object_storage.client().fetch_block, block.url
-                    )
-                    return block_index, content
-                except BlockFetchError:
-                    logger.exception(
-                        "Failed to fetch block",
-                        recording_id=recording.session_id,
-                        team_id=self.team.id,
-                        block_index=block_index,
-                    )
-                    return block_index, None
-
             with (
                 timer("fetch_blocks_parallel__stream_blob_v2_to_client"),
                 tracer.start_as_current_span("fetch_blocks_parallel__stream_blob_v2_to_client"),
             ):
-                tasks = [fetch_single_block_async(block_index) for block_index in range(min_blob_key, max_blob_key + 1)]
-
-                results = await asyncio.gather(*tasks)
+                # Blocks next to each other in storage are fetched with a single ranged read
+                results = await asyncio.to_thread(
+                    session_recording_v2_object_storage.client().fetch_blocks,
+                    [blocks[block_index].url for block_index in range(min_blob_key, max_blob_key + 1)],
+                )
 
                 decompressed_blocks: list[str | None] = [None] * len(results)
                 block_errors: list[int] = []
 
-                for block_index, content in results:
-                    if content is None:
-                        block_errors.append(block_index)
+                for offset, content in enumerate(results):
+                    if isinstance(content, BlockFetchError):
+                        logger.error(
+                            "Failed to fetch block",
+                            recording_id=recording.session_id,
+                            team_id=self.team.id,
+                            block_index=min_blob_key + offset,
+                            exc_info=content,
+                        )
+                        block_errors.append(min_blob_key + offset)
                     else:
-                        decompressed_blocks[block_index - min_blob_key] = content
+                        decompressed_blocks[offset] = content
 
             if block_errors:
                 raise exceptions.APIException("Failed to load recording block")
@@ -1356,6 +1364,76 @@ class SessionRecordingViewSet(TeamAndOrgViewSetMixin, viewsets.GenericViewSet, U
     ) -> HttpResponse:
         return asyncio.run(self._stream_blob_v2_to_client_async(recording, timer, min_blob_key, max_blob_key))
 
+    def _stream_blob_v2_blocks_to_client(
+        self,
+        recording: SessionRecording,
+        timer: ServerTimingsGathered,
+        min_blob_key: int,
+        max_blob_key: int,
+        accept_encoding: str | None,
+    ) -> StreamingHttpResponse:
+        """
+        Streams blocks to the client in order as they're fetched, rather than loading the whole range in memory first.
+
+        Depending on the client's Accept-Encoding, the JSONL is compressed with zstd or gzip, or blocks are passed
+        through snappy compressed as stored (see `SNAPPY_BLOCKS_ENCODING`).
+        """
+        with (
+            timer("list_blocks__stream_blob_v2_to_client"),
+            tracer.start_as_current_span("list_blocks__stream_blob_v2_to_client"),
+        ):
+            blocks = list_blocks(recording)
+            if not blocks:
+                raise exceptions.NotFound("Session recording not found")
+
+        if max_blob_key >= len(blocks):
+            raise exceptions.NotFound("Block index out of range")
+
+        encoding = negotiate_snapshot_encoding(accept_encoding)
+        block_iterator = session_recording_v2_object_storage.client().iter_blocks(
+            [blocks[block_index].url for block_index in range(min_blob_key, max_blob_key + 1)],
+            decompress=encoding != SNAPPY_BLOCKS_ENCODING,
+        )
+
+        def logged_blocks() -> Generator[str | bytes, None, None]:
+            block_index = min_blob_key
+            try:
+                with STREAM_RESPONSE_TO_CLIENT_HISTOGRAM.labels(blob_version="v2_stream").time():
+                    for block in block_iterator:
+                        yield block
+                        block_index += 1
+            except BlockFetchError:
+                logger.exception(
+                    "Failed to fetch block",
+                    recording_id=recording.session_id,
+                    team_id=self.team.id,
+                    block_index=block_index,
+                )
+                raise
+
+        logged_block_iterator = logged_blocks()
+        with (
+            timer("fetch_first_block__stream_blob_v2_to_client"),
+            tracer.start_as_current_span("fetch_first_block__stream_blob_v2_to_client"),
+        ):
+            # Fetch the first block before responding, so that failing to load the recording at all is still an error
+            # response. Once streaming, errors can only interrupt the response.
+            try:
+                first_block = next(logged_block_iterator)
+            except BlockFetchError:
+                raise exceptions.APIException("Failed to load recording block")
+
+        response = StreamingHttpResponse(
+            encode_snapshot_stream(itertools.chain([first_block], logged_block_iterator), encoding),
+            content_type="application/jsonl",
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+        patch_vary_headers(response, ("Accept-Encoding",))
+        response["Cache-Control"] = "max-age=3600"
+        response["Content-Disposition"] = "inline"
+        return response
+
     def _send_realtime_snapshots_to_client(self, recording: SessionRecording) -> HttpResponse | Response:
         with GET_REALTIME_SNAPSHOTS_FROM_REDIS.time():
             snapshot_lines = (
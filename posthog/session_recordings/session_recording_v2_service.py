@@ -49,6 +49,21 @@ def within_the_last_day(start_time: datetime | None) -> bool:
     return (datetime.now(start_time.tzinfo) - start_time).total_seconds() < ONE_DAY_IN_SECONDS
 
 
+def listing_cache_timeout(listed_blocks: RecordingBlockListing) -> int:
+    """
+    Sessions last at most a day, so once a recording's last block is more than a day old no more blocks will be
+    added to it, and its listing can be cached for a long time. This is decided from the listing itself, as the
+    recording's own start time can be missing (e.g. for recordings not yet persisted), which would otherwise cache
+    listings of recordings still being ingested for a day.
+    """
+    last_block_time = max(listed_blocks.block_last_timestamps, default=None)
+    if last_block_time is None or listed_blocks.start_time is None:
+        return FIVE_SECONDS
+    if within_the_last_day(listed_blocks.start_time) or within_the_last_day(last_block_time):
+        return FIVE_SECONDS
+    return ONE_DAY_IN_SECONDS
+
+
 def load_blocks(recording: SessionRecording) -> RecordingBlockListing | None:
     """
     When API clients are requesting v2 recordings, there is a dependency on querying ClickHouse for the metadata
@@ -75,21 +90,17 @@ def load_blocks(recording: SessionRecording) -> RecordingBlockListing | None:
         # If not, we might still be receiving blocks, so we cache it for a short time.
         # Blob ingestion flushes frequently, so we want not too short a cache.
         # But without a cache we read from clickhouse too often
-        timeout = FIVE_SECONDS if within_the_last_day(recording.start_time) else ONE_DAY_IN_SECONDS
+        timeout = listing_cache_timeout(listed_blocks)
         logger.info(
             "caching recording blocks",
             cache_key=cache_key,
             timeout=timeout,
-            start_time=recording.start_time,
-            is_within_the_last_day=within_the_last_day(recording.start_time),
-            now=datetime.now(),
-            number_of_blocks=len(listed_blocks.block_urls) if listed_blocks else 0,
+            start_time=listed_blocks.start_time,
+            number_of_blocks=len(listed_blocks.block_urls),
             team_id=recording.team_id,
             session_id=recording.session_id,
         )
-        # KLUDGE: i want to be able to cache for longer but believe i'm seeing incorrect caching behaviour
-        # so i'm setting it to alway be 5 seconds for now, and adding a log to see if the 24 hour cache is incorrect
-        cache.set(cache_key, listed_blocks, timeout=FIVE_SECONDS)
+        cache.set(cache_key, listed_blocks, timeout=timeout)
 
     return listed_blocks
 
@@ -0,0 +1,73 @@
+import struct
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from typing import Literal, Optional
+
+import zstandard
+
+SnapshotEncoding = Literal["x-snappy-blocks", "zstd", "gzip"]
+
+# Blocks as stored, each prefixed with its length as a 4 byte big endian integer. Decompressing each block with snappy,
+# stripping trailing newlines, and joining them with newlines gives the JSONL snapshots.
+SNAPPY_BLOCKS_ENCODING: SnapshotEncoding = "x-snappy-blocks"
+
+# In order of preference, when the client accepts more than one
+SNAPSHOT_ENCODINGS: tuple[SnapshotEncoding, ...] = (SNAPPY_BLOCKS_ENCODING, "zstd", "gzip")
+
+
+def negotiate_snapshot_encoding(accept_encoding: Optional[str]) -> Optional[SnapshotEncoding]:
+    """Returns the encoding to send snapshots with given an Accept-Encoding header, or None to send them as they are"""
+    if not accept_encoding:
+        return None
+
+    accepted: set[str] = set()
+    for coding in accept_encoding.split(","):
+        name, *params = (part.strip() for part in coding.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.lower())
+
+    for encoding in SNAPSHOT_ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def encode_snapshot_stream(blocks: Iterable[str | bytes], encoding: Optional[SnapshotEncoding]) -> Iterator[bytes]:
+    """
+    Yields the response body for `blocks`, which are snappy compressed for `SNAPPY_BLOCKS_ENCODING`, and decompressed
+    JSONL otherwise. Compressed output is flushed after every block, so the client receives data as it's fetched.
+    """
+    if encoding == SNAPPY_BLOCKS_ENCODING:
+        for block in blocks:
+            assert isinstance(block, bytes)
+            yield struct.pack(">I", len(block)) + block
+        return
+
+    compress: Callable[[bytes], bytes] = lambda data: data
+    finish: Callable[[], bytes] = lambda: b""
+    if encoding == "gzip":
+        # Adding 16 to wbits produces a gzip header and trailer instead of a zlib one
+        gzip_compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        compress = lambda data: gzip_compressor.compress(data) + gzip_compressor.flush(zlib.Z_SYNC_FLUSH)
+        finish = gzip_compressor.flush
+    elif encoding == "zstd":
+        zstd_compressor = zstandard.ZstdCompressor().compressobj()
+        compress = lambda data: zstd_compressor.compress(data) + zstd_compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        finish = lambda: zstd_compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+    for index, block in enumerate(blocks):
+        assert isinstance(block, str)
+        yield compress((b"\n" if index > 0 else b"") + block.encode("utf-8"))
+
+    if trailer := finish():
+        yield trailer
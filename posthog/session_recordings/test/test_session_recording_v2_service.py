@@ -10,6 +10,7 @@ from posthog.session_recordings.session_recording_v2_service import (
     list_blocks,
     load_blocks,
     FIVE_SECONDS,
+    ONE_DAY_IN_SECONDS,
     listing_cache_key,
 )
 
@@ -159,8 +160,46 @@ class TestSessionRecordingV2Service(TestCase):
 
         self.assertEqual(result, mock_blocks)
         expected_cache_key = listing_cache_key(self.recording)
-        # cache is forced to 5 seconds always
-        mock_cache.set.assert_called_once_with(expected_cache_key, mock_blocks, timeout=FIVE_SECONDS)
+        mock_cache.set.assert_called_once_with(expected_cache_key, mock_blocks, timeout=ONE_DAY_IN_SECONDS)
+
+    @freeze_time("2024-01-02T13:00:00Z")
+    @patch("posthog.session_recordings.session_recording_v2_service.cache")
+    @patch("posthog.session_recordings.session_recording_v2_service.SessionReplayEvents")
+    def test_load_blocks_caches_with_short_timeout_when_old_recording_has_recent_blocks(
+        self, mock_replay_events, mock_cache
+    ):
+        mock_cache.get.return_value = None
+        mock_blocks = RecordingBlockListing(
+            block_first_timestamps=[datetime(2024, 1, 1, 12, 0), datetime(2024, 1, 2, 12, 0)],
+            block_last_timestamps=[datetime(2024, 1, 1, 12, 1), datetime(2024, 1, 2, 12, 1)],
+            block_urls=["s3://bucket/key1", "s3://bucket/key2"],
+            start_time=datetime(2024, 1, 1, 12, 0),
+        )
+        mock_replay_events.return_value.list_blocks.return_value = mock_blocks
+
+        load_blocks(self.recording)
+
+        mock_cache.set.assert_called_once_with(listing_cache_key(self.recording), mock_blocks, timeout=FIVE_SECONDS)
+
+    @freeze_time("2024-01-01T12:00:00Z")
+    @patch("posthog.session_recordings.session_recording_v2_service.cache")
+    @patch("posthog.session_recordings.session_recording_v2_service.SessionReplayEvents")
+    def test_load_blocks_caches_with_short_timeout_when_recording_has_no_start_time(
+        self, mock_replay_events, mock_cache
+    ):
+        self.recording.start_time = None
+        mock_cache.get.return_value = None
+        mock_blocks = RecordingBlockListing(
+            block_first_timestamps=[datetime(2024, 1, 1, 11, 50)],
+            block_last_timestamps=[datetime(2024, 1, 1, 11, 55)],
+            block_urls=["s3://bucket/key1"],
+            start_time=datetime(2024, 1, 1, 11, 50),
+        )
+        mock_replay_events.return_value.list_blocks.return_value = mock_blocks
+
+        load_blocks(self.recording)
+
+        mock_cache.set.assert_called_once_with(listing_cache_key(self.recording), mock_blocks, timeout=FIVE_SECONDS)
 
     @freeze_time("2024-01-01T12:00:00Z")
     @patch("posthog.session_recordings.session_recording_v2_service.cache")
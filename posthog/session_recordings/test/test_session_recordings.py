@@ -1,3 +1,4 @@
+import gzip
 import json
 import re
 from datetime import UTC, datetime, timedelta
@@ -6,10 +7,12 @@ from unittest.mock import ANY, MagicMock, call, patch
 from urllib.parse import urlencode
 
 from dateutil.relativedelta import relativedelta
+from django.test import override_settings
 from django.utils.timezone import now
 from freezegun import freeze_time
 from parameterized import parameterized
 import pytest
+import zstandard
 from rest_framework import status
 
 from posthog.clickhouse.client import sync_execute
@@ -1464,6 +1467,7 @@ class TestSessionRecordings(APIBaseTest, ClickhouseTestMixin, QueryMatchingTest)
             response_data = response.json()
             assert "detail" in response_data or "error" in response_data
 
+    @override_settings(SESSION_RECORDING_V2_STREAM_SNAPSHOTS=False)
     @patch(
         "posthog.session_recordings.queries.session_replay_events.SessionReplayEvents.exists",
         return_value=True,
@@ -1492,10 +1496,10 @@ class TestSessionRecordings(APIBaseTest, ClickhouseTestMixin, QueryMatchingTest)
         ]
         mock_list_blocks.return_value = mock_blocks
 
-        # Mock the client fetch_block method
+        # Mock the client fetch_blocks method
         mock_client_instance = MagicMock()
         mock_client.return_value = mock_client_instance
-        mock_client_instance.fetch_block.side_effect = [
+        mock_client_instance.fetch_blocks.return_value = [
             '{"timestamp": 1000, "type": "snapshot1"}',
             '{"timestamp": 2000, "type": "snapshot2"}',
         ]
@@ -1506,10 +1510,67 @@ class TestSessionRecordings(APIBaseTest, ClickhouseTestMixin, QueryMatchingTest)
         assert response.status_code == status.HTTP_200_OK
         assert response.headers.get("content-type") == "application/jsonl"
 
-        # Verify the client was called with correct block URLs
-        assert mock_client_instance.fetch_block.call_count == 2
-        mock_client_instance.fetch_block.assert_any_call("http://test.com/block0")
-        mock_client_instance.fetch_block.assert_any_call("http://test.com/block1")
+        assert response.content.decode() == (
+            '{"timestamp": 1000, "type": "snapshot1"}\n{"timestamp": 2000, "type": "snapshot2"}'
+        )
+
+        # Verify the client was called once with correct block URLs
+        mock_client_instance.fetch_blocks.assert_called_once_with(["http://test.com/block0", "http://test.com/block1"])
+
+    @parameterized.expand(
+        [
+            ("identity", None),
+            ("gzip, deflate, br", "gzip"),
+            ("gzip, deflate, br, zstd", "zstd"),
+        ]
+    )
+    @patch(
+        "posthog.session_recordings.queries.session_replay_events.SessionReplayEvents.exists",
+        return_value=True,
+    )
+    @patch("posthog.session_recordings.session_recording_api.SessionRecording.get_or_build")
+    @patch("posthog.session_recordings.session_recording_api.list_blocks")
+    @patch("posthog.session_recordings.session_recording_api.session_recording_v2_object_storage.client")
+    def test_blob_v2_streams_blocks(
+        self,
+        accept_encoding,
+        expected_encoding,
+        mock_client,
+        mock_list_blocks,
+        mock_get_session_recording,
+        _mock_exists,
+    ) -> None:
+        session_id = str(uuid7())
+        mock_get_session_recording.return_value = SessionRecording(session_id=session_id, team=self.team, deleted=False)
+        mock_list_blocks.return_value = [
+            MagicMock(url="http://test.com/block0"),
+            MagicMock(url="http://test.com/block1"),
+            MagicMock(url="http://test.com/block2"),
+        ]
+        mock_client_instance = MagicMock()
+        mock_client.return_value = mock_client_instance
+        mock_client_instance.iter_blocks.return_value = iter(
+            ['{"timestamp": 1000, "type": "snapshot1"}', '{"timestamp": 2000, "type": "snapshot2"}']
+        )
+
+        url = f"/api/projects/{self.team.pk}/session_recordings/{session_id}/snapshots/?source=blob_v2&start_blob_key=1&end_blob_key=2"
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response.headers.get("content-type") == "application/jsonl"
+        assert response.headers.get("content-encoding") == expected_encoding
+
+        content = b"".join(response.streaming_content)
+        if expected_encoding == "gzip":
+            content = gzip.decompress(content)
+        elif expected_encoding == "zstd":
+            content = zstandard.ZstdDecompressor().decompressobj().decompress(content)
+        assert content == b'{"timestamp": 1000, "type": "snapshot1"}\n{"timestamp": 2000, "type": "snapshot2"}'
+
+        mock_client_instance.iter_blocks.assert_called_once_with(
+            ["http://test.com/block1", "http://test.com/block2"], decompress=True
+        )
 
     @parameterized.expand([("0", ""), ("", "1")])
     @patch(
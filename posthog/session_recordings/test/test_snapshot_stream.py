@@ -0,0 +1,67 @@
+import gzip
+import struct
+
+import pytest
+import snappy
+import zstandard
+
+from posthog.session_recordings.snapshot_stream import (
+    SNAPPY_BLOCKS_ENCODING,
+    encode_snapshot_stream,
+    negotiate_snapshot_encoding,
+)
+
+BLOCKS = ['{"timestamp": 1000}', '{"timestamp": 2000}\n{"timestamp": 3000}', '{"timestamp": 4000}']
+JSONL = b'{"timestamp": 1000}\n{"timestamp": 2000}\n{"timestamp": 3000}\n{"timestamp": 4000}'
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("br", None),
+        ("gzip, deflate, br", "gzip"),
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip, zstd;q=0", "gzip"),
+        ("GZIP;q=0.5", "gzip"),
+        ("gzip;q=invalid", None),
+        ("gzip, zstd, x-snappy-blocks", SNAPPY_BLOCKS_ENCODING),
+    ],
+)
+def test_negotiate_snapshot_encoding(accept_encoding, expected):
+    assert negotiate_snapshot_encoding(accept_encoding) == expected
+
+
+def test_encode_snapshot_stream_without_encoding():
+    assert b"".join(encode_snapshot_stream(iter(BLOCKS), None)) == JSONL
+
+
+def test_encode_snapshot_stream_with_gzip():
+    chunks = list(encode_snapshot_stream(iter(BLOCKS), "gzip"))
+
+    assert gzip.decompress(b"".join(chunks)) == JSONL
+    # Every block is flushed to the client as it comes
+    assert all(chunks)
+
+
+def test_encode_snapshot_stream_with_zstd():
+    chunks = list(encode_snapshot_stream(iter(BLOCKS), "zstd"))
+
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    assert decompressor.decompress(b"".join(chunks)) == JSONL
+    assert all(chunks)
+
+
+def test_encode_snapshot_stream_passes_snappy_blocks_through():
+    compressed_blocks = [snappy.compress(f"{block}\n".encode()) for block in BLOCKS]
+
+    data = b"".join(encode_snapshot_stream(iter(compressed_blocks), SNAPPY_BLOCKS_ENCODING))
+
+    decoded_blocks = []
+    while data:
+        (length,) = struct.unpack(">I", data[:4])
+        decoded_blocks.append(snappy.decompress(data[4 : 4 + length]).decode().rstrip("\n"))
+        data = data[4 + length :]
+    assert "\n".join(decoded_blocks).encode() == JSONL
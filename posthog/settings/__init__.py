@@ -112,6 +112,20 @@ PROM_PUSHGATEWAY_ADDRESS: str | None = os.getenv("PROM_PUSHGATEWAY_ADDRESS", Non
 
 HOGQL_INCREASED_MAX_EXECUTION_TIME: int = get_from_env("HOGQL_INCREASED_MAX_EXECUTION_TIME", 600, type_cast=int)
 
+# Number of built HogQL databases (schemas) each process keeps, keyed by team and modifiers. Set to 0 to disable.
+HOGQL_DATABASE_CACHE_MAX_ENTRIES: int = get_from_env(
+    "HOGQL_DATABASE_CACHE_MAX_ENTRIES", 0 if TEST else 100, type_cast=int
+)
+HOGQL_DATABASE_CACHE_TTL_SECONDS: int = get_from_env("HOGQL_DATABASE_CACHE_TTL_SECONDS", 300, type_cast=int)
+
+# Threads each process runs insight subqueries (e.g. trends series) on, and how many of them a single team can occupy
+INSIGHT_SUBQUERY_MAX_WORKERS: int = get_from_env("INSIGHT_SUBQUERY_MAX_WORKERS", 50, type_cast=int)
+INSIGHT_SUBQUERY_MAX_WORKERS_PER_TEAM: int = get_from_env("INSIGHT_SUBQUERY_MAX_WORKERS_PER_TEAM", 10, type_cast=int)
+# Idle workers exit, closing their Postgres connections, after this many seconds
+INSIGHT_SUBQUERY_WORKER_IDLE_TIMEOUT_SECONDS: float = get_from_env(
+    "INSIGHT_SUBQUERY_WORKER_IDLE_TIMEOUT_SECONDS", 0 if TEST else 60, type_cast=float
+)
+
 # Extend and override these settings with EE's ones
 if "ee.apps.EnterpriseConfig" in INSTALLED_APPS:
     from ee.settings import *  # noqa: F401, F403
@@ -196,6 +196,25 @@ QUERYSERVICE_VERIFY: bool = get_from_env("QUERYSERVICE_VERIFY", CLICKHOUSE_VERIF
 CLICKHOUSE_CONN_POOL_MIN: int = get_from_env("CLICKHOUSE_CONN_POOL_MIN", 20, type_cast=int)
 CLICKHOUSE_CONN_POOL_MAX: int = get_from_env("CLICKHOUSE_CONN_POOL_MAX", 1000, type_cast=int)
 
+# Concurrent identical read queries of a team share one execution, within a process, and optionally across processes.
+# Billed and personal API key queries always run, as their usage is counted from query_log
+CLICKHOUSE_SINGLE_FLIGHT_ENABLED: bool = get_from_env("CLICKHOUSE_SINGLE_FLIGHT_ENABLED", False, type_cast=str_to_bool)
+CLICKHOUSE_SINGLE_FLIGHT_ACROSS_PROCESSES: bool = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_ACROSS_PROCESSES", False, type_cast=str_to_bool
+)
+# The lock is refreshed while the query runs, so this is how long processes wait on a process that died running it
+CLICKHOUSE_SINGLE_FLIGHT_LOCK_TTL_SECONDS: int = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_LOCK_TTL_SECONDS", 10, type_cast=int
+)
+# Should be longer than the longest query, as a process waits on another for up to this long
+CLICKHOUSE_SINGLE_FLIGHT_MAX_WAIT_SECONDS: int = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_MAX_WAIT_SECONDS", 660, type_cast=int
+)
+# Larger results aren't handed off to other processes, which run the query themselves
+CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES: int = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES", 10 * 1024 * 1024, type_cast=int
+)
+
 CLICKHOUSE_STABLE_HOST: str = get_from_env("CLICKHOUSE_STABLE_HOST", CLICKHOUSE_HOST)
 # If enabled, some queries will use system.cluster table to query each shard
 CLICKHOUSE_ALLOW_PER_SHARD_EXECUTION: bool = get_from_env(
@@ -306,6 +325,13 @@ KAFKA_PRODUCER_SETTINGS = {
     if value is not None
 }
 
+# Hand messages to Kafka from a background thread, so that producing never blocks the calling thread on the Kafka
+# client (e.g. while it fetches metadata or its buffer is full). Producers block once this many messages are buffered.
+KAFKA_PRODUCER_BUFFERED = get_from_env("KAFKA_PRODUCER_BUFFERED", False, type_cast=str_to_bool)
+KAFKA_PRODUCER_BUFFER_MAX_MESSAGES = get_from_env("KAFKA_PRODUCER_BUFFER_MAX_MESSAGES", 10_000, type_cast=int)
+# How long the background thread waits for more messages before handing a batch to Kafka
+KAFKA_PRODUCER_BUFFER_LINGER_MS = get_from_env("KAFKA_PRODUCER_BUFFER_LINGER_MS", 5, type_cast=int)
+
 SESSION_RECORDING_KAFKA_MAX_REQUEST_SIZE_BYTES: int = get_from_env(
     "SESSION_RECORDING_KAFKA_MAX_REQUEST_SIZE_BYTES",
     1024 * 1024,  # 1MB
@@ -53,8 +53,14 @@ REPLAY_CAPTURE_ENDPOINT = os.getenv("REPLAY_CAPTURE_ENDPOINT", "/s/")
 CAPTURE_INTERNAL_URL = os.getenv("CAPTURE_INTERNAL_URL", "http://localhost:8010")
 CAPTURE_REPLAY_INTERNAL_URL = os.getenv("CAPTURE_REPLAY_INTERNAL_URL", "http://localhost:8010")
 CAPTURE_INTERNAL_MAX_WORKERS = get_from_env("CAPTURE_INTERNAL_MAX_WORKERS", type_cast=int, default=16)
+# Limits of the /batch/ requests capture_batch_internal sends when using the batch endpoint, before compression
+CAPTURE_INTERNAL_BATCH_MAX_EVENTS = get_from_env("CAPTURE_INTERNAL_BATCH_MAX_EVENTS", type_cast=int, default=1000)
+CAPTURE_INTERNAL_BATCH_MAX_BYTES = get_from_env(
+    "CAPTURE_INTERNAL_BATCH_MAX_BYTES", type_cast=int, default=4 * 1024 * 1024
+)
 
 NEW_ANALYTICS_CAPTURE_ENDPOINT = os.getenv("NEW_CAPTURE_ENDPOINT", "/i/v0/e/")
+BATCH_CAPTURE_ENDPOINT = os.getenv("BATCH_CAPTURE_ENDPOINT", "/batch/")
 NEW_ANALYTICS_CAPTURE_EXCLUDED_TEAM_IDS = get_set(os.getenv("NEW_ANALYTICS_CAPTURE_EXCLUDED_TEAM_IDS", ""))
 
 ELEMENT_CHAIN_AS_STRING_EXCLUDED_TEAMS = get_set(os.getenv("ELEMENT_CHAIN_AS_STRING_EXCLUDED_TEAMS", ""))
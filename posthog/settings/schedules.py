@@ -37,6 +37,11 @@ COUNT_TILES_WITH_NO_FILTERS_HASH_INTERVAL_SECONDS = get_from_env(
 
 CACHED_RESULTS_TTL = 7 * 24 * 60 * 60  # how long to keep cached results for
 
+# Optional per-process tier in front of the Redis query results cache. 0 disables it.
+QUERY_CACHE_LOCAL_MAX_BYTES = get_from_env("QUERY_CACHE_LOCAL_MAX_BYTES", 0, type_cast=int)
+# Upper bound on how long a locally cached result is trusted, in case an invalidation message was missed
+QUERY_CACHE_LOCAL_TTL_SECONDS = get_from_env("QUERY_CACHE_LOCAL_TTL_SECONDS", 60, type_cast=int)
+
 # Schedule to run asynchronous data deletion on. Follows crontab syntax.
 # Use empty string to prevent this
 CLEAR_CLICKHOUSE_REMOVED_DATA_SCHEDULE_CRON = get_from_env(
@@ -28,3 +28,25 @@ SESSION_RECORDING_V2_S3_REGION = os.getenv("SESSION_RECORDING_V2_S3_REGION", "us
 SESSION_RECORDING_V2_S3_BUCKET = os.getenv("SESSION_RECORDING_V2_S3_BUCKET", "posthog")
 SESSION_RECORDING_V2_S3_PREFIX = os.getenv("SESSION_RECORDING_V2_S3_PREFIX", "session_recordings_v2")
 SESSION_RECORDING_V2_S3_LTS_PREFIX = os.getenv("SESSION_RECORDING_V2_S3_LTS_PREFIX", "session_recordings_v2_lts")
+# Byte ranges of blocks in the same object are read together when the gap between them is at most this many bytes...
+SESSION_RECORDING_V2_S3_COALESCE_MAX_GAP_BYTES = get_from_env(
+    "SESSION_RECORDING_V2_S3_COALESCE_MAX_GAP_BYTES", 256 * 1024, type_cast=int
+)
+# ...and the combined read is at most this many bytes
+SESSION_RECORDING_V2_S3_COALESCE_MAX_READ_BYTES = get_from_env(
+    "SESSION_RECORDING_V2_S3_COALESCE_MAX_READ_BYTES", 8 * 1024 * 1024, type_cast=int
+)
+# Stream v2 snapshots to clients as blocks are fetched, instead of responding once all blocks are loaded
+SESSION_RECORDING_V2_STREAM_SNAPSHOTS = get_from_env(
+    "SESSION_RECORDING_V2_STREAM_SNAPSHOTS", True, type_cast=str_to_bool
+)
+# Number of (coalesced) reads made ahead of the client when streaming snapshots,
+# which bounds the memory used by a snapshots response
+SESSION_RECORDING_V2_S3_STREAM_PREFETCH_READS = get_from_env(
+    "SESSION_RECORDING_V2_S3_STREAM_PREFETCH_READS", 2, type_cast=int
+)
+# Directory of a node-local disk cache of recording blocks, shared by the processes of a node. Empty to disable it
+SESSION_RECORDING_V2_BLOCK_CACHE_DIR = get_from_env("SESSION_RECORDING_V2_BLOCK_CACHE_DIR", "")
+SESSION_RECORDING_V2_BLOCK_CACHE_MAX_BYTES = get_from_env(
+    "SESSION_RECORDING_V2_BLOCK_CACHE_MAX_BYTES", 1024 * 1024 * 1024, type_cast=int
+)
@@ -88,3 +88,7 @@ BATCH_EXPORT_INTERNAL_STAGING_BUCKET: str = os.getenv("BATCH_EXPORT_INTERNAL_STA
 # The number of partitions controls how many files ClickHouse writes to concurrently
 BATCH_EXPORT_CLICKHOUSE_S3_PARTITIONS: int = get_from_env("BATCH_EXPORT_CLICKHOUSE_S3_PARTITIONS", 5, type_cast=int)
 BATCH_EXPORT_TRANSFORMER_MAX_WORKERS: int = get_from_env("BATCH_EXPORT_TRANSFORMER_MAX_WORKERS", 2, type_cast=int)
+# Level and number of worker threads used by zstd compressed batch export files. 0 threads compresses in the calling
+# thread, while -1 uses as many threads as there are CPU cores.
+BATCH_EXPORT_ZSTD_COMPRESSION_LEVEL: int = get_from_env("BATCH_EXPORT_ZSTD_COMPRESSION_LEVEL", 3, type_cast=int)
+BATCH_EXPORT_ZSTD_COMPRESSION_THREADS: int = get_from_env("BATCH_EXPORT_ZSTD_COMPRESSION_THREADS", 0, type_cast=int)
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+import structlog
+from django.conf import settings
+from prometheus_client import Counter, Gauge
+
+if TYPE_CHECKING:
+    from posthog.storage.session_recording_v2_object_storage import BlockRange
+
+logger = structlog.get_logger(__name__)
+
+BLOCK_CACHE_COUNTER = Counter(
+    "posthog_session_recording_v2_block_cache_total",
+    "Lookups against the local disk cache of session recording v2 blocks.",
+    labelnames=["result"],
+)
+BLOCK_CACHE_EVICTED_BYTES_COUNTER = Counter(
+    "posthog_session_recording_v2_block_cache_evicted_bytes_total",
+    "Bytes of session recording v2 blocks evicted from the local disk cache.",
+)
+BLOCK_CACHE_SIZE_GAUGE = Gauge(
+    "posthog_session_recording_v2_block_cache_bytes",
+    "Size of the local disk cache of session recording v2 blocks, as last measured by this process.",
+)
+
+# Caches are shrunk to this fraction of their maximum size, so that eviction isn't needed on every write
+EVICT_TO_FRACTION = 0.9
+# Partially written blocks older than this were left behind by a process that died while writing them
+ABANDONED_WRITE_SECONDS = 60 * 60
+_TEMPORARY_PREFIX = ".tmp-"
+# Cached blocks are followed by a checksum of their contents, so that corrupted blocks are refetched
+CHECKSUM_BYTES = 16
+
+
+def _checksum(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=CHECKSUM_BYTES).digest()
+
+
+class BlockDiskCache:
+    """
+    Size bounded cache of session recording v2 blocks on local disk, keyed by bucket, object key and byte range.
+
+    Blocks are written once and never modified, so cached blocks never go stale. Blocks are cached as stored (snappy
+    compressed), so they serve both decompressed and compressed reads.
+
+    The directory can be shared by all processes of a node. Blocks are written to a temporary file and then renamed
+    into place, so that a reader never sees a partially written block, and concurrent fills of the same block leave
+    one complete copy behind. Blocks are stored with a checksum, and a block that doesn't match its checksum, like one
+    corrupted on disk, is removed and treated as missing, so that it gets fetched again.
+
+    Reading a block updates its modification time, and once the cache grows beyond `max_bytes` the least recently
+    read blocks are removed. Each process only counts its own writes between evictions, so with several processes the
+    cache can briefly grow beyond `max_bytes`.
+    """
+
+    def __init__(self, directory: str, *, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = self._measure()
+
+    def _path(self, bucket: str, block_range: "BlockRange") -> str:
+        key, first_byte, last_byte = block_range
+        digest = hashlib.sha256(f"{bucket}/{key}?range=bytes={first_byte}-{last_byte}".encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def contains(self, bucket: str, block_range: "BlockRange") -> bool:
+        return os.path.exists(self._path(bucket, block_range))
+
+    def get(self, bucket: str, block_range: "BlockRange") -> Optional[bytes]:
+        path = self._path(bucket, block_range)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            BLOCK_CACHE_COUNTER.labels(result="miss").inc()
+            return None
+        except OSError:
+            logger.exception("session_recording_v2_block_cache.read_failed", path=path)
+            BLOCK_CACHE_COUNTER.labels(result="error").inc()
+            return None
+
+        block, checksum = data[:-CHECKSUM_BYTES], data[-CHECKSUM_BYTES:]
+        if len(block) != block_range.last_byte - block_range.first_byte + 1 or checksum != _checksum(block):
+            # Corrupted, or not written by us, remove it so that it gets replaced
+            logger.warning("session_recording_v2_block_cache.corrupt_block", path=path)
+            BLOCK_CACHE_COUNTER.labels(result="corrupt").inc()
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted since we opened it
+            pass
+        BLOCK_CACHE_COUNTER.labels(result="hit").inc()
+        return block
+
+    def remove(self, bucket: str, block_range: "BlockRange") -> None:
+        self._remove(self._path(bucket, block_range))
+
+    def set(self, bucket: str, block_range: "BlockRange", data: bytes) -> None:
+        if len(data) != block_range.last_byte - block_range.first_byte + 1 or len(data) > self.max_bytes:
+            return
+
+        path = self._path(bucket, block_range)
+        temporary_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=_TEMPORARY_PREFIX)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.write(_checksum(data))
+            os.replace(temporary_path, path)
+        except OSError:
+            logger.exception("session_recording_v2_block_cache.write_failed", path=path)
+            BLOCK_CACHE_COUNTER.labels(result="write_error").inc()
+            if temporary_path is not None:
+                try:
+                    os.remove(temporary_path)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            self._size += len(data) + CHECKSUM_BYTES
+            needs_eviction = self._size > self.max_bytes
+        if needs_eviction:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently read blocks until the cache is below its maximum size"""
+        if not self._evict_lock.acquire(blocking=False):
+            # Another thread of this process is already evicting
+            return
+        try:
+            entries: list[tuple[float, int, str]] = []
+            now = time.time()
+            for path, stat in self._entries():
+                if os.path.basename(path).startswith(_TEMPORARY_PREFIX):
+                    if now - stat.st_mtime > ABANDONED_WRITE_SECONDS:
+                        self._remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(entry_size for _, entry_size, _ in entries)
+            if size > self.max_bytes:
+                target = self.max_bytes * EVICT_TO_FRACTION
+                evicted = 0
+                for _, entry_size, path in sorted(entries):
+                    if size <= target:
+                        break
+                    if self._remove(path):
+                        size -= entry_size
+                        evicted += entry_size
+                BLOCK_CACHE_EVICTED_BYTES_COUNTER.inc(evicted)
+
+            with self._lock:
+                self._size = size
+            BLOCK_CACHE_SIZE_GAUGE.set(size)
+        finally:
+            self._evict_lock.release()
+
+    def _measure(self) -> int:
+        size = sum(
+            stat.st_size for path, stat in self._entries() if not os.path.basename(path).startswith(_TEMPORARY_PREFIX)
+        )
+        BLOCK_CACHE_SIZE_GAUGE.set(size)
+        return size
+
+    def _entries(self):
+        try:
+            subdirectories = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for subdirectory in subdirectories:
+            if not subdirectory.is_dir(follow_symlinks=False):
+                continue
+            try:
+                with os.scandir(subdirectory.path) as files:
+                    for file in files:
+                        try:
+                            yield file.path, file.stat(follow_symlinks=False)
+                        except OSError:
+                            # Removed by another process
+                            continue
+            except OSError:
+                continue
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError:
+            logger.exception("session_recording_v2_block_cache.remove_failed", path=path)
+            return False
+
+
+_block_cache: Optional[BlockDiskCache] = None
+_block_cache_lock = threading.Lock()
+
+
+def get_block_cache() -> Optional[BlockDiskCache]:
+    """Returns this process's block cache, or None if it's disabled or its directory can't be used."""
+    global _block_cache
+
+    if not settings.SESSION_RECORDING_V2_BLOCK_CACHE_DIR or settings.SESSION_RECORDING_V2_BLOCK_CACHE_MAX_BYTES <= 0:
+        return None
+    if _block_cache is None:
+        with _block_cache_lock:
+            if _block_cache is None:
+                try:
+                    _block_cache = BlockDiskCache(
+                        settings.SESSION_RECORDING_V2_BLOCK_CACHE_DIR,
+                        max_bytes=settings.SESSION_RECORDING_V2_BLOCK_CACHE_MAX_BYTES,
+                    )
+                except OSError:
+                    logger.exception(
+                        "session_recording_v2_block_cache.unavailable",
+                        directory=settings.SESSION_RECORDING_V2_BLOCK_CACHE_DIR,
+                    )
+                    return None
+    return _block_cache
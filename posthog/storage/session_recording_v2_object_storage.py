@@ -2,18 +2,115 @@ import abc
 import structlog
 from boto3 import client as boto3_client
 from botocore.client import Config
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from django.conf import settings
+from posthog.storage.session_recording_v2_block_cache import BlockDiskCache, get_block_cache
 from urllib.parse import urlparse, parse_qs
 import snappy
-from typing import Optional
+from typing import NamedTuple, Optional, cast
 
 logger = structlog.get_logger(__name__)
 
+# Maximum number of coalesced byte ranges read from S3 at the same time
+MAX_PARALLEL_RANGE_READS = 8
+
 
 class BlockFetchError(Exception):
     pass
 
 
+class BlockRange(NamedTuple):
+    key: str
+    first_byte: int
+    last_byte: int
+
+
+@dataclass
+class CoalescedRead:
+    """A single ranged read covering the byte ranges of several blocks in the same object."""
+
+    key: str
+    first_byte: int
+    last_byte: int
+    # Index of each block in the list of blocks to fetch, with its byte range
+    blocks: list[tuple[int, BlockRange]] = field(default_factory=list)
+
+
+def parse_block_url(block_url: str) -> BlockRange:
+    """Returns the object key and byte range of a block URL, or raises BlockFetchError"""
+    parsed_url = urlparse(block_url)
+    key = parsed_url.path.lstrip("/")
+    query_params = parse_qs(parsed_url.query)
+    byte_range = query_params.get("range", [""])[0].replace("bytes=", "")
+    try:
+        start_byte, end_byte = map(int, byte_range.split("-")) if "-" in byte_range else (None, None)
+    except ValueError:
+        start_byte, end_byte = None, None
+
+    if start_byte is None or end_byte is None:
+        raise BlockFetchError("Invalid byte range in block URL")
+
+    return BlockRange(key, start_byte, end_byte)
+
+
+def coalesce_block_ranges(
+    block_ranges: list[tuple[int, BlockRange]], *, max_gap_bytes: int, max_read_bytes: int
+) -> list[CoalescedRead]:
+    """
+    Groups block ranges by object key and merges ranges that overlap, touch, or are at most `max_gap_bytes` apart
+    into single reads of at most `max_read_bytes` (unless a single block is larger than that).
+    """
+    reads: list[CoalescedRead] = []
+    by_key: dict[str, list[tuple[int, BlockRange]]] = {}
+    for index, block_range in block_ranges:
+        by_key.setdefault(block_range.key, []).append((index, block_range))
+
+    for key, key_ranges in by_key.items():
+        current: Optional[CoalescedRead] = None
+        for index, block_range in sorted(key_ranges, key=lambda item: (item[1].first_byte, item[1].last_byte)):
+            if (
+                current is not None
+                and block_range.first_byte - current.last_byte - 1 <= max_gap_bytes
+                and max(current.last_byte, block_range.last_byte) - current.first_byte + 1 <= max_read_bytes
+            ):
+                current.last_byte = max(current.last_byte, block_range.last_byte)
+            else:
+                current = CoalescedRead(key=key, first_byte=block_range.first_byte, last_byte=block_range.last_byte)
+                reads.append(current)
+            current.blocks.append((index, block_range))
+
+    return reads
+
+
+def check_block(compressed_block: bytes | None, expected_length: int) -> bytes:
+    """Returns the compressed block if it was read in full, or raises BlockFetchError"""
+    if not compressed_block:
+        raise BlockFetchError("Block content not found")
+
+    if len(compressed_block) != expected_length:
+        raise BlockFetchError(
+            f"Unexpected data length. Expected {expected_length} bytes, got {len(compressed_block)} bytes"
+        )
+
+    return compressed_block
+
+
+def decompress_block(compressed_block: bytes | None, expected_length: int) -> str:
+    """Returns the decompressed block or raises BlockFetchError"""
+    compressed_block = check_block(compressed_block, expected_length)
+
+    try:
+        decompressed_block = snappy.decompress(compressed_block).decode("utf-8")
+    except Exception as e:
+        logger.exception("Failed to decompress block", error=e)
+        raise BlockFetchError(f"Failed to read and decompress block: {str(e)}")
+
+    # Strip any trailing newlines
+    return decompressed_block.rstrip("\n")
+
+
 class SessionRecordingV2ObjectStorageBase(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def read_bytes(self, key: str, first_byte: int, last_byte: int) -> bytes | None:
@@ -32,6 +129,19 @@ class SessionRecordingV2ObjectStorageBase(metaclass=abc.ABCMeta):
         """Returns the decompressed block or raises BlockFetchError"""
         pass
 
+    @abc.abstractmethod
+    def fetch_blocks(self, block_urls: list[str]) -> list[str | BlockFetchError]:
+        """Returns each decompressed block, in order, or the BlockFetchError fetching it failed with"""
+        pass
+
+    @abc.abstractmethod
+    def iter_blocks(self, block_urls: list[str], *, decompress: bool = True) -> Iterator[str | bytes]:
+        """
+        Yields each block in order, decompressed or as stored (snappy compressed) if `decompress` is False.
+        Raises BlockFetchError once a block can't be fetched.
+        """
+        pass
+
     @abc.abstractmethod
     def store_lts_recording(self, recording_id: str, recording_data: str) -> tuple[Optional[str], Optional[str]]:
         """Returns a tuple of (target_key, error_message)"""
@@ -55,6 +165,12 @@ class UnavailableSessionRecordingV2ObjectStorage(SessionRecordingV2ObjectStorage
     def fetch_block(self, block_url: str) -> str:
         raise BlockFetchError("Storage not available")
 
+    def fetch_blocks(self, block_urls: list[str]) -> list[str | BlockFetchError]:
+        return [BlockFetchError("Storage not available") for _ in block_urls]
+
+    def iter_blocks(self, block_urls: list[str], *, decompress: bool = True) -> Iterator[str | bytes]:
+        raise BlockFetchError("Storage not available")
+
     def store_lts_recording(self, recording_id: str, recording_data: str) -> tuple[Optional[str], Optional[str]]:
         return None, "Storage not available"
 
@@ -63,9 +179,10 @@ class UnavailableSessionRecordingV2ObjectStorage(SessionRecordingV2ObjectStorage
 
 
 class SessionRecordingV2ObjectStorage(SessionRecordingV2ObjectStorageBase):
-    def __init__(self, aws_client, bucket: str) -> None:
+    def __init__(self, aws_client, bucket: str, block_cache: Optional[BlockDiskCache] = None) -> None:
         self.aws_client = aws_client
         self.bucket = bucket
+        self.block_cache = block_cache
 
     def read_bytes(self, key: str, first_byte: int, last_byte: int) -> bytes | None:
         s3_response = {}
@@ -108,33 +225,64 @@ class SessionRecordingV2ObjectStorage(SessionRecordingV2ObjectStorageBase):
     def is_enabled(self) -> bool:
         return True
 
-    def fetch_block(self, block_url: str) -> str:
-        try:
-            # Parse URL and extract key and byte range
-            parsed_url = urlparse(block_url)
-            key = parsed_url.path.lstrip("/")
-            query_params = parse_qs(parsed_url.query)
-            byte_range = query_params.get("range", [""])[0].replace("bytes=", "")
-            start_byte, end_byte = map(int, byte_range.split("-")) if "-" in byte_range else (None, None)
+    def _is_cached(self, block_range: BlockRange) -> bool:
+        return self.block_cache is not None and self.block_cache.contains(self.bucket, block_range)
 
-            if start_byte is None or end_byte is None:
-                raise BlockFetchError("Invalid byte range in block URL")
+    def _read_block(self, block_range: BlockRange, *, decompress: bool = True) -> str | bytes:
+        """Returns the block from the block cache, or from S3 and caches it"""
+        cached_block = self._read_cached_block(block_range, decompress=decompress)
+        if cached_block is not None:
+            return cached_block
 
-            expected_length = end_byte - start_byte + 1
-            compressed_block = self.read_bytes(key, first_byte=start_byte, last_byte=end_byte)
+        compressed_block = self.read_bytes(
+            block_range.key, first_byte=block_range.first_byte, last_byte=block_range.last_byte
+        )
+        return self._use_block(block_range, compressed_block, decompress=decompress)
 
-            if not compressed_block:
-                raise BlockFetchError("Block content not found")
+    def _read_cached_block(self, block_range: BlockRange, *, decompress: bool = True) -> str | bytes | None:
+        """Returns the block from the block cache, or None if it isn't cached or doesn't decompress"""
+        if self.block_cache is None:
+            return None
+        cached_block = self.block_cache.get(self.bucket, block_range)
+        if cached_block is None:
+            return None
+        try:
+            if decompress:
+                return decompress_block(cached_block, block_range.last_byte - block_range.first_byte + 1)
+            if not snappy.isValidCompressed(cached_block):
+                raise BlockFetchError("Cached block is not valid snappy data")
+            return cached_block
+        except BlockFetchError:
+            # Evict it so that it's read from S3 again
+            logger.warning("session_recording_v2_block_cache.invalid_block", key=block_range.key)
+            self.block_cache.remove(self.bucket, block_range)
+            return None
 
-            if len(compressed_block) != expected_length:
-                raise BlockFetchError(
-                    f"Unexpected data length. Expected {expected_length} bytes, got {len(compressed_block)} bytes"
-                )
+    def _use_block(
+        self, block_range: BlockRange, compressed_block: bytes | None, *, decompress: bool = True
+    ) -> str | bytes:
+        """
+        Returns a block read from S3, decompressed or as is, and caches it only if it decompresses, so that blocks that
+        can't be read are never served from the block cache.
+        """
+        expected_length = block_range.last_byte - block_range.first_byte + 1
+        compressed_block = check_block(compressed_block, expected_length)
+        block: str | bytes
+        if decompress:
+            block = decompress_block(compressed_block, expected_length)
+        elif snappy.isValidCompressed(compressed_block):
+            block = compressed_block
+        else:
+            # Served as read, for the consumer to fail on, but not cached
+            return compressed_block
+        if self.block_cache is not None:
+            self.block_cache.set(self.bucket, block_range, compressed_block)
+        return block
 
-            decompressed_block = snappy.decompress(compressed_block).decode("utf-8")
-            # Strip any trailing newlines
-            decompressed_block = decompressed_block.rstrip("\n")
-            return decompressed_block
+    def fetch_block(self, block_url: str) -> str:
+        try:
+            block_range = parse_block_url(block_url)
+            return cast(str, self._read_block(block_range))
 
         except BlockFetchError:
             raise
@@ -142,6 +290,106 @@ class SessionRecordingV2ObjectStorage(SessionRecordingV2ObjectStorageBase):
             logger.exception("Failed to read and decompress block", error=e)
             raise BlockFetchError(f"Failed to read and decompress block: {str(e)}")
 
+    def fetch_blocks(self, block_urls: list[str]) -> list[str | BlockFetchError]:
+        """
+        Blocks of a recording are usually next to each other in the same object, so rather than reading each block
+        separately, nearby blocks are read with a single ranged read and then split and decompressed locally.
+        Blocks in the block cache aren't read from S3 at all.
+        """
+        results: list[str | BlockFetchError] = [BlockFetchError("Block not fetched") for _ in block_urls]
+        block_ranges: list[tuple[int, BlockRange]] = []
+        for index, block_url in enumerate(block_urls):
+            try:
+                block_range = parse_block_url(block_url)
+                cached_block = self._read_cached_block(block_range)
+                if cached_block is None:
+                    block_ranges.append((index, block_range))
+                else:
+                    results[index] = cast(str, cached_block)
+            except BlockFetchError as e:
+                results[index] = e
+
+        reads = coalesce_block_ranges(
+            block_ranges,
+            max_gap_bytes=settings.SESSION_RECORDING_V2_S3_COALESCE_MAX_GAP_BYTES,
+            max_read_bytes=settings.SESSION_RECORDING_V2_S3_COALESCE_MAX_READ_BYTES,
+        )
+
+        def fetch_read(read: CoalescedRead) -> None:
+            data = self.read_bytes(read.key, first_byte=read.first_byte, last_byte=read.last_byte)
+            for index, block_range in read.blocks:
+                start = block_range.first_byte - read.first_byte
+                end = block_range.last_byte - read.first_byte + 1
+                compressed_block = data[start:end] if data else None
+                try:
+                    results[index] = cast(str, self._use_block(block_range, compressed_block))
+                except BlockFetchError as e:
+                    results[index] = e
+
+        if len(reads) <= 1:
+            for read in reads:
+                fetch_read(read)
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(reads), MAX_PARALLEL_RANGE_READS)) as executor:
+                list(executor.map(fetch_read, reads))
+
+        return results
+
+    def iter_blocks(self, block_urls: list[str], *, decompress: bool = True) -> Iterator[str | bytes]:
+        """
+        Like `fetch_blocks`, blocks are read with as few reads as possible. Reads are made ahead of the consumer, at
+        most SESSION_RECORDING_V2_S3_STREAM_PREFETCH_READS at a time, and only blocks not yet consumed are kept in
+        memory, so that memory use doesn't grow with the number of blocks. Blocks in the block cache are read from it
+        when they're consumed.
+        """
+        block_ranges = [(index, parse_block_url(block_url)) for index, block_url in enumerate(block_urls)]
+        cached = {index for index, block_range in block_ranges if self._is_cached(block_range)}
+        reads = sorted(
+            coalesce_block_ranges(
+                [(index, block_range) for index, block_range in block_ranges if index not in cached],
+                max_gap_bytes=settings.SESSION_RECORDING_V2_S3_COALESCE_MAX_GAP_BYTES,
+                max_read_bytes=settings.SESSION_RECORDING_V2_S3_COALESCE_MAX_READ_BYTES,
+            ),
+            key=lambda read: min(index for index, _ in read.blocks),
+        )
+        read_numbers = {index: read_number for read_number, read in enumerate(reads) for index, _ in read.blocks}
+        blocks_left = [len(read.blocks) for read in reads]
+        prefetch_reads = max(settings.SESSION_RECORDING_V2_S3_STREAM_PREFETCH_READS, 1)
+
+        executor = ThreadPoolExecutor(max_workers=prefetch_reads)
+        pending_reads: dict[int, Future[bytes | None]] = {}
+        next_read = 0
+        read_number = 0
+        try:
+            for index, block_range in block_ranges:
+                # Cached blocks keep prefetching the reads of the blocks after them
+                read_number = read_numbers.get(index, read_number)
+                while next_read < min(read_number + prefetch_reads, len(reads)):
+                    read = reads[next_read]
+                    pending_reads[next_read] = executor.submit(
+                        self.read_bytes, read.key, first_byte=read.first_byte, last_byte=read.last_byte
+                    )
+                    next_read += 1
+
+                if index in cached:
+                    # Falls back to S3 if the block was evicted, or is evicted for not decompressing, in the meantime
+                    yield self._read_block(block_range, decompress=decompress)
+                    continue
+
+                read = reads[read_number]
+                data = pending_reads[read_number].result()
+                start = block_range.first_byte - read.first_byte
+                end = block_range.last_byte - read.first_byte + 1
+                compressed_block = data[start:end] if data else None
+
+                blocks_left[read_number] -= 1
+                if blocks_left[read_number] == 0:
+                    del pending_reads[read_number]
+
+                yield self._use_block(block_range, compressed_block, decompress=decompress)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def store_lts_recording(self, recording_id: str, recording_data: str) -> tuple[Optional[str], Optional[str]]:
         try:
             compressed_data = snappy.compress(recording_data.encode("utf-8"))
@@ -197,6 +445,7 @@ def client() -> SessionRecordingV2ObjectStorageBase:
                 region_name=settings.SESSION_RECORDING_V2_S3_REGION,
             ),
             bucket=settings.SESSION_RECORDING_V2_S3_BUCKET,
+            block_cache=get_block_cache(),
         )
 
     return _client
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from posthog.storage.session_recording_v2_block_cache import CHECKSUM_BYTES, BlockDiskCache
+from posthog.storage.session_recording_v2_object_storage import BlockRange
+
+TEST_BUCKET = "test_session_recording_v2_bucket"
+
+
+class TestBlockDiskCache(TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temporary_directory.name
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_get_returns_set_blocks(self):
+        cache = BlockDiskCache(self.directory, max_bytes=1024)
+        block_range = BlockRange("key1", 10, 14)
+
+        assert cache.get(TEST_BUCKET, block_range) is None
+        assert not cache.contains(TEST_BUCKET, block_range)
+
+        cache.set(TEST_BUCKET, block_range, b"block")
+
+        assert cache.contains(TEST_BUCKET, block_range)
+        assert cache.get(TEST_BUCKET, block_range) == b"block"
+        assert cache.get("other_bucket", block_range) is None
+        assert cache.get(TEST_BUCKET, BlockRange("key1", 15, 19)) is None
+        assert cache.get(TEST_BUCKET, BlockRange("key2", 10, 14)) is None
+
+    def test_does_not_cache_blocks_of_the_wrong_length(self):
+        cache = BlockDiskCache(self.directory, max_bytes=1024)
+        block_range = BlockRange("key1", 0, 9)
+
+        cache.set(TEST_BUCKET, block_range, b"short")
+
+        assert cache.get(TEST_BUCKET, block_range) is None
+
+    def test_removes_corrupted_blocks(self):
+        cache = BlockDiskCache(self.directory, max_bytes=1024)
+        block_range = BlockRange("key1", 0, 4)
+        cache.set(TEST_BUCKET, block_range, b"block")
+        path = cache._path(TEST_BUCKET, block_range)
+        with open(path, "r+b") as f:
+            f.write(b"B")
+
+        assert cache.get(TEST_BUCKET, block_range) is None
+        assert not os.path.exists(path)
+
+        cache.set(TEST_BUCKET, block_range, b"block")
+        assert cache.get(TEST_BUCKET, block_range) == b"block"
+
+    def test_evicts_least_recently_read_blocks(self):
+        cache = BlockDiskCache(self.directory, max_bytes=3 * (100 + CHECKSUM_BYTES))
+        block_ranges = [BlockRange("key1", index * 100, index * 100 + 99) for index in range(4)]
+        for index, block_range in enumerate(block_ranges[:3]):
+            cache.set(TEST_BUCKET, block_range, bytes([index]) * 100)
+            # Modification times need to differ for the order to be deterministic
+            past = time.time() - 100 + index
+            os.utime(cache._path(TEST_BUCKET, block_range), (past, past))
+
+        assert cache.get(TEST_BUCKET, block_ranges[0]) == bytes([0]) * 100
+        cache.set(TEST_BUCKET, block_ranges[3], bytes([3]) * 100)
+
+        # The cache is shrunk to 90% of its size, evicting the blocks read longest ago
+        assert cache.get(TEST_BUCKET, block_ranges[0]) is not None
+        assert cache.get(TEST_BUCKET, block_ranges[1]) is None
+        assert cache.get(TEST_BUCKET, block_ranges[2]) is None
+        assert cache.get(TEST_BUCKET, block_ranges[3]) is not None
+        assert cache._size == 2 * (100 + CHECKSUM_BYTES)
+
+    def test_measures_existing_blocks(self):
+        BlockDiskCache(self.directory, max_bytes=1024).set(TEST_BUCKET, BlockRange("key1", 0, 99), b"x" * 100)
+
+        cache = BlockDiskCache(self.directory, max_bytes=1024)
+
+        assert cache._size == 100 + CHECKSUM_BYTES
+        assert cache.get(TEST_BUCKET, BlockRange("key1", 0, 99)) == b"x" * 100
+
+    def test_concurrent_fills_leave_a_complete_block(self):
+        cache = BlockDiskCache(self.directory, max_bytes=1024 * 1024)
+        block_range = BlockRange("key1", 0, 64 * 1024 - 1)
+        data = os.urandom(64 * 1024)
+        reads: list[bytes | None] = []
+
+        def fill():
+            for _ in range(20):
+                cache.set(TEST_BUCKET, block_range, data)
+                reads.append(cache.get(TEST_BUCKET, block_range))
+
+        threads = [threading.Thread(target=fill) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(read == data for read in reads)
+        files = [name for _, _, names in os.walk(self.directory) for name in names]
+        assert len(files) == 1
@@ -1,3 +1,4 @@
+import tempfile
 from unittest.mock import patch, MagicMock
 import snappy
 from django.test import override_settings
@@ -11,8 +12,11 @@ from posthog.settings.session_replay_v2 import (
     SESSION_RECORDING_V2_S3_REGION,
     SESSION_RECORDING_V2_S3_SECRET_ACCESS_KEY,
 )
+from posthog.storage.session_recording_v2_block_cache import BlockDiskCache
 from posthog.storage.session_recording_v2_object_storage import (
     client,
+    coalesce_block_ranges,
+    BlockRange,
     SessionRecordingV2ObjectStorage,
     BlockFetchError,
 )
@@ -155,6 +159,210 @@ class TestSessionRecordingV2Storage(APIBaseTest):
             storage.fetch_block("s3://bucket/key1?range=bytes=0-100")
         assert "Unexpected data length" in str(cm.exception)
 
+    def test_coalesce_block_ranges(self):
+        block_ranges = [
+            (0, BlockRange("key1", 0, 99)),
+            (1, BlockRange("key2", 0, 9)),
+            (2, BlockRange("key1", 100, 199)),
+            # Out of order, and close enough to the previous block
+            (4, BlockRange("key1", 250, 299)),
+            (3, BlockRange("key1", 210, 239)),
+            # Too far from the previous block
+            (5, BlockRange("key1", 400, 499)),
+        ]
+
+        reads = coalesce_block_ranges(block_ranges, max_gap_bytes=10, max_read_bytes=1000)
+
+        assert [(read.key, read.first_byte, read.last_byte, [index for index, _ in read.blocks]) for read in reads] == [
+            ("key1", 0, 299, [0, 2, 3, 4]),
+            ("key1", 400, 499, [5]),
+            ("key2", 0, 9, [1]),
+        ]
+
+    def test_coalesce_block_ranges_limits_read_size(self):
+        block_ranges = [(index, BlockRange("key1", index * 100, index * 100 + 99)) for index in range(5)]
+
+        reads = coalesce_block_ranges(block_ranges, max_gap_bytes=0, max_read_bytes=250)
+
+        assert [(read.first_byte, read.last_byte) for read in reads] == [(0, 199), (200, 399), (400, 499)]
+
+    def test_fetch_blocks_reads_nearby_blocks_at_once(self):
+        blocks = [snappy.compress(f"block {index}\n".encode()) for index in range(3)]
+        gap = b"x" * 5
+        data = blocks[0] + blocks[1] + gap + blocks[2]
+        offsets = [0, len(blocks[0]), len(blocks[0]) + len(blocks[1]) + len(gap)]
+        block_urls = [
+            f"s3://bucket/key1?range=bytes={offset}-{offset + len(block) - 1}" for offset, block in zip(offsets, blocks)
+        ]
+
+        mock_client = MagicMock()
+        mock_client.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=data))}
+        storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET)
+
+        results = storage.fetch_blocks([block_urls[2], block_urls[0], "s3://bucket/key1", block_urls[1]])
+
+        assert results[0] == "block 2"
+        assert results[1] == "block 0"
+        assert isinstance(results[2], BlockFetchError)
+        assert results[3] == "block 1"
+        mock_client.get_object.assert_called_once_with(Bucket=TEST_BUCKET, Key="key1", Range=f"bytes=0-{len(data) - 1}")
+
+    def test_fetch_blocks_reads_separate_objects_separately(self):
+        blocks = {key: snappy.compress(f"block in {key}".encode()) for key in ("key1", "key2")}
+
+        mock_client = MagicMock()
+        mock_client.get_object.side_effect = lambda Key, **kwargs: {
+            "Body": MagicMock(read=MagicMock(return_value=blocks[Key]))
+        }
+        storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET)
+
+        results = storage.fetch_blocks(
+            [f"s3://bucket/{key}?range=bytes=0-{len(block) - 1}" for key, block in blocks.items()]
+        )
+
+        assert results == ["block in key1", "block in key2"]
+        assert mock_client.get_object.call_count == 2
+
+    def test_fetch_blocks_short_read(self):
+        block = snappy.compress(b"block")
+        mock_client = MagicMock()
+        mock_client.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=block))}
+        storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET)
+
+        results = storage.fetch_blocks(
+            [
+                f"s3://bucket/key1?range=bytes=0-{len(block) - 1}",
+                f"s3://bucket/key1?range=bytes={len(block)}-{len(block) + 9}",
+            ]
+        )
+
+        assert results[0] == "block"
+        assert isinstance(results[1], BlockFetchError)
+        assert "Block content not found" in str(results[1])
+
+    def test_iter_blocks_yields_blocks_in_order(self):
+        blocks = [snappy.compress(f"block {index}\n".encode()) for index in range(4)]
+        offsets = [sum(len(block) for block in blocks[:index]) for index in range(4)]
+        data = b"".join(blocks)
+        block_urls = [
+            f"s3://bucket/key1?range=bytes={offset}-{offset + len(block) - 1}" for offset, block in zip(offsets, blocks)
+        ]
+
+        def get_object(Range: str, **kwargs):
+            first_byte, last_byte = map(int, Range.removeprefix("bytes=").split("-"))
+            return {"Body": MagicMock(read=MagicMock(return_value=data[first_byte : last_byte + 1]))}
+
+        mock_client = MagicMock()
+        mock_client.get_object.side_effect = get_object
+        storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET)
+
+        with override_settings(SESSION_RECORDING_V2_S3_COALESCE_MAX_READ_BYTES=len(blocks[0]) + len(blocks[1])):
+            assert list(storage.iter_blocks(block_urls)) == ["block 0", "block 1", "block 2", "block 3"]
+            assert list(storage.iter_blocks(block_urls, decompress=False)) == blocks
+
+        # Two reads of two blocks each, for each iteration
+        assert mock_client.get_object.call_count == 4
+
+    def test_iter_blocks_raises_when_a_block_cannot_be_fetched(self):
+        block = snappy.compress(b"block")
+        mock_client = MagicMock()
+        mock_client.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=block))}
+        storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET)
+
+        iterator = storage.iter_blocks(
+            [
+                f"s3://bucket/key1?range=bytes=0-{len(block) - 1}",
+                f"s3://bucket/key1?range=bytes={len(block)}-{len(block) + 9}",
+            ]
+        )
+
+        assert next(iterator) == "block"
+        with self.assertRaises(BlockFetchError):
+            next(iterator)
+
+    def test_reads_cached_blocks_from_the_block_cache(self):
+        blocks = [snappy.compress(f"block {index}\n".encode()) for index in range(3)]
+        offsets = [sum(len(block) for block in blocks[:index]) for index in range(3)]
+        data = b"".join(blocks)
+        block_urls = [
+            f"s3://bucket/key1?range=bytes={offset}-{offset + len(block) - 1}" for offset, block in zip(offsets, blocks)
+        ]
+
+        def get_object(Range: str, **kwargs):
+            first_byte, last_byte = map(int, Range.removeprefix("bytes=").split("-"))
+            return {"Body": MagicMock(read=MagicMock(return_value=data[first_byte : last_byte + 1]))}
+
+        mock_client = MagicMock()
+        mock_client.get_object.side_effect = get_object
+
+        with tempfile.TemporaryDirectory() as directory:
+            storage = SessionRecordingV2ObjectStorage(
+                mock_client, TEST_BUCKET, block_cache=BlockDiskCache(directory, max_bytes=1024 * 1024)
+            )
+
+            assert storage.fetch_block(block_urls[1]) == "block 1"
+            mock_client.get_object.assert_called_once_with(
+                Bucket=TEST_BUCKET, Key="key1", Range=f"bytes={offsets[1]}-{offsets[1] + len(blocks[1]) - 1}"
+            )
+
+            # Only the blocks around the cached one are read from S3
+            mock_client.get_object.reset_mock()
+            with override_settings(SESSION_RECORDING_V2_S3_COALESCE_MAX_GAP_BYTES=0):
+                assert storage.fetch_blocks(block_urls) == ["block 0", "block 1", "block 2"]
+            assert mock_client.get_object.call_count == 2
+
+            mock_client.get_object.reset_mock()
+            assert storage.fetch_block(block_urls[0]) == "block 0"
+            assert list(storage.iter_blocks(block_urls)) == ["block 0", "block 1", "block 2"]
+            assert list(storage.iter_blocks(block_urls, decompress=False)) == blocks
+            mock_client.get_object.assert_not_called()
+
+    def test_only_caches_blocks_that_decompress(self):
+        block = snappy.compress(b"block")
+        invalid_block = b"\xff" * len(block)
+        block_url = f"s3://bucket/key1?range=bytes=0-{len(block) - 1}"
+        block_range = BlockRange("key1", 0, len(block) - 1)
+
+        mock_client = MagicMock()
+        mock_client.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=invalid_block))}
+
+        with tempfile.TemporaryDirectory() as directory:
+            block_cache = BlockDiskCache(directory, max_bytes=1024 * 1024)
+            storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET, block_cache=block_cache)
+
+            with self.assertRaises(BlockFetchError):
+                storage.fetch_block(block_url)
+            assert isinstance(storage.fetch_blocks([block_url])[0], BlockFetchError)
+            with self.assertRaises(BlockFetchError):
+                list(storage.iter_blocks([block_url]))
+            assert list(storage.iter_blocks([block_url], decompress=False)) == [invalid_block]
+            assert not block_cache.contains(TEST_BUCKET, block_range)
+
+    def test_refetches_cached_blocks_that_do_not_decompress(self):
+        block = snappy.compress(b"block")
+        block_url = f"s3://bucket/key1?range=bytes=0-{len(block) - 1}"
+        block_range = BlockRange("key1", 0, len(block) - 1)
+
+        mock_client = MagicMock()
+        mock_client.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=block))}
+
+        with tempfile.TemporaryDirectory() as directory:
+            block_cache = BlockDiskCache(directory, max_bytes=1024 * 1024)
+            storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET, block_cache=block_cache)
+
+            for fetch in (
+                lambda: storage.fetch_block(block_url),
+                lambda: storage.fetch_blocks([block_url])[0],
+                lambda: next(storage.iter_blocks([block_url])),
+            ):
+                # Cached with a valid checksum, but not a valid block
+                block_cache.set(TEST_BUCKET, block_range, b"\xff" * len(block))
+                mock_client.get_object.reset_mock()
+
+                assert fetch() == "block"
+                mock_client.get_object.assert_called_once()
+                assert block_cache.get(TEST_BUCKET, block_range) == block
+
     def test_store_lts_recording_success(self):
         mock_client = MagicMock()
         storage = SessionRecordingV2ObjectStorage(mock_client, TEST_BUCKET)
@@ -1,12 +1,17 @@
+import contextvars
 import gc
+import queue
 import sys
+import threading
 import time
+from collections.abc import Callable
 from typing import Any, Literal
 
 import deltalake as deltalake
 import posthoganalytics
 import pyarrow as pa
 import pyarrow.compute as pc
+from django.db import connections
 from django.db.models import F
 
 from posthog.exceptions_capture import capture_exception
@@ -62,6 +67,8 @@ class PipelineNonDLT:
     _load_id: int
     _chunk_size: int = 5000
     _chunk_size_bytes: int = 200 * 1024 * 1024  # 200 MiB
+    # Chunks waiting to be converted, and to be written, while the source is read
+    _max_queued_chunks: int = 1
 
     def __init__(
         self,
@@ -123,7 +130,6 @@ class PipelineNonDLT:
 
             buffer: list[Any] = []
             buffer_size_bytes = 0
-            py_table = None
             row_count = 0
             chunk_index = 0
 
@@ -140,8 +146,20 @@ class PipelineNonDLT:
             # If the schema has no DWH table, it's a first ever sync
             is_first_ever_sync: bool = self._schema.table is None
 
+            def write(py_table: pa.Table) -> None:
+                nonlocal row_count, chunk_index
+
+                row_count += py_table.num_rows
+                self._process_pa_table(
+                    pa_table=py_table, index=chunk_index, row_count=row_count, is_first_ever_sync=is_first_ever_sync
+                )
+                chunk_index += 1
+                pa_memory_pool.release_unused()
+
+            chunks = _ChunkPipeline(convert=_chunk_to_table, write=write, max_queued=self._max_queued_chunks)
+
             for item in self._resource.items:
-                py_table = None
+                chunk: list[Any] | pa.Table
 
                 if isinstance(item, list):
                     if len(buffer) > 0:
@@ -150,7 +168,7 @@ class PipelineNonDLT:
                         if buffer_size_bytes >= self._chunk_size_bytes or len(buffer) >= self._chunk_size:
                             self._logger.debug(f"Processing pipeline buffer (list). Length of buffer = {len(buffer)}")
 
-                            py_table = table_from_py_list(buffer)
+                            chunk = buffer
                             buffer = []
                             buffer_size_bytes = 0
                         else:
@@ -159,7 +177,7 @@ class PipelineNonDLT:
                         buffer_size_bytes += _estimate_size(item)
                         if buffer_size_bytes >= self._chunk_size_bytes or len(item) >= self._chunk_size:
                             self._logger.debug(f"Processing pipeline item (list). Length of item = {len(item)}")
-                            py_table = table_from_py_list(item)
+                            chunk = item
                             buffer_size_bytes = 0
                         else:
                             buffer.extend(item)
@@ -171,28 +189,16 @@ class PipelineNonDLT:
                         continue
 
                     self._logger.debug(f"Processing pipeline buffer (dict). Length of buffer = {len(buffer)}")
-                    py_table = table_from_py_list(buffer)
+                    chunk = buffer
                     buffer = []
                     buffer_size_bytes = 0
                 elif isinstance(item, pa.Table):
-                    py_table = item
+                    chunk = item
                 else:
                     raise Exception(f"Unhandled item type: {item.__class__.__name__}")
 
-                assert py_table is not None
-                row_count += py_table.num_rows
-
-                self._process_pa_table(
-                    pa_table=py_table, index=chunk_index, row_count=row_count, is_first_ever_sync=is_first_ever_sync
-                )
-
-                chunk_index += 1
-
-                # Cleanup
-                if "py_table" in locals() and py_table is not None:
-                    del py_table
-                pa_memory_pool.release_unused()
-                gc.collect()
+                chunks.put(chunk)
+                del chunk
 
                 # Only raise if we're not running in descending order, otherwise we'll often not
                 # complete the job before the incremental value can be updated
@@ -201,14 +207,18 @@ class PipelineNonDLT:
                     self._shutdown_monitor.raise_if_is_worker_shutdown()
 
             if len(buffer) > 0:
-                py_table = table_from_py_list(buffer)
-                row_count += py_table.num_rows
-                self._process_pa_table(
-                    pa_table=py_table, index=chunk_index, row_count=row_count, is_first_ever_sync=is_first_ever_sync
-                )
+                chunks.put(buffer)
+                buffer = []
+
+            chunks.finish()
 
             self._post_run_operations(row_count=row_count)
         finally:
+            # Chunks that haven't been written yet are dropped, like the rows in the buffer. Waits for the chunk being
+            # written, if any
+            if "chunks" in locals():
+                chunks.stop()
+
             # Help reduce the memory footprint of each job
             delta_table = self._delta_table_helper.get_delta_table()
             self._delta_table_helper.get_delta_table.cache_clear()
@@ -220,8 +230,6 @@ class PipelineNonDLT:
 
             if "buffer" in locals() and buffer is not None:
                 del buffer
-            if "py_table" in locals() and py_table is not None:
-                del py_table
 
             pa_memory_pool.release_unused()
             gc.collect()
@@ -445,6 +453,106 @@ def _notify_revenue_analytics_that_sync_has_completed(schema: ExternalDataSchema
         capture_exception(e)
 
 
+def _chunk_to_table(chunk: list[Any] | pa.Table) -> pa.Table:
+    if isinstance(chunk, pa.Table):
+        return chunk
+    return table_from_py_list(chunk)
+
+
+_DONE = object()
+
+
+class _ChunkPipeline:
+    """
+    Converts chunks of source rows to Arrow tables and writes them, each on its own thread, so that reading the source,
+    converting chunks and writing them overlap. Chunks are converted and written one at a time, in the order they're
+    put, so incremental field values are stored in order.
+
+    At most `max_queued` chunks wait to be converted, and as many to be written, after which `put` blocks, so that
+    memory stays bounded when writing is slower than reading. If converting or writing a chunk fails, the pipeline
+    stops, and `put` and `finish` raise the error.
+    """
+
+    _poll_interval = 0.1
+
+    def __init__(
+        self, convert: Callable[[Any], pa.Table], write: Callable[[pa.Table], None], max_queued: int = 1
+    ) -> None:
+        self._stopped = threading.Event()
+        self._error: BaseException | None = None
+        self._chunks: queue.Queue[Any] = queue.Queue(maxsize=max_queued)
+        self._tables: queue.Queue[Any] = queue.Queue(maxsize=max_queued)
+        self._threads = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._work, self._chunks, convert, self._tables),
+                name="pipeline_convert",
+                daemon=True,
+            ),
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._work, self._tables, write, None),
+                name="pipeline_write",
+                daemon=True,
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, chunk: Any) -> None:
+        self._put(self._chunks, chunk)
+
+    def finish(self) -> None:
+        """Waits for all chunks to be written"""
+        self._put(self._chunks, _DONE)
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self) -> None:
+        """Stops once the chunks being converted and written are, dropping the others"""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _put(self, to: queue.Queue[Any], item: Any) -> None:
+        while True:
+            if self._stopped.is_set():
+                if self._error is not None:
+                    raise self._error
+                raise Exception("Pipeline was stopped")
+            try:
+                to.put(item, timeout=self._poll_interval)
+                return
+            except queue.Full:
+                continue
+
+    def _work(self, source: queue.Queue[Any], fn: Callable[[Any], Any], to: queue.Queue[Any] | None) -> None:
+        try:
+            while not self._stopped.is_set():
+                try:
+                    item = source.get(timeout=self._poll_interval)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    if to is not None:
+                        self._put(to, _DONE)
+                    return
+                result = fn(item)
+                del item
+                if to is not None:
+                    self._put(to, result)
+                del result
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._stopped.set()
+        finally:
+            # Writing chunks updates the job and schema, this only closes the connections of this thread
+            connections.close_all()
+
+
 def _estimate_size(obj: Any) -> int:
     if isinstance(obj, dict):
         return sys.getsizeof(obj) + sum(_estimate_size(k) + _estimate_size(v) for k, v in obj.items())
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pyarrow as pa
+import pytest
+
+from posthog.temporal.data_imports.pipelines.pipeline.pipeline import _chunk_to_table, _ChunkPipeline
+
+
+def test_chunk_pipeline_writes_chunks_in_order():
+    written: list[list[int]] = []
+
+    def write(table: pa.Table) -> None:
+        # Slower than reading, so chunks queue up
+        time.sleep(0.01)
+        written.append(table.column("id").to_pylist())
+
+    pipeline = _ChunkPipeline(convert=_chunk_to_table, write=write)
+    for index in range(10):
+        if index % 2:
+            pipeline.put([{"id": index}])
+        else:
+            pipeline.put(pa.table({"id": [index]}))
+    pipeline.finish()
+
+    assert written == [[index] for index in range(10)]
+
+
+def test_chunk_pipeline_bounds_queued_chunks():
+    release = threading.Event()
+    converted: list[int] = []
+
+    def convert(chunk):
+        converted.append(chunk[0]["id"])
+        return _chunk_to_table(chunk)
+
+    pipeline = _ChunkPipeline(convert=convert, write=lambda table: release.wait(5), max_queued=1)
+    put = 0
+
+    def read():
+        nonlocal put
+        for index in range(10):
+            pipeline.put([{"id": index}])
+            put += 1
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    time.sleep(0.3)
+
+    # One chunk being written, one waiting to be written, one being converted, and one waiting to be converted
+    assert put <= 4
+    assert len(converted) <= 3
+
+    release.set()
+    reader.join(5)
+    pipeline.finish()
+    assert converted == list(range(10))
+
+
+def test_chunk_pipeline_raises_write_errors():
+    def write(table: pa.Table) -> None:
+        raise ValueError("Write failed")
+
+    pipeline = _ChunkPipeline(convert=_chunk_to_table, write=write)
+
+    with pytest.raises(ValueError, match="Write failed"):
+        for index in range(10):
+            pipeline.put([{"id": index}])
+        pipeline.finish()
+
+
+def test_chunk_pipeline_stop_drops_queued_chunks():
+    started = threading.Event()
+    release = threading.Event()
+    written: list[int] = []
+
+    def write(table: pa.Table) -> None:
+        started.set()
+        release.wait(5)
+        written.append(table.num_rows)
+
+    pipeline = _ChunkPipeline(convert=_chunk_to_table, write=write)
+    pipeline.put([{"id": 0}])
+    started.wait(5)
+    pipeline.put([{"id": 1}])
+
+    release.set()
+    pipeline.stop()
+
+    # The chunk being written was written
+    assert written[:1] == [1]
+    with pytest.raises(Exception, match="Pipeline was stopped"):
+        pipeline.put([{"id": 2}])
@@ -8,6 +8,8 @@ import os
 from django.conf import settings
 import gzip
 import brotli
+import lz4.frame
+import zstandard
 
 
 async def read_parquet_from_s3(
@@ -70,6 +72,10 @@ def read_s3_data_as_json(data: bytes, compression: str | None) -> list:
             data = gzip.decompress(data)
         case "brotli":
             data = brotli.decompress(data)
+        case "zstd":
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        case "lz4":
+            data = lz4.frame.decompress(data)
         case _:
             pass
 
@@ -1,10 +1,12 @@
 import concurrent.futures
 from datetime import datetime
 from typing import cast
+from unittest.mock import ANY, patch
 
 from django.core.cache import cache
-from django.db import IntegrityError, connection
+from django.db import DatabaseError, IntegrityError, connection
 from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from freezegun import freeze_time
 from parameterized import parameterized
@@ -14,6 +16,7 @@ from flaky import flaky
 from posthog.models import Cohort, FeatureFlag, GroupTypeMapping, Person
 from posthog.models.feature_flag import get_feature_flags_for_team_in_cache
 from posthog.models.feature_flag.flag_matching import (
+    BulkFeatureFlagMatcher,
     FeatureFlagHashKeyOverride,
     FeatureFlagMatch,
     FeatureFlagMatcher,
@@ -21,6 +24,8 @@ from posthog.models.feature_flag.flag_matching import (
     FlagsMatcherCache,
     get_all_feature_flags,
     get_feature_flag_hash_key_overrides,
+    get_feature_flag_hash_key_overrides_for_distinct_ids,
+    get_feature_flag_matches_for_distinct_ids,
     set_feature_flag_hash_key_overrides,
 )
 from posthog.models.group import Group
@@ -6075,6 +6080,124 @@ class TestFeatureFlagHashKeyOverrides(BaseTest, QueryMatchingTest):
         self.assertEqual(payloads, {})
 
 
+class TestBulkFeatureFlagMatcher(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.flags = [
+            FeatureFlag.objects.create(
+                team=self.team,
+                created_by=self.user,
+                key="email-flag",
+                filters={
+                    "groups": [
+                        {
+                            "properties": [
+                                {"key": "email", "value": "posthog.com", "operator": "icontains", "type": "person"}
+                            ],
+                            "rollout_percentage": 50,
+                        }
+                    ]
+                },
+            ),
+            FeatureFlag.objects.create(
+                team=self.team,
+                created_by=self.user,
+                key="no-email-flag",
+                filters={"groups": [{"properties": [{"key": "email", "operator": "is_not_set", "type": "person"}]}]},
+            ),
+            FeatureFlag.objects.create(
+                team=self.team,
+                created_by=self.user,
+                key="distinct-id-flag",
+                filters={
+                    "groups": [
+                        {
+                            "properties": [
+                                {"key": "distinct_id", "value": ["2", "no-person"], "operator": "exact"},
+                                {"key": "email", "operator": "is_not_set", "type": "person"},
+                            ]
+                        }
+                    ]
+                },
+            ),
+            FeatureFlag.objects.create(
+                team=self.team,
+                created_by=self.user,
+                key="multivariate-flag",
+                filters={
+                    "groups": [{"properties": [], "rollout_percentage": 100}],
+                    "multivariate": {
+                        "variants": [
+                            {"key": "first", "rollout_percentage": 50},
+                            {"key": "second", "rollout_percentage": 50},
+                        ]
+                    },
+                },
+                ensure_experience_continuity=True,
+            ),
+        ]
+        for i in range(4):
+            Person.objects.create(
+                team=self.team,
+                distinct_ids=[str(i)],
+                properties={"email": f"{i}@posthog.com"} if i % 2 == 0 else {},
+            )
+
+    def test_bulk_matches_are_the_same_as_individual_matches(self):
+        distinct_ids = ["0", "1", "2", "3", "no-person"]
+
+        bulk_matches = BulkFeatureFlagMatcher(self.team.pk, self.project.pk, self.flags, distinct_ids).get_matches()
+
+        for distinct_id in distinct_ids:
+            matcher = FeatureFlagMatcher(
+                self.team.pk,
+                self.project.pk,
+                self.flags,
+                distinct_id,
+                property_value_overrides={"distinct_id": distinct_id},
+            )
+            self.assertEqual(
+                bulk_matches[distinct_id],
+                {flag.key: matcher.get_match(flag) for flag in self.flags},
+                distinct_id,
+            )
+
+    def test_number_of_queries_doesnt_grow_with_distinct_ids(self):
+        flags = [flag for flag in self.flags if flag.key != "distinct-id-flag"]
+
+        with CaptureQueriesContext(connection) as two_distinct_ids_queries:
+            BulkFeatureFlagMatcher(self.team.pk, self.project.pk, flags, ["0", "1"]).get_matches()
+        with CaptureQueriesContext(connection) as four_distinct_ids_queries:
+            matches = BulkFeatureFlagMatcher(self.team.pk, self.project.pk, flags, ["0", "1", "2", "3"]).get_matches()
+
+        self.assertEqual(
+            len(two_distinct_ids_queries.captured_queries), len(four_distinct_ids_queries.captured_queries)
+        )
+        self.assertEqual(matches["1"]["no-email-flag"].match, True)
+        self.assertEqual(matches["2"]["no-email-flag"].match, False)
+
+    def test_flags_needing_conditions_fail_when_fetching_them_fails(self):
+        matcher = BulkFeatureFlagMatcher(self.team.pk, self.project.pk, self.flags, ["0", "1"])
+
+        with patch.object(matcher, "_bulk_query_conditions", side_effect=DatabaseError("statement timeout")):
+            matches = matcher.get_matches()
+
+        # Flags that don't need the database are still matched
+        self.assertEqual(matches, {"0": {"multivariate-flag": ANY}, "1": {"multivariate-flag": ANY}})
+        self.assertTrue(matcher.errors_while_computing_flags)
+
+    def test_hash_key_overrides_for_distinct_ids(self):
+        set_feature_flag_hash_key_overrides(team=self.team, distinct_ids=["0"], hash_key_override="other_id")
+
+        hash_key_overrides = get_feature_flag_hash_key_overrides_for_distinct_ids(self.team.pk, ["0", "1"])
+        self.assertEqual(hash_key_overrides, {"0": {"multivariate-flag": "other_id"}})
+
+        matches = get_feature_flag_matches_for_distinct_ids(
+            self.team, ["0", "other_id"], flag_keys=["multivariate-flag"]
+        )
+        self.assertEqual(matches["0"]["multivariate-flag"], matches["other_id"]["multivariate-flag"])
+
+
 class TestHashKeyOverridesRaceConditions(TransactionTestCase, QueryMatchingTest):
     def setUp(self) -> None:
         return super().setUp()
@@ -0,0 +1,131 @@
+"""Streaming compressors used to compress files produced by batch exports."""
+
+import typing
+import zlib
+
+import brotli
+import lz4.frame
+import zstandard
+from django.conf import settings
+
+STREAM_COMPRESSIONS = ("gzip", "brotli", "zstd", "lz4")
+
+
+class StreamCompressor(typing.Protocol):
+    """A compressor that produces a single compressed stream out of multiple writes.
+
+    A stream compressor is used for the lifetime of one file: All writes are fed to
+    `compress`, and the stream is completed by calling `finish` once at the end of the file.
+    After `finish`, the compressor must not be used again.
+    """
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress `data`, returning any compressed bytes ready to be written.
+
+        Compressors may buffer data internally, so the returned bytes may be empty.
+        """
+        ...
+
+    def finish(self) -> bytes:
+        """Return any remaining compressed bytes, including the stream's trailer."""
+        ...
+
+
+class GzipStreamCompressor:
+    def __init__(self, level: int | None = None):
+        # Adding 16 to wbits produces a gzip header and trailer instead of a zlib one.
+        self._compressor = zlib.compressobj(
+            level=zlib.Z_DEFAULT_COMPRESSION if level is None else level, wbits=zlib.MAX_WBITS | 16
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliStreamCompressor:
+    """Brotli compressor flushing after every write.
+
+    Brotli holds on to a lot of data before producing any output, so we flush on every
+    write to keep memory usage predictable and byte counts moving.
+    """
+
+    def __init__(self, level: int | None = None):
+        # Quality goes from 0 to 11.
+        # Default is 11, aka maximum compression and worst performance.
+        self._compressor = brotli.Compressor() if level is None else brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdStreamCompressor:
+    """Zstandard compressor.
+
+    When `threads` is not 0, compression happens in zstd's own worker threads, outside of the GIL,
+    so the calling thread is only busy copying data in and out.
+    """
+
+    def __init__(self, level: int | None = None, threads: int | None = None):
+        self._compressor = zstandard.ZstdCompressor(
+            level=settings.BATCH_EXPORT_ZSTD_COMPRESSION_LEVEL if level is None else level,
+            threads=settings.BATCH_EXPORT_ZSTD_COMPRESSION_THREADS if threads is None else threads,
+        ).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class LZ4StreamCompressor:
+    """LZ4 compressor producing a single LZ4 frame."""
+
+    def __init__(self, level: int | None = None):
+        self._compressor = lz4.frame.LZ4FrameCompressor(compression_level=0 if level is None else level)
+        self._begun = False
+
+    def _begin(self) -> bytes:
+        if self._begun:
+            return b""
+
+        self._begun = True
+        return self._compressor.begin()
+
+    def compress(self, data: bytes) -> bytes:
+        header = self._begin()
+        return header + self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        header = self._begin()
+        return header + self._compressor.flush()
+
+
+def get_stream_compressor(compression: str, level: int | None = None) -> StreamCompressor:
+    """Return a new `StreamCompressor` for `compression`.
+
+    Arguments:
+        compression: One of `STREAM_COMPRESSIONS`.
+        level: Compression level. Its range depends on the compression used. If
+            `None`, each compression uses its default level.
+
+    Raises:
+        ValueError: If `compression` is not supported.
+    """
+    match compression:
+        case "gzip":
+            return GzipStreamCompressor(level=level)
+        case "brotli":
+            return BrotliStreamCompressor(level=level)
+        case "zstd":
+            return ZstdStreamCompressor(level=level)
+        case "lz4":
+            return LZ4StreamCompressor(level=level)
+        case _:
+            raise ValueError(f"Unsupported compression: '{compression}'")
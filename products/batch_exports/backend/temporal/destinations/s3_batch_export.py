@@ -90,7 +90,7 @@ COMPRESSION_EXTENSIONS = {
 
 SUPPORTED_COMPRESSIONS = {
     "Parquet": ["zstd", "lz4", "snappy", "gzip", "brotli"],
-    "JSONLines": ["gzip", "brotli"],
+    "JSONLines": ["gzip", "brotli", "zstd", "lz4"],
 }
 
 LOGGER = get_logger(__name__)
@@ -0,0 +1,223 @@
+"""Serialize record batches to JSON lines directly from Arrow arrays.
+
+The straightforward way to produce JSON lines from a `pa.RecordBatch` is to call
+`to_pylist()` and dump every row dictionary with `orjson`. That creates a Python
+object for every value in the record batch, which is where most of the time
+goes when exporting large record batches.
+
+Instead, we serialize the record batch column by column: Each column is turned
+into an array with the JSON representation of each of its values, using Arrow
+compute functions where the JSON representation can be produced by them, and
+falling back to `orjson` on Python values otherwise. The columns are then
+joined element-wise, together with the keys, into one array of lines, whose data
+buffer is the JSON lines output.
+
+The output is byte-for-byte what dumping each row with `orjson.dumps(row,
+default=str) + b"\\n"` would produce. Rows with values that `orjson` cannot
+serialize (for example, integers exceeding 64-bit range or very nested JSON)
+are dumped with the row dumping function passed by the caller instead, so that
+existing fallbacks keep applying to them.
+"""
+
+import collections.abc
+import re
+import typing
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from products.batch_exports.backend.temporal.utils import JsonType
+
+DumpRow = collections.abc.Callable[[dict[str, typing.Any]], bytes]
+
+NULL = pa.scalar(b"null", pa.binary())
+EMPTY = pa.scalar(b"", pa.binary())
+
+# Characters that orjson escapes in strings.
+_NEEDS_ESCAPE_PATTERN = r'[\x00-\x1f"\\]'
+# `JsonScalar.as_py` escapes these before decoding JSON, which can change the result.
+_JSON_WHITESPACE_RE = re.compile(r"[\t\n\r\f\v]")
+_UTC_TIMEZONES = {"UTC", "utc", "Etc/UTC", "+00:00", "Z"}
+_MICROSECONDS_PER_UNIT = {"s": 1_000_000, "ms": 1_000, "us": 1}
+# Timestamps we can format with `pc.strftime`: Years from 1970 up to 9999.
+_MAX_SECONDS = 253402300799
+
+
+def dump_record_batch_to_jsonl(record_batch: pa.RecordBatch, dump_row: DumpRow) -> bytes:
+    """Dump all rows in `record_batch` to JSON lines.
+
+    Arguments:
+        record_batch: The record batch to dump.
+        dump_row: Function to dump a single row dictionary to a line of JSON,
+            used for rows that cannot be dumped from Arrow arrays directly.
+    """
+    if record_batch.num_columns == 0 or record_batch.num_rows == 0:
+        return b""
+
+    fallback_rows: set[int] = set()
+    parts: list[pa.Array | pa.Scalar] = []
+
+    for index, (name, column) in enumerate(zip(record_batch.schema.names, record_batch.columns)):
+        key = orjson.dumps(name) + b":"
+        parts.append(pa.scalar((b"{" if index == 0 else b",") + key, pa.binary()))
+        parts.append(_dump_column(column, fallback_rows))
+
+    parts.append(pa.scalar(b"}\n", pa.binary()))
+    lines = pc.binary_join_element_wise(*parts, EMPTY)
+
+    if fallback_rows:
+        dumped_lines = lines.to_pylist()
+        for row in fallback_rows:
+            dumped_lines[row] = dump_row(record_batch.slice(row, 1).to_pylist()[0])
+        return b"".join(dumped_lines)
+
+    return _array_data_to_bytes(lines)
+
+
+def _array_data_to_bytes(array: pa.BinaryArray) -> bytes:
+    """Return the concatenation of all values in a binary array without copying each value."""
+    _, offsets_buffer, data_buffer = array.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int32)[array.offset : array.offset + len(array) + 1]
+    start, end = int(offsets[0]), int(offsets[-1])
+    return data_buffer.slice(start, end - start).to_pybytes()
+
+
+def _dump_column(column: pa.Array, fallback_rows: set[int]) -> pa.Array:
+    """Return a binary array with the JSON representation of each value in `column`."""
+    if isinstance(column.type, JsonType):
+        return _dump_json_column(column, fallback_rows)
+
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+
+    column_type = column.type
+
+    if pa.types.is_string(column_type) or pa.types.is_large_string(column_type):
+        dumped = _dump_string_column(column)
+
+    elif pa.types.is_integer(column_type):
+        dumped = pc.cast(column, pa.string())
+
+    elif pa.types.is_boolean(column_type):
+        dumped = pc.if_else(column, "true", "false")
+
+    elif pa.types.is_timestamp(column_type) and _can_format_timestamps(column):
+        dumped = _dump_timestamp_column(column)
+
+    elif (
+        pa.types.is_floating(column_type)
+        or pa.types.is_timestamp(column_type)
+        or pa.types.is_date(column_type)
+        or pa.types.is_time(column_type)
+        or pa.types.is_decimal(column_type)
+    ):
+        # orjson's representation of all these types never includes a comma, so we
+        # can dump them all at once and split the resulting JSON array.
+        dumped = pa.array(orjson.dumps(column.to_pylist(), default=str)[1:-1].split(b","), pa.binary())
+
+    else:
+        dumped = pa.array(_dump_values(column.to_pylist(), fallback_rows), pa.binary())
+
+    return pc.fill_null(dumped.cast(pa.binary()), NULL)
+
+
+def _dump_values(values: list[typing.Any], fallback_rows: set[int]) -> list[bytes]:
+    dumped = []
+    for row, value in enumerate(values):
+        try:
+            dumped.append(orjson.dumps(value, default=str))
+        except orjson.JSONEncodeError:
+            fallback_rows.add(row)
+            dumped.append(b"null")
+    return dumped
+
+
+def _dump_string_column(column: pa.Array) -> pa.Array:
+    """Quote strings, escaping only the (rare) strings that need it."""
+    quoted = pc.binary_join_element_wise('"', column, '"', "").cast(pa.binary())
+
+    needs_escape = pc.fill_null(pc.match_substring_regex(column, _NEEDS_ESCAPE_PATTERN), False)
+    if not pc.any(needs_escape).as_py():
+        return quoted
+
+    escaped = pa.array(
+        [orjson.dumps(value) for value in column.filter(needs_escape).to_pylist()],
+        pa.binary(),
+    )
+    return pc.replace_with_mask(quoted, needs_escape, escaped)
+
+
+def _can_format_timestamps(column: pa.Array) -> bool:
+    column_type = column.type
+    if column_type.unit not in _MICROSECONDS_PER_UNIT:
+        return False
+    if column_type.tz is not None and column_type.tz not in _UTC_TIMEZONES:
+        return False
+
+    min_max = pc.min_max(column.cast(pa.int64())).as_py()
+    if min_max["min"] is None:
+        return True
+
+    microseconds_per_unit = _MICROSECONDS_PER_UNIT[column_type.unit]
+    return min_max["min"] >= 0 and min_max["max"] // (1_000_000 // microseconds_per_unit) <= _MAX_SECONDS
+
+
+def _dump_timestamp_column(column: pa.Array) -> pa.Array:
+    """Format timestamps like orjson formats `datetime.datetime`.
+
+    That is, RFC 3339 with microseconds only if they are not 0, and with an offset only if
+    the timestamp has a time zone.
+    """
+    column_type = column.type
+    microseconds_per_unit = _MICROSECONDS_PER_UNIT[column_type.unit]
+    units_per_second = 1_000_000 // microseconds_per_unit
+
+    values = column.cast(pa.int64())
+    seconds = pc.divide(values, units_per_second)
+    formatted_seconds = pc.strftime(seconds.cast(pa.timestamp("s")), format="%Y-%m-%dT%H:%M:%S")
+
+    microseconds = pc.multiply(pc.subtract(values, pc.multiply(seconds, units_per_second)), microseconds_per_unit)
+    fraction = pc.if_else(
+        pc.equal(microseconds, 0),
+        "",
+        pc.binary_join_element_wise(".", pc.utf8_lpad(microseconds.cast(pa.string()), 6, "0"), ""),
+    )
+
+    suffix = '+00:00"' if column_type.tz is not None else '"'
+    return pc.binary_join_element_wise('"', formatted_seconds, fraction, suffix, "")
+
+
+def _dump_json_column(column: pa.ExtensionArray, fallback_rows: set[int]) -> pa.Array:
+    """Dump a `JsonType` column.
+
+    `JsonType` values are JSON strings, but we cannot include them as they are:
+    The output has to match dumping the value decoded by `JsonScalar.as_py`. Most
+    values are valid JSON, which we decode and dump right away, and for anything else
+    we go through `JsonScalar.as_py`.
+    """
+    dumped = []
+    for row, value in enumerate(column.storage.to_pylist()):
+        if not value:
+            dumped.append(b"null")
+            continue
+
+        if not _JSON_WHITESPACE_RE.search(value):
+            try:
+                dumped.append(orjson.dumps(orjson.loads(value)))
+                continue
+            except orjson.JSONDecodeError:
+                pass
+            except orjson.JSONEncodeError:
+                fallback_rows.add(row)
+                dumped.append(b"null")
+                continue
+
+        try:
+            dumped.append(orjson.dumps(column[row].as_py(), default=str))
+        except orjson.JSONEncodeError:
+            fallback_rows.add(row)
+            dumped.append(b"null")
+
+    return pa.array(dumped, pa.binary())
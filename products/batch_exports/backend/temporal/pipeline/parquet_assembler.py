@@ -0,0 +1,343 @@
+"""Assemble a single Parquet file out of Parquet files encoded independently.
+
+A Parquet file is laid out as the magic bytes, the row groups (and optional page
+indexes), a footer with the file's metadata, the length of the footer, and the
+magic bytes again. Column chunks refer to their pages by absolute offsets in
+the file, so row groups encoded in separate files can be concatenated into one
+file as long as we merge the footers and shift those offsets by where each row
+group ends up in the final file.
+
+This allows encoding record batches in parallel, each into its own small
+Parquet file, and stitching them back together in order into a single valid
+file. The footer is a Thrift struct encoded with the compact protocol, which we
+decode and encode here as a generic tree so that any field we don't care about
+is written back untouched.
+
+See: https://github.com/apache/parquet-format
+"""
+
+import io
+import struct
+import typing
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MAGIC = b"PAR1"
+
+# Thrift compact protocol types. Others are: 3 byte, 4 i16, 5 i32, 6 i64, 7 double,
+# 8 binary, 9 list, 10 set and 11 map.
+_BOOLEAN_TRUE = 1
+_BOOLEAN_FALSE = 2
+_STRUCT = 12
+
+# Field ids in parquet.thrift.
+_FILE_METADATA_NUM_ROWS = 3
+_FILE_METADATA_ROW_GROUPS = 4
+_ROW_GROUP_COLUMNS = 1
+_ROW_GROUP_FILE_OFFSET = 5
+_ROW_GROUP_ORDINAL = 7
+_COLUMN_CHUNK_META_DATA = 3
+_COLUMN_CHUNK_OFFSET_FIELDS = {
+    2,  # file_offset
+    4,  # offset_index_offset
+    6,  # column_index_offset
+}
+_COLUMN_META_DATA_OFFSET_FIELDS = {
+    9,  # data_page_offset
+    10,  # index_page_offset
+    11,  # dictionary_page_offset
+    14,  # bloom_filter_offset
+}
+
+
+class ParquetAssemblyError(Exception):
+    """Raised when a Parquet file cannot be assembled from its parts."""
+
+
+class Field(typing.NamedTuple):
+    id: int
+    type: int
+    value: typing.Any
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def byte(self) -> int:
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def varint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self) -> int:
+        value = self.varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def bytes(self, length: int) -> bytes:
+        value = self.data[self.position : self.position + length]
+        self.position += length
+        return value
+
+    def value(self, value_type: int) -> typing.Any:
+        match value_type:
+            case 1 | 2 | 3:
+                # Booleans in collections and bytes are a single byte, which we keep as is.
+                return self.byte()
+            case 4 | 5 | 6:
+                return self.zigzag()
+            case 7:
+                return self.bytes(8)
+            case 8:
+                return self.bytes(self.varint())
+            case 9 | 10:
+                header = self.byte()
+                size = header >> 4
+                if size == 15:
+                    size = self.varint()
+                element_type = header & 0x0F
+                return element_type, [self.value(element_type) for _ in range(size)]
+            case 11:
+                size = self.varint()
+                if size == 0:
+                    return 0, 0, []
+                types = self.byte()
+                key_type, value_type = types >> 4, types & 0x0F
+                return key_type, value_type, [(self.value(key_type), self.value(value_type)) for _ in range(size)]
+            case 12:
+                return self.struct()
+            case _:
+                raise ParquetAssemblyError(f"Unexpected Thrift type: {value_type}")
+
+    def struct(self) -> list[Field]:
+        fields = []
+        last_id = 0
+        while True:
+            header = self.byte()
+            if header == 0:
+                return fields
+
+            field_type = header & 0x0F
+            delta = header >> 4
+            field_id = last_id + delta if delta else self.zigzag()
+
+            if field_type in (_BOOLEAN_TRUE, _BOOLEAN_FALSE):
+                value = field_type == _BOOLEAN_TRUE
+            else:
+                value = self.value(field_type)
+
+            fields.append(Field(field_id, field_type, value))
+            last_id = field_id
+
+
+class _Writer:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def byte(self, value: int) -> None:
+        self.buffer.write(bytes((value,)))
+
+    def varint(self, value: int) -> None:
+        while True:
+            if value < 0x80:
+                self.byte(value)
+                return
+            self.byte((value & 0x7F) | 0x80)
+            value >>= 7
+
+    def zigzag(self, value: int) -> None:
+        self.varint((value << 1) ^ (value >> 63))
+
+    def value(self, value_type: int, value: typing.Any) -> None:
+        match value_type:
+            case 1 | 2 | 3:
+                self.byte(value)
+            case 4 | 5 | 6:
+                self.zigzag(value)
+            case 7:
+                self.buffer.write(value)
+            case 8:
+                self.varint(len(value))
+                self.buffer.write(value)
+            case 9 | 10:
+                element_type, elements = value
+                if len(elements) < 15:
+                    self.byte(len(elements) << 4 | element_type)
+                else:
+                    self.byte(0xF0 | element_type)
+                    self.varint(len(elements))
+                for element in elements:
+                    self.value(element_type, element)
+            case 11:
+                key_type, value_type, entries = value
+                self.varint(len(entries))
+                if entries:
+                    self.byte(key_type << 4 | value_type)
+                for key, entry_value in entries:
+                    self.value(key_type, key)
+                    self.value(value_type, entry_value)
+            case 12:
+                self.struct(value)
+            case _:
+                raise ParquetAssemblyError(f"Unexpected Thrift type: {value_type}")
+
+    def struct(self, fields: list[Field]) -> None:
+        last_id = 0
+        for field in fields:
+            field_type = field.type
+            if field_type in (_BOOLEAN_TRUE, _BOOLEAN_FALSE):
+                field_type = _BOOLEAN_TRUE if field.value else _BOOLEAN_FALSE
+
+            delta = field.id - last_id
+            if 0 < delta <= 15:
+                self.byte(delta << 4 | field_type)
+            else:
+                self.byte(field_type)
+                self.zigzag(field.id)
+
+            if field_type not in (_BOOLEAN_TRUE, _BOOLEAN_FALSE):
+                self.value(field_type, field.value)
+            last_id = field.id
+        self.byte(0)
+
+
+def _get(fields: list[Field], field_id: int) -> typing.Any:
+    for field in fields:
+        if field.id == field_id:
+            return field.value
+    return None
+
+
+def _replace(fields: list[Field], field_id: int, value: typing.Any) -> list[Field]:
+    return [field._replace(value=value) if field.id == field_id else field for field in fields]
+
+
+def _shift(fields: list[Field], field_ids: set[int], shift: int) -> list[Field]:
+    return [
+        field._replace(value=field.value + shift) if field.id in field_ids and field.value > 0 else field
+        for field in fields
+    ]
+
+
+def split_parquet_file(data: bytes) -> tuple[bytes, list[Field]]:
+    """Split a Parquet file into its body, without magic bytes nor footer, and its decoded footer."""
+    if len(data) < 12 or data[:4] != MAGIC or data[-4:] != MAGIC:
+        raise ParquetAssemblyError("Not a Parquet file")
+
+    (footer_length,) = struct.unpack("<I", data[-8:-4])
+    footer_start = len(data) - 8 - footer_length
+    return data[4:footer_start], _Reader(data[footer_start:-8]).struct()
+
+
+class ParquetFileAssembler:
+    """Assemble Parquet files, each containing some row groups, into a single Parquet file.
+
+    All parts must have been written with the same schema and writer options. Parts
+    are added in order with `add_part`, which returns the bytes to append to the
+    assembled file, and the file is completed by the bytes returned by `finish`.
+    Only the footers of the parts added so far are kept in memory.
+    """
+
+    def __init__(self, schema: pa.Schema):
+        self.schema = schema
+        self.reset()
+
+    def reset(self) -> None:
+        self._position = 0
+        self._num_rows = 0
+        self._row_groups: list[list[Field]] = []
+        self._file_metadata: list[Field] | None = None
+
+    def add_part(self, part: bytes) -> bytes:
+        body, file_metadata = split_parquet_file(part)
+        prefix = b""
+        if self._position == 0:
+            prefix = MAGIC
+            self._position = len(MAGIC)
+
+        if self._file_metadata is None:
+            self._file_metadata = file_metadata
+
+        # Offsets in the part are relative to a file starting with the magic bytes.
+        shift = self._position - len(MAGIC)
+        _, row_groups = _get(file_metadata, _FILE_METADATA_ROW_GROUPS) or (_STRUCT, [])
+        for row_group in row_groups:
+            self._row_groups.append(self._shift_row_group(row_group, shift))
+
+        self._num_rows += _get(file_metadata, _FILE_METADATA_NUM_ROWS) or 0
+        self._position += len(body)
+
+        return prefix + body
+
+    def finish(self) -> bytes:
+        """Return the remaining bytes of the assembled file and reset the assembler."""
+        prefix = b""
+        if self._file_metadata is None:
+            # No parts were added: Use an empty file for its footer.
+            prefix = self.add_part(encode_parquet_part([], self.schema))
+
+        assert self._file_metadata is not None
+        row_groups = [
+            _replace(row_group, _ROW_GROUP_ORDINAL, ordinal)
+            if _get(row_group, _ROW_GROUP_ORDINAL) is not None
+            else row_group
+            for ordinal, row_group in enumerate(self._row_groups)
+        ]
+        file_metadata = _replace(self._file_metadata, _FILE_METADATA_NUM_ROWS, self._num_rows)
+        file_metadata = _replace(file_metadata, _FILE_METADATA_ROW_GROUPS, (_STRUCT, row_groups))
+
+        writer = _Writer()
+        writer.struct(file_metadata)
+        footer = writer.buffer.getvalue()
+
+        self.reset()
+        return prefix + footer + struct.pack("<I", len(footer)) + MAGIC
+
+    @staticmethod
+    def _shift_row_group(row_group: list[Field], shift: int) -> list[Field]:
+        if shift == 0:
+            return row_group
+
+        column_type, columns = _get(row_group, _ROW_GROUP_COLUMNS)
+        shifted_columns = []
+        for column in columns:
+            column = _shift(column, _COLUMN_CHUNK_OFFSET_FIELDS, shift)
+            column_metadata = _get(column, _COLUMN_CHUNK_META_DATA)
+            if column_metadata is not None:
+                column = _replace(
+                    column, _COLUMN_CHUNK_META_DATA, _shift(column_metadata, _COLUMN_META_DATA_OFFSET_FIELDS, shift)
+                )
+            shifted_columns.append(column)
+
+        row_group = _replace(row_group, _ROW_GROUP_COLUMNS, (column_type, shifted_columns))
+        return _shift(row_group, {_ROW_GROUP_FILE_OFFSET}, shift)
+
+
+def encode_parquet_part(
+    record_batches: list[pa.RecordBatch],
+    schema: pa.Schema,
+    compression: str | None = None,
+    compression_level: int | None = None,
+) -> bytes:
+    """Encode record batches into a standalone Parquet file, to be assembled with `ParquetFileAssembler`."""
+    sink = pa.BufferOutputStream()
+    with pq.ParquetWriter(
+        sink,
+        schema=schema,
+        compression="none" if compression is None else compression,  # type: ignore
+        compression_level=compression_level,
+    ) as writer:
+        for record_batch in record_batches:
+            writer.write_batch(record_batch)
+    return sink.getvalue().to_pybytes()
@@ -3,20 +3,26 @@ import collections
 import collections.abc
 import concurrent.futures
 import contextlib
-import gzip
-import io
 import json
 import multiprocessing as mp
 import typing
 
-import brotli
 import orjson
 import pyarrow as pa
-import pyarrow.parquet as pq
 import structlog
 from django.conf import settings
 
+from products.batch_exports.backend.temporal.compression import (
+    STREAM_COMPRESSIONS,
+    StreamCompressor,
+    get_stream_compressor,
+)
+from products.batch_exports.backend.temporal.jsonl import dump_record_batch_to_jsonl
 from products.batch_exports.backend.temporal.metrics import ExecutionTimeRecorder
+from products.batch_exports.backend.temporal.pipeline.parquet_assembler import (
+    ParquetFileAssembler,
+    encode_parquet_part,
+)
 
 logger = structlog.get_logger()
 
@@ -43,18 +49,27 @@ class _TransformerProtocol(typing.Protocol):
 
 
 def get_stream_transformer(
-    format: str, compression: str | None = None, schema: pa.Schema | None = None, include_inserted_at: bool = False
+    format: str,
+    compression: str | None = None,
+    schema: pa.Schema | None = None,
+    include_inserted_at: bool = False,
+    compression_level: int | None = None,
 ) -> _TransformerProtocol:
     match format.lower():
-        case "jsonlines" if compression != "brotli":
-            return JSONLStreamTransformer(compression=compression, include_inserted_at=include_inserted_at)
-        case "jsonlines" if compression == "brotli":
-            return JSONLBrotliStreamTransformer(include_inserted_at=include_inserted_at)
+        case "jsonlines" if compression is None:
+            return JSONLStreamTransformer(include_inserted_at=include_inserted_at)
+        case "jsonlines":
+            return JSONLCompressedStreamTransformer(
+                compression=compression, compression_level=compression_level, include_inserted_at=include_inserted_at
+            )
         case "parquet":
             if schema is None:
                 raise ValueError("Schema is required for Parquet")
             return ParquetStreamTransformer(
-                compression=compression, schema=schema, include_inserted_at=include_inserted_at
+                compression=compression,
+                compression_level=compression_level,
+                schema=schema,
+                include_inserted_at=include_inserted_at,
             )
         case _:
             raise ValueError(f"Unsupported format: {format}")
@@ -68,12 +83,10 @@ class JSONLStreamTransformer:
 
     def __init__(
         self,
-        compression: str | None = None,
         include_inserted_at: bool = False,
         max_workers: int = settings.BATCH_EXPORT_TRANSFORMER_MAX_WORKERS,
     ):
         self.include_inserted_at = include_inserted_at
-        self.compression = compression
         self.max_workers = max_workers
 
         self._futures_pending: set[asyncio.Future[list[bytes]]] = set()
@@ -105,7 +118,6 @@ class JSONLStreamTransformer:
                 semaphore=self._semaphore,
                 futures_pending=self._futures_pending,
                 include_inserted_at=self.include_inserted_at,
-                compression=self.compression,
             ) as producer_task:
                 while True:
                     try:
@@ -133,26 +145,44 @@ class JSONLStreamTransformer:
                                 current_file_size += len(chunk)
 
 
-class JSONLBrotliStreamTransformer:
+class JSONLCompressedStreamTransformer:
+    """A transformer to convert record batches into compressed lines of JSON.
+
+    Records are dumped to JSON in worker processes, but compressed in the main
+    process, as a single compressor has to see all data to produce a single
+    compressed stream per file.
+    """
+
     def __init__(
         self,
+        compression: str,
+        compression_level: int | None = None,
         include_inserted_at: bool = False,
         max_workers: int = settings.BATCH_EXPORT_TRANSFORMER_MAX_WORKERS,
     ):
+        if compression not in STREAM_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: '{compression}'")
+
+        if compression == "brotli" and compression_level is None:
+            # Brotli's default quality (11) is too slow for large exports.
+            compression_level = 5
+
+        self.compression = compression
+        self.compression_level = compression_level
         self.include_inserted_at = include_inserted_at
         self.max_workers = max_workers
 
         self._futures_pending: set[asyncio.Future[list[bytes]]] = set()
         self._semaphore = asyncio.Semaphore(max_workers)
-        self._brotli_compressor = None
+        self._compressor: StreamCompressor | None = None
 
     async def iter(
         self, record_batches: collections.abc.AsyncIterable[pa.RecordBatch], max_file_size_bytes: int = 0
     ) -> collections.abc.AsyncIterator[Chunk]:
         """Distribute transformation of record batches into multiple processes.
 
-        This supports brotli compression by compressing only in the main
-        process. So, the brotli compressor keeps the necessary state to finalize
+        Compression happens in a thread of the main process, one record batch at
+        a time, so that the compressor keeps the necessary state to finalize
         every file.
 
         See `JSONLStreamTransformer` for an outline of the pipeline.
@@ -170,7 +200,6 @@ class JSONLBrotliStreamTransformer:
                 semaphore=self._semaphore,
                 futures_pending=self._futures_pending,
                 include_inserted_at=self.include_inserted_at,
-                compression=None,
             ) as producer_task:
                 while True:
                     try:
@@ -187,47 +216,37 @@ class JSONLBrotliStreamTransformer:
                         self._semaphore.release()
                         self._futures_pending.remove(future)
 
-                        for chunk in chunks:
-                            chunk = await loop.run_in_executor(None, self._compress, chunk)
+                        chunk = await loop.run_in_executor(None, self._compress, b"".join(chunks))
 
-                            yield Chunk(chunk, False)
+                        yield Chunk(chunk, False)
 
-                            if max_file_size_bytes and current_file_size + len(chunk) > max_file_size_bytes:
-                                data = await loop.run_in_executor(None, self._finish_brotli_compressor)
+                        if max_file_size_bytes and current_file_size + len(chunk) > max_file_size_bytes:
+                            data = await loop.run_in_executor(None, self._finish_compressor)
 
-                                yield Chunk(data, True)
-                                current_file_size = 0
+                            yield Chunk(data, True)
+                            current_file_size = 0
 
-                            else:
-                                current_file_size += len(chunk)
+                        else:
+                            current_file_size += len(chunk)
 
-        data = self._finish_brotli_compressor()
+        data = self._finish_compressor()
         await asyncio.sleep(0)
         yield Chunk(data, True)
 
-    def _compress(self, content: bytes | str) -> bytes:
-        """Compress using brotli."""
-        if isinstance(content, str):
-            encoded = content.encode("utf-8")
-        else:
-            encoded = content
-
-        self.brotli_compressor.process(encoded)
-        return self.brotli_compressor.flush()
+    def _compress(self, content: bytes) -> bytes:
+        return self.compressor.compress(content)
 
-    def _finish_brotli_compressor(self) -> bytes:
-        """Flush remaining brotli bytes."""
-        bytes = self.brotli_compressor.finish()
-        self._brotli_compressor = None
-        return bytes
+    def _finish_compressor(self) -> bytes:
+        """Flush remaining compressed bytes and finish the compressed stream."""
+        data = self.compressor.finish()
+        self._compressor = None
+        return data
 
     @property
-    def brotli_compressor(self) -> brotli._brotli.Compressor:
-        if self._brotli_compressor is None:
-            # Quality goes from 0 to 11.
-            # Default is 11, aka maximum compression and worst performance.
-            self._brotli_compressor = brotli.Compressor(quality=5)
-        return self._brotli_compressor
+    def compressor(self) -> StreamCompressor:
+        if self._compressor is None:
+            self._compressor = get_stream_compressor(self.compression, level=self.compression_level)
+        return self._compressor
 
 
 @contextlib.asynccontextmanager
@@ -237,7 +256,6 @@ async def _record_batches_producer(
     semaphore: asyncio.Semaphore,
     futures_pending: set[asyncio.Future[list[bytes]]],
     include_inserted_at: bool,
-    compression: str | None = None,
 ):
     """Manage a task to produce record batches to run in executor."""
     loop = asyncio.get_running_loop()
@@ -247,7 +265,7 @@ async def _record_batches_producer(
         async for record_batch in record_batches:
             _ = await semaphore.acquire()
 
-            future = loop.run_in_executor(executor, dump_record_batch, record_batch, compression, include_inserted_at)
+            future = loop.run_in_executor(executor, dump_record_batch, record_batch, include_inserted_at)
             futures_pending.add(future)
 
     producer_task = asyncio.create_task(producer())
@@ -266,31 +284,18 @@ async def _record_batches_producer(
 
 def dump_record_batch(
     record_batch: pa.RecordBatch,
-    compression: str | None,
     include_inserted_at: bool = False,
 ) -> list[bytes]:
-    """Dump all records in a record batch to JSON lines."""
+    """Dump all records in a record batch to JSON lines.
+
+    All records are returned as a single chunk.
+    """
     column_names = record_batch.column_names
     if not include_inserted_at:
         _ = column_names.pop(column_names.index("_inserted_at"))
 
-    def compress(content: bytes):
-        match compression:
-            case "gzip":
-                return gzip.compress(content)
-            case None:
-                return content
-            case _:
-                raise ValueError(f"Unsupported compression: '{compression}'")
-
-    if compression:
-        return [
-            compress(dump_dict(record_dict))
-            for record_dict in record_batch.select(column_names).to_pylist()
-            if record_dict
-        ]
-    else:
-        return [dump_dict(record_dict) for record_dict in record_batch.select(column_names).to_pylist() if record_dict]
+    jsonl = dump_record_batch_to_jsonl(record_batch.select(column_names), dump_row=dump_dict)
+    return [jsonl] if jsonl else []
 
 
 def dump_dict(d: dict[str, typing.Any]) -> bytes:
@@ -352,7 +357,12 @@ def replace_broken_unicode(obj):
 
 
 class ParquetStreamTransformer:
-    """A transformer to convert record batches into Parquet."""
+    """A transformer to convert record batches into Parquet.
+
+    Record batches are encoded into row groups in parallel in a pool of worker
+    processes, each into a standalone Parquet file, which are then assembled in
+    order into a single Parquet file by a `ParquetFileAssembler`.
+    """
 
     def __init__(
         self,
@@ -360,26 +370,41 @@ class ParquetStreamTransformer:
         compression: str | None = None,
         compression_level: int | None = None,
         include_inserted_at: bool = False,
+        max_workers: int = settings.BATCH_EXPORT_TRANSFORMER_MAX_WORKERS,
     ):
         self.include_inserted_at = include_inserted_at
-        self.schema = schema
         self.compression = compression
         self.compression_level = compression_level
+        self.max_workers = max_workers
 
-        # For Parquet, we need to handle schema and batching
-        self._parquet_writer: pq.ParquetWriter | None = None
-        self._parquet_buffer = io.BytesIO()
+        if not include_inserted_at and "_inserted_at" in schema.names:
+            schema = schema.remove(schema.get_field_index("_inserted_at"))
+        self.schema = schema
+
+        self._assembler = ParquetFileAssembler(schema)
 
     async def iter(
         self, record_batches: collections.abc.AsyncIterable[pa.RecordBatch], max_file_size_bytes: int = 0
     ) -> collections.abc.AsyncIterator[Chunk]:
-        """Iterate over record batches transforming them into chunks."""
+        """Iterate over record batches transforming them into chunks.
+
+        Encoding happens in worker processes, so that large exports scale with the
+        number of cores and the event loop is free to heartbeat in the meantime.
+        At most `max_workers` record batches are in flight at a time, which bounds
+        memory usage, and encoded row groups are yielded in the order their record
+        batches came in.
+        """
+        loop = asyncio.get_running_loop()
         current_file_size = 0
+        pending: collections.deque[tuple[pa.RecordBatch, asyncio.Future[bytes]]] = collections.deque()
 
-        async for record_batch in record_batches:
+        async def assemble_next_part() -> collections.abc.AsyncIterator[Chunk]:
+            nonlocal current_file_size
+
+            record_batch, future = pending.popleft()
             with ExecutionTimeRecorder(
                 "parquet_stream_transformer_record_batch_transform_duration",
-                description="Duration to transform a record batch into Parquet bytes.",
+                description="Duration waiting for a record batch to be transformed into Parquet bytes.",
                 log_message=(
                     "Processed record batch with %(num_records)d records to parquet."
                     " Record batch size: %(mb_processed).2f MB, process time:"
@@ -388,56 +413,39 @@ class ParquetStreamTransformer:
                 log_attributes={"num_records": record_batch.num_rows},
             ) as recorder:
                 recorder.add_bytes_processed(record_batch.nbytes)
-                # Running write in a thread to yield control back to event loop.
-                chunk = await asyncio.to_thread(self.write_record_batch, record_batch)
-
-                yield Chunk(chunk, False)
-
-                if max_file_size_bytes and current_file_size + len(chunk) > max_file_size_bytes:
-                    footer = await asyncio.to_thread(self.finish_parquet_file)
-
-                    yield Chunk(footer, True)
-                    current_file_size = 0
-
-                else:
-                    current_file_size += len(chunk)
-
-        footer = await asyncio.to_thread(self.finish_parquet_file)
-        yield Chunk(footer, True)
-
-    @property
-    def parquet_writer(self) -> pq.ParquetWriter:
-        if self._parquet_writer is None:
-            self._parquet_writer = pq.ParquetWriter(
-                self._parquet_buffer,
-                schema=self.schema,
-                compression="none" if self.compression is None else self.compression,  # type: ignore
-                compression_level=self.compression_level,
-            )
-        assert self._parquet_writer is not None
-        return self._parquet_writer
-
-    def finish_parquet_file(self) -> bytes:
-        """Ensure underlying Parquet writer is closed before flushing buffer."""
-        self.parquet_writer.close()
-        self._parquet_writer = None
-
-        final_data = self._parquet_buffer.getvalue()
+                part = await future
 
-        self._parquet_buffer = io.BytesIO()
+            chunk = self._assembler.add_part(part)
+            yield Chunk(chunk, False)
 
-        return final_data
+            if max_file_size_bytes and current_file_size + len(chunk) > max_file_size_bytes:
+                yield Chunk(self._assembler.finish(), True)
+                current_file_size = 0
 
-    def write_record_batch(self, record_batch: pa.RecordBatch) -> bytes:
-        """Write record batch to buffer as Parquet."""
-        column_names = self.parquet_writer.schema.names
-        if not self.include_inserted_at:
-            column_names.pop(column_names.index("_inserted_at"))
-
-        self.parquet_writer.write_batch(record_batch.select(column_names))
-        data = self._parquet_buffer.getvalue()
-
-        self._parquet_buffer.seek(0)
-        self._parquet_buffer.truncate(0)
+            else:
+                current_file_size += len(chunk)
 
-        return data
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=mp.get_context("fork")
+        ) as executor:
+            async for record_batch in record_batches:
+                record_batch = record_batch.select(self.schema.names)
+                future = loop.run_in_executor(
+                    executor,
+                    encode_parquet_part,
+                    [record_batch],
+                    self.schema,
+                    self.compression,
+                    self.compression_level,
+                )
+                pending.append((record_batch, future))
+
+                while pending and (len(pending) >= self.max_workers or pending[0][1].done()):
+                    async for chunk in assemble_next_part():
+                        yield chunk
+
+            while pending:
+                async for chunk in assemble_next_part():
+                    yield chunk
+
+        yield Chunk(self._assembler.finish(), True)
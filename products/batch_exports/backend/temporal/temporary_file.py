@@ -7,12 +7,10 @@ import contextlib
 import csv
 import datetime as dt
 import enum
-import gzip
 import json
 import tempfile
 import typing
 
-import brotli
 import orjson
 import psycopg
 import pyarrow as pa
@@ -20,7 +18,13 @@ import pyarrow.parquet as pq
 import structlog
 from psycopg import sql
 
+from products.batch_exports.backend.temporal.compression import (
+    STREAM_COMPRESSIONS,
+    StreamCompressor,
+    get_stream_compressor,
+)
 from products.batch_exports.backend.temporal.heartbeat import DateRange
+from products.batch_exports.backend.temporal.jsonl import dump_record_batch_to_jsonl
 
 logger = structlog.get_logger()
 
@@ -72,7 +76,11 @@ class BatchExportTemporaryFile:
         dir: str | None = None,
         *,
         errors: str | None = None,
+        compression_level: int | None = None,
     ):
+        if compression is not None and compression not in STREAM_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: '{compression}'")
+
         self._file = tempfile.NamedTemporaryFile(
             mode=mode,
             encoding=encoding,
@@ -84,11 +92,12 @@ class BatchExportTemporaryFile:
             errors=errors,
         )
         self.compression = compression
+        self.compression_level = compression_level
         self.bytes_total = 0
         self.records_total = 0
         self.bytes_since_last_reset = 0
         self.records_since_last_reset = 0
-        self._brotli_compressor = None
+        self._compressor: StreamCompressor | None = None
 
     def __getattr__(self, name):
         """Pass get attr to underlying tempfile.NamedTemporaryFile."""
@@ -111,21 +120,36 @@ class BatchExportTemporaryFile:
         return self._file.name
 
     @property
-    def brotli_compressor(self):
-        if self._brotli_compressor is None:
-            self._brotli_compressor = brotli.Compressor()
-        return self._brotli_compressor
-
-    def finish_brotli_compressor(self):
-        """Flush remaining brotli bytes."""
-        # TODO: Move compression out of `BatchExportTemporaryFile` to a standard class for all writers.
-        if self.compression != "brotli":
-            raise ValueError(f"Compression is '{self.compression}', not 'brotli'")
-
-        result = self._file.write(self.brotli_compressor.finish())
+    def compressor(self) -> StreamCompressor:
+        """Streaming compressor kept for the lifetime of the compressed file.
+
+        Compressing each write on its own (e.g. one gzip member per write) resets the compression
+        window every time and adds per-write headers, which is both slower and compresses worse.
+        Instead, we feed every write to the same compressor, and only finish it at file boundaries
+        in `finish_compressor`.
+        """
+        if self.compression is None:
+            raise ValueError("Compression is not enabled")
+
+        if self._compressor is None:
+            self._compressor = get_stream_compressor(self.compression, level=self.compression_level)
+        return self._compressor
+
+    @property
+    def has_unfinished_compression(self) -> bool:
+        """Whether the compressor holds state that has to be finished before the file is complete.
+
+        Compressors may buffer data internally, so this can be true even if no bytes have been written
+        to the underlying file since the last reset.
+        """
+        return self._compressor is not None
+
+    def finish_compressor(self):
+        """Flush remaining compressed bytes and finish the compressed stream."""
+        result = self._file.write(self.compressor.finish())
         self.bytes_total += result
         self.bytes_since_last_reset += result
-        self._brotli_compressor = None
+        self._compressor = None
 
     def compress(self, content: bytes | str) -> bytes:
         if isinstance(content, str):
@@ -133,16 +157,9 @@ class BatchExportTemporaryFile:
         else:
             encoded = content
 
-        match self.compression:
-            case "gzip":
-                return gzip.compress(encoded)
-            case "brotli":
-                self.brotli_compressor.process(encoded)
-                return self.brotli_compressor.flush()
-            case None:
-                return encoded
-            case _:
-                raise ValueError(f"Unsupported compression: '{self.compression}'")
+        if self.compression is None:
+            return encoded
+        return self.compressor.compress(encoded)
 
     def write(self, content: bytes | str):
         """Write bytes to underlying file keeping track of how many bytes were written."""
@@ -379,11 +396,13 @@ class BatchExportWriter(abc.ABC):
     async def close_temporary_file(self):
         self.track_bytes_written(self.batch_export_file)
 
-        if self.bytes_since_last_flush > 0:
+        if self.bytes_since_last_flush > 0 or self.batch_export_file.has_unfinished_compression:
             # `bytes_since_last_flush` should be 0 unless:
             # 1. The last batch wasn't flushed as it didn't reach `max_bytes`.
             # 2. The last batch was flushed but there was another write after the last call to
             #    `write_record_batch`. For example, footer bytes.
+            # Even if it is 0, a compressor may still be holding buffered data or be missing its
+            # trailer, so we must flush to finish the compressed stream.
             await self.flush(is_last=True)
 
         self._batch_export_file = None
@@ -466,8 +485,9 @@ class BatchExportWriter(abc.ABC):
 
         The underlying batch export temporary file will be reset after calling `flush_callable`.
         """
-        if is_last is True and self.batch_export_file.compression == "brotli":
-            self.batch_export_file.finish_brotli_compressor()
+        if is_last is True and self.batch_export_file.has_unfinished_compression:
+            self.batch_export_file.finish_compressor()
+            self.track_bytes_written(self.batch_export_file)
 
         self.batch_export_file.seek(0)
 
@@ -574,11 +594,12 @@ class JSONLBatchExportWriter(BatchExportWriter):
         compression: None | str = None,
         default: typing.Callable = str,
         max_file_size_bytes: int = 0,
+        compression_level: int | None = None,
     ):
         super().__init__(
             max_bytes=max_bytes,
             flush_callable=flush_callable,
-            file_kwargs={"compression": compression},
+            file_kwargs={"compression": compression, "compression_level": compression_level},
             max_file_size_bytes=max_file_size_bytes,
         )
 
@@ -586,8 +607,12 @@ class JSONLBatchExportWriter(BatchExportWriter):
 
     def write_dict(self, d: dict[str, typing.Any]) -> int:
         """Write a single row of JSONL."""
+        return self.batch_export_file.write(self.dump_dict(d))
+
+    def dump_dict(self, d: dict[str, typing.Any]) -> bytes:
+        """Dump a single row to a line of JSON."""
         try:
-            n = self.batch_export_file.write(orjson.dumps(d, default=str) + b"\n")
+            dumped = orjson.dumps(d, default=str)
         except orjson.JSONEncodeError as err:
             # NOTE: `orjson.JSONEncodeError` is actually just an alias for `TypeError`.
             # This handler will catch everything coming from orjson, so we have to
@@ -607,33 +632,32 @@ class JSONLBatchExportWriter(BatchExportWriter):
                         # json.
                         logger.exception("PostHog $web_vitals event didn't match expected structure")
                         dumped = json.dumps(d, default=str).encode("utf-8")
-                        n = self.batch_export_file.write(dumped + b"\n")
                     else:
                         dumped = orjson.dumps(d, default=str)
-                        n = self.batch_export_file.write(dumped + b"\n")
 
                 else:
                     # In this case, we fallback to the slower but more permissive stdlib
                     # json.
                     logger.exception("Orjson detected a deeply nested dict: %s", d)
                     dumped = json.dumps(d, default=str).encode("utf-8")
-                    n = self.batch_export_file.write(dumped + b"\n")
             else:
                 # Orjson is very strict about invalid unicode. This slow path protects us
                 # against things we've observed in practice, like single surrogate codes, e.g.
                 # "\ud83d"
                 logger.exception("Failed to encode with orjson: %s", d)
                 cleaned_content = replace_broken_unicode(d)
-                n = self.batch_export_file.write(orjson.dumps(cleaned_content, default=str) + b"\n")
-        return n
+                dumped = orjson.dumps(cleaned_content, default=str)
+        return dumped + b"\n"
 
     def _write_record_batch(self, record_batch: pa.RecordBatch) -> None:
-        """Write records to a temporary file as JSONL."""
-        for record_dict in record_batch.to_pylist():
-            if not record_dict:
-                continue
+        """Write records to a temporary file as JSONL.
 
-            self.write_dict(record_dict)
+        Records are dumped from the Arrow arrays directly, only falling back to
+        `dump_dict` for rows that cannot be dumped that way.
+        """
+        jsonl = dump_record_batch_to_jsonl(record_batch, dump_row=self.dump_dict)
+        if jsonl:
+            self.batch_export_file.write(jsonl)
 
 
 class CSVBatchExportWriter(BatchExportWriter):
@@ -653,11 +677,12 @@ class CSVBatchExportWriter(BatchExportWriter):
         quoting=csv.QUOTE_NONE,
         compression: str | None = None,
         max_file_size_bytes: int = 0,
+        compression_level: int | None = None,
     ):
         super().__init__(
             max_bytes=max_bytes,
             flush_callable=flush_callable,
-            file_kwargs={"compression": compression},
+            file_kwargs={"compression": compression, "compression_level": compression_level},
             max_file_size_bytes=max_file_size_bytes,
         )
         self.field_names = field_names
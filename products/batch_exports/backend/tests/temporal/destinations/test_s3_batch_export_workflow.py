@@ -101,7 +101,7 @@ def compression(request) -> str | None:
 
     By decorating a test function with @pytest.mark.parametrize("compression", ..., indirect=True)
     it's possible to set the compression that will be used to create an S3
-    BatchExport. Possible values are "brotli", "gzip", or None.
+    BatchExport. Possible values are "brotli", "gzip", "zstd", "lz4", or None.
     """
     try:
         return request.param
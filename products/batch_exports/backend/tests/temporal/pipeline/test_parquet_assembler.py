@@ -0,0 +1,83 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from products.batch_exports.backend.temporal.pipeline.parquet_assembler import (
+    ParquetAssemblyError,
+    ParquetFileAssembler,
+    _Writer,
+    encode_parquet_part,
+    split_parquet_file,
+)
+
+SCHEMA = pa.schema([("id", pa.int64()), ("event", pa.string()), ("properties", pa.string())])
+
+
+def _record_batch(start: int, size: int) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pydict(
+        {
+            "id": list(range(start, start + size)),
+            "event": [f"event-{i % 7}" for i in range(start, start + size)],
+            "properties": [None if i % 3 == 0 else f'{{"i": {i}}}' for i in range(start, start + size)],
+        },
+        schema=SCHEMA,
+    )
+
+
+def test_footer_is_encoded_back_unchanged():
+    """Test decoding and encoding back a footer produces the exact same bytes."""
+    part = encode_parquet_part([_record_batch(0, 100)], SCHEMA, compression="zstd")
+    body, footer = split_parquet_file(part)
+
+    writer = _Writer()
+    writer.struct(footer)
+
+    assert part == b"PAR1" + body + part[4 + len(body) : -8] + part[-8:]
+    assert writer.buffer.getvalue() == part[4 + len(body) : -8]
+
+
+@pytest.mark.parametrize("compression", [None, "snappy", "gzip", "brotli", "zstd", "lz4"])
+def test_assembled_file_contains_all_parts_in_order(compression):
+    assembler = ParquetFileAssembler(SCHEMA)
+    record_batches = [_record_batch(start, size) for start, size in ((0, 100), (100, 1), (101, 5000), (5101, 42))]
+
+    data = b""
+    for record_batch in record_batches:
+        data += assembler.add_part(encode_parquet_part([record_batch], SCHEMA, compression=compression))
+    data += assembler.finish()
+
+    parquet_file = pq.ParquetFile(pa.BufferReader(data))
+    assert parquet_file.metadata.num_rows == 5143
+    assert parquet_file.metadata.num_row_groups == len(record_batches)
+    assert parquet_file.schema_arrow == SCHEMA
+    assert parquet_file.read() == pa.Table.from_batches(record_batches)
+
+    for index, record_batch in enumerate(record_batches):
+        row_group = parquet_file.metadata.row_group(index)
+        assert row_group.num_rows == record_batch.num_rows
+        statistics = row_group.column(0).statistics
+        assert (statistics.min, statistics.max) == (record_batch["id"][0].as_py(), record_batch["id"][-1].as_py())
+        assert parquet_file.read_row_group(index) == pa.Table.from_batches([record_batch])
+
+
+def test_assembler_is_reset_after_finish():
+    assembler = ParquetFileAssembler(SCHEMA)
+
+    first = assembler.add_part(encode_parquet_part([_record_batch(0, 10)], SCHEMA)) + assembler.finish()
+    second = assembler.add_part(encode_parquet_part([_record_batch(10, 10)], SCHEMA)) + assembler.finish()
+
+    assert pq.read_table(pa.BufferReader(first)).column("id").to_pylist() == list(range(10))
+    assert pq.read_table(pa.BufferReader(second)).column("id").to_pylist() == list(range(10, 20))
+
+
+def test_finish_without_parts_produces_empty_file():
+    data = ParquetFileAssembler(SCHEMA).finish()
+
+    table = pq.read_table(pa.BufferReader(data))
+    assert table.num_rows == 0
+    assert table.schema == SCHEMA
+
+
+def test_split_rejects_invalid_file():
+    with pytest.raises(ParquetAssemblyError):
+        split_parquet_file(b"not a parquet file")
@@ -1,9 +1,15 @@
+import datetime as dt
 import json
 import typing
+import uuid
+from unittest import mock
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
-from products.batch_exports.backend.temporal.pipeline.transformer import dump_dict
+from products.batch_exports.backend.temporal.pipeline.transformer import dump_dict, get_stream_transformer
+from products.batch_exports.backend.tests.temporal.test_compression import decompress
 
 
 def create_deeply_nested_dict(depth: int, value: str = "test") -> typing.Any:
@@ -53,3 +59,85 @@ def test_dump_dict_with_deeply_nested_dict():
     assert isinstance(result, bytes)
     # check the reverse direction
     assert json.loads(result) == deeply_nested_dict
+
+
+async def _record_batches_from(record_batches):
+    for record_batch in record_batches:
+        yield record_batch
+
+
+@pytest.mark.parametrize("compression", ["gzip", "brotli", "zstd", "lz4"])
+@pytest.mark.parametrize("max_file_size_bytes", [0, 1])
+@pytest.mark.asyncio
+async def test_jsonl_compressed_stream_transformer(compression, max_file_size_bytes):
+    """Test each file yielded by the transformer is a single valid compressed stream."""
+    record_batches = [
+        pa.RecordBatch.from_pydict(
+            {
+                "event": pa.array([f"test-event-{batch}-{i}" for i in range(5000)]),
+                "uuid": pa.array([str(uuid.uuid4()) for _ in range(5000)]),
+                "_inserted_at": pa.array([dt.datetime.fromtimestamp(i) for i in range(5000)]),
+            }
+        )
+        for batch in range(3)
+    ]
+    transformer = get_stream_transformer("JSONLines", compression=compression)
+
+    files = []
+    current_file = b""
+    async for chunk in transformer.iter(_record_batches_from(record_batches), max_file_size_bytes=max_file_size_bytes):
+        current_file += chunk.data
+        if chunk.is_eof:
+            files.append(current_file)
+            current_file = b""
+
+    assert current_file == b""
+    if max_file_size_bytes == 0:
+        assert len(files) == 1
+    else:
+        # Compressors may buffer data without producing output, so we can't know exactly when files are split,
+        # but there is enough data for all of them to produce some output before the end.
+        assert len(files) > 1
+
+    lines = b"".join(decompress(file, compression) for file in files).splitlines()
+    events = sorted(json.loads(line)["event"] for line in lines)
+    assert events == sorted(f"test-event-{batch}-{i}" for batch in range(3) for i in range(5000))
+
+
+@pytest.mark.parametrize("compression", [None, "zstd", "snappy"])
+@pytest.mark.parametrize("max_file_size_bytes", [0, 1])
+@pytest.mark.asyncio
+async def test_parquet_stream_transformer(compression, max_file_size_bytes):
+    """Test record batches encoded in parallel are assembled in order into valid Parquet files."""
+    record_batches = [
+        pa.RecordBatch.from_pydict(
+            {
+                "event": pa.array([f"test-event-{batch}-{i}" for i in range(1000)]),
+                "_inserted_at": pa.array([dt.datetime.fromtimestamp(i) for i in range(1000)]),
+            }
+        )
+        for batch in range(5)
+    ]
+    transformer = get_stream_transformer(
+        "Parquet", compression=compression, schema=record_batches[0].schema, include_inserted_at=False
+    )
+
+    files = []
+    current_file = b""
+    with mock.patch("products.batch_exports.backend.temporal.metrics.get_metric_meter", mock.MagicMock()):
+        async for chunk in transformer.iter(
+            _record_batches_from(record_batches), max_file_size_bytes=max_file_size_bytes
+        ):
+            current_file += chunk.data
+            if chunk.is_eof:
+                files.append(current_file)
+                current_file = b""
+
+    assert current_file == b""
+    # When splitting, every record batch ends a file, and there is always a final (empty) file.
+    assert len(files) == (1 if max_file_size_bytes == 0 else 6)
+
+    tables = [pq.read_table(pa.BufferReader(file)) for file in files]
+    assert all(table.column_names == ["event"] for table in tables)
+    events = [event for table in tables for event in table.column("event").to_pylist()]
+    assert events == [f"test-event-{batch}-{i}" for batch in range(5) for i in range(1000)]
@@ -0,0 +1,62 @@
+import gzip
+
+import brotli
+import lz4.frame
+import pytest
+import zstandard
+
+from products.batch_exports.backend.temporal.compression import (
+    STREAM_COMPRESSIONS,
+    ZstdStreamCompressor,
+    get_stream_compressor,
+)
+
+
+def decompress(content: bytes, compression: str) -> bytes:
+    match compression:
+        case "gzip":
+            return gzip.decompress(content)
+        case "brotli":
+            return brotli.decompress(content)
+        case "zstd":
+            return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+        case "lz4":
+            return lz4.frame.decompress(content)
+        case _:
+            raise ValueError(f"Unsupported compression: '{compression}'")
+
+
+@pytest.mark.parametrize("compression", STREAM_COMPRESSIONS)
+@pytest.mark.parametrize(
+    "to_write",
+    [
+        (),
+        (b"",),
+        (b"12345",),
+        tuple(f'{{"id": "record-{i}", "property": "value"}}\n'.encode() for i in range(1000)),
+    ],
+)
+def test_stream_compressor_produces_a_single_stream(compression, to_write):
+    """Test writes fed to a stream compressor decompress to the concatenation of all writes."""
+    compressor = get_stream_compressor(compression)
+
+    compressed = b"".join(compressor.compress(content) for content in to_write) + compressor.finish()
+
+    assert decompress(compressed, compression) == b"".join(to_write)
+
+
+@pytest.mark.parametrize("threads", [0, 2, -1])
+@pytest.mark.parametrize("level", [1, 3, 19])
+def test_zstd_stream_compressor_with_level_and_threads(level, threads):
+    """Test zstd compressed data can be decompressed regardless of level and number of threads."""
+    to_write = [f'{{"id": "record-{i}", "property": "value"}}\n'.encode() for i in range(10000)]
+    compressor = ZstdStreamCompressor(level=level, threads=threads)
+
+    compressed = b"".join(compressor.compress(content) for content in to_write) + compressor.finish()
+
+    assert decompress(compressed, "zstd") == b"".join(to_write)
+
+
+def test_get_stream_compressor_raises_on_unsupported_compression():
+    with pytest.raises(ValueError):
+        get_stream_compressor("snappy")
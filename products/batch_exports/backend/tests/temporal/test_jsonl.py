@@ -0,0 +1,101 @@
+import datetime as dt
+import decimal
+import json
+
+import pyarrow as pa
+import pytest
+
+from products.batch_exports.backend.temporal.jsonl import dump_record_batch_to_jsonl
+from products.batch_exports.backend.temporal.pipeline.transformer import dump_dict
+from products.batch_exports.backend.temporal.utils import cast_record_batch_json_columns
+
+
+def dump_rows(record_batch: pa.RecordBatch) -> bytes:
+    """Dump a record batch row by row, which is what `dump_record_batch_to_jsonl` must match."""
+    return b"".join(dump_dict(record) for record in record_batch.to_pylist())
+
+
+@pytest.mark.parametrize(
+    "array",
+    [
+        pa.array(
+            ["plain", 'with "quotes"', "new\nline", "tab\t", "back\\slash", "\x00", "ünïcode 👋", "a,b", "", None]
+        ),
+        pa.array(["x", "y", None, "x"]).dictionary_encode(),
+        pa.array([0, -3, 2**62, None], pa.int64()),
+        pa.array([0, 2**64 - 1, None], pa.uint64()),
+        pa.array([1.0, 0.1, 1e16, 1e-7, -0.0, float("nan"), None]),
+        pa.array([0.1, None], pa.float32()),
+        pa.array([True, False, None]),
+        pa.array(
+            [dt.datetime(2024, 1, 1, tzinfo=dt.UTC), dt.datetime(2024, 1, 1, 1, 2, 3, 450, tzinfo=dt.UTC), None],
+            pa.timestamp("us", tz="UTC"),
+        ),
+        pa.array([dt.datetime(2024, 1, 1, 0, 0, 0, 123000), None], pa.timestamp("ms")),
+        pa.array([dt.datetime(1960, 1, 1, 1, 2, 3, 450), None], pa.timestamp("us")),
+        pa.array([dt.datetime(2024, 1, 1, 12, tzinfo=dt.UTC)], pa.timestamp("us", tz="Europe/Berlin")),
+        pa.array([dt.date(2024, 1, 2), None]),
+        pa.array([decimal.Decimal("1.50"), None], pa.decimal128(10, 2)),
+        pa.array([[1, 2], [], None], pa.list_(pa.int64())),
+        pa.array([{"a": 1, "b": "x,y"}, None], pa.struct([("a", pa.int64()), ("b", pa.string())])),
+        pa.array([[("key", "value")], None], pa.map_(pa.string(), pa.string())),
+    ],
+)
+def test_dump_record_batch_to_jsonl_matches_dumping_rows(array):
+    """Test dumping from Arrow arrays produces the same bytes as dumping each row."""
+    record_batch = pa.RecordBatch.from_arrays([array, pa.array(range(len(array)))], names=["value", "index"])
+
+    assert dump_record_batch_to_jsonl(record_batch, dump_row=dump_dict) == dump_rows(record_batch)
+
+
+def test_dump_record_batch_to_jsonl_matches_dumping_rows_with_json_columns():
+    """Test JSON columns are dumped like their values decoded by `JsonScalar.as_py`."""
+    record_batch = pa.RecordBatch.from_pydict(
+        {
+            "event": pa.array(["test-event"] * 7),
+            "properties": pa.array(
+                [
+                    '{"$current_url":   "https://posthog.com", "value": 1.50, "nested": {"list": [1, null, true]}}',
+                    '{"tab": "before\tafter"}',
+                    '{"surrogate": "\\ud83d"}',
+                    "$set: Something",
+                    "",
+                    None,
+                    "[]",
+                ]
+            ),
+        }
+    )
+    record_batch = cast_record_batch_json_columns(record_batch, json_columns=("properties",))
+
+    assert dump_record_batch_to_jsonl(record_batch, dump_row=dump_dict) == dump_rows(record_batch)
+
+
+def test_dump_record_batch_to_jsonl_falls_back_to_dump_row():
+    """Test rows orjson can't dump are dumped by `dump_row`, keeping other rows as they are."""
+    deeply_nested: str = "test"
+    for _ in range(300):
+        deeply_nested = json.dumps({"nested": json.loads(deeply_nested) if deeply_nested != "test" else "test"})
+
+    record_batch = pa.RecordBatch.from_pydict(
+        {
+            "event": pa.array(["test-event-0", "test-event-1", "test-event-2"]),
+            "properties": pa.array(['{"a": 1}', deeply_nested, '{"big": 12345678901234567890987654321}']),
+        }
+    )
+    record_batch = cast_record_batch_json_columns(record_batch, json_columns=("properties",))
+    dumped_rows = []
+
+    def dump_row(row):
+        dumped_rows.append(row["event"])
+        return dump_dict(row)
+
+    assert dump_record_batch_to_jsonl(record_batch, dump_row=dump_row) == dump_rows(record_batch)
+    assert "test-event-0" not in dumped_rows
+    assert "test-event-1" in dumped_rows
+
+
+def test_dump_record_batch_to_jsonl_with_no_rows():
+    record_batch = pa.RecordBatch.from_pydict({"event": pa.array([], pa.string())})
+
+    assert dump_record_batch_to_jsonl(record_batch, dump_row=dump_dict) == b""
@@ -2,6 +2,7 @@ import csv
 import datetime as dt
 import io
 import json
+import zlib
 
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -15,6 +16,7 @@ from products.batch_exports.backend.temporal.temporary_file import (
     ParquetBatchExportWriter,
     json_dumps_bytes,
 )
+from products.batch_exports.backend.tests.temporal.test_compression import decompress
 
 
 @pytest.mark.parametrize(
@@ -204,6 +206,65 @@ def test_batch_export_temporary_file_write_records_to_tsv(records):
         assert be_file.records_since_last_reset == 0
 
 
+@pytest.mark.parametrize("compression", ["gzip", "brotli", "zstd", "lz4"])
+def test_batch_export_temporary_file_compresses_as_a_single_stream(compression):
+    """Test all writes to a compressed BatchExportTemporaryFile are part of a single compressed stream."""
+    to_write = [json_dumps_bytes({"id": f"record-{i}", "property": "value"}) + b"\n" for i in range(1000)]
+
+    with BatchExportTemporaryFile(compression=compression) as be_file:
+        for content in to_write:
+            be_file.write(content)
+
+        assert be_file.has_unfinished_compression is True
+
+        be_file.finish_compressor()
+
+        assert be_file.has_unfinished_compression is False
+        assert be_file.bytes_total == be_file.tell()
+
+        be_file.seek(0)
+        compressed = be_file.read()
+
+    assert decompress(compressed, compression) == b"".join(to_write)
+    if compression == "gzip":
+        # A single gzip member: Decompressing it must not leave any data for another member.
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        decompressor.decompress(compressed)
+        assert decompressor.eof is True
+        assert decompressor.unused_data == b""
+
+
+@pytest.mark.parametrize("compression", ["gzip", "brotli", "zstd", "lz4"])
+@pytest.mark.asyncio
+async def test_jsonl_writer_finishes_compressed_stream_when_closing(compression):
+    """Test the compressed stream is finished when closing, even if all data was already flushed."""
+    flushed: list[tuple[bytes, bool]] = []
+
+    async def store_in_memory_on_flush(
+        batch_export_file,
+        records_since_last_flush,
+        bytes_since_last_flush,
+        flush_counter,
+        last_date_range,
+        is_last,
+        error,
+    ):
+        flushed.append((batch_export_file.read(), is_last))
+
+    writer = JSONLBatchExportWriter(max_bytes=1, flush_callable=store_in_memory_on_flush, compression=compression)
+    record_batch = TEST_RECORD_BATCHES[0]
+
+    async with writer.open_temporary_file():
+        await writer.write_record_batch(record_batch, flush=False)
+        await writer.flush()
+
+    assert [is_last for _, is_last in flushed] == [False, True]
+
+    lines = decompress(b"".join(data for data, _ in flushed), compression).splitlines()
+    assert len(lines) == record_batch.num_rows
+    assert json.loads(lines[0]) == {"event": "test-event-0", "properties": '{"prop_0": 1, "prop_1": 2}'}
+
+
 TEST_RECORD_BATCHES = [
     pa.RecordBatch.from_pydict(
         {